@@ -0,0 +1,50 @@
+"""
+Management command to compare render_to_string + strip_tags against
+the precompiled email renderer
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.utils.html import strip_tags
+
+from core.email_templates import email_renderer, get_shell_context
+
+
+class Command(BaseCommand):
+    help = 'Benchmark email rendering with precompiled text templates against strip_tags'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--emails', type=int, default=1000, help='Number of emails to render')
+        parser.add_argument('--template', default='transaction_notification', help='Email template name')
+
+    def handle(self, *args, **options):
+        count = options['emails']
+        name = options['template']
+        contexts = [
+            {
+                'recipient_name': f'User {i}',
+                'user_name': f'User {i}',
+                'transaction_message': f'You just received ${i:,}.00 from Jane Doe',
+                'verification_code': f'{i:06d}',
+            }
+            for i in range(count)
+        ]
+
+        self.stdout.write(self.style.HTTP_INFO(f'Rendering {count} "{name}" emails...'))
+
+        start = time.perf_counter()
+        for context in contexts:
+            html_content = render_to_string(f'emails/{name}.html', {**get_shell_context(), **context})
+            strip_tags(html_content)
+        legacy_elapsed = time.perf_counter() - start
+
+        email_renderer.preload([name])
+        start = time.perf_counter()
+        for context in contexts:
+            email_renderer.render(name, context)
+        compiled_elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'render_to_string + strip_tags: {legacy_elapsed:.2f}s, {count / legacy_elapsed:.0f} emails/s')
+        self.stdout.write(f'Precompiled html + text:       {compiled_elapsed:.2f}s, {count / compiled_elapsed:.0f} emails/s')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {legacy_elapsed / compiled_elapsed:.1f}x'))
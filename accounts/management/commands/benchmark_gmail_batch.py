@@ -0,0 +1,65 @@
+"""
+Management command to compare one-by-one and batched Gmail sends
+against the local fake Gmail endpoint
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from core.gmail_fake import FakeGmailHttp, build_fake_gmail_service
+from core.gmail_service import GmailAPIService, TokenBucket
+
+
+class Command(BaseCommand):
+    help = 'Benchmark Gmail batch sending against one-by-one sends (no network)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=500, help='Number of emails to send')
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages per batch request')
+        parser.add_argument('--latency-ms', type=float, default=50, help='Simulated latency per HTTP round trip')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        latency = options['latency_ms'] / 1000
+        messages = [
+            {
+                'to_emails': [f'user{i}@example.com'],
+                'subject': 'Benchmark',
+                'text_content': f'Message {i}',
+                'html_content': f'<p>Message {i}</p>',
+            }
+            for i in range(count)
+        ]
+
+        self.stdout.write(self.style.HTTP_INFO(
+            f'Sending {count} emails with {options["latency_ms"]:.0f}ms simulated latency...'
+        ))
+
+        single_http, single_service = self._service(latency, options['batch_size'])
+        start = time.perf_counter()
+        for message in messages:
+            single_service.send_email(**message)
+        single_elapsed = time.perf_counter() - start
+
+        batch_http, batch_service = self._service(latency, options['batch_size'])
+        start = time.perf_counter()
+        results = batch_service.send_batch(messages)
+        batch_elapsed = time.perf_counter() - start
+
+        sent = sum(1 for success, _ in results if success)
+        self.stdout.write(
+            f'One-by-one: {single_elapsed:.2f}s, {single_http.round_trips} requests, '
+            f'{count / single_elapsed:.0f} emails/s'
+        )
+        self.stdout.write(
+            f'Batched:    {batch_elapsed:.2f}s, {batch_http.round_trips} requests, '
+            f'{sent / batch_elapsed:.0f} emails/s'
+        )
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {single_elapsed / batch_elapsed:.1f}x'))
+
+    def _service(self, latency, batch_size):
+        http = FakeGmailHttp(latency=latency)
+        service = GmailAPIService(service=build_fake_gmail_service(http))
+        service.batch_size = batch_size
+        # Measure transport cost only; quota pacing would dominate both runs
+        service.rate_limiter = TokenBucket(rate=1e9, capacity=1e9)
+        return http, service
@@ -6,8 +6,7 @@ import string
 import socket
 from smtplib import SMTPException
 from django.core.mail import send_mail, get_connection
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from core.email_templates import render_email
 from django.conf import settings
 from django.core.cache import cache
 from core.gmail_service import send_gmail
@@ -21,6 +20,7 @@ import logging
 from datetime import datetime, timedelta
 from django.contrib.auth.hashers import make_password, check_password
 from django.utils import timezone
+from django.utils.crypto import salted_hmac
 from typing import Tuple, List, Optional, Dict, Any
 from django.contrib.gis.geoip2 import GeoIP2
 
@@ -33,7 +33,7 @@ def generate_verification_code():
 
 def send_verification_email(user, code, is_login=False):
     """
-    Send verification email with the provided code via Gmail API.
+    Queue verification email with the provided code for background delivery.
     
     Args:
         user: User object or email string
@@ -51,11 +51,11 @@ def send_verification_email(user, code, is_login=False):
     # Determine the subject and template based on the verification type
     if is_login:
         subject = 'Login Verification Code'
-        template = 'emails/login_code_email.html'
+        template = 'login_code_email'
         timeout = settings.LOGIN_VERIFICATION_TIMEOUT
     else:
         subject = 'Verify Your Email Address'
-        template = 'emails/verification_email.html'
+        template = 'verification_email'
         timeout = settings.EMAIL_VERIFICATION_TIMEOUT
 
     try:
@@ -65,55 +65,27 @@ def send_verification_email(user, code, is_login=False):
             'user_name': user_name,
             'is_login': is_login
         }
-        html_message = render_to_string(template, context)
-        text_message = strip_tags(html_message)
+        html_message, text_message = render_email(template, context)
 
-        # Try Gmail API for production
-        if not settings.DEBUG and hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
-            try:
-                success, result = send_gmail(
-                    to_emails=[email],
-                    subject=subject,
-                    text_content=text_message,
-                    html_content=html_message,
-                    headers={'X-Verification-Type': 'login' if is_login else 'registration'}
-                )
-                
-                if success:
-                    # Store the verification code in cache
-                    cache_key = f"verification_code_{email}"
-                    cache.set(cache_key, code, timeout)
-                    
-                    logger.info(f"Verification email sent via Gmail API to {email} (login: {is_login})")
-                    return True
-                else:
-                    logger.error(f"Gmail API failed for {email}: {result}")
-                    # Fall through to Django backend
-                    
-            except Exception as gmail_error:
-                logger.error(f"Gmail API error for {email}: {str(gmail_error)}")
-                # Fall through to Django backend
-        
-        # Fallback to Django's email backend
-        sent = send_mail(
-            subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{subject}",
-            message=text_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[email],
-            html_message=html_message,
-            fail_silently=False,
+        # Imported here to avoid loading banking models with the accounts app
+        from banking.email_outbox import enqueue_email
+        enqueue_email(
+            to_email=email,
+            subject=subject,
+            text_body=text_message,
+            html_body=html_message,
+            headers={'X-Verification-Type': 'login' if is_login else 'registration'},
+            email_type='verification',
+            # Keyed on an HMAC so the code itself is never stored in the key
+            dedup_key=f"verification:{email}:{salted_hmac('verification-email', code).hexdigest()}"
         )
-        
-        if sent:
-            # Store the verification code in cache
-            cache_key = f"verification_code_{email}"
-            cache.set(cache_key, code, timeout)
-            
-            logger.info(f"Verification email sent via Django backend to {email} (login: {is_login})")
-            return True
-        else:
-            logger.error(f"Django email backend failed for {email}")
-            return False
+
+        # Store the verification code in cache; the email is delivered in the background
+        cache_key = f"verification_code_{email}"
+        cache.set(cache_key, code, timeout)
+
+        logger.info(f"Verification email queued for {email} (login: {is_login})")
+        return True
             
     except Exception as e:
         logger.error(f"Error sending verification email to {email}: {str(e)}", exc_info=True)
@@ -164,8 +136,7 @@ def send_password_reset_email(user, reset_link):
             'site_name': 'PrimeTrust'
         }
         
-        html_message = render_to_string('emails/password_reset.html', context)
-        text_message = strip_tags(html_message)
+        html_message, text_message = render_email('password_reset', context)
         
         # Try Gmail API for production
         if not settings.DEBUG and hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
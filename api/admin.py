@@ -1,16 +1,19 @@
 from django.contrib import admin
 from .models import (
     WebhookEndpoint, WebhookEvent, WebhookDelivery, 
-    WebhookSignature, WebhookTemplate, WebhookLog
+    WebhookSignature, WebhookTemplate, WebhookLog, WebhookReplayJob,
+    WebhookDeliverySummary
 )
+from .webhook_retention import WebhookRetentionService
 
 @admin.register(WebhookEndpoint)
 class WebhookEndpointAdmin(admin.ModelAdmin):
-    list_display = ['name', 'url', 'user', 'is_active', 'success_rate', 'total_deliveries', 'created_at']
-    list_filter = ['is_active', 'created_at', 'events']
+    list_display = ['name', 'url', 'user', 'is_active', 'circuit_state', 'success_rate', 'total_deliveries', 'created_at']
+    list_filter = ['is_active', 'circuit_state', 'created_at', 'events']
     search_fields = ['name', 'url', 'user__email']
     readonly_fields = ['id', 'created_at', 'updated_at', 'last_used_at', 'total_deliveries', 
-                      'successful_deliveries', 'failed_deliveries', 'success_rate']
+                      'successful_deliveries', 'failed_deliveries', 'success_rate',
+                      'circuit_state', 'circuit_opened_at']
     fieldsets = [
         ('Basic Information', {
             'fields': ['id', 'user', 'name', 'url', 'is_active']
@@ -21,6 +24,13 @@ class WebhookEndpointAdmin(admin.ModelAdmin):
         ('Delivery Settings', {
             'fields': ['timeout_seconds', 'max_retries', 'retry_delay_seconds']
         }),
+        ('Batch Delivery', {
+            'fields': ['batch_enabled', 'batch_max_events', 'batch_max_bytes', 'batch_linger_ms'],
+            'classes': ['collapse']
+        }),
+        ('Circuit Breaker', {
+            'fields': ['circuit_state', 'circuit_opened_at']
+        }),
         ('Statistics', {
             'fields': ['total_deliveries', 'successful_deliveries', 'failed_deliveries', 'success_rate'],
             'classes': ['collapse']
@@ -104,6 +114,31 @@ class WebhookDeliveryAdmin(admin.ModelAdmin):
     is_successful.short_description = 'Successful'
 
 
+@admin.register(WebhookReplayJob)
+class WebhookReplayJobAdmin(admin.ModelAdmin):
+    list_display = ['webhook_endpoint', 'user', 'status', 'scheduled_events', 
+                   'total_events', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['webhook_endpoint__name', 'user__email']
+    readonly_fields = ['id', 'total_events', 'scheduled_events', 'cursor_created_at',
+                      'cursor_event_id', 'created_at', 'started_at', 'completed_at']
+    fieldsets = [
+        ('Replay Selection', {
+            'fields': ['id', 'user', 'webhook_endpoint', 'start_time', 'end_time', 'event_statuses']
+        }),
+        ('Pacing', {
+            'fields': ['chunk_size', 'rate_limit_per_second']
+        }),
+        ('Progress', {
+            'fields': ['status', 'total_events', 'scheduled_events', 'error_message',
+                      'cursor_created_at', 'cursor_event_id']
+        }),
+        ('Timestamps', {
+            'fields': ['created_at', 'started_at', 'completed_at']
+        })
+    ]
+
+
 @admin.register(WebhookSignature)
 class WebhookSignatureAdmin(admin.ModelAdmin):
     list_display = ['webhook_endpoint', 'method', 'algorithm', 'created_at']
@@ -172,11 +207,17 @@ class WebhookLogAdmin(admin.ModelAdmin):
     actions = ['clear_old_logs']
     
     def clear_old_logs(self, request, queryset):
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        # Delete logs older than 30 days
-        cutoff_date = timezone.now() - timedelta(days=30)
-        count = queryset.filter(created_at__lt=cutoff_date).delete()[0]
+        # Delete logs older than 30 days in chunks
+        count = WebhookRetentionService.purge_logs(older_than_days=30, queryset=queryset)
         self.message_user(request, f'{count} old log entries deleted.')
     clear_old_logs.short_description = 'Clear logs older than 30 days'
+
+
+@admin.register(WebhookDeliverySummary)
+class WebhookDeliverySummaryAdmin(admin.ModelAdmin):
+    list_display = ['webhook_endpoint', 'date', 'total_deliveries', 'successful_deliveries',
+                   'failed_deliveries', 'average_response_time']
+    list_filter = ['date']
+    search_fields = ['webhook_endpoint__name']
+    readonly_fields = ['id', 'created_at', 'updated_at']
+    date_hierarchy = 'date'
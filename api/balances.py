@@ -0,0 +1,142 @@
+"""
+Consolidated Balances for PrimeTrust Banking API
+
+Net-worth views used to call the account, Bitcoin wallet, investment
+account and loan account endpoints separately. BalanceService reads
+every balance a user holds with one UNION ALL query over the four
+tables and derives the totals from those rows:
+- Every branch selects the same columns (kind, id, user, number, type,
+  amount, price, updated_at) so the union needs no per-kind follow-up
+- Totals are computed in Python from the rows instead of one aggregate
+  per account type
+"""
+
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List
+
+from django.db.models import CharField, DecimalField, ExpressionWrapper, F, Value
+
+from banking.models import Account, BitcoinWallet
+from banking.models_investments_insurance import InvestmentAccount
+from banking.models_loans import LoanAccount
+from .conditional import ResourceVersion
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+SATOSHIS = Decimal('0.00000001')
+
+_AMOUNT = DecimalField(max_digits=30, decimal_places=8)
+_COLUMNS = ('row_kind', 'row_id', 'row_user', 'row_number', 'row_type', 'row_amount', 'row_price', 'row_updated')
+_KIND_ORDER = {'account': 0, 'bitcoin': 1, 'investment': 2, 'loan': 3}
+
+
+def _branch(queryset, kind, user, number, account_type, amount, price=None):
+    """values() rows for one kind, with the columns every branch of the union shares"""
+    # Every column is an annotation so all branches select them in the same order;
+    # amounts share one decimal type so Bitcoin balances keep their 8 places
+    return queryset.annotate(
+        row_kind=Value(kind, output_field=CharField()),
+        row_id=F('pk'),
+        row_user=user,
+        row_number=number,
+        row_type=account_type,
+        row_amount=ExpressionWrapper(amount, output_field=_AMOUNT),
+        row_price=ExpressionWrapper(price, output_field=_AMOUNT) if price is not None
+        else Value(None, output_field=_AMOUNT),
+        row_updated=F('updated_at'),
+    ).values(*_COLUMNS).order_by()
+
+
+class BalanceService:
+    """
+    Every balance of one or more users in a single query
+    """
+
+    @staticmethod
+    def query(user_ids: Iterable[int]):
+        """UNION ALL of the users' accounts, wallets, investment accounts and loans"""
+        user_ids = list(user_ids)
+        return _branch(
+            Account.objects.filter(user_id__in=user_ids), 'account',
+            F('user_id'), F('account_number'), F('account_type'), F('balance'),
+        ).union(
+            _branch(
+                BitcoinWallet.objects.filter(user_id__in=user_ids), 'bitcoin',
+                F('user_id'), F('address'), Value('bitcoin', output_field=CharField()), F('balance'),
+                price=F('btc_price_usd'),
+            ),
+            _branch(
+                InvestmentAccount.objects.filter(user_id__in=user_ids), 'investment',
+                F('user_id'), F('account_number'), F('account_type'), F('balance'),
+            ),
+            _branch(
+                LoanAccount.objects.filter(application__user_id__in=user_ids), 'loan',
+                F('application__user_id'), F('loan_number'), F('application__loan_type'), F('current_balance'),
+            ),
+            all=True,
+        )
+
+    @staticmethod
+    def rows(user_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """Balance rows, accounts first, each with its USD value"""
+        rows = []
+        for row in BalanceService.query(user_ids):
+            kind = row['row_kind']
+            amount = Decimal(row['row_amount'] or 0)
+            if kind == 'bitcoin':
+                balance = amount.quantize(SATOSHIS)
+                value_usd = (amount * Decimal(row['row_price'] or 0)).quantize(CENTS)
+            else:
+                balance = value_usd = amount.quantize(CENTS)
+            rows.append({
+                'kind': kind,
+                'id': row['row_id'],
+                'user_id': row['row_user'],
+                'number': row['row_number'],
+                'type': row['row_type'],
+                'balance': balance,
+                'value_usd': value_usd,
+                'updated_at': row['row_updated'],
+            })
+        rows.sort(key=lambda row: (row['user_id'], _KIND_ORDER[row['kind']], row['id']))
+        return rows
+
+    @staticmethod
+    def summary(rows: Iterable[Dict[str, Any]]) -> Dict[str, Decimal]:
+        """Totals in AccountSummarySerializer's shape, plus net worth"""
+        totals = defaultdict(Decimal)
+        for row in rows:
+            if row['kind'] == 'account':
+                totals[f"total_{row['type']}"] += row['balance']
+                totals['total_balance'] += row['balance']
+            elif row['kind'] == 'bitcoin':
+                totals['total_bitcoin'] += row['balance']
+                totals['bitcoin_value_usd'] += row['value_usd']
+            elif row['kind'] == 'investment':
+                totals['total_investments'] += row['balance']
+            else:
+                totals['total_loans'] += row['balance']
+        summary = {
+            key: totals[key] for key in (
+                'total_checking', 'total_savings', 'total_credit', 'total_balance',
+                'total_bitcoin', 'bitcoin_value_usd', 'total_investments', 'total_loans',
+            )
+        }
+        summary['net_worth'] = (
+            summary['total_balance'] + summary['bitcoin_value_usd']
+            + summary['total_investments'] - summary['total_loans']
+        )
+        return summary
+
+    @staticmethod
+    def version(user_ids: Iterable[int], rows: List[Dict[str, Any]]) -> ResourceVersion:
+        """Version of a balances response, from rows already read"""
+        stamps = tuple((row['kind'], row['id'], row['balance'], row['updated_at']) for row in rows)
+        updated = [row['updated_at'] for row in rows if row['updated_at'] is not None]
+        return ResourceVersion(
+            'balances', tuple(sorted(user_ids)), stamps,
+            last_modified=max(updated) if updated else None,
+        )
@@ -0,0 +1,220 @@
+"""
+Circuit Breaker for Webhook Delivery
+
+This module tracks the health of each webhook endpoint so that a subscriber
+that is down stops costing a full request timeout on every event:
+- Closed / open / half-open states driven by a rolling failure rate and latency
+- Single probe request once the open cooldown has elapsed
+- AIMD (additive increase, multiplicative decrease) concurrency limits
+"""
+
+import logging
+from datetime import timedelta
+from typing import Dict, Any, List
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import WebhookEndpoint
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    The breaker state is stored on the WebhookEndpoint row so every worker
+    sees the same state. The rolling outcome window, the AIMD concurrency
+    limit and the in-flight counter live in the cache.
+    """
+
+    def __init__(self, endpoint: WebhookEndpoint):
+        self.endpoint = endpoint
+        self.cache_prefix = f'webhook_circuit:{endpoint.pk}:'
+        self.cache_timeout = 86400  # 24 hours
+
+        self.window_size = getattr(settings, 'WEBHOOK_CIRCUIT_WINDOW_SIZE', 20)
+        self.min_calls = getattr(settings, 'WEBHOOK_CIRCUIT_MIN_CALLS', 5)
+        self.failure_rate_threshold = getattr(settings, 'WEBHOOK_CIRCUIT_FAILURE_RATE', 50)
+        self.slow_call_ms = getattr(settings, 'WEBHOOK_CIRCUIT_SLOW_CALL_MS', 5000)
+        self.open_seconds = getattr(settings, 'WEBHOOK_CIRCUIT_OPEN_SECONDS', 60)
+        self.max_concurrency = getattr(settings, 'WEBHOOK_MAX_CONCURRENCY', 10)
+
+    @property
+    def state(self) -> str:
+        return self.endpoint.circuit_state
+
+    def allow_request(self) -> bool:
+        """
+        Return True if a delivery may be attempted now.
+
+        Callers that get True must call record_success() or record_failure()
+        once the attempt finishes so that the slot is released.
+        """
+        if self.state == WebhookEndpoint.CIRCUIT_OPEN:
+            if not self._cooldown_elapsed():
+                return False
+            # Only one worker gets to send the probe
+            if not self._acquire_probe():
+                return False
+            self._transition(WebhookEndpoint.CIRCUIT_HALF_OPEN)
+            return True
+
+        if self.state == WebhookEndpoint.CIRCUIT_HALF_OPEN:
+            return self._acquire_probe()
+
+        return self._acquire_slot()
+
+    def record_success(self, response_time_ms: int):
+        """Record a successful delivery attempt"""
+        slow = response_time_ms >= self.slow_call_ms
+        self._record_outcome(failed=slow, response_time_ms=response_time_ms)
+
+        if self.state == WebhookEndpoint.CIRCUIT_HALF_OPEN:
+            self._release_probe()
+            self._reset_window()
+            self._transition(WebhookEndpoint.CIRCUIT_CLOSED)
+            return
+
+        self._release_slot()
+        if slow:
+            self._decrease_limit()
+            self._evaluate()
+        else:
+            self._increase_limit()
+
+    def record_failure(self, response_time_ms: int):
+        """Record a failed delivery attempt"""
+        self._record_outcome(failed=True, response_time_ms=response_time_ms)
+
+        if self.state == WebhookEndpoint.CIRCUIT_HALF_OPEN:
+            self._release_probe()
+            self._transition(WebhookEndpoint.CIRCUIT_OPEN)
+            return
+
+        self._release_slot()
+        self._decrease_limit()
+        self._evaluate()
+
+    def reset(self):
+        """Force the breaker back to closed and clear its statistics"""
+        for key in ('window', 'limit', 'in_flight', 'probe'):
+            cache.delete(self._key(key))
+        self._transition(WebhookEndpoint.CIRCUIT_CLOSED)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return breaker state and rolling statistics for monitoring"""
+        window = self._get_window()
+        total = len(window)
+        failures = sum(1 for failed, _ in window if failed)
+
+        return {
+            'state': self.state,
+            'opened_at': self.endpoint.circuit_opened_at.isoformat() if self.endpoint.circuit_opened_at else None,
+            'retry_at': self._retry_at().isoformat() if self.state == WebhookEndpoint.CIRCUIT_OPEN else None,
+            'window_calls': total,
+            'failure_rate': (failures / total * 100) if total > 0 else 0,
+            'avg_response_time_ms': (sum(ms for _, ms in window) / total) if total > 0 else 0,
+            'concurrency_limit': self._get_limit(),
+            'in_flight': cache.get(self._key('in_flight'), 0),
+        }
+
+    def _key(self, name: str) -> str:
+        return f'{self.cache_prefix}{name}'
+
+    def _cooldown_elapsed(self) -> bool:
+        return timezone.now() >= self._retry_at()
+
+    def _retry_at(self):
+        opened_at = self.endpoint.circuit_opened_at or timezone.now()
+        return opened_at + timedelta(seconds=self.open_seconds)
+
+    def _transition(self, new_state: str):
+        """Persist a state change so that all workers observe it"""
+        if new_state == self.endpoint.circuit_state:
+            return
+
+        old_state = self.endpoint.circuit_state
+        opened_at = timezone.now() if new_state == WebhookEndpoint.CIRCUIT_OPEN else self.endpoint.circuit_opened_at
+        if new_state == WebhookEndpoint.CIRCUIT_CLOSED:
+            opened_at = None
+
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(
+            circuit_state=new_state,
+            circuit_opened_at=opened_at
+        )
+        self.endpoint.circuit_state = new_state
+        self.endpoint.circuit_opened_at = opened_at
+
+        logger.warning(
+            f"Webhook circuit for {self.endpoint.name} changed from {old_state} to {new_state}"
+        )
+
+    def _evaluate(self):
+        """Open the circuit when the rolling failure rate crosses the threshold"""
+        window = self._get_window()
+        if len(window) < self.min_calls:
+            return
+
+        failures = sum(1 for failed, _ in window if failed)
+        failure_rate = failures / len(window) * 100
+        if failure_rate >= self.failure_rate_threshold:
+            self._transition(WebhookEndpoint.CIRCUIT_OPEN)
+
+    # Rolling window
+
+    def _get_window(self) -> List:
+        return cache.get(self._key('window'), [])
+
+    def _record_outcome(self, failed: bool, response_time_ms: int):
+        window = self._get_window()
+        window.append((failed, response_time_ms))
+        cache.set(self._key('window'), window[-self.window_size:], self.cache_timeout)
+
+    def _reset_window(self):
+        cache.delete(self._key('window'))
+
+    # AIMD concurrency limit
+
+    def _get_limit(self) -> int:
+        return cache.get(self._key('limit'), self.max_concurrency)
+
+    def _increase_limit(self):
+        limit = min(self._get_limit() + 1, self.max_concurrency)
+        cache.set(self._key('limit'), limit, self.cache_timeout)
+
+    def _decrease_limit(self):
+        limit = max(self._get_limit() // 2, 1)
+        cache.set(self._key('limit'), limit, self.cache_timeout)
+
+    def _acquire_slot(self) -> bool:
+        key = self._key('in_flight')
+        cache.add(key, 0, self.endpoint.timeout_seconds * 2)
+        try:
+            in_flight = cache.incr(key)
+        except ValueError:
+            # Key expired between add() and incr()
+            cache.set(key, 1, self.endpoint.timeout_seconds * 2)
+            in_flight = 1
+
+        if in_flight > self._get_limit():
+            self._release_slot()
+            return False
+        return True
+
+    def _release_slot(self):
+        try:
+            if cache.decr(self._key('in_flight')) < 0:
+                cache.set(self._key('in_flight'), 0, self.endpoint.timeout_seconds * 2)
+        except ValueError:
+            pass
+
+    # Half-open probe
+
+    def _acquire_probe(self) -> bool:
+        # The probe lock expires on its own if the worker dies mid-request
+        return cache.add(self._key('probe'), 1, self.endpoint.timeout_seconds + 5)
+
+    def _release_probe(self):
+        cache.delete(self._key('probe'))
@@ -0,0 +1,113 @@
+"""
+Response compression for PrimeTrust Banking API
+
+Compresses large JSON responses under /api/:
+- Brotli when the client accepts it and the brotli package is installed,
+  gzip otherwise
+- Responses below API_COMPRESSION_MIN_SIZE are sent as is; compressing a
+  small balance payload costs more CPU than it saves on the wire
+- Streaming responses (the dashboard event stream) are never buffered
+- Strong ETags are weakened after compression, as GZipMiddleware does, so
+  conditional GETs keep matching
+- Both encodings carry random-length padding against BREACH: gzip in the
+  header filename, as django.middleware.gzip does, and brotli in a metadata
+  meta-block, which decoders skip
+"""
+
+import logging
+import secrets
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+# brotli is optional; without it every client gets gzip
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_CONTENT_TYPES = ('application/json', 'application/vnd.oai.openapi+json')
+
+
+def compress_brotli(content: bytes, quality: int, max_random_bytes: int) -> bytes:
+    """
+    Brotli-compress content behind a metadata meta-block of 1..max_random_bytes bytes
+
+    flush() byte-aligns the stream after its header, so the metadata block
+    (ISLAST=0, MNIBBLES=0, one MSKIPLEN byte) can be placed there as is.
+    """
+    compressor = brotli.Compressor(quality=quality)
+    header = compressor.process(b'') + compressor.flush()
+    length = 1 + secrets.randbelow(min(max_random_bytes, 256))
+    metadata = ((3 << 1) | (1 << 4) | ((length - 1) << 6)).to_bytes(2, 'little')
+    return header + metadata + bytes(length) + compressor.process(content) + compressor.finish()
+
+
+def _accepts(request, encoding: str) -> bool:
+    """True if Accept-Encoding lists the encoding without q=0"""
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.partition(';')
+        if name.strip().lower() != encoding:
+            continue
+        quality = params.strip().lower()
+        if quality.startswith('q='):
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class APICompressionMiddleware:
+    """Size-aware brotli/gzip compression for API responses"""
+
+    # Random padding against BREACH on both encodings, as in django.middleware.gzip
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'API_COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'API_COMPRESSION_BROTLI_QUALITY', 5)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if not request.path.startswith('/api/') or not self._compressible(response):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if BROTLI_AVAILABLE and _accepts(request, 'br'):
+            compressed = compress_brotli(response.content, self.brotli_quality, self.max_random_bytes)
+            encoding = 'br'
+        elif _accepts(request, 'gzip'):
+            compressed, encoding = compress_string(response.content, max_random_bytes=self.max_random_bytes), 'gzip'
+        else:
+            return response
+
+        # Padding can make tiny gains negative
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+
+        return response
+
+    def _compressible(self, response) -> bool:
+        if response.streaming or response.has_header('Content-Encoding'):
+            return False
+        if not 200 <= response.status_code < 300 or len(response.content) < self.min_size:
+            return False
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        return content_type in COMPRESSIBLE_CONTENT_TYPES
@@ -0,0 +1,130 @@
+"""
+Conditional GET for PrimeTrust Banking API
+
+Polling clients send back the ETag of their last response in
+If-None-Match; when nothing they can see has changed the read endpoints
+answer 304 Not Modified before running list queries or serializers.
+
+Versions are built from cheap aggregates only:
+- Account.updated_at, which moves on every balance change
+- The latest transaction id and updated_at involving the accounts, so new
+  transactions and status changes are both picked up
+- The latest updated_at of accounts embedded in those transactions, since
+  TransactionSerializer nests the counterpart account
+"""
+
+import hashlib
+import logging
+from typing import Iterable, Tuple
+
+from django.db.models import Max, Q
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+from banking.models import Account, Transaction
+
+logger = logging.getLogger(__name__)
+
+
+class ResourceVersion:
+    """Version stamp for one API representation"""
+
+    def __init__(self, *parts, last_modified=None):
+        self.parts = parts
+        self.last_modified = last_modified
+
+    def etag(self, request) -> str:
+        """
+        Strong ETag for this version as rendered for the request.
+
+        The path, query string and renderer are part of the tag so that
+        pages and formats of the same resource never share a validator.
+        """
+        renderer = getattr(getattr(request, 'accepted_renderer', None), 'format', '')
+        raw = repr((self.parts, request.get_full_path(), renderer))
+        return f'"{hashlib.sha1(raw.encode()).hexdigest()}"'
+
+
+class ConditionalGetService:
+    """
+    Version stamps and 304 handling for account and transaction reads
+    """
+
+    @staticmethod
+    def _latest(*values):
+        values = [value for value in values if value is not None]
+        return max(values) if values else None
+
+    @staticmethod
+    def _transactions_stamp(account_ids: Iterable[int], user=None) -> Tuple:
+        """Latest id/updated_at of the transactions involving the accounts (one query)"""
+        involved = Q(from_account_id__in=account_ids) | Q(to_account_id__in=account_ids)
+        if user is not None:
+            involved |= Q(user=user)
+        stamp = Transaction.objects.filter(involved).aggregate(
+            last_id=Max('id'),
+            last_updated=Max('updated_at'),
+            from_updated=Max('from_account__updated_at'),
+            to_updated=Max('to_account__updated_at'),
+        )
+        return (
+            stamp['last_id'],
+            stamp['last_updated'],
+            ConditionalGetService._latest(stamp['from_updated'], stamp['to_updated']),
+        )
+
+    @staticmethod
+    def account_version(account: Account) -> ResourceVersion:
+        """Version of an account's own fields; needs no query"""
+        return ResourceVersion('account', account.pk, account.updated_at, last_modified=account.updated_at)
+
+    @staticmethod
+    def account_transactions_version(account: Account) -> ResourceVersion:
+        """Version of an account's transaction list"""
+        last_id, last_updated, embedded_updated = ConditionalGetService._transactions_stamp([account.pk])
+        return ResourceVersion(
+            'account_transactions', account.pk, account.updated_at, last_id, last_updated, embedded_updated,
+            last_modified=ConditionalGetService._latest(account.updated_at, last_updated, embedded_updated),
+        )
+
+    @staticmethod
+    def user_version(user, scope: str) -> ResourceVersion:
+        """Version of everything a user's account and transaction reads return (two queries)"""
+        accounts = list(
+            Account.objects.filter(user=user).order_by('pk').values_list('pk', 'updated_at')
+        )
+        account_ids = [pk for pk, _ in accounts]
+        last_id, last_updated, embedded_updated = ConditionalGetService._transactions_stamp(account_ids, user=user)
+        accounts_updated = ConditionalGetService._latest(*(updated for _, updated in accounts))
+        return ResourceVersion(
+            scope, user.pk, user.first_name, user.last_name, tuple(accounts),
+            last_id, last_updated, embedded_updated,
+            last_modified=ConditionalGetService._latest(accounts_updated, last_updated, embedded_updated),
+        )
+
+    @staticmethod
+    def not_modified(request, version: ResourceVersion):
+        """
+        Evaluate the request's preconditions against a version.
+
+        Returns:
+            HttpResponse: A 304 response if the client's copy is current,
+            otherwise None and the view should build the full response
+        """
+        etag = version.etag(request)
+        last_modified = version.last_modified.timestamp() if version.last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            return None
+        return ConditionalGetService.finalize(response, version, request)
+
+    @staticmethod
+    def finalize(response, version: ResourceVersion, request):
+        """Attach validators and revalidation headers to a response"""
+        response['ETag'] = version.etag(request)
+        if version.last_modified:
+            response['Last-Modified'] = http_date(version.last_modified.timestamp())
+        # Per-user data: never stored by shared caches, always revalidated by clients
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
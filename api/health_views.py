@@ -512,6 +512,7 @@ def monitoring_dashboard_data(request):
                 'active_alerts': active_alerts_count
             },
             'system_resources': system_metrics,
+            'webhook_circuits': performance_monitor.get_webhook_circuit_summary(),
             'latest_health_checks': [
                 {
                     'service': h.service_type,
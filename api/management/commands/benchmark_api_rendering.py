@@ -0,0 +1,72 @@
+"""
+Management command to compare DRF's JSONRenderer against the orjson
+renderer on TransactionSerializer output
+"""
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+
+from banking.models import Account, Transaction
+from api.renderers import ORJSONRenderer, ORJSON_AVAILABLE
+from api.serializers import TransactionSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark JSONRenderer against ORJSONRenderer on serialized transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Number of transactions to serialize')
+        parser.add_argument('--repeat', type=int, default=5, help='Renders per renderer; the best run is reported')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        repeat = options['repeat']
+
+        if not ORJSON_AVAILABLE:
+            self.stdout.write(self.style.WARNING('orjson is not installed; ORJSONRenderer falls back to JSONRenderer'))
+
+        # Unsaved instances: the benchmark measures serialization, not queries
+        now = timezone.now()
+        sender = Account(id=1, account_number='100000000001', routing_number='123456789',
+                         balance=Decimal('15234.56'), created_at=now, updated_at=now)
+        recipient = Account(id=2, account_number='100000000002', routing_number='123456789',
+                            account_type='savings', balance=Decimal('987.65'), created_at=now, updated_at=now)
+        transactions = [
+            Transaction(
+                id=i, from_account=sender, to_account=recipient, transaction_type='transfer',
+                amount=Decimal(f'{i % 5000}.{i % 100:02d}') + Decimal('0.01'), status='completed',
+                description=f'Transfer to {recipient.account_number}: invoice {i}',
+                reference=f'TRF{i:012d}', created_at=now, updated_at=now,
+            )
+            for i in range(1, rows + 1)
+        ]
+
+        self.stdout.write(self.style.HTTP_INFO(f'Serializing {rows} transactions...'))
+        start = time.perf_counter()
+        data = TransactionSerializer(transactions, many=True).data
+        serialize_elapsed = time.perf_counter() - start
+
+        results = {}
+        for name, renderer in (('JSONRenderer', JSONRenderer()), ('ORJSONRenderer', ORJSONRenderer())):
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                body = renderer.render(data, 'application/json', {})
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            results[name] = (best, body)
+
+        stock_elapsed, stock_body = results['JSONRenderer']
+        fast_elapsed, fast_body = results['ORJSONRenderer']
+
+        self.stdout.write(f'TransactionSerializer:  {serialize_elapsed:.3f}s')
+        self.stdout.write(f'JSONRenderer:           {stock_elapsed:.3f}s, {len(stock_body) / 1024:.0f} KiB')
+        self.stdout.write(f'ORJSONRenderer:         {fast_elapsed:.3f}s, {len(fast_body) / 1024:.0f} KiB')
+        self.stdout.write(f'gzip size:              {len(compress_string(fast_body)) / 1024:.0f} KiB')
+        if stock_body != fast_body:
+            self.stdout.write(self.style.ERROR('Renderer output differs'))
+        self.stdout.write(self.style.SUCCESS(f'Render speedup: {stock_elapsed / fast_elapsed:.1f}x'))
@@ -0,0 +1,91 @@
+"""
+Management command to compare per-recipient transfers against one batch
+transfer. Everything runs in a transaction that is rolled back.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from banking.batch_transfers import BatchTransferService
+from banking.models import Account, Transaction
+from banking.utils import generate_reference_number
+
+User = get_user_model()
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark BatchTransferService against one transfer per recipient'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--legs', type=int, default=10000, help='Transfer legs in the batch')
+        parser.add_argument('--sample', type=int, default=100,
+                            help='Single transfers timed to extrapolate the per-recipient cost')
+
+    def handle(self, *args, **options):
+        legs = options['legs']
+        sample = min(options['sample'], legs)
+        try:
+            with transaction.atomic():
+                self.run(legs, sample)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, legs, sample):
+        suffix = uuid.uuid4().hex[:8]
+        sender = User.objects.create_user(
+            username=f'bench-payroll-{suffix}', email=f'bench-payroll-{suffix}@example.com', password=uuid.uuid4().hex
+        )
+        sender.profile.set_transaction_pin('1234')
+        payee = User.objects.create_user(
+            username=f'bench-payee-{suffix}', email=f'bench-payee-{suffix}@example.com', password=uuid.uuid4().hex
+        )
+        account = Account.objects.get(user=sender)
+        account.balance = Decimal('1000') * (legs + sample)
+        account.save()
+
+        # One account per employee; bulk_create skips the per-account signals
+        recipients = Account.objects.bulk_create([
+            Account(user=payee, account_number=f'BN{suffix[:6]}{i:06d}'.upper(), balance=0)
+            for i in range(legs)
+        ], batch_size=1000)
+
+        self.stdout.write(self.style.HTTP_INFO(f'Timing {sample} single transfers...'))
+        start = time.perf_counter()
+        for recipient in recipients[:sample]:
+            # What AccountViewSet.transfer does per request
+            sender.profile.check_transaction_pin('1234')
+            recipient = Account.objects.get(account_number=recipient.account_number)
+            with transaction.atomic():
+                Transaction.objects.create(
+                    user=sender, from_account=account, to_account=recipient, transaction_type='transfer',
+                    amount=Decimal('12.34'), description=f'Transfer to {recipient.account_number}: Payroll',
+                    reference=generate_reference_number(), status='completed'
+                )
+                account.balance -= Decimal('12.34')
+                recipient.balance += Decimal('12.34')
+                account.save()
+                recipient.save()
+        single_elapsed = (time.perf_counter() - start) / sample * legs
+
+        self.stdout.write(self.style.HTTP_INFO(f'Posting a batch of {legs} legs...'))
+        batch = [
+            {'recipient_account': recipient.account_number, 'amount': '12.34'}
+            for recipient in recipients
+        ]
+        start = time.perf_counter()
+        sender.profile.check_transaction_pin('1234')
+        result = BatchTransferService.execute(sender, account.pk, batch, description='Payroll')
+        batch_elapsed = time.perf_counter() - start
+
+        self.stdout.write(f'Single transfers: {single_elapsed:.2f}s for {legs} (extrapolated from {sample})')
+        self.stdout.write(f'Batch transfer:   {batch_elapsed:.2f}s for {result["completed"]} legs')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {single_elapsed / batch_elapsed:.1f}x'))
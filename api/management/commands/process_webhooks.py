@@ -3,6 +3,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from api.webhook_delivery import WebhookProcessor
+from api.webhook_replay import WebhookReplayService
 from api.models import WebhookEvent
 
 
@@ -26,12 +27,38 @@ class Command(BaseCommand):
             action='store_true',
             help='Show what would be processed without actually processing'
         )
+        parser.add_argument(
+            '--replay-chunks',
+            type=int,
+            default=50,
+            help='Maximum number of chunks to schedule per replay job (default: 50)'
+        )
 
     def handle(self, *args, **options):
         max_events = options['max_events']
         event_type = options['event_type']
         dry_run = options['dry_run']
         
+        # Schedule replay jobs, release parked deliveries and flush due batches
+        if not dry_run:
+            replayed = WebhookReplayService.run_pending_jobs(options['replay_chunks'])
+            if replayed:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Scheduled {replayed} webhook events for replay')
+                )
+            
+            released = WebhookProcessor.process_parked_deliveries()
+            if released:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Released {released} parked webhook deliveries')
+                )
+            
+            batched = WebhookProcessor.flush_batches()
+            if batched:
+                self.stdout.write(
+                    self.style.SUCCESS(f'Delivered {batched} batched webhook events')
+                )
+        
         # Build query for pending events
         query = WebhookEvent.objects.filter(
             status='pending',
@@ -41,7 +68,7 @@ class Command(BaseCommand):
         if event_type:
             query = query.filter(event_type=event_type)
         
-        pending_events = query.order_by('created_at')[:max_events]
+        pending_events = query.order_by('next_retry_at', 'created_at')[:max_events]
         
         if not pending_events.exists():
             self.stdout.write(
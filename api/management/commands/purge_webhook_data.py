@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.webhook_retention import WebhookRetentionService
+
+
+class Command(BaseCommand):
+    help = 'Apply retention to webhook logs and deliveries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log-days',
+            type=int,
+            default=getattr(settings, 'WEBHOOK_LOG_RETENTION_DAYS', 30),
+            help='Delete webhook logs older than this many days'
+        )
+        parser.add_argument(
+            '--delivery-days',
+            type=int,
+            default=getattr(settings, 'WEBHOOK_DELIVERY_RETENTION_DAYS', 90),
+            help='Summarize and delete webhook deliveries older than this many days'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=getattr(settings, 'WEBHOOK_RETENTION_CHUNK_SIZE', 5000),
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--max-chunks',
+            type=int,
+            help='Stop after this many chunks per table (default: run until done)'
+        )
+
+    def handle(self, *args, **options):
+        # Logs first, so cascading delivery deletes have fewer rows to remove
+        purged = WebhookRetentionService.purge_logs(
+            older_than_days=options['log_days'],
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Deleted {purged} webhook log entries')
+        )
+        
+        summarized = WebhookRetentionService.summarize_deliveries(
+            older_than_days=options['delivery_days'],
+            chunk_size=options['chunk_size'],
+            max_chunks=options['max_chunks']
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f'Summarized {summarized} webhook deliveries')
+        )
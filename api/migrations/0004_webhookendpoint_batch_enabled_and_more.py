@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:03
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_webhookendpoint_circuit_opened_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='batch_enabled',
+            field=models.BooleanField(default=False, help_text='Deliver events in batches as a single JSON array'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='batch_linger_ms',
+            field=models.PositiveIntegerField(default=1000, help_text='Maximum time an event waits for its batch to fill'),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='batch_max_bytes',
+            field=models.PositiveIntegerField(default=262144, help_text='Maximum batch payload size in bytes', validators=[django.core.validators.MinValueValidator(1024)]),
+        ),
+        migrations.AddField(
+            model_name='webhookendpoint',
+            name='batch_max_events',
+            field=models.PositiveIntegerField(default=100, help_text='Maximum number of events per batch', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(1000)]),
+        ),
+        migrations.AlterField(
+            model_name='webhookdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed'), ('timeout', 'Timeout'), ('error', 'Error'), ('parked', 'Parked'), ('queued', 'Queued')], default='pending', max_length=20),
+        ),
+    ]
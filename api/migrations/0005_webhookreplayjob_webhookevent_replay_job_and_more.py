@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:05
+
+import django.core.validators
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_webhookendpoint_batch_enabled_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookReplayJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('start_time', models.DateTimeField(help_text='Replay events created at or after this time')),
+                ('end_time', models.DateTimeField(help_text='Replay events created at or before this time')),
+                ('event_statuses', models.JSONField(blank=True, default=list, help_text='Event statuses to replay (empty for all)')),
+                ('chunk_size', models.PositiveIntegerField(default=1000, help_text='Events rescheduled per UPDATE', validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(10000)])),
+                ('rate_limit_per_second', models.PositiveIntegerField(default=50, help_text='Maximum replayed events released to the delivery workers per second', validators=[django.core.validators.MinValueValidator(1)])),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('cancelled', 'Cancelled'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('total_events', models.PositiveIntegerField(default=0)),
+                ('scheduled_events', models.PositiveIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('cursor_created_at', models.DateTimeField(blank=True, null=True)),
+                ('cursor_event_id', models.UUIDField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='webhook_replay_jobs', to=settings.AUTH_USER_MODEL)),
+                ('webhook_endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='replay_jobs', to='api.webhookendpoint')),
+            ],
+            options={
+                'db_table': 'api_webhook_replay_jobs',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='webhookevent',
+            name='replay_job',
+            field=models.ForeignKey(blank=True, help_text="Replay job that rescheduled this event; limits delivery to the job's endpoint", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='api.webhookreplayjob'),
+        ),
+        migrations.AddIndex(
+            model_name='webhookreplayjob',
+            index=models.Index(fields=['status', 'created_at'], name='api_webhook_status_9c5fca_idx'),
+        ),
+    ]
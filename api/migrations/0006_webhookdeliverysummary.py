@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:11
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_webhookreplayjob_webhookevent_replay_job_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookDeliverySummary',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('total_deliveries', models.PositiveIntegerField(default=0)),
+                ('successful_deliveries', models.PositiveIntegerField(default=0)),
+                ('failed_deliveries', models.PositiveIntegerField(default=0)),
+                ('response_time_ms_total', models.PositiveBigIntegerField(default=0)),
+                ('response_time_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('webhook_endpoint', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='delivery_summaries', to='api.webhookendpoint')),
+            ],
+            options={
+                'db_table': 'api_webhook_delivery_summaries',
+                'ordering': ['-date'],
+                'unique_together': {('webhook_endpoint', 'date')},
+            },
+        ),
+    ]
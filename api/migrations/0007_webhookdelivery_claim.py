@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_webhookdeliverysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdelivery',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, help_text='When a batch sender claimed this queued delivery', null=True),
+        ),
+        migrations.AlterField(
+            model_name='webhookdelivery',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed'), ('timeout', 'Timeout'), ('error', 'Error'), ('parked', 'Parked'), ('queued', 'Queued'), ('sending', 'Sending')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_webhookdelivery_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookreplayjob',
+            name='next_due_at',
+            field=models.DateTimeField(blank=True, help_text='Earliest release time of the next chunk', null=True),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from django.core.validators import URLValidator
+from django.core.validators import URLValidator, MinValueValidator, MaxValueValidator
 import uuid
 import json
 from datetime import timedelta
@@ -73,6 +73,15 @@ class WebhookEndpoint(models.Model):
         ('system.update', 'System Update'),
     ]
     
+    CIRCUIT_CLOSED = 'closed'
+    CIRCUIT_OPEN = 'open'
+    CIRCUIT_HALF_OPEN = 'half_open'
+    CIRCUIT_STATES = [
+        (CIRCUIT_CLOSED, 'Closed'),
+        (CIRCUIT_OPEN, 'Open'),
+        (CIRCUIT_HALF_OPEN, 'Half Open'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_endpoints')
     name = models.CharField(max_length=255, help_text="Descriptive name for this webhook")
@@ -87,6 +96,24 @@ class WebhookEndpoint(models.Model):
     retry_delay_seconds = models.PositiveIntegerField(default=60, help_text="Initial delay between retries")
     email_notifications_enabled = models.BooleanField(default=False, help_text="Send email notifications for webhook events")
     
+    # Batch delivery
+    batch_enabled = models.BooleanField(default=False, help_text="Deliver events in batches as a single JSON array")
+    batch_max_events = models.PositiveIntegerField(
+        default=100,
+        validators=[MinValueValidator(1), MaxValueValidator(1000)],
+        help_text="Maximum number of events per batch"
+    )
+    batch_max_bytes = models.PositiveIntegerField(
+        default=262144,
+        validators=[MinValueValidator(1024)],
+        help_text="Maximum batch payload size in bytes"
+    )
+    batch_linger_ms = models.PositiveIntegerField(default=1000, help_text="Maximum time an event waits for its batch to fill")
+    
+    # Circuit breaker
+    circuit_state = models.CharField(max_length=20, choices=CIRCUIT_STATES, default=CIRCUIT_CLOSED)
+    circuit_opened_at = models.DateTimeField(null=True, blank=True)
+    
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -141,6 +168,14 @@ class WebhookEvent(models.Model):
     # Processing info
     delivery_attempts = models.PositiveIntegerField(default=0)
     next_retry_at = models.DateTimeField(null=True, blank=True)
+    replay_job = models.ForeignKey(
+        'WebhookReplayJob',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='events',
+        help_text="Replay job that rescheduled this event; limits delivery to the job's endpoint"
+    )
     
     class Meta:
         db_table = 'api_webhook_events'
@@ -173,6 +208,9 @@ class WebhookDelivery(models.Model):
         ('failed', 'Failed'),
         ('timeout', 'Timeout'),
         ('error', 'Error'),
+        ('parked', 'Parked'),
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -192,6 +230,7 @@ class WebhookDelivery(models.Model):
     # Timing
     attempted_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True, help_text="When a batch sender claimed this queued delivery")
     response_time_ms = models.PositiveIntegerField(null=True, blank=True)
     
     # Retry info
@@ -215,6 +254,72 @@ class WebhookDelivery(models.Model):
         return self.status == 'success' and 200 <= (self.http_status_code or 0) <= 299
 
 
+class WebhookReplayJob(models.Model):
+    """
+    Replay of historical webhook events to a single endpoint
+    """
+    JOB_STATUS = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('cancelled', 'Cancelled'),
+        ('failed', 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='webhook_replay_jobs')
+    webhook_endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='replay_jobs')
+    
+    # Event selection
+    start_time = models.DateTimeField(help_text="Replay events created at or after this time")
+    end_time = models.DateTimeField(help_text="Replay events created at or before this time")
+    event_statuses = models.JSONField(default=list, blank=True, help_text="Event statuses to replay (empty for all)")
+    
+    # Pacing
+    chunk_size = models.PositiveIntegerField(
+        default=1000,
+        validators=[MinValueValidator(1), MaxValueValidator(10000)],
+        help_text="Events rescheduled per UPDATE"
+    )
+    rate_limit_per_second = models.PositiveIntegerField(
+        default=50,
+        validators=[MinValueValidator(1)],
+        help_text="Maximum replayed events released to the delivery workers per second"
+    )
+    
+    # Progress
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='pending')
+    total_events = models.PositiveIntegerField(default=0)
+    scheduled_events = models.PositiveIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    
+    # Keyset cursor so scheduling can resume where it stopped
+    cursor_created_at = models.DateTimeField(null=True, blank=True)
+    cursor_event_id = models.UUIDField(null=True, blank=True)
+    next_due_at = models.DateTimeField(null=True, blank=True, help_text="Earliest release time of the next chunk")
+    
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'api_webhook_replay_jobs'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+        
+    def __str__(self):
+        return f"Replay to {self.webhook_endpoint.name} - {self.status}"
+    
+    @property
+    def progress(self):
+        if self.total_events == 0:
+            return 100 if self.status == 'completed' else 0
+        return (self.scheduled_events / self.total_events) * 100
+
+
 class WebhookSignature(models.Model):
     """
     Webhook signature verification keys and methods
@@ -324,3 +429,37 @@ class WebhookLog(models.Model):
         
     def __str__(self):
         return f"[{self.level.upper()}] {self.message[:50]}..."
+
+
+class WebhookDeliverySummary(models.Model):
+    """
+    Daily per-endpoint rollup of webhook deliveries removed by retention
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    webhook_endpoint = models.ForeignKey(WebhookEndpoint, on_delete=models.CASCADE, related_name='delivery_summaries')
+    date = models.DateField()
+    
+    total_deliveries = models.PositiveIntegerField(default=0)
+    successful_deliveries = models.PositiveIntegerField(default=0)
+    failed_deliveries = models.PositiveIntegerField(default=0)
+    
+    # Sum and count are kept so averages can be merged across chunks
+    response_time_ms_total = models.PositiveBigIntegerField(default=0)
+    response_time_count = models.PositiveIntegerField(default=0)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'api_webhook_delivery_summaries'
+        ordering = ['-date']
+        unique_together = ['webhook_endpoint', 'date']
+        
+    def __str__(self):
+        return f"{self.webhook_endpoint.name} - {self.date}: {self.total_deliveries} deliveries"
+    
+    @property
+    def average_response_time(self):
+        if self.response_time_count == 0:
+            return 0
+        return self.response_time_ms_total / self.response_time_count
@@ -27,7 +27,7 @@ except ImportError:
     PSUTIL_AVAILABLE = False
 
 # Import webhook models
-from .models import WebhookDelivery
+from .models import WebhookDelivery, WebhookEndpoint
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
@@ -595,6 +595,40 @@ class PerformanceMonitor:
             'successful_deliveries': successful
         }
     
+    def get_webhook_circuit_summary(self) -> Dict[str, Any]:
+        """Get circuit breaker states across all webhook endpoints"""
+        state_counts = dict(
+            WebhookEndpoint.objects.filter(is_active=True)
+            .values_list('circuit_state')
+            .annotate(count=Count('id'))
+        )
+        
+        tripped = WebhookEndpoint.objects.filter(
+            is_active=True
+        ).exclude(
+            circuit_state=WebhookEndpoint.CIRCUIT_CLOSED
+        ).annotate(
+            parked_deliveries=Count('deliveries', filter=Q(deliveries__status='parked'))
+        ).order_by('circuit_opened_at')[:20]
+        
+        return {
+            'closed': state_counts.get(WebhookEndpoint.CIRCUIT_CLOSED, 0),
+            'open': state_counts.get(WebhookEndpoint.CIRCUIT_OPEN, 0),
+            'half_open': state_counts.get(WebhookEndpoint.CIRCUIT_HALF_OPEN, 0),
+            'parked_deliveries': WebhookDelivery.objects.filter(status='parked').count(),
+            'tripped_endpoints': [
+                {
+                    'id': str(endpoint.id),
+                    'name': endpoint.name,
+                    'url': endpoint.url,
+                    'state': endpoint.circuit_state,
+                    'opened_at': endpoint.circuit_opened_at.isoformat() if endpoint.circuit_opened_at else None,
+                    'parked_deliveries': endpoint.parked_deliveries
+                }
+                for endpoint in tripped
+            ]
+        }
+    
     def _check_system_resources(self) -> Dict[str, Any]:
         """Check system resource usage"""
         if not PSUTIL_AVAILABLE:
@@ -0,0 +1,350 @@
+"""
+Projection Serializers for PrimeTrust Banking API
+
+Read-only serializers for high-volume list endpoints. Instead of loading
+model instances and running every DRF field per row, a projection:
+- Selects only the output columns with .values(), joining nested objects
+  and related names in the same query
+- Computes derived fields in SQL with annotations, or in Python from the
+  row's own columns where the ModelSerializer's arithmetic has to be
+  reproduced exactly
+- Formats rows with one precomputed converter per column, reproducing
+  DRF's datetime, decimal and UUID representations without its per-value
+  timezone and context lookups
+
+The output matches the corresponding ModelSerializer field for field, so
+list responses keep their schema. Writes and detail views keep using the
+full serializers in serializers.py.
+"""
+
+import datetime
+import decimal
+import logging
+from typing import Any, Dict, Iterable, List
+
+from django.conf import settings
+from django.db import models
+from django.db.models import BooleanField, Case, Value, When
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from banking.models import Account, Transaction, Notification
+from banking.models_investments_insurance import Investment
+from .models import WebhookDelivery
+
+logger = logging.getLogger(__name__)
+
+# Converter marker for datetimes, which need the request's timezone
+DATETIME = object()
+# Column marker for fields computed in Python from other columns of the row
+COMPUTED = object()
+
+
+def _format_datetime(value, tz):
+    """DateTimeField.to_representation for ISO 8601 output, with the timezone resolved by the caller"""
+    if tz is not None:
+        value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    elif timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def _decimal_converter(max_digits, decimal_places):
+    """DecimalField.to_representation with the quantum and context built once"""
+    field = serializers.DecimalField(max_digits=max_digits, decimal_places=decimal_places)
+    if not api_settings.COERCE_DECIMAL_TO_STRING or field.localize or field.normalize_output:
+        return field.to_representation
+    quantum = decimal.Decimal('.1') ** decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(quantum, context=context))
+    return convert
+
+
+def _model_converter(field):
+    """Representation for a concrete model field's value; None passes it through"""
+    if isinstance(field, models.DateTimeField):
+        if api_settings.DATETIME_FORMAT == ISO_8601:
+            return DATETIME
+        return serializers.DateTimeField().to_representation
+    if isinstance(field, models.DateField):
+        return serializers.DateField().to_representation
+    if isinstance(field, models.DecimalField):
+        return _decimal_converter(field.max_digits, field.decimal_places)
+    if isinstance(field, models.UUIDField):
+        return str
+    return None
+
+
+class ProjectionSerializer:
+    """
+    Base class for .values() based list serializers.
+
+    Subclasses declare:
+        model: The model being projected
+        fields: Output names in response order
+        sources: Output name -> values() lookup, for related or annotated columns
+        annotations: Annotation name -> expression, added before .values()
+        converters: Output name -> callable formatting an annotated column
+        nested: Output name -> ProjectionSerializer for forward foreign keys
+        computed: Output name -> (function, column names); the function
+            receives those columns' raw values in order
+    """
+
+    model = None
+    fields = ()
+    sources = {}
+    annotations = {}
+    converters = {}
+    nested = {}
+    computed = {}
+
+    @classmethod
+    def _resolve(cls, lookup):
+        """Model field at the end of a lookup path"""
+        model = cls.model
+        field = None
+        for part in lookup.split('__'):
+            field = model._meta.get_field(part)
+            if field.is_relation:
+                model = field.related_model
+        return field
+
+    @classmethod
+    def _build_columns(cls, prefix):
+        columns = []
+        for name in cls.fields:
+            if name in cls.nested:
+                columns.append((name, f'{prefix}{name}', None, cls.nested[name]))
+                continue
+            if name in cls.computed:
+                function, inputs = cls.computed[name]
+                columns.append((name, tuple(f'{prefix}{column}' for column in inputs), function, COMPUTED))
+                continue
+            source = cls.sources.get(name, name)
+            if name in cls.converters:
+                convert = cls.converters[name]
+            elif source in cls.annotations:
+                convert = None
+            else:
+                field = cls._resolve(source)
+                convert = None if field.is_relation else _model_converter(field)
+            columns.append((name, f'{prefix}{source}', convert, None))
+        return columns
+
+    @classmethod
+    def columns(cls, prefix=''):
+        """(output name, values() key, converter, nested projection) per field, built once per class"""
+        cache = cls.__dict__.get('_column_cache')
+        if cache is None:
+            cache = {}
+            cls._column_cache = cache
+        if prefix not in cache:
+            cache[prefix] = cls._build_columns(prefix)
+        return cache[prefix]
+
+    @classmethod
+    def lookups(cls, prefix='') -> List[str]:
+        """values() arguments for this projection and its nested projections"""
+        result = []
+        for name, key, _, nested in cls.columns(prefix):
+            if nested is COMPUTED:
+                result.extend(column for column in key if column not in result)
+                continue
+            if key not in result:
+                result.append(key)
+            if nested is not None:
+                result.extend(nested.lookups(f'{key}__'))
+        return result
+
+    @classmethod
+    def unknown_fields(cls, fields: Iterable[str]) -> List[str]:
+        return [name for name in fields if name not in cls.fields]
+
+    @classmethod
+    def narrow(cls, fields=None, expand=()):
+        """
+        Projection limited to `fields`, for ?fields= requests.
+
+        Nested fields are only joined when also listed in `expand`;
+        otherwise they are returned as the related id. None keeps every
+        field. Narrowed classes are cached per selection.
+        """
+        if fields is None:
+            return cls
+        key = (frozenset(fields), frozenset(expand))
+        narrowed_cache = cls.__dict__.get('_narrowed')
+        if narrowed_cache is None:
+            narrowed_cache = {}
+            cls._narrowed = narrowed_cache
+        if key not in narrowed_cache:
+            sources = {name: source for name, source in cls.sources.items() if name in fields}
+            narrowed_cache[key] = type(cls.__name__, (cls,), {
+                'fields': tuple(name for name in cls.fields if name in fields),
+                'sources': sources,
+                'annotations': {
+                    name: expression for name, expression in cls.annotations.items()
+                    if name in sources.values()
+                },
+                'converters': {name: convert for name, convert in cls.converters.items() if name in fields},
+                'nested': {name: nested for name, nested in cls.nested.items() if name in fields and name in expand},
+                'computed': {name: computed for name, computed in cls.computed.items() if name in fields},
+                '_column_cache': None,
+                '_narrowed': None,
+            })
+        return narrowed_cache[key]
+
+    @classmethod
+    def project(cls, queryset):
+        """Turn a queryset of the model into a queryset of projection rows"""
+        if cls.annotations:
+            queryset = queryset.annotate(**cls.annotations)
+        return queryset.values(*cls.lookups())
+
+    @classmethod
+    def to_representation(cls, row: Dict[str, Any], prefix='', tz=None, nested_cache=None) -> Dict[str, Any]:
+        data = {}
+        for name, key, convert, nested in cls.columns(prefix):
+            if nested is COMPUTED:
+                data[name] = convert(*[row[column] for column in key])
+                continue
+            value = row[key]
+            if nested is not None:
+                if value is None:
+                    data[name] = None
+                elif nested_cache is not None:
+                    # The same account appears on many rows of one page; format it once
+                    cache_key = (key, value)
+                    if cache_key not in nested_cache:
+                        nested_cache[cache_key] = nested.to_representation(row, f'{key}__', tz, nested_cache)
+                    data[name] = nested_cache[cache_key]
+                else:
+                    data[name] = nested.to_representation(row, f'{key}__', tz)
+            elif value is None or convert is None:
+                data[name] = value
+            elif convert is DATETIME:
+                data[name] = _format_datetime(value, tz)
+            else:
+                data[name] = convert(value)
+        return data
+
+    @classmethod
+    def serialize(cls, rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Represent rows from project(); accepts a projected queryset or a page of it"""
+        # Looked up once per call rather than once per datetime value
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        nested_cache = {}
+        return [cls.to_representation(row, tz=tz, nested_cache=nested_cache) for row in rows]
+
+
+class AccountProjection(ProjectionSerializer):
+    """AccountSerializer fields"""
+    model = Account
+    fields = ('id', 'account_number', 'account_type', 'balance', 'routing_number', 'created_at', 'updated_at')
+
+
+class TransactionProjection(ProjectionSerializer):
+    """TransactionSerializer fields, with both accounts joined in the same query"""
+    model = Transaction
+    fields = (
+        'id', 'from_account', 'to_account', 'transaction_type', 'amount', 'description',
+        'reference', 'status', 'created_at', 'updated_at'
+    )
+    nested = {'from_account': AccountProjection, 'to_account': AccountProjection}
+
+
+class NotificationProjection(ProjectionSerializer):
+    """NotificationSerializer fields"""
+    model = Notification
+    fields = ('id', 'notification_type', 'title', 'message', 'is_read', 'created_at')
+
+
+class WebhookDeliveryProjection(ProjectionSerializer):
+    """WebhookDeliverySerializer fields; is_successful is computed in SQL"""
+    model = WebhookDelivery
+    fields = (
+        'id', 'webhook_endpoint', 'webhook_endpoint_name', 'webhook_event',
+        'webhook_event_type', 'status', 'http_status_code', 'response_body',
+        'error_message', 'response_time_ms', 'attempt_number', 'is_retry',
+        'is_successful', 'attempted_at', 'completed_at'
+    )
+    sources = {
+        'webhook_endpoint_name': 'webhook_endpoint__name',
+        'webhook_event_type': 'webhook_event__event_type',
+        'is_successful': 'is_successful_flag',
+    }
+    annotations = {
+        # Mirrors WebhookDelivery.is_successful
+        'is_successful_flag': Case(
+            When(status='success', http_status_code__gte=200, http_status_code__lte=299, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField(),
+        ),
+    }
+
+
+# Same arithmetic as InvestmentSerializer (Investment.current_value()/profit_loss()
+# and get_profit_loss_percentage), so the values and their Decimal exponents match
+def _investment_current_value(quantity, purchase_price, current_price):
+    if current_price:
+        return quantity * current_price
+    return quantity * purchase_price
+
+
+def _investment_profit_loss(quantity, purchase_price, current_price):
+    if current_price:
+        return (current_price - purchase_price) * quantity
+    return 0
+
+
+def _investment_profit_loss_percentage(purchase_price, current_price):
+    if purchase_price:
+        return ((current_price or purchase_price) - purchase_price) / purchase_price * 100
+    return 0
+
+
+class InvestmentProjection(ProjectionSerializer):
+    """InvestmentSerializer fields; value and profit/loss are computed from the row's prices"""
+    model = Investment
+    fields = (
+        'id', 'account', 'investment_type', 'name', 'symbol', 'quantity',
+        'purchase_price', 'current_price', 'purchase_date', 'current_value',
+        'profit_loss', 'profit_loss_percentage', 'created_at', 'updated_at'
+    )
+    computed = {
+        'current_value': (_investment_current_value, ('quantity', 'purchase_price', 'current_price')),
+        'profit_loss': (_investment_profit_loss, ('quantity', 'purchase_price', 'current_price')),
+        'profit_loss_percentage': (_investment_profit_loss_percentage, ('purchase_price', 'current_price')),
+    }
+
+
+class ProjectionListMixin:
+    """
+    Serve a viewset's list action through projection_class.
+
+    Filtering, ordering and pagination run on the projected queryset, so
+    the response envelope is unchanged.
+    """
+
+    projection_class = None
+
+    def get_projection(self, projection_class):
+        """Projection to serve; SparseFieldsetMixin narrows it to ?fields="""
+        return projection_class
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection(self.projection_class)
+        rows = projection.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.serialize(page))
+        return Response(projection.serialize(rows))
@@ -0,0 +1,56 @@
+"""
+Query Plans for PrimeTrust Banking API
+
+Each viewset declares how its querysets load related data, per action:
+- select_related for forward relations its serializers nest
+- prefetch_related for reverse relations
+- annotations for counts and sums that serializers would otherwise query
+  once per row
+
+QueryPlanMixin applies the plan in filter_queryset, which DRF runs for
+list, retrieve and every action that goes through get_object(), so
+get_queryset stays a plain ownership filter.
+"""
+
+import logging
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class QueryPlan:
+    """Eager-loading plan applied to a queryset"""
+
+    def __init__(self, select_related: Iterable[str] = (), prefetch_related: Iterable = (),
+                 annotations: Optional[Dict] = None):
+        self.select_related = tuple(select_related)
+        self.prefetch_related = tuple(prefetch_related)
+        self.annotations = annotations or {}
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.annotations:
+            queryset = queryset.annotate(**self.annotations)
+        return queryset
+
+
+class QueryPlanMixin:
+    """
+    Apply query_plans[action], falling back to query_plans['*'].
+
+    Actions that build their own querysets can call plan_for(name).apply().
+    """
+
+    query_plans: Dict[str, QueryPlan] = {}
+
+    def plan_for(self, action: Optional[str] = None) -> Optional[QueryPlan]:
+        action = action or self.action
+        return self.query_plans.get(action, self.query_plans.get('*'))
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        plan = self.plan_for()
+        return plan.apply(queryset) if plan is not None else queryset
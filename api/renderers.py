@@ -0,0 +1,75 @@
+"""
+JSON rendering and parsing for PrimeTrust Banking API
+
+orjson-backed renderer and parser used as the API defaults:
+- Output matches rest_framework.renderers.JSONRenderer byte for byte for
+  compact responses; types orjson does not handle natively (datetime,
+  lazy strings, querysets) go through DRF's JSONEncoder, so timestamps
+  keep DRF's format
+- Decimal values are always rendered as strings, following
+  COERCE_DECIMAL_TO_STRING; the stock encoder turns a raw Decimal in a
+  view's Response (e.g. an account balance) into a lossy float
+- Falls back to the stock DRF classes when orjson is not installed or an
+  indented response is requested
+"""
+
+import logging
+from decimal import Decimal
+
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+# orjson is optional; without it the API renders with the stdlib encoder
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_drf_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    if isinstance(obj, Decimal) and api_settings.COERCE_DECIMAL_TO_STRING:
+        return str(obj)
+    return _drf_encoder.default(obj)
+
+
+if ORJSON_AVAILABLE:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """JSONRenderer using orjson for the encoding step"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if not ORJSON_AVAILABLE or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        # Same escaping as JSONRenderer so the output is valid JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser using orjson to decode request bodies"""
+
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not ORJSON_AVAILABLE:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -1,15 +1,16 @@
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from accounts.models import UserProfile
 from banking.models import (
-    Account, Transaction, BitcoinWallet, VirtualCard, Notification
+    Account, Transaction, BitcoinWallet, VirtualCard, Notification, Broadcast
 )
 from banking.models_loans import LoanApplication, LoanAccount, LoanPayment
 from banking.models_investments_insurance import InvestmentAccount, Investment, InsurancePolicy, InsuranceClaim
 from banking.models_bills import Biller, BillPayment, Payee, ScheduledPayment
 from .models import (
     WebhookEndpoint, WebhookEvent, WebhookDelivery, 
-    WebhookSignature, WebhookTemplate, WebhookLog
+    WebhookSignature, WebhookTemplate, WebhookLog, WebhookReplayJob
 )
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
@@ -128,6 +129,28 @@ class MoneyTransferSerializer(serializers.Serializer):
         return value
 
 
+class BatchTransferSerializer(serializers.Serializer):
+    """Serializer for batch transfers; each leg is validated by BatchTransferService."""
+    from_account = serializers.IntegerField(required=False)
+    transaction_pin = serializers.CharField(min_length=4, max_length=4)
+    description = serializers.CharField(max_length=255, required=False)
+    atomic = serializers.BooleanField(default=True)
+    legs = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    
+    def validate_transaction_pin(self, value):
+        """Validate transaction PIN format."""
+        if not value.isdigit():
+            raise serializers.ValidationError("Transaction PIN must be 4 digits.")
+        return value
+    
+    def validate_legs(self, value):
+        """Validate the number of legs."""
+        max_legs = getattr(settings, 'BATCH_TRANSFER_MAX_LEGS', 10000)
+        if len(value) > max_legs:
+            raise serializers.ValidationError(f"A batch can contain at most {max_legs} transfers.")
+        return value
+
+
 # ====== BITCOIN/CRYPTOCURRENCY SERIALIZERS ======
 
 class BitcoinWalletSerializer(serializers.ModelSerializer):
@@ -234,7 +257,9 @@ class InvestmentAccountSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'account_number', 'created_at', 'updated_at']
     
     def get_total_investments(self, obj):
-        return obj.investments.count()
+        # Annotated by InvestmentAccountViewSet's query plan; instances loaded elsewhere are counted
+        count = getattr(obj, 'investment_count', None)
+        return obj.investments.count() if count is None else count
 
 
 class InvestmentSerializer(serializers.ModelSerializer):
@@ -378,9 +403,14 @@ class ScheduledPaymentSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'payee', 'account', 'amount', 'frequency', 'start_date',
             'end_date', 'next_payment_date', 'status', 'reference',
-            'notes', 'created_at', 'updated_at'
+            'notes', 'failed_attempts', 'retry_at', 'last_failure_reason',
+            'created_at', 'updated_at'
+        ]
+        # The executor owns the schedule's position and state; pause/resume change the status
+        read_only_fields = [
+            'id', 'next_payment_date', 'status', 'reference', 'failed_attempts', 'retry_at',
+            'last_failure_reason', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'reference', 'created_at', 'updated_at']
 
 
 class ScheduledPaymentCreateSerializer(serializers.ModelSerializer):
@@ -395,6 +425,23 @@ class ScheduledPaymentCreateSerializer(serializers.ModelSerializer):
         if value <= 0:
             raise serializers.ValidationError("Payment amount must be greater than 0")
         return value
+    
+    def validate_account(self, value):
+        request = self.context.get('request')
+        if request and value.user_id != request.user.id:
+            raise serializers.ValidationError("Account not found")
+        return value
+    
+    def validate_payee(self, value):
+        request = self.context.get('request')
+        if request and value.user_id != request.user.id:
+            raise serializers.ValidationError("Payee not found")
+        return value
+    
+    def create(self, validated_data):
+        # The first occurrence is due on the start date
+        validated_data.setdefault('next_payment_date', validated_data['start_date'])
+        return super().create(validated_data)
 
 
 # ====== NOTIFICATION SERIALIZERS ======
@@ -409,6 +456,18 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class BroadcastSerializer(serializers.ModelSerializer):
+    is_read = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Broadcast
+        fields = [
+            'id', 'notification_type', 'title', 'message', 'is_read',
+            'created_at'
+        ]
+        read_only_fields = fields
+
+
 # ====== ANALYTICS & REPORTING SERIALIZERS ======
 
 class AccountSummarySerializer(serializers.Serializer):
@@ -485,10 +544,12 @@ class WebhookEndpointSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'url', 'events', 'secret', 'is_active',
             'timeout_seconds', 'max_retries', 'retry_delay_seconds', 'email_notifications_enabled',
+            'batch_enabled', 'batch_max_events', 'batch_max_bytes', 'batch_linger_ms',
+            'circuit_state', 'circuit_opened_at',
             'created_at', 'updated_at', 'last_used_at',
             'total_deliveries', 'successful_deliveries', 'failed_deliveries', 'success_rate'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'last_used_at', 
+        read_only_fields = ['id', 'circuit_state', 'circuit_opened_at', 'created_at', 'updated_at', 'last_used_at', 
                            'total_deliveries', 'successful_deliveries', 'failed_deliveries']
         extra_kwargs = {
             'secret': {'write_only': True, 'required': False}
@@ -516,7 +577,8 @@ class WebhookEndpointCreateSerializer(serializers.ModelSerializer):
         model = WebhookEndpoint
         fields = [
             'name', 'url', 'events', 'secret', 'is_active',
-            'timeout_seconds', 'max_retries', 'retry_delay_seconds', 'email_notifications_enabled'
+            'timeout_seconds', 'max_retries', 'retry_delay_seconds', 'email_notifications_enabled',
+            'batch_enabled', 'batch_max_events', 'batch_max_bytes', 'batch_linger_ms'
         ]
         extra_kwargs = {
             'secret': {'write_only': True, 'required': False}
@@ -643,6 +705,7 @@ class WebhookStatsSerializer(serializers.Serializer):
     failed_deliveries = serializers.IntegerField()
     average_response_time = serializers.FloatField()
     success_rate = serializers.FloatField()
+    endpoint_stats = serializers.DictField(required=False)
 
 
 class WebhookRetrySerializer(serializers.Serializer):
@@ -654,6 +717,59 @@ class WebhookRetrySerializer(serializers.Serializer):
     delay_seconds = serializers.IntegerField(default=60, min_value=1, max_value=3600)
 
     def validate_event_ids(self, value):
-        if len(value) > 100:
-            raise serializers.ValidationError("Cannot retry more than 100 events at once")
-        return value 
\ No newline at end of file
+        if len(value) > 1000:
+            raise serializers.ValidationError("Cannot retry more than 1000 events at once")
+        return value
+
+
+class WebhookReplayJobSerializer(serializers.ModelSerializer):
+    webhook_endpoint_name = serializers.CharField(source='webhook_endpoint.name', read_only=True)
+    progress = serializers.FloatField(read_only=True)
+    delivered_events = serializers.IntegerField(read_only=True, default=0)
+    failed_events = serializers.IntegerField(read_only=True, default=0)
+    pending_events = serializers.IntegerField(read_only=True, default=0)
+    
+    class Meta:
+        model = WebhookReplayJob
+        fields = [
+            'id', 'webhook_endpoint', 'webhook_endpoint_name', 'start_time', 'end_time',
+            'event_statuses', 'chunk_size', 'rate_limit_per_second', 'status',
+            'total_events', 'scheduled_events', 'progress', 'delivered_events',
+            'failed_events', 'pending_events', 'error_message', 'created_at',
+            'started_at', 'completed_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'total_events', 'scheduled_events', 'error_message',
+            'created_at', 'started_at', 'completed_at'
+        ]
+
+
+class WebhookReplayJobCreateSerializer(serializers.ModelSerializer):
+    """Serializer for creating webhook replay jobs"""
+    class Meta:
+        model = WebhookReplayJob
+        fields = [
+            'webhook_endpoint', 'start_time', 'end_time', 'event_statuses',
+            'chunk_size', 'rate_limit_per_second'
+        ]
+
+    def validate_webhook_endpoint(self, value):
+        if value.user != self.context['request'].user:
+            raise serializers.ValidationError("Webhook endpoint not found")
+        return value
+
+    def validate_event_statuses(self, value):
+        valid_statuses = [choice[0] for choice in WebhookEvent.EVENT_STATUS]
+        invalid_statuses = [s for s in value if s not in valid_statuses]
+        if invalid_statuses:
+            raise serializers.ValidationError(f"Invalid event statuses: {invalid_statuses}")
+        return value
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("start_time must be before end_time")
+        return data
+
+    def create(self, validated_data):
+        validated_data['user'] = self.context['request'].user
+        return super().create(validated_data) 
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Sparse Fieldsets for PrimeTrust Banking API
+
+?fields=id,amount,created_at limits a read to the listed fields:
+- Projection-backed lists select only those columns and skip joins for
+  nested objects that were not requested
+- Serializer-backed reads drop the other serializer fields, load only
+  the matching model columns with .only() and keep only the query plan's
+  select_related joins the remaining fields read
+
+Nested objects listed in ?fields= are returned as their id unless they
+are also named in ?expand=. Without ?fields= responses are unchanged.
+"""
+
+import logging
+from typing import FrozenSet, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def parse_field_list(value: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Split a comma separated query parameter; None when absent or empty"""
+    if not value:
+        return None
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    return names or None
+
+
+class SparseFieldsetMixin:
+    """Viewset support for ?fields= and ?expand= on read requests"""
+
+    fields_param = 'fields'
+    expand_param = 'expand'
+
+    @cached_property
+    def sparse_fields(self) -> Optional[Tuple[str, ...]]:
+        if self.request.method not in SAFE_METHODS:
+            return None
+        return parse_field_list(self.request.query_params.get(self.fields_param))
+
+    @cached_property
+    def expanded_fields(self) -> FrozenSet[str]:
+        return frozenset(parse_field_list(self.request.query_params.get(self.expand_param)) or ())
+
+    def _reject_unknown(self, unknown):
+        if unknown:
+            raise ValidationError({self.fields_param: [f"Unknown field(s): {', '.join(unknown)}"]})
+
+    # Projection-backed reads
+
+    def get_projection(self, projection_class):
+        if self.sparse_fields is None:
+            return projection_class
+        self._reject_unknown(projection_class.unknown_fields(self.sparse_fields))
+        return projection_class.narrow(self.sparse_fields, self.expanded_fields)
+
+    # Serializer-backed reads
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.sparse_fields is not None:
+            self.narrow_serializer(getattr(serializer, 'child', serializer))
+        return serializer
+
+    def narrow_serializer(self, serializer):
+        """Drop unrequested fields; unexpanded nested serializers become ids"""
+        fields = serializer.fields
+        self._reject_unknown([name for name in self.sparse_fields if name not in fields])
+        for name in list(fields):
+            if name not in self.sparse_fields:
+                fields.pop(name)
+            elif isinstance(fields[name], serializers.BaseSerializer) and name not in self.expanded_fields:
+                source = fields[name].source
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True, **({'source': source} if source != name else {})
+                )
+        return serializer
+
+    def _read_sources(self):
+        """
+        Root attribute of every requested field's source, and the roots
+        whose related object is read (not just its id).
+
+        Returns None if a requested field reads the whole object (method
+        fields, source='*'), in which case columns cannot be narrowed.
+        """
+        serializer = self.get_serializer_class()(context=self.get_serializer_context())
+        roots, joined = set(), set()
+        for name in self.sparse_fields:
+            field = serializer.fields.get(name)
+            if field is None:
+                continue
+            if field.source == '*':
+                return None
+            root = field.source.split('.')[0]
+            roots.add(root)
+            if '.' in field.source or (
+                isinstance(field, serializers.BaseSerializer) and name in self.expanded_fields
+            ):
+                joined.add(root)
+        return roots, joined
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.sparse_fields is None or getattr(queryset, '_fields', None) is not None:
+            return queryset
+        if self.action == 'list' and getattr(self, 'projection_class', None) is not None:
+            # Narrowed by get_projection instead
+            return queryset
+
+        sources = self._read_sources()
+        if sources is None:
+            return queryset
+        roots, joined = sources
+
+        # Keep only the joins the remaining fields read
+        plan_for = getattr(self, 'plan_for', None)
+        plan = plan_for() if plan_for else None
+        if plan is not None and plan.select_related:
+            queryset = queryset.select_related(None)
+            kept = [lookup for lookup in plan.select_related if lookup.split('__')[0] in joined]
+            if kept:
+                queryset = queryset.select_related(*kept)
+
+        model = queryset.model
+        columns = {model._meta.pk.name}
+        for root in roots:
+            if root in queryset.query.annotations:
+                continue
+            try:
+                field = model._meta.get_field(root)
+            except FieldDoesNotExist:
+                # Properties and model methods may read any column
+                return queryset
+            if field.concrete:
+                columns.add(root)
+            elif not field.is_relation:
+                return queryset
+        return queryset.only(*columns)
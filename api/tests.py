@@ -8,8 +8,11 @@ webhooks, and security features to ensure production readiness.
 import json
 import uuid
 from decimal import Decimal
+from unittest import skipUnless
 from unittest.mock import patch, Mock
 from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
@@ -19,14 +22,22 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from accounts.models import UserProfile
 from banking.models import Account, Transaction, BitcoinWallet, VirtualCard
 from banking.models_loans import LoanApplication, LoanAccount
-from banking.models_investments_insurance import InvestmentAccount, Investment, InsurancePolicy
-from banking.models_bills import Biller, BillPayment, Payee
-from dashboard.models import Notification
+from banking.models_investments_insurance import InvestmentAccount, Investment, InsurancePolicy, InsuranceClaim
+from banking.models_bills import Biller, BillPayment, Payee, ScheduledPayment
+from banking.scheduled_payments import ScheduledPaymentExecutor
+from banking.models import Notification, Broadcast
 from .models import (
     WebhookEndpoint, WebhookEvent, WebhookDelivery, 
-    WebhookTemplate, WebhookLog
+    WebhookTemplate, WebhookLog, WebhookReplayJob, WebhookDeliverySummary
 )
-from .webhook_delivery import WebhookDeliveryService, WebhookEventTrigger
+from .webhook_delivery import WebhookDeliveryService, WebhookEventTrigger, WebhookProcessor
+from .webhook_replay import WebhookReplayService
+from .webhook_stats import WebhookStatsService
+from .webhook_retention import WebhookRetentionService
+from .circuit_breaker import CircuitBreaker
+from .compression import BROTLI_AVAILABLE
+from core.ids import next_id
+from core.query_inspector import NPlusOneAssertionsMixin
 
 User = get_user_model()
 
@@ -511,6 +522,1441 @@ class WebhookAPITestCase(BaseAPITestCase):
         self.assertEqual(response.data['rendered_payload']['user_id'], self.user.id)
 
 
+class WebhookCircuitBreakerTestCase(APITestCase):
+    """Test per-endpoint circuit breaker for webhook delivery"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='circuituser',
+            email='circuit@example.com',
+            password='TestPassword123!',
+            first_name='Circuit',
+            last_name='User'
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Flaky Webhook',
+            url='https://example.com/flaky',
+            events=['transaction.completed'],
+            max_retries=0
+        )
+        self.delivery_service = WebhookDeliveryService()
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def create_event(self):
+        return WebhookEvent.objects.create(
+            event_type='transaction.completed',
+            user=self.user,
+            payload={'amount': '10.00'}
+        )
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_circuit_opens_and_parks_deliveries(self, mock_post):
+        """Test that repeated failures open the circuit and later events are parked"""
+        import requests
+        mock_post.side_effect = requests.exceptions.ConnectionError()
+        
+        for _ in range(5):
+            self.delivery_service.deliver_webhook(self.endpoint, self.create_event())
+        
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.circuit_state, WebhookEndpoint.CIRCUIT_OPEN)
+        self.assertEqual(mock_post.call_count, 5)
+        
+        # Open circuit: no HTTP request, delivery parked
+        success, response_data = self.delivery_service.deliver_webhook(self.endpoint, self.create_event())
+        
+        self.assertFalse(success)
+        self.assertTrue(response_data['parked'])
+        self.assertEqual(mock_post.call_count, 5)
+        self.assertEqual(
+            WebhookDelivery.objects.filter(webhook_endpoint=self.endpoint, status='parked').count(), 1
+        )
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_probe_success_closes_circuit_and_releases_parked(self, mock_post):
+        """Test that a successful half-open probe closes the circuit and drains parked deliveries"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = 'OK'
+        mock_post.return_value = mock_response
+        
+        self.endpoint.circuit_state = WebhookEndpoint.CIRCUIT_OPEN
+        self.endpoint.circuit_opened_at = timezone.now() - timezone.timedelta(minutes=5)
+        self.endpoint.save()
+        
+        for _ in range(3):
+            WebhookDelivery.objects.create(
+                webhook_endpoint=self.endpoint,
+                webhook_event=self.create_event(),
+                status='parked'
+            )
+        
+        released = WebhookProcessor.process_parked_deliveries(self.delivery_service)
+        
+        self.assertEqual(released, 3)
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.circuit_state, WebhookEndpoint.CIRCUIT_CLOSED)
+        self.assertEqual(
+            WebhookDelivery.objects.filter(webhook_endpoint=self.endpoint, status='success').count(), 3
+        )
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_failed_probe_reopens_circuit(self, mock_post):
+        """Test that a failed probe reopens the circuit and stops draining"""
+        import requests
+        mock_post.side_effect = requests.exceptions.Timeout()
+        
+        self.endpoint.circuit_state = WebhookEndpoint.CIRCUIT_OPEN
+        self.endpoint.circuit_opened_at = timezone.now() - timezone.timedelta(minutes=5)
+        self.endpoint.save()
+        
+        for _ in range(3):
+            WebhookDelivery.objects.create(
+                webhook_endpoint=self.endpoint,
+                webhook_event=self.create_event(),
+                status='parked'
+            )
+        
+        released = WebhookProcessor.process_parked_deliveries(self.delivery_service)
+        
+        self.assertEqual(released, 1)
+        self.assertEqual(mock_post.call_count, 1)
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.circuit_state, WebhookEndpoint.CIRCUIT_OPEN)
+        self.assertGreater(self.endpoint.circuit_opened_at, timezone.now() - timezone.timedelta(minutes=1))
+    
+    def test_aimd_concurrency_limit(self):
+        """Test additive increase and multiplicative decrease of the concurrency limit"""
+        breaker = CircuitBreaker(self.endpoint)
+        initial_limit = breaker.get_stats()['concurrency_limit']
+        
+        self.assertTrue(breaker.allow_request())
+        breaker.record_failure(100)
+        self.assertEqual(breaker.get_stats()['concurrency_limit'], initial_limit // 2)
+        
+        self.assertTrue(breaker.allow_request())
+        breaker.record_success(100)
+        self.assertEqual(breaker.get_stats()['concurrency_limit'], initial_limit // 2 + 1)
+        self.assertEqual(breaker.get_stats()['in_flight'], 0)
+    
+    def test_circuit_endpoint(self):
+        """Test circuit breaker state is exposed through the API"""
+        url = reverse('api:webhook-endpoint-circuit', kwargs={'pk': self.endpoint.pk})
+        response = self.client.get(url, secure=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['state'], WebhookEndpoint.CIRCUIT_CLOSED)
+        self.assertEqual(response.data['parked_deliveries'], 0)
+        
+        url = reverse('api:webhook-endpoint-detail', kwargs={'pk': self.endpoint.pk})
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.data['circuit_state'], WebhookEndpoint.CIRCUIT_CLOSED)
+
+
+class WebhookBatchDeliveryTestCase(TestCase):
+    """Test batched webhook delivery mode"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='batchuser',
+            email='batch@example.com',
+            password='TestPassword123!',
+            first_name='Batch',
+            last_name='User'
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Batch Webhook',
+            url='https://example.com/batch',
+            events=['transaction.completed'],
+            secret='batch-secret',
+            batch_enabled=True,
+            batch_max_events=5,
+            max_retries=3
+        )
+        self.delivery_service = WebhookDeliveryService()
+    
+    def queue_events(self, count):
+        events = []
+        for i in range(count):
+            event = WebhookEvent.objects.create(
+                event_type='transaction.completed',
+                user=self.user,
+                payload={'transaction_id': i, 'amount': '10.00'}
+            )
+            WebhookDelivery.objects.create(
+                webhook_endpoint=self.endpoint,
+                webhook_event=event,
+                status='queued'
+            )
+            events.append(event)
+        return events
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_batch_sent_as_single_request(self, mock_post):
+        """Test that queued events are sent as one signed JSON array"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = 'OK'
+        mock_response.json.side_effect = ValueError()
+        mock_post.return_value = mock_response
+        
+        events = self.queue_events(3)
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        
+        self.assertTrue(success)
+        self.assertEqual(result['delivered'], 3)
+        self.assertEqual(mock_post.call_count, 1)
+        
+        payload = mock_post.call_args.kwargs['json']
+        headers = mock_post.call_args.kwargs['headers']
+        self.assertEqual([item['id'] for item in payload], [str(event.id) for event in events])
+        self.assertEqual(headers['X-Webhook-Batch-Size'], '3')
+        self.assertTrue(headers['X-Webhook-Signature'].startswith('sha256='))
+        
+        # One delivery record per event
+        self.assertEqual(
+            WebhookDelivery.objects.filter(webhook_endpoint=self.endpoint, status='success').count(), 3
+        )
+        self.endpoint.refresh_from_db()
+        self.assertEqual(self.endpoint.successful_deliveries, 3)
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_per_event_acks(self, mock_post):
+        """Test that events rejected by the receiver are retried individually"""
+        events = self.queue_events(3)
+        
+        mock_response = Mock()
+        mock_response.status_code = 207
+        mock_response.text = 'partial'
+        mock_response.json.return_value = {
+            'results': [{'id': str(events[1].id), 'accepted': False, 'error': 'duplicate'}]
+        }
+        mock_post.return_value = mock_response
+        
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        
+        self.assertFalse(success)
+        self.assertEqual(result['accepted'], 2)
+        self.assertEqual(result['failed'], 1)
+        
+        rejected = WebhookDelivery.objects.get(webhook_event=events[1])
+        self.assertEqual(rejected.status, 'error')
+        self.assertEqual(rejected.error_message, 'duplicate')
+        events[1].refresh_from_db()
+        self.assertEqual(events[1].status, 'pending')
+        self.assertIsNotNone(events[1].next_retry_at)
+        events[0].refresh_from_db()
+        self.assertEqual(events[0].status, 'completed')
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_batch_respects_limits(self, mock_post):
+        """Test batch size and byte limits"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = 'OK'
+        mock_response.json.side_effect = ValueError()
+        mock_post.return_value = mock_response
+        
+        self.queue_events(7)
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        self.assertEqual(result['delivered'], 5)
+        
+        self.endpoint.batch_max_bytes = 1024
+        self.endpoint.save()
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        self.assertLess(len(json.dumps(mock_post.call_args.kwargs['json'])), 1024 + 300)
+        self.assertGreaterEqual(result['delivered'], 1)
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_flush_batches_after_linger(self, mock_post):
+        """Test that partially filled batches are flushed after the linger time"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = 'OK'
+        mock_response.json.side_effect = ValueError()
+        mock_post.return_value = mock_response
+        
+        self.endpoint.batch_linger_ms = 60000
+        self.endpoint.save()
+        self.queue_events(2)
+        
+        self.assertEqual(WebhookProcessor.flush_batches(self.delivery_service), 0)
+        
+        WebhookDelivery.objects.filter(status='queued').update(
+            attempted_at=timezone.now() - timezone.timedelta(minutes=5)
+        )
+        self.assertEqual(WebhookProcessor.flush_batches(self.delivery_service), 2)
+        self.assertEqual(mock_post.call_count, 1)
+    
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_claimed_deliveries_are_not_sent_twice(self, mock_post):
+        """Test that deliveries claimed by another sender are skipped until their claim expires"""
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = 'OK'
+        mock_response.json.side_effect = ValueError()
+        mock_post.return_value = mock_response
+        
+        events = self.queue_events(3)
+        # Another sender is part way through the first two
+        WebhookDelivery.objects.filter(webhook_event__in=events[:2]).update(
+            status='sending', claimed_at=timezone.now()
+        )
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        self.assertEqual(result['delivered'], 1)
+        self.assertEqual([item['id'] for item in mock_post.call_args.kwargs['json']], [str(events[2].id)])
+        
+        # Nothing left to claim; no request is made
+        success, result = self.delivery_service.deliver_batch(self.endpoint)
+        self.assertEqual(result['delivered'], 0)
+        self.assertEqual(mock_post.call_count, 1)
+        
+        # The other sender crashed: its claim expires and the events are sent
+        WebhookDelivery.objects.filter(status='sending').update(
+            attempted_at=timezone.now() - timezone.timedelta(minutes=10),
+            claimed_at=timezone.now() - timezone.timedelta(minutes=10)
+        )
+        self.assertEqual(WebhookProcessor.flush_batches(self.delivery_service), 2)
+        self.assertEqual(WebhookDelivery.objects.filter(status='success').count(), 3)
+
+    @patch('api.webhook_delivery.requests.Session.post')
+    def test_lost_claim_does_not_take_the_probe(self, mock_post):
+        """Test that a sender beaten to the claim leaves the half-open probe free"""
+        self.queue_events(2)
+        WebhookEndpoint.objects.filter(pk=self.endpoint.pk).update(circuit_state=WebhookEndpoint.CIRCUIT_HALF_OPEN)
+        self.endpoint.refresh_from_db()
+
+        # Another sender claims the batch between our candidate SELECT and claim UPDATE
+        def concurrent_claim(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            if sql.startswith('SELECT') and 'api_webhook_deliveries' in sql and not raced:
+                raced.append(True)
+                WebhookDelivery.objects.update(status='sending', claimed_at=timezone.now())
+            return result
+
+        raced = []
+        with connection.execute_wrapper(concurrent_claim):
+            success, result = self.delivery_service.deliver_batch(self.endpoint)
+        self.assertEqual(result, {'delivered': 0})
+        mock_post.assert_not_called()
+        self.assertTrue(CircuitBreaker(self.endpoint).allow_request())
+
+
+class WebhookReplayTestCase(APITestCase):
+    """Test bulk retry and webhook replay jobs"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='replayuser',
+            email='replay@example.com',
+            password='TestPassword123!',
+            first_name='Replay',
+            last_name='User'
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Recovered Webhook',
+            url='https://example.com/recovered',
+            events=['transaction.completed']
+        )
+        self.other_endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Healthy Webhook',
+            url='https://example.com/healthy',
+            events=['transaction.completed']
+        )
+        self.window_start = timezone.now() - timezone.timedelta(hours=2)
+        self.events = [
+            WebhookEvent.objects.create(
+                event_type='transaction.completed',
+                user=self.user,
+                payload={'transaction_id': i},
+                status='failed'
+            )
+            for i in range(5)
+        ]
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def create_job(self, **kwargs):
+        return WebhookReplayJob.objects.create(
+            user=self.user,
+            webhook_endpoint=self.endpoint,
+            start_time=self.window_start,
+            end_time=timezone.now() + timezone.timedelta(minutes=1),
+            **kwargs
+        )
+    
+    def test_replay_schedules_in_paced_chunks(self):
+        """Test that events are rescheduled chunk by chunk at the job's rate"""
+        job = self.create_job(chunk_size=2, rate_limit_per_second=2)
+        
+        self.assertEqual(WebhookReplayService.run_job(job, max_chunks=1), 2)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+        self.assertEqual(job.total_events, 5)
+        self.assertEqual(job.scheduled_events, 2)
+        
+        # Resumes from the cursor on the next pass
+        self.assertEqual(WebhookReplayService.run_job(job), 3)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.progress, 100)
+        
+        due_times = sorted(set(
+            WebhookEvent.objects.filter(replay_job=job).values_list('next_retry_at', flat=True)
+        ))
+        self.assertEqual(len(due_times), 3)
+        self.assertEqual(due_times[1] - due_times[0], timezone.timedelta(seconds=1))
+        self.assertFalse(WebhookEvent.objects.filter(replay_job=job).exclude(status='pending').exists())
+
+    def test_resumed_job_is_paced_from_now(self):
+        """Test that a job resumed after a gap does not release its backlog at once"""
+        job = self.create_job(chunk_size=2, rate_limit_per_second=2)
+        WebhookReplayService.run_job(job, max_chunks=1)
+
+        # The worker was down for an hour between passes
+        an_hour_ago = timezone.now() - timezone.timedelta(hours=1)
+        WebhookReplayJob.objects.filter(pk=job.pk).update(started_at=an_hour_ago, next_due_at=an_hour_ago)
+        job.refresh_from_db()
+        resumed_at = timezone.now()
+        WebhookReplayService.run_job(job)
+
+        due_times = sorted(set(
+            WebhookEvent.objects.filter(replay_job=job, id__in=[e.id for e in self.events[2:]])
+            .values_list('next_retry_at', flat=True)
+        ))
+        self.assertEqual(len(due_times), 2)
+        self.assertGreaterEqual(due_times[0], resumed_at)
+        self.assertEqual(due_times[1] - due_times[0], timezone.timedelta(seconds=1))
+
+    def test_cancelled_job_stops_scheduling(self):
+        """Test that a cancelled job schedules no further events"""
+        job = self.create_job(chunk_size=2)
+        WebhookReplayService.run_job(job, max_chunks=1)
+        WebhookReplayJob.objects.filter(pk=job.pk).update(status='cancelled')
+        
+        self.assertEqual(WebhookReplayService.run_job(job), 0)
+        self.assertEqual(WebhookEvent.objects.filter(replay_job=job).count(), 2)
+    
+    @patch('api.webhook_delivery.WebhookDeliveryService.deliver_webhook')
+    def test_replayed_event_targets_job_endpoint(self, mock_deliver):
+        """Test that replayed events are only delivered to the replay endpoint"""
+        job = self.create_job()
+        WebhookReplayService.run_job(job)
+        
+        WebhookProcessor.process_event(WebhookEvent.objects.get(pk=self.events[0].pk))
+        
+        self.assertEqual(mock_deliver.call_count, 1)
+        self.assertEqual(mock_deliver.call_args.args[0], self.endpoint)
+    
+    def test_replay_leaves_undelivered_events_alone(self):
+        """Test that events still awaiting live delivery are not taken over by a replay"""
+        live = WebhookEvent.objects.create(
+            event_type='transaction.completed',
+            user=self.user,
+            payload={'transaction_id': 'live'},
+            status='pending'
+        )
+        job = self.create_job()
+        self.assertEqual(WebhookReplayService.run_job(job), 5)
+
+        live.refresh_from_db()
+        self.assertIsNone(live.replay_job_id)
+        self.assertIsNone(live.next_retry_at)
+
+    def test_retry_failed_bulk_update(self):
+        """Test that retry_failed reschedules events with a single update"""
+        url = reverse('api:webhook-event-retry-failed')
+        event_ids = [str(event.id) for event in self.events]
+        
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'event_ids': event_ids, 'delay_seconds': 60},
+                                        format='json', secure=True)
+        
+        event_queries = [q['sql'] for q in queries.captured_queries if 'api_webhook_events' in q['sql']]
+        self.assertEqual(len(event_queries), 1)
+        self.assertTrue(event_queries[0].startswith('UPDATE'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['retried_events'], 5)
+        self.assertEqual(WebhookEvent.objects.filter(id__in=event_ids, status='pending').count(), 5)
+    
+    def test_create_replay_job_api(self):
+        """Test creating a replay job and validating its window"""
+        url = reverse('api:webhook-replay-list')
+        data = {
+            'webhook_endpoint': str(self.endpoint.id),
+            'start_time': self.window_start.isoformat(),
+            'end_time': timezone.now().isoformat(),
+            'event_statuses': ['failed'],
+        }
+        
+        response = self.client.post(url, data, format='json', secure=True)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], 'pending')
+        
+        data['start_time'], data['end_time'] = data['end_time'], data['start_time']
+        response = self.client.post(url, data, format='json', secure=True)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        data['start_time'], data['end_time'] = data['end_time'], data['start_time']
+        data['event_statuses'] = ['bogus']
+        response = self.client.post(url, data, format='json', secure=True)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WebhookStatsTestCase(APITestCase):
+    """Test aggregated webhook statistics"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='statsuser',
+            email='stats@example.com',
+            password='TestPassword123!',
+            first_name='Stats',
+            last_name='User'
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Stats Webhook',
+            url='https://example.com/stats',
+            events=['transaction.completed']
+        )
+        for i, (event_status, delivery_status, code, ms) in enumerate([
+            ('completed', 'success', 200, 100),
+            ('completed', 'success', 200, 300),
+            ('failed', 'error', 500, 200),
+        ]):
+            event = WebhookEvent.objects.create(
+                event_type='transaction.completed',
+                user=self.user,
+                payload={'transaction_id': i},
+                status=event_status
+            )
+            WebhookDelivery.objects.create(
+                webhook_endpoint=self.endpoint,
+                webhook_event=event,
+                status=delivery_status,
+                http_status_code=code,
+                response_time_ms=ms
+            )
+        WebhookStatsService.invalidate(self.user.pk)
+        
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def test_delivery_stats_aggregated(self):
+        """Test delivery statistics and per-endpoint breakdown"""
+        response = self.client.get(reverse('api:webhook-delivery-stats'), secure=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_deliveries'], 3)
+        self.assertEqual(response.data['successful_deliveries'], 2)
+        self.assertEqual(response.data['failed_deliveries'], 1)
+        self.assertEqual(response.data['average_response_time'], 200)
+        self.assertEqual(response.data['endpoint_stats']['Stats Webhook']['successful'], 2)
+    
+    def test_delivery_stats_query_count_is_constant(self):
+        """Test that building the snapshot does not scale with delivery rows"""
+        with CaptureQueriesContext(connection) as queries:
+            WebhookStatsService.build_delivery_stats(self.user)
+        
+        self.assertEqual(len(queries.captured_queries), 6)
+    
+    def test_snapshot_invalidated_on_delivery(self):
+        """Test that the cached snapshot is refreshed after a delivery completes"""
+        self.assertEqual(WebhookStatsService.get_delivery_stats(self.user)['total_deliveries'], 3)
+        
+        event = WebhookEvent.objects.create(
+            event_type='transaction.completed',
+            user=self.user,
+            payload={'transaction_id': 99}
+        )
+        with patch('api.webhook_delivery.requests.Session.post') as mock_post:
+            mock_post.return_value = Mock(status_code=200, text='OK')
+            WebhookDeliveryService().deliver_webhook(self.endpoint, event)
+        
+        self.assertEqual(WebhookStatsService.get_delivery_stats(self.user)['total_deliveries'], 4)
+    
+    def test_event_stats_grouped_by_type(self):
+        """Test event statistics with event type breakdown"""
+        response = self.client.get(reverse('api:webhook-event-stats'), secure=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['completed_events'], 2)
+        self.assertEqual(response.data['failed_events'], 1)
+        self.assertEqual(response.data['event_types']['transaction.completed'], 3)
+
+
+class WebhookRetentionTestCase(TestCase):
+    """Test webhook log and delivery retention"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='retentionuser',
+            email='retention@example.com',
+            password='TestPassword123!',
+            first_name='Retention',
+            last_name='User'
+        )
+        self.endpoint = WebhookEndpoint.objects.create(
+            user=self.user,
+            name='Retention Webhook',
+            url='https://example.com/retention',
+            events=['transaction.completed']
+        )
+        self.old = timezone.now() - timezone.timedelta(days=120)
+    
+    def create_delivery(self, delivery_status, response_time_ms, attempted_at):
+        event = WebhookEvent.objects.create(
+            event_type='transaction.completed',
+            user=self.user,
+            payload={'amount': '10.00'}
+        )
+        delivery = WebhookDelivery.objects.create(
+            webhook_endpoint=self.endpoint,
+            webhook_event=event,
+            status=delivery_status,
+            http_status_code=200 if delivery_status == 'success' else 500,
+            response_time_ms=response_time_ms
+        )
+        WebhookDelivery.objects.filter(pk=delivery.pk).update(attempted_at=attempted_at)
+        return delivery
+    
+    def test_purge_logs_in_chunks(self):
+        """Test that only logs past retention are deleted"""
+        for _ in range(5):
+            WebhookLog.objects.create(webhook_endpoint=self.endpoint, message='old')
+        WebhookLog.objects.update(created_at=self.old)
+        WebhookLog.objects.create(webhook_endpoint=self.endpoint, message='recent')
+        
+        deleted = WebhookRetentionService.purge_logs(older_than_days=30, chunk_size=2)
+        
+        self.assertEqual(deleted, 5)
+        self.assertEqual(list(WebhookLog.objects.values_list('message', flat=True)), ['recent'])
+    
+    def test_old_deliveries_summarized(self):
+        """Test that old deliveries are rolled up into daily summaries"""
+        self.create_delivery('success', 100, self.old)
+        self.create_delivery('success', 300, self.old)
+        self.create_delivery('error', 200, self.old)
+        recent = self.create_delivery('success', 50, timezone.now())
+        
+        summarized = WebhookRetentionService.summarize_deliveries(older_than_days=90, chunk_size=2)
+        
+        self.assertEqual(summarized, 3)
+        self.assertEqual(list(WebhookDelivery.objects.values_list('id', flat=True)), [recent.id])
+        summary = WebhookDeliverySummary.objects.get(webhook_endpoint=self.endpoint)
+        self.assertEqual(summary.date, self.old.date())
+        self.assertEqual(summary.total_deliveries, 3)
+        self.assertEqual(summary.successful_deliveries, 2)
+        self.assertEqual(summary.failed_deliveries, 1)
+        self.assertEqual(summary.average_response_time, 200)
+        
+        # Stats still account for summarized deliveries
+        stats = WebhookStatsService.build_delivery_stats(self.user)
+        self.assertEqual(stats['total_deliveries'], 4)
+        self.assertEqual(stats['successful_deliveries'], 3)
+    
+    def test_error_only_log_sink(self):
+        """Test that the errors sink mode drops unsampled info logs"""
+        with self.settings(WEBHOOK_LOG_SINK_MODE='errors', WEBHOOK_LOG_SUCCESS_SAMPLE_RATE=0):
+            self.assertFalse(WebhookRetentionService.should_write_log('info'))
+            self.assertTrue(WebhookRetentionService.should_write_log('error'))
+        
+        self.assertTrue(WebhookRetentionService.should_write_log('info'))
+
+
+class NotificationBroadcastAPITestCase(APITestCase):
+    """Test broadcast listing and read receipts"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='broadcastuser',
+            email='broadcast@example.com',
+            password='TestPassword123!'
+        )
+        self.broadcast = Broadcast.objects.create(title='Maintenance', message='Tonight at 10pm')
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def test_broadcast_read_receipt(self):
+        """Test that reading a broadcast only changes this user's read state"""
+        url = reverse('api:notification-broadcasts')
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data.get('results', response.data)
+        self.assertEqual([(b['title'], b['is_read']) for b in results], [('Maintenance', False)])
+        
+        response = self.client.post(
+            reverse('api:notification-read-broadcast', kwargs={'broadcast_id': self.broadcast.pk}), secure=True
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        results = self.client.get(url, secure=True).data
+        self.assertTrue(results.get('results', results)[0]['is_read'])
+
+
+class ScheduledPaymentAPITestCase(APITestCase):
+    """Test pausing and resuming scheduled payments"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='scheduleuser',
+            email='schedule@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.account.balance = Decimal('500.00')
+        self.account.save()
+        self.payee = Payee.objects.create(user=self.user, name='Landlord', account_number='777000111')
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def test_resume_skips_occurrences_missed_while_paused(self):
+        """Test that resuming a long-paused schedule does not pay the missed occurrences"""
+        today = timezone.localdate()
+        schedule = ScheduledPayment.objects.create(
+            user=self.user, account=self.account, payee=self.payee, amount=Decimal('100.00'),
+            frequency='weekly', start_date=today - timezone.timedelta(days=60),
+            next_payment_date=today - timezone.timedelta(days=60)
+        )
+        self.client.post(reverse('api:scheduled-payment-pause', kwargs={'pk': schedule.pk}), secure=True)
+        response = self.client.post(reverse('api:scheduled-payment-resume', kwargs={'pk': schedule.pk}), secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        schedule.refresh_from_db()
+        self.assertEqual(schedule.status, 'active')
+        self.assertEqual(schedule.next_payment_date, today + timezone.timedelta(days=3))
+        
+        totals = ScheduledPaymentExecutor.run(as_of=today)
+        self.assertEqual(totals['paid'], 0)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('500.00'))
+
+
+class ConditionalGetAPITestCase(APITestCase):
+    """Test ETag revalidation on account and transaction reads"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='etaguser',
+            email='etag@example.com',
+            password='TestPassword123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='etagpayer',
+            email='etagpayer@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.other_account = Account.objects.get(user=self.other_user)
+        self.account.balance = Decimal('100.00')
+        self.account.save()
+        Transaction.objects.create(
+            user=self.other_user, from_account=self.other_account, to_account=self.account,
+            transaction_type='transfer', amount=Decimal('100.00'), reference='ETAG-TRF-1', status='completed'
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def _revalidate(self, url):
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        return etag, cached, queries
+    
+    def test_unchanged_resources_return_304_without_serializing(self):
+        """Test that a matching ETag skips the list queries"""
+        urls = [
+            reverse('api:account-balance', kwargs={'pk': self.account.pk}),
+            reverse('api:account-transactions', kwargs={'pk': self.account.pk}),
+            reverse('api:transaction-recent'),
+            reverse('api:banking-dashboard-data'),
+        ]
+        for url in urls:
+            etag, cached, queries = self._revalidate(url)
+            self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED, url)
+            self.assertEqual(cached['ETag'], etag)
+            self.assertFalse(cached.content)
+            # Only aggregates run; no transaction rows are selected
+            selects = [q['sql'] for q in queries.captured_queries if '"banking_transaction"."reference"' in q['sql']]
+            self.assertEqual(selects, [], url)
+    
+    def test_new_transaction_changes_etag(self):
+        """Test that a new transaction or balance change invalidates the ETag"""
+        url = reverse('api:transaction-recent')
+        etag = self.client.get(url, secure=True)['ETag']
+        
+        Transaction.objects.create(
+            user=self.user, from_account=self.account, to_account=self.other_account,
+            transaction_type='transfer', amount=Decimal('10.00'), reference='ETAG-TRF-2', status='completed'
+        )
+        response = self.client.get(url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data), 2)
+        
+        balance_url = reverse('api:account-balance', kwargs={'pk': self.account.pk})
+        etag = self.client.get(balance_url, secure=True)['ETag']
+        self.account.balance = Decimal('90.00')
+        self.account.save()
+        response = self.client.get(balance_url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['balance'], Decimal('90.00'))
+    
+    def test_pages_have_distinct_etags(self):
+        """Test that each page of a list gets its own validator"""
+        url = reverse('api:account-transactions', kwargs={'pk': self.account.pk})
+        first = self.client.get(url, secure=True)
+        second = self.client.get(f'{url}?page_size=5', secure=True)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        self.assertIn('private', first['Cache-Control'])
+
+
+class APIRenderingTestCase(TestCase):
+    """Test the orjson renderer/parser and response compression"""
+    
+    def test_orjson_renderer_matches_json_renderer(self):
+        """Test that money, timestamps and ids render exactly like DRF's encoder"""
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import ORJSONRenderer
+        
+        data = {
+            'last_updated': timezone.now(),
+            'date': timezone.now().date(),
+            'id': uuid.uuid4(),
+            'items': [{'name': 'caf\u00e9 \u2028', 'count': 3}],
+            7: None,
+        }
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json', {}),
+            JSONRenderer().render(data, 'application/json', {})
+        )
+        # Money is never turned into a float
+        self.assertEqual(
+            ORJSONRenderer().render({'balance': Decimal('1234.50')}, 'application/json', {}),
+            b'{"balance":"1234.50"}'
+        )
+    
+    def test_orjson_parser(self):
+        """Test that the parser decodes bodies and rejects invalid JSON"""
+        import io
+        from rest_framework.exceptions import ParseError
+        from .renderers import ORJSONParser
+        
+        parsed = ORJSONParser().parse(io.BytesIO(b'{"amount": "10.00", "ids": [1, 2]}'))
+        self.assertEqual(parsed, {'amount': '10.00', 'ids': [1, 2]})
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"amount": NaN}'))
+    
+    def test_compression_is_size_aware(self):
+        """Test that only large JSON API responses are compressed"""
+        import gzip
+        from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+        from django.test import RequestFactory, override_settings
+        from .compression import APICompressionMiddleware
+        
+        factory = RequestFactory()
+        large = {'results': [{'id': i, 'amount': '10.00'} for i in range(500)]}
+        
+        with override_settings(API_COMPRESSION_MIN_SIZE=1024):
+            middleware = APICompressionMiddleware(lambda request: JsonResponse(large, headers={'ETag': '"v1"'}))
+            response = middleware(factory.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(json.loads(gzip.decompress(response.content)), large)
+            self.assertEqual(response['ETag'], 'W/"v1"')
+            self.assertIn('Accept-Encoding', response['Vary'])
+            
+            # Client refuses gzip
+            response = middleware(factory.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip;q=0'))
+            self.assertFalse(response.has_header('Content-Encoding'))
+            
+            middleware = APICompressionMiddleware(lambda request: JsonResponse({'balance': '1.00'}))
+            response = middleware(factory.get('/api/accounts/1/balance/', HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertFalse(response.has_header('Content-Encoding'))
+            
+            middleware = APICompressionMiddleware(lambda request: HttpResponse('x' * 5000))
+            response = middleware(factory.get('/dashboard/', HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertFalse(response.has_header('Content-Encoding'))
+            
+            middleware = APICompressionMiddleware(
+                lambda request: StreamingHttpResponse(iter([b'{}'] * 1000), content_type='application/json')
+            )
+            response = middleware(factory.get('/api/transactions/', HTTP_ACCEPT_ENCODING='gzip'))
+            self.assertFalse(response.has_header('Content-Encoding'))
+    
+    @skipUnless(BROTLI_AVAILABLE, 'brotli is not installed')
+    def test_brotli_responses_are_padded(self):
+        """Test that brotli output carries random padding against BREACH and still decodes"""
+        import brotli
+        from django.http import JsonResponse
+        from django.test import RequestFactory
+        from .compression import APICompressionMiddleware
+        
+        large = {'results': [{'id': i, 'amount': '10.00'} for i in range(500)]}
+        middleware = APICompressionMiddleware(lambda request: JsonResponse(large))
+        request = RequestFactory().get('/api/transactions/', HTTP_ACCEPT_ENCODING='br, gzip')
+        
+        sizes = set()
+        for _ in range(10):
+            response = middleware(request)
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(json.loads(brotli.decompress(response.content)), large)
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+
+class ProjectionSerializerTestCase(APITestCase):
+    """Test that projection serializers match the model serializers"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='projectionuser',
+            email='projection@example.com',
+            password='TestPassword123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='projectionpayee',
+            email='projectionpayee@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.other_account = Account.objects.get(user=self.other_user)
+        for i in range(3):
+            Transaction.objects.create(
+                user=self.user, from_account=self.account, to_account=self.other_account,
+                transaction_type='transfer', amount=Decimal('12.50') + i, reference=f'PRJ-TRF-{i}',
+                status='completed', description=f'Transfer {i}'
+            )
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def assertProjectionMatches(self, projection, serializer_class, queryset):
+        expected = serializer_class(queryset, many=True).data
+        actual = projection.serialize(projection.project(queryset))
+        self.assertEqual(json.loads(json.dumps(actual, default=str)), json.loads(json.dumps(expected, default=str)))
+        self.assertEqual([list(row) for row in actual], [list(row) for row in expected])
+    
+    def test_transaction_notification_and_delivery_projections(self):
+        """Test field-for-field equality with the model serializers"""
+        from .projections import TransactionProjection, NotificationProjection, WebhookDeliveryProjection
+        from .serializers import TransactionSerializer, NotificationSerializer, WebhookDeliverySerializer
+        
+        self.assertProjectionMatches(
+            TransactionProjection, TransactionSerializer, Transaction.objects.order_by('-created_at')
+        )
+        self.assertProjectionMatches(
+            NotificationProjection, NotificationSerializer, Notification.objects.filter(user=self.user)
+        )
+        
+        endpoint = WebhookEndpoint.objects.create(
+            user=self.user, name='Projection Webhook', url='https://example.com/hook',
+            events=['transaction.completed']
+        )
+        for delivery_status, code in [('success', 200), ('success', 500), ('failed', None)]:
+            event = WebhookEvent.objects.create(
+                event_type='transaction.completed', user=self.user, payload={}, status='completed'
+            )
+            WebhookDelivery.objects.create(
+                webhook_endpoint=endpoint, webhook_event=event, status=delivery_status, http_status_code=code
+            )
+        self.assertProjectionMatches(
+            WebhookDeliveryProjection, WebhookDeliverySerializer, WebhookDelivery.objects.order_by('-attempted_at')
+        )
+    
+    def test_investment_projection_matches_serializer(self):
+        """Test field-for-field equality for priced, unpriced and free investments"""
+        from .projections import InvestmentProjection
+        from .serializers import InvestmentSerializer
+        
+        investment_account = InvestmentAccount.objects.create(
+            user=self.user, account_type='brokerage', balance=Decimal('10000.00')
+        )
+        for name, purchase_price, current_price in [
+            ('Double', Decimal('100.00'), Decimal('200.00')),
+            ('Third', Decimal('100.00'), Decimal('133.30')),
+            ('Unpriced', Decimal('40.00'), None),
+            ('Free', Decimal('0.00'), Decimal('5.00')),
+        ]:
+            Investment.objects.create(
+                account=investment_account, investment_type='stock', name=name, symbol=name[:4].upper(),
+                quantity=Decimal('2.5'), purchase_price=purchase_price, current_price=current_price,
+                purchase_date=timezone.now().date()
+            )
+        queryset = Investment.objects.order_by('name')
+        self.assertProjectionMatches(InvestmentProjection, InvestmentSerializer, queryset)
+        
+        rows = {row['name']: row for row in InvestmentProjection.serialize(InvestmentProjection.project(queryset))}
+        self.assertEqual(rows['Unpriced']['profit_loss'], 0)
+        self.assertEqual(rows['Third']['profit_loss_percentage'], Decimal('33.300'))
+        narrowed = InvestmentProjection.narrow(['id', 'profit_loss'])
+        self.assertEqual(
+            narrowed.serialize(narrowed.project(queryset.filter(name='Double'))),
+            [{'id': rows['Double']['id'], 'profit_loss': Decimal('250.0000000')}]
+        )
+    
+    def test_list_endpoint_uses_single_query(self):
+        """Test that a paginated transaction list joins both accounts in one query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('api:transaction-list'), secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual(response.data['results'][0]['to_account']['account_number'], self.other_account.account_number)
+        selects = [q['sql'] for q in queries.captured_queries if 'FROM "banking_transaction"' in q['sql']]
+        # COUNT for the paginator plus the page itself
+        self.assertEqual(len(selects), 2)
+        self.assertFalse([q['sql'] for q in queries.captured_queries if q['sql'].startswith('SELECT') and 'FROM "banking_account" WHERE "banking_account"."id" =' in q['sql']])
+
+
+class NPlusOneAPITestCase(NPlusOneAssertionsMixin, APITestCase):
+    """Test that list endpoints run a constant number of queries"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='nplusoneuser',
+            email='nplusone@example.com',
+            password='TestPassword123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='nplusonepayee',
+            email='nplusonepayee@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.other_account = Account.objects.get(user=self.other_user)
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def fetch(self, url):
+        def _fetch():
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return _fetch
+    
+    def grow(self, model, make):
+        """Return a grow(n) callable topping model rows up to n"""
+        def _grow(n):
+            for i in range(model.objects.count(), n):
+                make(i)
+        return _grow
+    
+    def test_transaction_endpoints(self):
+        """Test transaction lists and the dashboard payload"""
+        def make(i):
+            Transaction.objects.create(
+                user=self.user, from_account=self.account, to_account=self.other_account,
+                transaction_type='transfer', amount=Decimal('5.00'), reference=f'N1-TRF-{i}', status='completed'
+            )
+        grow = self.grow(Transaction, make)
+        for url in [
+            reverse('api:transaction-list'),
+            reverse('api:transaction-recent'),
+            reverse('api:account-transactions', kwargs={'pk': self.account.pk}),
+            reverse('api:banking-dashboard-data'),
+            reverse('api:notification-list'),
+        ]:
+            self.assertNoNPlusOne(self.fetch(url), grow)
+    
+    def test_investment_and_bill_endpoints(self):
+        """Test nested and counted relations on investment, bill and claim lists"""
+        def make_investment_account(i):
+            investment_account = InvestmentAccount.objects.create(
+                user=self.user, account_type='brokerage', account_number=f'INV-N1-{i}', balance=Decimal('100.00')
+            )
+            Investment.objects.create(
+                account=investment_account, investment_type='stock', name=f'Stock {i}',
+                quantity=Decimal('1'), purchase_price=Decimal('10.00'), purchase_date=timezone.now().date()
+            )
+        self.assertNoNPlusOne(
+            self.fetch(reverse('api:investment-account-list')), self.grow(InvestmentAccount, make_investment_account)
+        )
+        
+        def make_bill_payment(i):
+            biller = Biller.objects.create(name=f'Biller {i}', biller_type='utility')
+            BillPayment.objects.create(
+                user=self.user, biller=biller, account=self.account, payment_method='checking',
+                amount=Decimal('20.00'), account_number=f'ACC{i}', scheduled_date=timezone.now().date()
+            )
+        self.assertNoNPlusOne(self.fetch(reverse('api:bill-payment-list')), self.grow(BillPayment, make_bill_payment))
+        
+        def make_claim(i):
+            policy = InsurancePolicy.objects.create(
+                user=self.user, policy_type='auto', policy_number=f'POL-{i}', provider='Acme',
+                coverage_amount=Decimal('1000.00'), monthly_premium=Decimal('10.00'),
+                start_date=timezone.now().date(), end_date=timezone.now().date()
+            )
+            InsuranceClaim.objects.create(
+                policy=policy, claim_number=f'CLM-{i}', claim_amount=Decimal('50.00'),
+                description='Dent', incident_date=timezone.now().date()
+            )
+        self.assertNoNPlusOne(self.fetch(reverse('api:insurance-claim-list')), self.grow(InsuranceClaim, make_claim))
+    
+    def test_webhook_log_endpoint(self):
+        """Test endpoint and event names on webhook logs"""
+        def make(i):
+            endpoint = WebhookEndpoint.objects.create(
+                user=self.user, name=f'Hook {i}', url=f'https://example.com/{i}', events=['transaction.completed']
+            )
+            event = WebhookEvent.objects.create(event_type='transaction.completed', user=self.user, payload={})
+            WebhookLog.objects.create(webhook_endpoint=endpoint, webhook_event=event, message='Delivered')
+        self.assertNoNPlusOne(self.fetch(reverse('api:webhook-log-list')), self.grow(WebhookLog, make))
+    
+    def test_detector_reports_growing_queries(self):
+        """Test that the detector fails on a per-row query"""
+        def make(i):
+            Transaction.objects.create(
+                user=self.user, from_account=self.account, to_account=self.other_account,
+                transaction_type='transfer', amount=Decimal('5.00'), reference=f'N1-BAD-{i}', status='completed'
+            )
+        
+        def fetch():
+            for trans in Transaction.objects.all():
+                trans.from_account.account_number
+        
+        with self.assertRaisesMessage(AssertionError, 'N+1'):
+            self.assertNoNPlusOne(fetch, self.grow(Transaction, make))
+
+
+class SparseFieldsetAPITestCase(APITestCase):
+    """Test ?fields= and ?expand= on list and detail endpoints"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='sparseuser',
+            email='sparse@example.com',
+            password='TestPassword123!'
+        )
+        self.other_user = User.objects.create_user(
+            username='sparsepayee',
+            email='sparsepayee@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.other_account = Account.objects.get(user=self.other_user)
+        self.transaction = Transaction.objects.create(
+            user=self.user, from_account=self.account, to_account=self.other_account,
+            transaction_type='transfer', amount=Decimal('12.50'), reference='SPARSE-TRF-1', status='completed'
+        )
+        self.biller = Biller.objects.create(name='Sparse Power', biller_type='utility')
+        self.bill_payment = BillPayment.objects.create(
+            user=self.user, biller=self.biller, account=self.account, payment_method='checking',
+            amount=Decimal('20.00'), account_number='ACC1', scheduled_date=timezone.now().date()
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+    
+    def get(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response, [q['sql'] for q in queries.captured_queries 
+                if f'FROM "{table}"' in q['sql'] and 'COUNT(*)' not in q['sql']]
+    
+    def test_transaction_list_fields(self):
+        """Test that only the requested columns are selected and accounts are not joined"""
+        response, sql = self.get(reverse('api:transaction-list') + '?fields=id,amount,created_at', 'banking_transaction')
+        row = response.data['results'][0]
+        self.assertEqual(list(row), ['id', 'amount', 'created_at'])
+        self.assertEqual(row['amount'], '12.50')
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('JOIN "banking_account"', sql[0])
+        self.assertNotIn('"description"', sql[0])
+    
+    def test_transaction_nested_id_and_expand(self):
+        """Test that nested accounts are ids unless expanded"""
+        url = reverse('api:transaction-list') + '?fields=id,from_account'
+        response, sql = self.get(url, 'banking_transaction')
+        self.assertEqual(response.data['results'][0]['from_account'], self.account.id)
+        self.assertNotIn('JOIN "banking_account"', sql[0])
+        
+        response, sql = self.get(url + '&expand=from_account', 'banking_transaction')
+        self.assertEqual(response.data['results'][0]['from_account']['account_number'], self.account.account_number)
+        self.assertIn('JOIN "banking_account"', sql[0])
+    
+    def test_default_response_unchanged(self):
+        """Test that requests without ?fields= return every field"""
+        response, _ = self.get(reverse('api:transaction-list'), 'banking_transaction')
+        row = response.data['results'][0]
+        self.assertEqual(row['from_account']['id'], self.account.id)
+        self.assertIn('description', row)
+    
+    def test_unknown_field_rejected(self):
+        """Test that unknown field names are a 400"""
+        for url in [
+            reverse('api:transaction-list') + '?fields=id,password',
+            reverse('api:bill-payment-list') + '?fields=id,password',
+            reverse('api:account-transactions', kwargs={'pk': self.account.pk}) + '?fields=nope',
+        ]:
+            response = self.client.get(url, secure=True)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('fields', response.data)
+    
+    def test_serializer_list_fields(self):
+        """Test that serializer-backed lists use .only() and drop unneeded joins"""
+        response, sql = self.get(reverse('api:bill-payment-list') + '?fields=id,amount,status', 'banking_billpayment')
+        self.assertEqual(response.data['results'][0], {'id': self.bill_payment.id, 'amount': '20.00', 'status': 'scheduled'})
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('JOIN "banking_biller"', sql[0])
+        self.assertNotIn('"notes"', sql[0])
+        
+        response, sql = self.get(reverse('api:bill-payment-list') + '?fields=id,biller', 'banking_billpayment')
+        self.assertEqual(response.data['results'][0]['biller'], self.biller.id)
+        self.assertNotIn('JOIN "banking_biller"', sql[0])
+        
+        response, sql = self.get(reverse('api:bill-payment-list') + '?fields=id,biller&expand=biller', 'banking_billpayment')
+        self.assertEqual(response.data['results'][0]['biller']['name'], 'Sparse Power')
+        self.assertIn('JOIN "banking_biller"', sql[0])
+    
+    def test_method_field_disables_narrowing(self):
+        """Test that method fields still see the whole row"""
+        response, _ = self.get(reverse('api:bill-payment-list') + '?fields=id,total_amount', 'banking_billpayment')
+        self.assertEqual(Decimal(str(response.data['results'][0]['total_amount'])), Decimal('20.00'))
+    
+    def test_detail_fields(self):
+        """Test that retrieve honours ?fields="""
+        url = reverse('api:account-detail', kwargs={'pk': self.account.pk}) + '?fields=id,balance'
+        response, sql = self.get(url, 'banking_account')
+        self.assertEqual(list(response.data), ['id', 'balance'])
+        self.assertNotIn('"routing_number"', sql[-1])
+    
+    def test_writes_ignore_fields(self):
+        """Test that ?fields= only applies to reads"""
+        response = self.client.patch(
+            reverse('api:bill-payment-detail', kwargs={'pk': self.bill_payment.pk}) + '?fields=id',
+            {'notes': 'Updated'}, format='json', secure=True
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('notes', response.data)
+
+
+class BatchTransferAPITestCase(APITestCase):
+    """Test the batch transfer endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='payrolluser',
+            email='payroll@example.com',
+            password='TestPassword123!'
+        )
+        self.user.profile.set_transaction_pin('1234')
+        self.account = Account.objects.get(user=self.user)
+        self.account.balance = Decimal('1000.00')
+        self.account.save()
+        self.recipients = []
+        for i in range(2):
+            employee = User.objects.create_user(
+                username=f'employee{i}',
+                email=f'employee{i}@example.com',
+                password='TestPassword123!'
+            )
+            self.recipients.append(Account.objects.get(user=employee))
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('api:transfer-batch')
+    
+    def post(self, legs, **extra):
+        data = {'transaction_pin': '1234', 'description': 'Payroll', 'legs': legs, **extra}
+        return self.client.post(self.url, data, format='json', secure=True)
+    
+    def leg(self, account, amount):
+        return {'recipient_account': account.account_number, 'amount': amount}
+    
+    def test_batch_transfer(self):
+        """Test that every leg is posted and balances move once"""
+        response = self.post([self.leg(self.recipients[0], '100.00'), self.leg(self.recipients[1], '250.50')])
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['completed'], 2)
+        self.assertEqual(response.data['total_amount'], Decimal('350.50'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('649.50'))
+        self.recipients[1].refresh_from_db()
+        self.assertEqual(self.recipients[1].balance, Decimal('250.50'))
+        
+        references = [result['reference'] for result in response.data['results']]
+        transactions = Transaction.objects.filter(reference__in=references)
+        self.assertEqual(transactions.count(), 2)
+        self.assertTrue(all(t.status == 'completed' and t.from_account_id == self.account.id for t in transactions))
+        self.assertTrue(Notification.objects.filter(user=self.recipients[0].user, related_transaction__isnull=False).exists())
+        self.assertTrue(Notification.objects.filter(user=self.user, title__startswith='Batch Transfer Sent').exists())
+    
+    def test_atomic_batch_rejected(self):
+        """Test that one bad leg rejects an atomic batch"""
+        response = self.post([self.leg(self.recipients[0], '100.00'), {'recipient_account': 'PTMISSING', 'amount': '5'}])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'], [{'index': 1, 'status': 'failed', 'error': 'Recipient account not found'}])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00'))
+        self.assertFalse(Transaction.objects.filter(from_account=self.account).exists())
+    
+    def test_insufficient_funds(self):
+        """Test that the batch total is checked against the balance"""
+        response = self.post([self.leg(self.recipients[0], '600.00'), self.leg(self.recipients[1], '600.00')])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errors'][0]['error'], 'Insufficient funds')
+        self.assertFalse(Transaction.objects.filter(from_account=self.account).exists())
+    
+    def test_per_leg_results(self):
+        """Test that non-atomic batches post the valid legs"""
+        response = self.post([
+            self.leg(self.recipients[0], '100.00'),
+            self.leg(self.account, '5.00'),
+            self.leg(self.recipients[1], '-1'),
+            self.leg(self.recipients[1], '20000'),
+            self.leg(self.recipients[1], '950.00'),
+        ], atomic=False)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['completed'], 1)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['completed', 'failed', 'failed', 'failed', 'failed'])
+        self.assertEqual(response.data['results'][1]['error'], 'Cannot transfer to the same account')
+        self.assertEqual(response.data['results'][4]['error'], 'Insufficient funds')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('900.00'))
+    
+    def test_invalid_pin(self):
+        """Test that the PIN is verified"""
+        response = self.post([self.leg(self.recipients[0], '100.00')], transaction_pin='9999')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], 'Invalid transaction PIN')
+    
+    def test_other_users_account(self):
+        """Test that legs cannot be paid from another user's account"""
+        response = self.post([self.leg(self.recipients[1], '1.00')], from_account=self.recipients[0].id)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_leg_limit(self):
+        """Test that oversized batches are rejected before any work"""
+        with self.settings(BATCH_TRANSFER_MAX_LEGS=1):
+            response = self.post([self.leg(self.recipients[0], '1.00'), self.leg(self.recipients[1], '1.00')])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('legs', response.data)
+    
+    def test_query_count_independent_of_legs(self):
+        """Test that posting more legs does not add queries"""
+        def count(legs):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.post(legs)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+        
+        # Lease the ID worker slot before measuring; a lease written in an earlier
+        # test's rolled back transaction is written again on first use
+        next_id()
+        few = count([self.leg(self.recipients[0], '1.00')])
+        many = count([self.leg(self.recipients[i % 2], '1.00') for i in range(20)])
+        self.assertEqual(few, many)
+
+
+class BalanceAPITestCase(APITestCase):
+    """Test the consolidated balances endpoint"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='networthuser',
+            email='networth@example.com',
+            password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.account.balance = Decimal('1500.25')
+        self.account.save()
+        self.wallet = BitcoinWallet.objects.get(user=self.user)
+        self.wallet.balance = Decimal('0.12345678')
+        self.wallet.btc_price_usd = Decimal('50000.00')
+        self.wallet.save()
+        InvestmentAccount.objects.create(
+            user=self.user, account_type='brokerage', account_number='INV-NW-1', balance=Decimal('2000.00')
+        )
+        application = LoanApplication.objects.create(
+            user=self.user, loan_type='personal', amount=Decimal('5000.00'), term_months=12, purpose='Car'
+        )
+        LoanAccount.objects.create(
+            application=application, account=self.account, loan_number='LN-NW-1',
+            original_amount=Decimal('5000.00'), current_balance=Decimal('4000.00'), interest_rate=Decimal('5.00'),
+            term_months=12, monthly_payment=Decimal('428.04'), start_date=timezone.now().date(),
+            next_payment_date=timezone.now().date()
+        )
+        refresh = RefreshToken.for_user(self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        self.url = reverse('api:balance-list')
+    
+    def test_balances(self):
+        """Test that every balance comes back from one query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, secure=True)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['kind'] for row in response.data['balances']], ['account', 'bitcoin', 'investment', 'loan'])
+        bitcoin = response.data['balances'][1]
+        self.assertEqual(bitcoin['balance'], Decimal('0.12345678'))
+        self.assertEqual(bitcoin['value_usd'], Decimal('6172.84'))
+        
+        summary = response.data['summary']
+        self.assertEqual(summary['total_checking'], Decimal('1500.25'))
+        self.assertEqual(summary['total_investments'], Decimal('2000.00'))
+        self.assertEqual(summary['total_loans'], Decimal('4000.00'))
+        self.assertEqual(summary['net_worth'], Decimal('5673.09'))
+        
+        balance_queries = [q['sql'] for q in queries.captured_queries if 'banking_bitcoinwallet' in q['sql']]
+        self.assertEqual(len(balance_queries), 1)
+        self.assertIn('UNION ALL', balance_queries[0])
+    
+    def test_not_modified(self):
+        """Test conditional GET and that balance changes produce a new ETag"""
+        etag = self.client.get(self.url, secure=True)['ETag']
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.wallet.balance = Decimal('1.00000000')
+        self.wallet.save()
+        response = self.client.get(self.url, secure=True, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    def test_other_users_require_staff(self):
+        """Test that only staff can include other users"""
+        other = User.objects.create_user(username='networthother', email='networthother@example.com', password='TestPassword123!')
+        url = f'{self.url}?users={self.user.id},{other.id}'
+        self.assertEqual(self.client.get(url, secure=True).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url, secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['users']), {self.user.id, other.id})
+        self.assertEqual(response.data['users'][self.user.id]['total_loans'], Decimal('4000.00'))
+    
+    def test_account_summary(self):
+        """Test that the analytics summary is built from the same rows"""
+        response = self.client.get(reverse('api:analytics-account-summary'), secure=True)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_balance'], '1500.25')
+        self.assertEqual(response.data['total_bitcoin'], '0.12345678')
+        self.assertEqual(response.data['bitcoin_value_usd'], '6172.84')
+        self.assertEqual(response.data['total_loans'], '4000.00')
+
+
 class SecurityAPITestCase(BaseAPITestCase):
     """Test security-related endpoints"""
     
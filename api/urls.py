@@ -24,15 +24,15 @@ from .auth_views import (
     get_2fa_status_api,
 )
 from .viewsets import (
-    AccountViewSet, TransactionViewSet, BankingViewSet,
+    AccountViewSet, TransactionViewSet, TransferViewSet, BankingViewSet,
     BitcoinViewSet, LoanApplicationViewSet, LoanAccountViewSet,
     InvestmentAccountViewSet, InvestmentViewSet,
     InsurancePolicyViewSet, InsuranceClaimViewSet,
     BillerViewSet, BillPaymentViewSet, PayeeViewSet, ScheduledPaymentViewSet,
-    NotificationViewSet, AnalyticsViewSet, VirtualCardViewSet,
+    NotificationViewSet, BalanceViewSet, AnalyticsViewSet, VirtualCardViewSet,
     # Phase 4: Webhook System
     WebhookEndpointViewSet, WebhookEventViewSet, WebhookDeliveryViewSet,
-    WebhookTemplateViewSet, WebhookLogViewSet
+    WebhookTemplateViewSet, WebhookLogViewSet, WebhookReplayJobViewSet
 )
 
 app_name = 'api'
@@ -41,6 +41,7 @@ app_name = 'api'
 router = DefaultRouter()
 router.register(r'accounts', AccountViewSet, basename='account')
 router.register(r'transactions', TransactionViewSet, basename='transaction')
+router.register(r'transfers', TransferViewSet, basename='transfer')
 router.register(r'banking', BankingViewSet, basename='banking')
 
 # Phase 2: Advanced Banking Features
@@ -57,6 +58,7 @@ router.register(r'bill-payments', BillPaymentViewSet, basename='bill-payment')
 router.register(r'payees', PayeeViewSet, basename='payee')
 router.register(r'scheduled-payments', ScheduledPaymentViewSet, basename='scheduled-payment')
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'balances', BalanceViewSet, basename='balance')
 router.register(r'analytics', AnalyticsViewSet, basename='analytics')
 
 # Phase 4: Webhook System
@@ -65,6 +67,7 @@ router.register(r'webhooks/events', WebhookEventViewSet, basename='webhook-event
 router.register(r'webhooks/deliveries', WebhookDeliveryViewSet, basename='webhook-delivery')
 router.register(r'webhooks/templates', WebhookTemplateViewSet, basename='webhook-template')
 router.register(r'webhooks/logs', WebhookLogViewSet, basename='webhook-log')
+router.register(r'webhooks/replays', WebhookReplayJobViewSet, basename='webhook-replay')
 
 # API v1 URL patterns
 v1_patterns = [
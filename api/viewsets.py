@@ -6,25 +6,42 @@ from django.shortcuts import get_object_or_404
 from django.db import transaction
 from django.utils import timezone
 from decimal import Decimal
-from banking.models import Account, Transaction, Notification, BitcoinWallet, VirtualCard
+from banking.models import Account, Transaction, Notification, BitcoinWallet, VirtualCard, Broadcast
+from banking.notification_fanout import get_broadcasts_for_user, mark_all_broadcasts_read, mark_broadcast_read
+from banking.batch_transfers import BatchTransferService, BatchTransferError
+from banking.number_allocator import allocate_card_number
+from banking.amortization import record_payment
+from banking.scheduled_payments import ScheduledPaymentExecutor
+from banking import notification_cache
 from banking.models_loans import LoanApplication, LoanAccount, LoanPayment
 from banking.models_investments_insurance import InvestmentAccount, Investment, InsurancePolicy, InsuranceClaim
 from banking.models_bills import Biller, BillPayment, Payee, ScheduledPayment
-from .models import WebhookEndpoint, WebhookEvent, WebhookDelivery, WebhookTemplate, WebhookLog
+from .models import WebhookEndpoint, WebhookEvent, WebhookDelivery, WebhookTemplate, WebhookLog, WebhookReplayJob
+from .webhook_stats import WebhookStatsService
+from .webhook_retention import WebhookRetentionService
+from .conditional import ConditionalGetService
+from .balances import BalanceService
+from .query_plans import QueryPlan, QueryPlanMixin
+from .sparse_fields import SparseFieldsetMixin
+from .projections import (
+    ProjectionListMixin, TransactionProjection, NotificationProjection,
+    WebhookDeliveryProjection, InvestmentProjection
+)
 from .serializers import (
-    AccountSerializer, TransactionSerializer, MoneyTransferSerializer,
+    AccountSerializer, TransactionSerializer, MoneyTransferSerializer, BatchTransferSerializer,
     TransactionCreateSerializer, BitcoinWalletSerializer, BitcoinSendSerializer,
     BitcoinSwapSerializer, LoanApplicationSerializer, LoanAccountSerializer,
     LoanPaymentSerializer, LoanPaymentCreateSerializer, InvestmentAccountSerializer,
     InvestmentSerializer, InvestmentCreateSerializer, InsurancePolicySerializer,
     InsuranceClaimSerializer, InsuranceClaimCreateSerializer, BillerSerializer,
     BillPaymentSerializer, BillPaymentCreateSerializer, PayeeSerializer,
-    ScheduledPaymentSerializer, ScheduledPaymentCreateSerializer, NotificationSerializer,
+    ScheduledPaymentSerializer, ScheduledPaymentCreateSerializer, NotificationSerializer, BroadcastSerializer,
     AccountSummarySerializer, TransactionAnalyticsSerializer, VirtualCardCreateSerializer,
     VirtualCardSerializer, CardTransactionSerializer, WebhookEndpointSerializer,
     WebhookEndpointCreateSerializer, WebhookEventSerializer, WebhookDeliverySerializer,
     WebhookTestSerializer, WebhookRetrySerializer, WebhookStatsSerializer,
-    WebhookTemplateSerializer, WebhookLogSerializer
+    WebhookTemplateSerializer, WebhookLogSerializer, WebhookReplayJobSerializer,
+    WebhookReplayJobCreateSerializer
 )
 from banking.utils import generate_reference_number
 import random
@@ -35,7 +52,7 @@ from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
 
-class AccountViewSet(viewsets.ReadOnlyModelViewSet):
+class AccountViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for bank accounts.
     Provides list and detail views for user's accounts.
@@ -51,28 +68,39 @@ class AccountViewSet(viewsets.ReadOnlyModelViewSet):
     def balance(self, request, pk=None):
         """Get account balance."""
         account = self.get_object()
-        return Response({
+        version = ConditionalGetService.account_version(account)
+        not_modified = ConditionalGetService.not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        return ConditionalGetService.finalize(Response({
             'account_number': account.account_number,
             'balance': account.balance,
             'last_updated': account.updated_at
-        })
+        }), version, request)
     
     @action(detail=True, methods=['get'])
     def transactions(self, request, pk=None):
         """Get account transactions."""
         account = self.get_object()
-        transactions = Transaction.objects.filter(
+        version = ConditionalGetService.account_transactions_version(account)
+        not_modified = ConditionalGetService.not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        projection = self.get_projection(TransactionProjection)
+        transactions = projection.project(Transaction.objects.filter(
             models.Q(from_account=account) | models.Q(to_account=account)
-        ).order_by('-created_at')
+        ).order_by('-created_at'))
         
         # Add pagination
         page = self.paginate_queryset(transactions)
         if page is not None:
-            serializer = TransactionSerializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            data = projection.serialize(page)
+            return ConditionalGetService.finalize(self.get_paginated_response(data), version, request)
         
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        data = projection.serialize(transactions)
+        return ConditionalGetService.finalize(Response(data), version, request)
     
     @action(detail=True, methods=['post'])
     def deposit(self, request, pk=None):
@@ -189,13 +217,18 @@ class AccountViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class TransactionViewSet(SparseFieldsetMixin, ProjectionListMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for transactions.
     Provides list and detail views for user's transactions.
     """
     serializer_class = TransactionSerializer
+    projection_class = TransactionProjection
     permission_classes = [IsAuthenticated]
+    query_plans = {
+        'list': None,
+        '*': QueryPlan(select_related=['from_account', 'to_account']),
+    }
     
     def get_queryset(self):
         """Return transactions for the current user's accounts only."""
@@ -209,9 +242,14 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def recent(self, request):
         """Get recent transactions (last 10)."""
-        transactions = self.get_queryset()[:10]
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        version = ConditionalGetService.user_version(request.user, 'recent_transactions')
+        not_modified = ConditionalGetService.not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
+        projection = self.get_projection(TransactionProjection)
+        transactions = projection.project(self.get_queryset())[:10]
+        return ConditionalGetService.finalize(Response(projection.serialize(transactions)), version, request)
     
     @action(detail=False, methods=['get'])
     def summary(self, request):
@@ -250,6 +288,52 @@ class TransactionViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
+class TransferViewSet(viewsets.GenericViewSet):
+    """
+    ViewSet for bulk money movement.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Transfer money from one account to many recipients, e.g. for payroll."""
+        serializer = BatchTransferSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        
+        # One PIN check for the whole batch
+        if not request.user.profile.check_transaction_pin(data['transaction_pin']):
+            return Response(
+                {'error': 'Invalid transaction PIN'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        accounts = Account.objects.filter(user=request.user)
+        if 'from_account' in data:
+            sender_account_id = accounts.filter(pk=data['from_account']).values_list('pk', flat=True).first()
+        else:
+            sender_account_id = accounts.order_by('pk').values_list('pk', flat=True).first()
+        if sender_account_id is None:
+            return Response({'error': 'Account not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        try:
+            result = BatchTransferService.execute(
+                request.user,
+                sender_account_id,
+                data['legs'],
+                description=data.get('description', 'Batch Transfer'),
+                atomic=data['atomic'],
+            )
+        except BatchTransferError as e:
+            return Response(
+                {'error': str(e), 'errors': e.errors}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
 class BankingViewSet(viewsets.GenericViewSet):
     """
     ViewSet for general banking operations.
@@ -296,19 +380,24 @@ class BankingViewSet(viewsets.GenericViewSet):
     @action(detail=False, methods=['get'])
     def dashboard_data(self, request):
         """Get dashboard data for the user."""
+        version = ConditionalGetService.user_version(request.user, 'dashboard_data')
+        not_modified = ConditionalGetService.not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+
         try:
             account = Account.objects.get(user=request.user)
-            recent_transactions = Transaction.objects.filter(
+            recent_transactions = TransactionProjection.project(Transaction.objects.filter(
                 models.Q(from_account=account) | 
                 models.Q(to_account=account) |
                 models.Q(user=request.user)
-            ).order_by('-created_at')[:5]
+            ).order_by('-created_at'))[:5]
             
-            return Response({
+            return ConditionalGetService.finalize(Response({
                 'account': AccountSerializer(account).data,
-                'recent_transactions': TransactionSerializer(recent_transactions, many=True).data,
+                'recent_transactions': TransactionProjection.serialize(recent_transactions),
                 'account_holder': f"{request.user.first_name} {request.user.last_name}"
-            })
+            }), version, request)
         except Account.DoesNotExist:
             return Response(
                 {'error': 'No account found'}, 
@@ -558,10 +647,11 @@ class LoanApplicationViewSet(viewsets.ModelViewSet):
         )
 
 
-class LoanAccountViewSet(viewsets.ReadOnlyModelViewSet):
+class LoanAccountViewSet(QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """Loan account management (read-only)"""
     serializer_class = LoanAccountSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(select_related=['application'])}
     
     def get_queryset(self):
         return LoanAccount.objects.filter(application__user=self.request.user)
@@ -592,14 +682,8 @@ class LoanAccountViewSet(viewsets.ReadOnlyModelViewSet):
                             status=status.HTTP_400_BAD_REQUEST
                         )
                     
-                    # Calculate principal and interest
-                    monthly_interest = loan.interest_rate / Decimal('1200')
-                    interest_amount = loan.current_balance * monthly_interest
-                    principal_amount = payment_amount - interest_amount
-                    
-                    if principal_amount < 0:
-                        principal_amount = payment_amount
-                        interest_amount = Decimal('0')
+                    # Split into interest and principal; updates the balance and marks the schedule stale
+                    principal_amount, interest_amount = record_payment(loan, payment_amount)
                     
                     # Create payment record
                     payment = LoanPayment.objects.create(
@@ -614,8 +698,7 @@ class LoanAccountViewSet(viewsets.ReadOnlyModelViewSet):
                         notes=serializer.validated_data.get('notes', '')
                     )
                     
-                    # Update loan balance
-                    loan.current_balance -= principal_amount
+                    # Advance to the next installment
                     loan.next_payment_date = loan.next_payment_date + relativedelta(months=1)
                     loan.save()
                     
@@ -635,10 +718,11 @@ class LoanAccountViewSet(viewsets.ReadOnlyModelViewSet):
 
 # ====== INVESTMENT MANAGEMENT VIEWSETS ======
 
-class InvestmentAccountViewSet(viewsets.ModelViewSet):
+class InvestmentAccountViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """Investment account management"""
     serializer_class = InvestmentAccountSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(annotations={'investment_count': Count('investments')})}
     
     def get_queryset(self):
         return InvestmentAccount.objects.filter(user=self.request.user)
@@ -650,9 +734,8 @@ class InvestmentAccountViewSet(viewsets.ModelViewSet):
     def portfolio(self, request, pk=None):
         """Get investment portfolio for this account"""
         account = self.get_object()
-        investments = Investment.objects.filter(account=account)
-        serializer = InvestmentSerializer(investments, many=True)
-        return Response(serializer.data)
+        investments = InvestmentProjection.project(Investment.objects.filter(account=account))
+        return Response(InvestmentProjection.serialize(investments))
     
     @action(detail=True, methods=['post'])
     def buy_investment(self, request, pk=None):
@@ -696,9 +779,10 @@ class InvestmentAccountViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class InvestmentViewSet(viewsets.ReadOnlyModelViewSet):
+class InvestmentViewSet(SparseFieldsetMixin, ProjectionListMixin, viewsets.ReadOnlyModelViewSet):
     """Investment management (read-only)"""
     serializer_class = InvestmentSerializer
+    projection_class = InvestmentProjection
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
@@ -722,7 +806,7 @@ class InsurancePolicyViewSet(viewsets.ModelViewSet):
     def claims(self, request, pk=None):
         """Get claims for this policy"""
         policy = self.get_object()
-        claims = InsuranceClaim.objects.filter(policy=policy)
+        claims = InsuranceClaim.objects.filter(policy=policy).select_related('policy')
         serializer = InsuranceClaimSerializer(claims, many=True)
         return Response(serializer.data)
     
@@ -741,10 +825,11 @@ class InsurancePolicyViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class InsuranceClaimViewSet(viewsets.ReadOnlyModelViewSet):
+class InsuranceClaimViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """Insurance claim management (read-only)"""
     serializer_class = InsuranceClaimSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(select_related=['policy'])}
     
     def get_queryset(self):
         return InsuranceClaim.objects.filter(policy__user=self.request.user)
@@ -761,10 +846,11 @@ class BillerViewSet(viewsets.ReadOnlyModelViewSet):
         return Biller.objects.filter(is_active=True)
 
 
-class BillPaymentViewSet(viewsets.ModelViewSet):
+class BillPaymentViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """Bill payment management"""
     serializer_class = BillPaymentSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(select_related=['biller'])}
     
     def get_queryset(self):
         return BillPayment.objects.filter(user=self.request.user)
@@ -814,10 +900,11 @@ class PayeeViewSet(viewsets.ModelViewSet):
         })
 
 
-class ScheduledPaymentViewSet(viewsets.ModelViewSet):
+class ScheduledPaymentViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ModelViewSet):
     """Scheduled payment management"""
     serializer_class = ScheduledPaymentSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(select_related=['payee'])}
     
     def get_queryset(self):
         return ScheduledPayment.objects.filter(user=self.request.user)
@@ -843,37 +930,107 @@ class ScheduledPaymentViewSet(viewsets.ModelViewSet):
         """Resume scheduled payment"""
         payment = self.get_object()
         payment.status = 'active'
+        ScheduledPaymentExecutor.skip_missed(payment)
         payment.save()
         return Response({'message': 'Payment resumed successfully'})
 
 
 # ====== NOTIFICATION VIEWSETS ======
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(SparseFieldsetMixin, ProjectionListMixin, viewsets.ReadOnlyModelViewSet):
     """Notification management"""
     serializer_class = NotificationSerializer
+    projection_class = NotificationProjection
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user)
     
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        """Unread notification count, served from the per-user cache"""
+        return Response({'unread_count': notification_cache.get_unread_count(request.user.id)})
+    
     @action(detail=True, methods=['post'])
     def mark_read(self, request, pk=None):
         """Mark notification as read"""
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            notification.is_read = True
+            notification.save()
+            notification_cache.notification_read(request.user.id)
         return Response({'message': 'Notification marked as read'})
     
     @action(detail=False, methods=['post'])
     def mark_all_read(self, request):
-        """Mark all notifications as read"""
+        """Mark all notifications and broadcasts as read"""
         count = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        count += mark_all_broadcasts_read(request.user)
+        notification_cache.invalidate(request.user.id)
         return Response({'message': f'{count} notifications marked as read'})
+    
+    @action(detail=False, methods=['get'])
+    def broadcasts(self, request):
+        """Broadcasts shared by all users, with this user's read state"""
+        queryset = get_broadcasts_for_user(request.user)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(BroadcastSerializer(page, many=True).data)
+        return Response(BroadcastSerializer(queryset, many=True).data)
+    
+    @action(detail=False, methods=['post'], url_path=r'broadcasts/(?P<broadcast_id>\d+)/read')
+    def read_broadcast(self, request, broadcast_id=None):
+        """Record a read receipt for a broadcast"""
+        broadcast = get_object_or_404(Broadcast, pk=broadcast_id, is_active=True)
+        mark_broadcast_read(request.user, broadcast)
+        return Response({'message': 'Broadcast marked as read'})
 
 
 # ====== ANALYTICS & REPORTING VIEWSETS ======
 
+class BalanceViewSet(viewsets.ViewSet):
+    """
+    Every balance the user holds, for net-worth views.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def list(self, request):
+        """Accounts, Bitcoin wallet, investment accounts and loans in one response."""
+        user_ids = [request.user.pk]
+        requested = request.query_params.get('users')
+        if requested:
+            # Several users' balances are an operator view
+            if not request.user.is_staff:
+                return Response(
+                    {'error': 'Only staff can read other users\' balances'},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+            try:
+                user_ids = sorted({int(user_id) for user_id in requested.split(',') if user_id.strip()})
+            except ValueError:
+                return Response(
+                    {'error': 'users must be a comma separated list of ids'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
+        rows = BalanceService.rows(user_ids)
+        version = BalanceService.version(user_ids, rows)
+        not_modified = ConditionalGetService.not_modified(request, version)
+        if not_modified is not None:
+            return not_modified
+        
+        data = {
+            'balances': rows,
+            'summary': BalanceService.summary(rows),
+        }
+        if len(user_ids) > 1:
+            data['users'] = {
+                user_id: BalanceService.summary(row for row in rows if row['user_id'] == user_id)
+                for user_id in user_ids
+            }
+        return ConditionalGetService.finalize(Response(data), version, request)
+
+
 class AnalyticsViewSet(viewsets.ViewSet):
     """Advanced analytics and reporting"""
     permission_classes = [IsAuthenticated]
@@ -881,42 +1038,8 @@ class AnalyticsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def account_summary(self, request):
         """Get comprehensive account summary"""
-        user = request.user
-        
-        # Get account balances
-        accounts = Account.objects.filter(user=user)
-        total_checking = accounts.filter(account_type='checking').aggregate(Sum('balance'))['balance__sum'] or 0
-        total_savings = accounts.filter(account_type='savings').aggregate(Sum('balance'))['balance__sum'] or 0
-        total_credit = accounts.filter(account_type='credit').aggregate(Sum('balance'))['balance__sum'] or 0
-        total_balance = total_checking + total_savings + total_credit
-        
-        # Get Bitcoin information
-        try:
-            wallet = BitcoinWallet.objects.get(user=user)
-            total_bitcoin = wallet.balance
-            bitcoin_value_usd = wallet.balance * wallet.btc_price_usd
-        except BitcoinWallet.DoesNotExist:
-            total_bitcoin = 0
-            bitcoin_value_usd = 0
-        
-        # Get investment information
-        investment_accounts = InvestmentAccount.objects.filter(user=user)
-        total_investments = investment_accounts.aggregate(Sum('balance'))['balance__sum'] or 0
-        
-        # Get loan information
-        loan_accounts = LoanAccount.objects.filter(application__user=user)
-        total_loans = loan_accounts.aggregate(Sum('current_balance'))['current_balance__sum'] or 0
-        
-        data = {
-            'total_checking': total_checking,
-            'total_savings': total_savings,
-            'total_credit': total_credit,
-            'total_balance': total_balance,
-            'total_bitcoin': total_bitcoin,
-            'bitcoin_value_usd': bitcoin_value_usd,
-            'total_investments': total_investments,
-            'total_loans': total_loans
-        }
+        # Accounts, wallet, investments and loans in one query
+        data = BalanceService.summary(BalanceService.rows([request.user.pk]))
         
         serializer = AccountSummarySerializer(data)
         return Response(serializer.data)
@@ -1006,9 +1129,8 @@ class VirtualCardViewSet(viewsets.ModelViewSet):
         
         card_type = serializer.validated_data.get('card_type', 'visa')
         
-        # Generate card number
-        prefix = '4' if card_type == 'visa' else '5'
-        card_number = prefix + ''.join([str(random.randint(0, 9)) for _ in range(15)])
+        # Allocate a unique, Luhn-valid card number
+        card_number = allocate_card_number(card_type)
         
         # Generate expiry date (3 years from now)
         expiry_date = date.today() + relativedelta(years=3)
@@ -1110,14 +1232,13 @@ class VirtualCardViewSet(viewsets.ModelViewSet):
         """Get card transaction history"""
         card = self.get_object()
         # Get transactions related to this card (simplified)
-        transactions = Transaction.objects.filter(
+        transactions = TransactionProjection.project(Transaction.objects.filter(
             user=request.user,
             transaction_type='payment',
             description__icontains='Card payment'
-        ).order_by('-created_at')[:20]
+        ).order_by('-created_at'))[:20]
         
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        return Response(TransactionProjection.serialize(transactions))
 
 
 # ====== WEBHOOK VIEWSETS ======
@@ -1189,12 +1310,38 @@ class WebhookEndpointViewSet(viewsets.ModelViewSet):
     def deliveries(self, request, pk=None):
         """Get delivery history for this endpoint"""
         endpoint = self.get_object()
-        deliveries = WebhookDelivery.objects.filter(
+        deliveries = WebhookDeliveryProjection.project(WebhookDelivery.objects.filter(
             webhook_endpoint=endpoint
-        ).order_by('-attempted_at')[:100]
+        ).order_by('-attempted_at'))[:100]
         
-        serializer = WebhookDeliverySerializer(deliveries, many=True)
-        return Response(serializer.data)
+        return Response(WebhookDeliveryProjection.serialize(deliveries))
+    
+    @action(detail=True, methods=['get'])
+    def circuit(self, request, pk=None):
+        """Get circuit breaker state for this endpoint"""
+        from .circuit_breaker import CircuitBreaker
+        
+        endpoint = self.get_object()
+        data = CircuitBreaker(endpoint).get_stats()
+        data['parked_deliveries'] = WebhookDelivery.objects.filter(
+            webhook_endpoint=endpoint,
+            status='parked'
+        ).count()
+        
+        return Response(data)
+    
+    @action(detail=True, methods=['post'])
+    def reset_circuit(self, request, pk=None):
+        """Close the circuit breaker and clear its statistics"""
+        from .circuit_breaker import CircuitBreaker
+        
+        endpoint = self.get_object()
+        CircuitBreaker(endpoint).reset()
+        
+        return Response({
+            'message': 'Circuit breaker reset successfully',
+            'circuit_state': endpoint.circuit_state
+        })
     
     @action(detail=True, methods=['post'])
     def regenerate_secret(self, request, pk=None):
@@ -1210,7 +1357,7 @@ class WebhookEndpointViewSet(viewsets.ModelViewSet):
         })
 
 
-class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
+class WebhookEventViewSet(SparseFieldsetMixin, viewsets.ReadOnlyModelViewSet):
     """Webhook event monitoring"""
     serializer_class = WebhookEventSerializer
     permission_classes = [IsAuthenticated]
@@ -1226,18 +1373,16 @@ class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
             event_ids = serializer.validated_data['event_ids']
             delay_seconds = serializer.validated_data['delay_seconds']
             
-            events = WebhookEvent.objects.filter(
+            # Single UPDATE instead of saving each event
+            count = WebhookEvent.objects.filter(
                 id__in=event_ids,
                 user=request.user,
                 status='failed'
+            ).update(
+                status='pending',
+                next_retry_at=timezone.now() + timedelta(seconds=delay_seconds)
             )
             
-            count = 0
-            for event in events:
-                event.status = 'pending'
-                event.schedule_retry(delay_seconds)
-                count += 1
-            
             return Response({
                 'message': f'{count} events scheduled for retry',
                 'retried_events': count
@@ -1259,32 +1404,10 @@ class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
         if request.query_params.get('end_date'):
             end_date = datetime.strptime(request.query_params['end_date'], '%Y-%m-%d')
         
-        events = WebhookEvent.objects.filter(
-            user=user,
-            created_at__gte=start_date,
-            created_at__lte=end_date
-        )
-        
-        total_events = events.count()
-        pending_events = events.filter(status='pending').count()
-        failed_events = events.filter(status='failed').count()
-        completed_events = events.filter(status='completed').count()
-        
-        # Event type breakdown
-        event_types = {}
-        for event in events:
-            event_type = event.event_type
-            if event_type not in event_types:
-                event_types[event_type] = 0
-            event_types[event_type] += 1
+        stats = WebhookStatsService.get_event_stats(user, start_date, end_date)
         
         return Response({
-            'total_events': total_events,
-            'pending_events': pending_events,
-            'failed_events': failed_events,
-            'completed_events': completed_events,
-            'success_rate': (completed_events / total_events * 100) if total_events > 0 else 0,
-            'event_types': event_types,
+            **stats,
             'date_range': {
                 'start': start_date.isoformat(),
                 'end': end_date.isoformat()
@@ -1292,10 +1415,15 @@ class WebhookEventViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
-class WebhookDeliveryViewSet(viewsets.ReadOnlyModelViewSet):
+class WebhookDeliveryViewSet(SparseFieldsetMixin, ProjectionListMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """Webhook delivery monitoring"""
     serializer_class = WebhookDeliverySerializer
+    projection_class = WebhookDeliveryProjection
     permission_classes = [IsAuthenticated]
+    query_plans = {
+        'list': None,
+        '*': QueryPlan(select_related=['webhook_endpoint', 'webhook_event']),
+    }
     
     def get_queryset(self):
         return WebhookDelivery.objects.filter(
@@ -1307,59 +1435,56 @@ class WebhookDeliveryViewSet(viewsets.ReadOnlyModelViewSet):
         """Get delivery statistics"""
         user = request.user
         
-        deliveries = WebhookDelivery.objects.filter(
-            webhook_endpoint__user=user
-        )
-        
-        total_deliveries = deliveries.count()
-        successful_deliveries = deliveries.filter(status='success').count()
-        failed_deliveries = deliveries.filter(status='failed').count()
-        
-        # Average response time
-        avg_response_time = deliveries.filter(
-            response_time_ms__isnull=False
-        ).aggregate(avg_time=models.Avg('response_time_ms'))['avg_time'] or 0
-        
-        # Success rate by endpoint
-        endpoint_stats = {}
-        for delivery in deliveries.select_related('webhook_endpoint'):
-            endpoint_name = delivery.webhook_endpoint.name
-            if endpoint_name not in endpoint_stats:
-                endpoint_stats[endpoint_name] = {'total': 0, 'successful': 0}
-            
-            endpoint_stats[endpoint_name]['total'] += 1
-            if delivery.is_successful:
-                endpoint_stats[endpoint_name]['successful'] += 1
-        
-        # Calculate success rates
-        for name, stats in endpoint_stats.items():
-            stats['success_rate'] = (stats['successful'] / stats['total'] * 100) if stats['total'] > 0 else 0
+        data = WebhookStatsService.get_delivery_stats(user)
         
-        # Get additional required stats for the serializer
-        endpoints = WebhookEndpoint.objects.filter(user=user)
-        total_endpoints = endpoints.count()
-        active_endpoints = endpoints.filter(is_active=True).count()
+        serializer = WebhookStatsSerializer(data)
+        return Response(serializer.data)
+
+
+class WebhookReplayJobViewSet(viewsets.ModelViewSet):
+    """Replay historical webhook events to an endpoint"""
+    permission_classes = [IsAuthenticated]
+    http_method_names = ['get', 'post', 'head', 'options']
+    
+    def get_queryset(self):
+        return WebhookReplayJob.objects.filter(
+            user=self.request.user
+        ).select_related('webhook_endpoint').annotate(
+            delivered_events=Count('events', filter=Q(events__status='completed')),
+            failed_events=Count('events', filter=Q(events__status='failed')),
+            pending_events=Count('events', filter=Q(events__status__in=['pending', 'processing']))
+        ).order_by('-created_at')
+    
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return WebhookReplayJobCreateSerializer
+        return WebhookReplayJobSerializer
+    
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save()
         
-        events = WebhookEvent.objects.filter(user=user)
-        total_events = events.count()
-        pending_events = events.filter(status='pending').count()
-        failed_events = events.filter(status='failed').count()
+        job = self.get_queryset().get(pk=job.pk)
+        return Response(WebhookReplayJobSerializer(job).data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        """Stop scheduling further events for a replay job"""
+        job = self.get_object()
         
-        data = {
-            'total_endpoints': total_endpoints,
-            'active_endpoints': active_endpoints,
-            'total_events': total_events,
-            'pending_events': pending_events,
-            'failed_events': failed_events,
-            'total_deliveries': total_deliveries,
-            'successful_deliveries': successful_deliveries,
-            'failed_deliveries': failed_deliveries,
-            'success_rate': (successful_deliveries / total_deliveries * 100) if total_deliveries > 0 else 0,
-            'average_response_time': round(avg_response_time, 2),
-        }
+        if job.status not in ('pending', 'running'):
+            return Response(
+                {'error': f'Cannot cancel a {job.status} replay job'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        serializer = WebhookStatsSerializer(data)
-        return Response(serializer.data)
+        WebhookReplayJob.objects.filter(pk=job.pk).update(
+            status='cancelled',
+            completed_at=timezone.now()
+        )
+        job.refresh_from_db()
+        return Response(WebhookReplayJobSerializer(job).data)
 
 
 class WebhookTemplateViewSet(viewsets.ModelViewSet):
@@ -1405,10 +1530,11 @@ class WebhookTemplateViewSet(viewsets.ModelViewSet):
             )
 
 
-class WebhookLogViewSet(viewsets.ReadOnlyModelViewSet):
+class WebhookLogViewSet(SparseFieldsetMixin, QueryPlanMixin, viewsets.ReadOnlyModelViewSet):
     """Webhook log monitoring"""
     serializer_class = WebhookLogSerializer
     permission_classes = [IsAuthenticated]
+    query_plans = {'*': QueryPlan(select_related=['webhook_endpoint', 'webhook_event'])}
     
     def get_queryset(self):
         return WebhookLog.objects.filter(
@@ -1420,11 +1546,12 @@ class WebhookLogViewSet(viewsets.ReadOnlyModelViewSet):
         """Clear logs older than specified days"""
         days = int(request.query_params.get('days', 30))
         
-        cutoff_date = timezone.now() - timedelta(days=days)
-        deleted_count = WebhookLog.objects.filter(
-            webhook_endpoint__user=request.user,
-            created_at__lt=cutoff_date
-        ).delete()[0]
+        # Bounded chunked delete; the purge_webhook_data command handles the rest
+        deleted_count = WebhookRetentionService.purge_logs(
+            older_than_days=days,
+            max_chunks=10,
+            queryset=WebhookLog.objects.filter(webhook_endpoint__user=request.user)
+        )
         
         return Response({
             'message': f'Deleted {deleted_count} log entries older than {days} days'
@@ -11,20 +11,31 @@ import time
 import hmac
 import hashlib
 import logging
+import uuid
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, Tuple
 from django.utils import timezone
 from django.conf import settings
 from django.core.cache import cache
+from django.db.models import F, Count, Min, Q
 
 from .models import (
     WebhookEndpoint, WebhookEvent, WebhookDelivery, 
     WebhookSignature, WebhookTemplate, WebhookLog
 )
+from .circuit_breaker import CircuitBreaker
+from .webhook_stats import WebhookStatsService
+from .webhook_retention import WebhookRetentionService
 
 logger = logging.getLogger(__name__)
 
 
+def claimable_batch_deliveries() -> Q:
+    """Queued batch deliveries, and those claimed by a sender that never finished"""
+    claim_expired = timezone.now() - timedelta(seconds=getattr(settings, 'WEBHOOK_BATCH_CLAIM_SECONDS', 300))
+    return Q(status='queued') | Q(status='sending', claimed_at__lt=claim_expired)
+
+
 class WebhookDeliveryService:
     """
     Enhanced webhook delivery service with email notifications
@@ -36,17 +47,31 @@ class WebhookDeliveryService:
             'User-Agent': 'PrimeTrust-Webhook/1.0'
         })
     
-    def deliver_webhook(self, endpoint: WebhookEndpoint, event: WebhookEvent) -> Tuple[bool, Dict[str, Any]]:
+    def deliver_webhook(self, endpoint: WebhookEndpoint, event: WebhookEvent,
+                        delivery: Optional[WebhookDelivery] = None) -> Tuple[bool, Dict[str, Any]]:
         """
         Deliver webhook to endpoint and optionally send email notification
+        
+        If the endpoint's circuit breaker rejects the attempt, the delivery is
+        parked instead of paying the request timeout. Parked deliveries are
+        passed back in via ``delivery`` once the circuit allows traffic again.
         """
-        # Create delivery record
-        delivery = WebhookDelivery.objects.create(
-            webhook_endpoint=endpoint,
-            webhook_event=event,
-            status='pending',
-            started_at=timezone.now()
-        )
+        breaker = CircuitBreaker(endpoint)
+        if not breaker.allow_request():
+            return self._park_delivery(endpoint, event, delivery, breaker)
+        
+        # Create delivery record, or reuse a parked one
+        if delivery is None:
+            delivery = WebhookDelivery.objects.create(
+                webhook_endpoint=endpoint,
+                webhook_event=event,
+                status='pending',
+                attempt_number=event.delivery_attempts + 1,
+                is_retry=event.delivery_attempts > 0
+            )
+        else:
+            delivery.status = 'pending'
+            delivery.attempt_number = event.delivery_attempts + 1
         
         # Update event delivery attempts
         event.delivery_attempts += 1
@@ -64,42 +89,43 @@ class WebhookDeliveryService:
             
             # Update delivery record
             delivery.status = 'success' if response.status_code < 400 else 'error'
-            delivery.response_code = response.status_code
+            delivery.http_status_code = response.status_code
             delivery.response_body = response.text[:10000]  # Limit size
             delivery.response_time_ms = int(response_time * 1000)
             delivery.completed_at = timezone.now()
             delivery.save()
+            WebhookStatsService.invalidate(endpoint.user_id)
+            
+            if response.status_code >= 400:
+                # Handle as failure for retry logic
+                breaker.record_failure(int(response_time * 1000))
+                return self._handle_delivery_failure(
+                    endpoint, event, delivery,
+                    f"HTTP {response.status_code}: {response.text[:200]}",
+                    response_time
+                )
+            
+            breaker.record_success(int(response_time * 1000))
             
             # Update endpoint statistics
             endpoint.total_deliveries += 1
-            if response.status_code >= 400:
-                endpoint.failed_deliveries += 1
-            endpoint.last_delivery_at = timezone.now()
+            endpoint.successful_deliveries += 1
+            endpoint.last_used_at = timezone.now()
             endpoint.save()
             
             # Log the delivery
-            level = 'info' if response.status_code < 400 else 'warning'
             self._log_webhook_event(
-                endpoint, event, delivery, level,
+                endpoint, event, delivery, 'info',
                 f"Webhook delivered with status {response.status_code}"
             )
             
-            # Send email notification if enabled and webhook was successful
-            if response.status_code < 400 and endpoint.email_notifications_enabled:
+            # Send email notification if enabled
+            if endpoint.email_notifications_enabled:
                 self._send_email_notification(endpoint, event)
             
-            # Mark event as completed if successful
-            if response.status_code < 400:
-                event.status = 'completed'
-                event.processed_at = timezone.now()
-            else:
-                # Handle as failure for retry logic
-                return self._handle_delivery_failure(
-                    endpoint, event, delivery,
-                    f"HTTP {response.status_code}: {response.text[:200]}",
-                    response_time
-                )
-            
+            # Mark event as completed
+            event.status = 'completed'
+            event.processed_at = timezone.now()
             event.save()
             
             return True, {
@@ -111,33 +137,61 @@ class WebhookDeliveryService:
             }
             
         except requests.exceptions.Timeout:
+            breaker.record_failure(int((time.time() - start_time) * 1000))
             return self._handle_delivery_failure(
-                endpoint, event, delivery if 'delivery' in locals() else None,
+                endpoint, event, delivery,
                 "Request timeout", time.time() - start_time
             )
             
         except requests.exceptions.ConnectionError:
+            breaker.record_failure(int((time.time() - start_time) * 1000))
             return self._handle_delivery_failure(
-                endpoint, event, delivery if 'delivery' in locals() else None,
+                endpoint, event, delivery,
                 "Connection error", time.time() - start_time
             )
             
         except Exception as e:
+            breaker.record_failure(int((time.time() - start_time) * 1000))
             return self._handle_delivery_failure(
-                endpoint, event, delivery if 'delivery' in locals() else None,
+                endpoint, event, delivery,
                 f"Unexpected error: {str(e)}", time.time() - start_time
             )
     
+    def _park_delivery(self, endpoint: WebhookEndpoint, event: WebhookEvent,
+                       delivery: Optional[WebhookDelivery], breaker: CircuitBreaker) -> Tuple[bool, Dict[str, Any]]:
+        """Park a delivery while the endpoint's circuit is not accepting traffic"""
+        if delivery is None:
+            delivery = WebhookDelivery.objects.create(
+                webhook_endpoint=endpoint,
+                webhook_event=event,
+                status='parked',
+                attempt_number=event.delivery_attempts + 1,
+                is_retry=event.delivery_attempts > 0
+            )
+        
+        logger.info(f"Webhook {event.event_type} to {endpoint.name} parked (circuit {breaker.state})")
+        
+        return False, {
+            'parked': True,
+            'circuit_state': breaker.state,
+            'will_retry': True,
+            'delivery_id': str(delivery.id)
+        }
+    
     def _prepare_payload(self, endpoint: WebhookEndpoint, event: WebhookEvent) -> Dict[str, Any]:
         """Prepare the payload for webhook delivery"""
         
         # Try to use template if available
-        try:
-            template = WebhookTemplate.objects.get(
-                event_type=event.event_type,
-                is_active=True
-            )
-            
+        template = WebhookTemplate.objects.filter(
+            event_type=event.event_type,
+            is_active=True
+        ).first()
+        
+        return self._build_payload(event, template)
+    
+    def _build_payload(self, event: WebhookEvent, template: Optional[WebhookTemplate]) -> Dict[str, Any]:
+        """Build the event payload, rendering the template when one is given"""
+        if template:
             context_data = {
                 'event_id': str(event.id),
                 'event_type': event.event_type,
@@ -147,21 +201,275 @@ class WebhookDeliveryService:
             }
             
             return template.render_payload(context_data)
-            
-        except WebhookTemplate.DoesNotExist:
-            # Use default payload structure
-            return {
-                'event': {
-                    'id': str(event.id),
-                    'type': event.event_type,
-                    'created': event.created_at.isoformat(),
-                    'data': event.payload
-                },
-                'user': {
-                    'id': event.user.id if event.user else None,
-                    'email': event.user.email if event.user else None
-                } if event.user else None
+        
+        # Use default payload structure
+        return {
+            'event': {
+                'id': str(event.id),
+                'type': event.event_type,
+                'created': event.created_at.isoformat(),
+                'data': event.payload
+            },
+            'user': {
+                'id': event.user.id if event.user else None,
+                'email': event.user.email if event.user else None
+            } if event.user else None
+        }
+    
+    def enqueue_for_batch(self, endpoint: WebhookEndpoint, event: WebhookEvent) -> WebhookDelivery:
+        """
+        Queue an event for a batch-mode endpoint
+        
+        The batch is sent straight away once it is full; otherwise it is
+        flushed by WebhookProcessor.flush_batches after batch_linger_ms.
+        """
+        delivery = WebhookDelivery.objects.create(
+            webhook_endpoint=endpoint,
+            webhook_event=event,
+            status='queued',
+            attempt_number=event.delivery_attempts + 1,
+            is_retry=event.delivery_attempts > 0
+        )
+        
+        queued_count = WebhookDelivery.objects.filter(
+            webhook_endpoint=endpoint,
+            status='queued'
+        ).count()
+        
+        if queued_count >= endpoint.batch_max_events:
+            self.deliver_batch(endpoint)
+        
+        return delivery
+    
+    def deliver_batch(self, endpoint: WebhookEndpoint) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Send the oldest queued events for an endpoint as a single signed JSON array
+        
+        The receiver may acknowledge events individually by responding with
+        ``{"results": [{"id": "<event id>", "accepted": false, "error": "..."}]}``.
+        Events not listed in a 2xx response are treated as accepted; a non-2xx
+        response fails every event in the batch. One WebhookDelivery is kept
+        per event either way.
+        
+        Deliveries are claimed (status 'sending') with a conditional UPDATE
+        before the payload is built, so concurrent callers (a request thread
+        filling the batch and flush_batches) never send the same events. The
+        circuit breaker is consulted only once the claim is won.
+        """
+        claimable = claimable_batch_deliveries()
+        candidate_ids = list(
+            WebhookDelivery.objects.filter(claimable, webhook_endpoint=endpoint)
+            .order_by('attempted_at').values_list('id', flat=True)[:endpoint.batch_max_events]
+        )
+        
+        if not candidate_ids:
+            return True, {'delivered': 0}
+        
+        # The claim time identifies the rows this caller won
+        claimed_at = timezone.now()
+        WebhookDelivery.objects.filter(claimable, id__in=candidate_ids).update(status='sending', claimed_at=claimed_at)
+        queued = list(
+            WebhookDelivery.objects.filter(id__in=candidate_ids, status='sending', claimed_at=claimed_at)
+            .select_related('webhook_event', 'webhook_event__user').order_by('attempted_at')
+        )
+        if not queued:
+            # Claimed by a concurrent sender
+            return True, {'delivered': 0}
+        
+        # Only a caller that won rows takes a breaker slot (or the half-open
+        # probe), so losing the claim race can never leak one
+        breaker = CircuitBreaker(endpoint)
+        if not breaker.allow_request():
+            # Deliveries go back to the queue until the circuit lets traffic through
+            WebhookDelivery.objects.filter(id__in=[delivery.id for delivery in queued]).update(
+                status='queued', claimed_at=None
+            )
+            return False, {
+                'parked': True,
+                'circuit_state': breaker.state,
+                'delivered': 0
+            }
+        
+        # Load templates once for the whole batch
+        event_types = {delivery.webhook_event.event_type for delivery in queued}
+        templates = {
+            template.event_type: template
+            for template in WebhookTemplate.objects.filter(event_type__in=event_types, is_active=True)
+        }
+        
+        # Fill the batch up to the byte limit (always at least one event)
+        batch = []
+        batch_size = 2  # Enclosing brackets
+        for delivery in queued:
+            event = delivery.webhook_event
+            item = {
+                'id': str(event.id),
+                'type': event.event_type,
+                'attempt': event.delivery_attempts + 1,
+                'data': self._build_payload(event, templates.get(event.event_type))
             }
+            item_size = len(json.dumps(item, separators=(',', ':'), default=str)) + 1
+            if batch and batch_size + item_size > endpoint.batch_max_bytes:
+                break
+            batch.append((delivery, item))
+            batch_size += item_size
+        
+        # Events that did not fit go back to the queue for the next batch
+        unsent = [delivery.id for delivery in queued[len(batch):]]
+        if unsent:
+            WebhookDelivery.objects.filter(id__in=unsent).update(status='queued', claimed_at=None)
+        
+        payload = [item for _, item in batch]
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'PrimeTrust-Webhook/1.0',
+            'X-Webhook-Batch-ID': str(uuid.uuid4()),
+            'X-Webhook-Batch-Size': str(len(payload)),
+            'X-Webhook-Timestamp': str(int(timezone.now().timestamp()))
+        }
+        if endpoint.secret:
+            headers['X-Webhook-Signature'] = self._generate_signature(endpoint, payload)
+        
+        start_time = time.time()
+        
+        try:
+            response = self._make_request(endpoint, payload, headers)
+            response_time_ms = int((time.time() - start_time) * 1000)
+            
+            if response.status_code < 400:
+                breaker.record_success(response_time_ms)
+                acks = self._parse_batch_acks(response)
+                error_message = ''
+            else:
+                breaker.record_failure(response_time_ms)
+                acks = {}
+                error_message = f"HTTP {response.status_code}: {response.text[:200]}"
+            
+            return self._complete_batch(
+                endpoint, batch, acks,
+                status_code=response.status_code,
+                response_body=response.text[:10000],
+                response_time_ms=response_time_ms,
+                error_message=error_message
+            )
+            
+        except requests.exceptions.Timeout:
+            error_message = "Request timeout"
+        except requests.exceptions.ConnectionError:
+            error_message = "Connection error"
+        except Exception as e:
+            error_message = f"Unexpected error: {str(e)}"
+        
+        response_time_ms = int((time.time() - start_time) * 1000)
+        breaker.record_failure(response_time_ms)
+        return self._complete_batch(
+            endpoint, batch, {},
+            status_code=None,
+            response_body='',
+            response_time_ms=response_time_ms,
+            error_message=error_message
+        )
+    
+    def _parse_batch_acks(self, response: requests.Response) -> Dict[str, Tuple[bool, str]]:
+        """Map event id to (accepted, error) from a batch response body"""
+        try:
+            body = response.json()
+        except ValueError:
+            return {}
+        
+        acks = {}
+        if isinstance(body, dict) and isinstance(body.get('results'), list):
+            for result in body['results']:
+                if isinstance(result, dict) and result.get('id'):
+                    acks[str(result['id'])] = (bool(result.get('accepted', True)), str(result.get('error', '')))
+        return acks
+    
+    def _complete_batch(self, endpoint: WebhookEndpoint, batch, acks: Dict[str, Tuple[bool, str]],
+                        status_code: Optional[int], response_body: str, response_time_ms: int,
+                        error_message: str) -> Tuple[bool, Dict[str, Any]]:
+        """Record per-event outcomes of a batch with bulk updates"""
+        now = timezone.now()
+        request_failed = status_code is None or status_code >= 400
+        
+        deliveries = []
+        events = []
+        successful = 0
+        for delivery, item in batch:
+            event = delivery.webhook_event
+            accepted, ack_error = acks.get(item['id'], (True, ''))
+            accepted = accepted and not request_failed
+            
+            event.delivery_attempts += 1
+            delivery.http_status_code = status_code
+            delivery.response_body = response_body
+            delivery.response_time_ms = response_time_ms
+            delivery.completed_at = now
+            delivery.request_body = item
+            
+            if accepted:
+                successful += 1
+                delivery.status = 'success'
+                event.status = 'completed'
+                event.processed_at = now
+            else:
+                delivery.status = 'error'
+                delivery.error_message = error_message or ack_error or 'Rejected by receiver'
+                if event.delivery_attempts < endpoint.max_retries:
+                    event.status = 'pending'
+                    event.next_retry_at = now + timedelta(seconds=endpoint.retry_delay_seconds)
+                else:
+                    event.status = 'failed'
+                    event.processed_at = now
+            
+            deliveries.append(delivery)
+            events.append(event)
+        
+        WebhookDelivery.objects.bulk_update(
+            deliveries,
+            ['status', 'http_status_code', 'response_body', 'error_message',
+             'response_time_ms', 'completed_at', 'request_body']
+        )
+        WebhookEvent.objects.bulk_update(
+            events,
+            ['status', 'delivery_attempts', 'next_retry_at', 'processed_at']
+        )
+        WebhookStatsService.invalidate(endpoint.user_id)
+        
+        failed = len(batch) - successful
+        WebhookEndpoint.objects.filter(pk=endpoint.pk).update(
+            total_deliveries=F('total_deliveries') + len(batch),
+            successful_deliveries=F('successful_deliveries') + successful,
+            failed_deliveries=F('failed_deliveries') + failed,
+            last_used_at=now
+        )
+        
+        level = 'info' if failed == 0 else ('error' if successful == 0 else 'warning')
+        if WebhookRetentionService.should_write_log(level):
+            WebhookLog.objects.create(
+                webhook_endpoint=endpoint,
+                level=level,
+                message=f"Webhook batch of {len(batch)} events delivered: {successful} accepted, {failed} failed",
+                details={
+                    'batch_size': len(batch),
+                    'accepted': successful,
+                    'failed': failed,
+                    'http_status_code': status_code,
+                    'error': error_message,
+                    'endpoint_url': endpoint.url
+                }
+            )
+        getattr(logger, level, logger.info)(
+            f"Webhook batch to {endpoint.name}: {successful}/{len(batch)} events accepted"
+        )
+        
+        return failed == 0, {
+            'delivered': len(batch),
+            'accepted': successful,
+            'failed': failed,
+            'status_code': status_code,
+            'response_time_ms': response_time_ms,
+            'error': error_message or None
+        }
     
     def _prepare_headers(self, endpoint: WebhookEndpoint, event: WebhookEvent, payload: Dict[str, Any]) -> Dict[str, str]:
         """Prepare headers for webhook request"""
@@ -228,6 +536,7 @@ class WebhookDeliveryService:
             delivery.response_time_ms = response_time_ms
             delivery.completed_at = timezone.now()
             delivery.save()
+            WebhookStatsService.invalidate(endpoint.user_id)
         
         # Update endpoint statistics
         endpoint.total_deliveries += 1
@@ -275,19 +584,20 @@ class WebhookDeliveryService:
                           delivery: Optional[WebhookDelivery], level: str, message: str):
         """Log webhook event for debugging and monitoring"""
         
-        WebhookLog.objects.create(
-            webhook_endpoint=endpoint,
-            webhook_event=event,
-            webhook_delivery=delivery,
-            level=level,
-            message=message,
-            details={
-                'event_type': event.event_type,
-                'attempt_number': event.delivery_attempts,
-                'endpoint_url': endpoint.url,
-                'user_id': event.user.id if event.user else None
-            }
-        )
+        if WebhookRetentionService.should_write_log(level):
+            WebhookLog.objects.create(
+                webhook_endpoint=endpoint,
+                webhook_event=event,
+                webhook_delivery=delivery,
+                level=level,
+                message=message,
+                details={
+                    'event_type': event.event_type,
+                    'attempt_number': event.delivery_attempts,
+                    'endpoint_url': endpoint.url,
+                    'user_id': event.user.id if event.user else None
+                }
+            )
         
         # Also log to Django logger
         getattr(logger, level, logger.info)(
@@ -519,12 +829,89 @@ class WebhookProcessor:
         pending_events = WebhookEvent.objects.filter(
             status='pending',
             next_retry_at__lte=timezone.now()
-        ).order_by('created_at')
+        ).order_by('next_retry_at', 'created_at')
         
         delivery_service = WebhookDeliveryService()
         
         for event in pending_events[:100]:  # Process in batches
             WebhookProcessor.process_event(event, delivery_service)
+        
+        WebhookProcessor.process_parked_deliveries(delivery_service)
+        WebhookProcessor.flush_batches(delivery_service)
+    
+    @staticmethod
+    def flush_batches(delivery_service: Optional[WebhookDeliveryService] = None) -> int:
+        """
+        Send queued batches that are full or have waited longer than batch_linger_ms
+        
+        Returns the number of events delivered.
+        """
+        if not delivery_service:
+            delivery_service = WebhookDeliveryService()
+        
+        now = timezone.now()
+        queued = WebhookDelivery.objects.filter(
+            claimable_batch_deliveries()
+        ).values('webhook_endpoint_id').annotate(
+            queued_count=Count('id'),
+            oldest=Min('attempted_at')
+        ).order_by()
+        queued = {row['webhook_endpoint_id']: row for row in queued}
+        
+        delivered_count = 0
+        for endpoint in WebhookEndpoint.objects.filter(id__in=list(queued.keys()), is_active=True):
+            row = queued[endpoint.id]
+            lingered = row['oldest'] <= now - timedelta(milliseconds=endpoint.batch_linger_ms)
+            if not lingered and row['queued_count'] < endpoint.batch_max_events:
+                continue
+            
+            remaining = row['queued_count']
+            while remaining > 0:
+                success, result = delivery_service.deliver_batch(endpoint)
+                if result.get('parked') or not result.get('delivered'):
+                    break
+                delivered_count += result['delivered']
+                remaining -= result['delivered']
+        
+        if delivered_count:
+            logger.info(f"Delivered {delivered_count} batched webhook events")
+        return delivered_count
+    
+    @staticmethod
+    def process_parked_deliveries(delivery_service: Optional[WebhookDeliveryService] = None,
+                                  batch_size: int = 100) -> int:
+        """
+        Release deliveries parked by an endpoint's circuit breaker
+        
+        For an open circuit whose cooldown has elapsed, the first parked
+        delivery is sent as the half-open probe. Draining stops for an
+        endpoint as soon as its circuit rejects a delivery again.
+        """
+        if not delivery_service:
+            delivery_service = WebhookDeliveryService()
+        
+        endpoint_ids = WebhookDelivery.objects.filter(
+            status='parked'
+        ).values_list('webhook_endpoint_id', flat=True).distinct()
+        
+        released_count = 0
+        for endpoint in WebhookEndpoint.objects.filter(id__in=list(endpoint_ids), is_active=True):
+            parked = WebhookDelivery.objects.filter(
+                webhook_endpoint=endpoint,
+                status='parked'
+            ).select_related('webhook_event').order_by('attempted_at')[:batch_size]
+            
+            for delivery in parked:
+                success, result = delivery_service.deliver_webhook(
+                    endpoint, delivery.webhook_event, delivery=delivery
+                )
+                if result.get('parked'):
+                    break
+                released_count += 1
+        
+        if released_count:
+            logger.info(f"Released {released_count} parked webhook deliveries")
+        return released_count
     
     @staticmethod
     def process_event(event: WebhookEvent, delivery_service: Optional[WebhookDeliveryService] = None):
@@ -532,12 +919,19 @@ class WebhookProcessor:
         if not delivery_service:
             delivery_service = WebhookDeliveryService()
         
-        # Find all active endpoints subscribed to this event type
-        endpoints = WebhookEndpoint.objects.filter(
-            user=event.user,
-            is_active=True,
-            events__contains=[event.event_type]
-        )
+        # Find all active endpoints subscribed to this event type. Replayed
+        # events only go to the endpoint the replay job targets.
+        if event.replay_job_id:
+            endpoints = WebhookEndpoint.objects.filter(
+                replay_jobs__id=event.replay_job_id,
+                is_active=True
+            )
+        else:
+            endpoints = WebhookEndpoint.objects.filter(
+                user=event.user,
+                is_active=True,
+                events__contains=[event.event_type]
+            )
         
         if not endpoints.exists():
             event.status = 'completed'
@@ -549,7 +943,10 @@ class WebhookProcessor:
         delivery_count = 0
         for endpoint in endpoints:
             try:
-                delivery_service.deliver_webhook(endpoint, event)
+                if endpoint.batch_enabled:
+                    delivery_service.enqueue_for_batch(endpoint, event)
+                else:
+                    delivery_service.deliver_webhook(endpoint, event)
                 delivery_count += 1
             except Exception as e:
                 logger.error(f"Failed to deliver webhook {event.id} to {endpoint.name}: {e}")
@@ -583,7 +980,7 @@ class WebhookProcessor:
         pending_events = WebhookEvent.objects.filter(
             status='pending',
             next_retry_at__lte=timezone.now()
-        ).order_by('created_at')
+        ).order_by('next_retry_at', 'created_at')
         
         delivery_service = WebhookDeliveryService()
         processed_count = 0
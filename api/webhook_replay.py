@@ -0,0 +1,141 @@
+"""
+Webhook Replay Service for PrimeTrust Banking API
+
+This module reschedules historical webhook events for delivery to a single
+endpoint, e.g. after a subscriber recovers from an outage. Events are
+rescheduled with one bulk UPDATE per chunk and released to the delivery
+workers at the job's rate limit, so large replays neither hold long row
+locks nor crowd out normal webhook traffic.
+"""
+
+import logging
+from datetime import timedelta
+from typing import Optional
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import WebhookEvent, WebhookReplayJob
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookReplayService:
+    """
+    Service for selecting and rescheduling events of a replay job
+    """
+
+    @staticmethod
+    def get_events(job: WebhookReplayJob):
+        """
+        Events selected by the job's endpoint, time window and statuses
+
+        Events whose delivery has not finished (pending or processing and not
+        yet processed, including events of another running replay) are never
+        selected: stamping them with this job would take them away from the
+        other endpoints they are still due to.
+        """
+        events = WebhookEvent.objects.filter(
+            user=job.user,
+            event_type__in=job.webhook_endpoint.events,
+            created_at__gte=job.start_time,
+            created_at__lte=job.end_time
+        ).exclude(status__in=['pending', 'processing'], processed_at__isnull=True)
+
+        if job.event_statuses:
+            events = events.filter(status__in=job.event_statuses)
+
+        return events
+
+    @staticmethod
+    def run_job(job: WebhookReplayJob, max_chunks: Optional[int] = None) -> int:
+        """
+        Reschedule the job's events chunk by chunk
+
+        Scheduling resumes from the job's keyset cursor, so a job can be run
+        in several passes. Each chunk is due ``len(chunk) / rate_limit_per_second``
+        seconds after the previous one, or immediately if that time has already
+        passed, so a job resumed after a gap is paced from now instead of
+        releasing the backlog at once. Returns the number of events rescheduled.
+        """
+        if job.status not in ('pending', 'running'):
+            return 0
+
+        if job.status == 'pending':
+            job.status = 'running'
+            job.started_at = timezone.now()
+            job.total_events = WebhookReplayService.get_events(job).count()
+            job.save(update_fields=['status', 'started_at', 'total_events'])
+
+        scheduled_count = 0
+        chunks = 0
+
+        try:
+            while max_chunks is None or chunks < max_chunks:
+                # Stop promptly if the job was cancelled from the API
+                job.refresh_from_db(fields=['status'])
+                if job.status != 'running':
+                    break
+
+                events = WebhookReplayService.get_events(job).order_by('created_at', 'id')
+                if job.cursor_created_at:
+                    events = events.filter(
+                        Q(created_at__gt=job.cursor_created_at) |
+                        Q(created_at=job.cursor_created_at, id__gt=job.cursor_event_id)
+                    )
+
+                chunk = list(events.values_list('id', 'created_at')[:job.chunk_size])
+                if not chunk:
+                    job.status = 'completed'
+                    job.completed_at = timezone.now()
+                    job.save(update_fields=['status', 'completed_at'])
+                    logger.info(f"Webhook replay {job.id} scheduled {job.scheduled_events} events")
+                    break
+
+                now = timezone.now()
+                due_at = max(now, job.next_due_at) if job.next_due_at else now
+
+                with transaction.atomic():
+                    WebhookEvent.objects.filter(
+                        id__in=[event_id for event_id, _ in chunk]
+                    ).update(
+                        status='pending',
+                        next_retry_at=due_at,
+                        delivery_attempts=0,
+                        processed_at=None,
+                        replay_job=job
+                    )
+
+                    job.scheduled_events += len(chunk)
+                    job.cursor_event_id, job.cursor_created_at = chunk[-1]
+                    job.next_due_at = due_at + timedelta(
+                        seconds=len(chunk) / job.rate_limit_per_second
+                    )
+                    job.save(update_fields=[
+                        'scheduled_events', 'cursor_event_id', 'cursor_created_at', 'next_due_at'
+                    ])
+
+                scheduled_count += len(chunk)
+                chunks += 1
+
+        except Exception as e:
+            logger.error(f"Webhook replay {job.id} failed: {str(e)}")
+            job.status = 'failed'
+            job.error_message = str(e)
+            job.save(update_fields=['status', 'error_message'])
+
+        return scheduled_count
+
+    @staticmethod
+    def run_pending_jobs(max_chunks_per_job: Optional[int] = None) -> int:
+        """Advance every pending or running replay job"""
+        scheduled_count = 0
+
+        jobs = WebhookReplayJob.objects.filter(
+            status__in=['pending', 'running']
+        ).select_related('webhook_endpoint', 'user').order_by('created_at')
+
+        for job in jobs:
+            scheduled_count += WebhookReplayService.run_job(job, max_chunks=max_chunks_per_job)
+
+        return scheduled_count
@@ -0,0 +1,133 @@
+"""
+Webhook Retention for PrimeTrust Banking API
+
+This module keeps the high-churn webhook tables bounded:
+- Chunked deletion of old WebhookLog rows
+- Old WebhookDelivery rows rolled up into daily WebhookDeliverySummary rows, then deleted
+- Log sink policy that keeps errors and a sample of successful deliveries
+"""
+
+import random
+import logging
+from datetime import timedelta
+from typing import Optional
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import WebhookDelivery, WebhookDeliverySummary, WebhookLog
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookRetentionService:
+    """
+    Retention and log sink policy for webhook storage
+    """
+
+    @staticmethod
+    def should_write_log(level: str) -> bool:
+        """
+        Apply WEBHOOK_LOG_SINK_MODE to a log entry
+
+        'all' writes every entry. 'errors' writes warnings and errors, plus
+        WEBHOOK_LOG_SUCCESS_SAMPLE_RATE of the remaining entries.
+        """
+        if getattr(settings, 'WEBHOOK_LOG_SINK_MODE', 'all') != 'errors':
+            return True
+        if level in ('error', 'warning'):
+            return True
+        return random.random() < getattr(settings, 'WEBHOOK_LOG_SUCCESS_SAMPLE_RATE', 0.01)
+
+    @staticmethod
+    def purge_logs(older_than_days: Optional[int] = None, chunk_size: Optional[int] = None,
+                   max_chunks: Optional[int] = None, queryset=None) -> int:
+        """
+        Delete logs older than the retention period in short transactions
+
+        Returns the number of log entries deleted.
+        """
+        if older_than_days is None:
+            older_than_days = getattr(settings, 'WEBHOOK_LOG_RETENTION_DAYS', 30)
+        chunk_size = chunk_size or getattr(settings, 'WEBHOOK_RETENTION_CHUNK_SIZE', 5000)
+
+        if queryset is None:
+            queryset = WebhookLog.objects.all()
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        old_logs = queryset.filter(created_at__lt=cutoff).order_by('created_at')
+
+        deleted_count = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            ids = list(old_logs.values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            deleted_count += WebhookLog.objects.filter(id__in=ids).delete()[0]
+            chunks += 1
+
+        if deleted_count:
+            logger.info(f"Purged {deleted_count} webhook log entries older than {older_than_days} days")
+        return deleted_count
+
+    @staticmethod
+    def summarize_deliveries(older_than_days: Optional[int] = None, chunk_size: Optional[int] = None,
+                             max_chunks: Optional[int] = None) -> int:
+        """
+        Roll old deliveries up into daily summaries and delete them
+
+        Each chunk is aggregated, merged into WebhookDeliverySummary and
+        deleted in one transaction, so an interrupted run never counts a
+        delivery twice. Returns the number of deliveries summarized.
+        """
+        if older_than_days is None:
+            older_than_days = getattr(settings, 'WEBHOOK_DELIVERY_RETENTION_DAYS', 90)
+        chunk_size = chunk_size or getattr(settings, 'WEBHOOK_RETENTION_CHUNK_SIZE', 5000)
+
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+        # Parked, queued and sending deliveries still have work to do
+        old_deliveries = WebhookDelivery.objects.filter(
+            attempted_at__lt=cutoff
+        ).exclude(status__in=['parked', 'queued', 'sending']).order_by('attempted_at')
+
+        summarized_count = 0
+        chunks = 0
+        while max_chunks is None or chunks < max_chunks:
+            with transaction.atomic():
+                ids = list(old_deliveries.values_list('id', flat=True)[:chunk_size])
+                if not ids:
+                    break
+
+                rows = WebhookDelivery.objects.filter(id__in=ids).annotate(
+                    date=TruncDate('attempted_at')
+                ).values('webhook_endpoint_id', 'date').annotate(
+                    total=Count('id'),
+                    successful=Count('id', filter=Q(status='success')),
+                    failed=Count('id', filter=Q(status__in=['failed', 'timeout', 'error'])),
+                    response_time_total=Sum('response_time_ms'),
+                    response_time_count=Count('response_time_ms')
+                ).order_by()
+
+                for row in rows:
+                    summary, _ = WebhookDeliverySummary.objects.get_or_create(
+                        webhook_endpoint_id=row['webhook_endpoint_id'],
+                        date=row['date']
+                    )
+                    WebhookDeliverySummary.objects.filter(pk=summary.pk).update(
+                        total_deliveries=F('total_deliveries') + row['total'],
+                        successful_deliveries=F('successful_deliveries') + row['successful'],
+                        failed_deliveries=F('failed_deliveries') + row['failed'],
+                        response_time_ms_total=F('response_time_ms_total') + (row['response_time_total'] or 0),
+                        response_time_count=F('response_time_count') + row['response_time_count'],
+                        updated_at=timezone.now()
+                    )
+
+                WebhookDelivery.objects.filter(id__in=ids).delete()
+
+            summarized_count += len(ids)
+            chunks += 1
+
+        if summarized_count:
+            logger.info(f"Summarized {summarized_count} webhook deliveries older than {older_than_days} days")
+        return summarized_count
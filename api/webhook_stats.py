@@ -0,0 +1,146 @@
+"""
+Webhook Statistics for PrimeTrust Banking API
+
+This module computes webhook statistics with grouped database aggregation:
+- Conditional counts per status in a single query
+- Per-endpoint and per-event-type breakdowns via GROUP BY
+- Cached per-user delivery snapshot, invalidated when a delivery completes
+- Deliveries removed by retention are included through their daily summaries
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Any
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Sum, Q
+
+from .models import WebhookEndpoint, WebhookEvent, WebhookDelivery, WebhookDeliverySummary
+
+logger = logging.getLogger(__name__)
+
+FAILED_DELIVERY_STATUSES = ['failed', 'timeout', 'error']
+
+
+class WebhookStatsService:
+    """
+    Aggregated webhook statistics
+    """
+
+    @staticmethod
+    def _cache_key(user_id) -> str:
+        return f'webhook_stats:{user_id}'
+
+    @staticmethod
+    def get_event_stats(user, start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """Event counts by status and type within a date range"""
+        events = WebhookEvent.objects.filter(
+            user=user,
+            created_at__gte=start_date,
+            created_at__lte=end_date
+        )
+
+        counts = events.aggregate(
+            total_events=Count('id'),
+            pending_events=Count('id', filter=Q(status='pending')),
+            failed_events=Count('id', filter=Q(status='failed')),
+            completed_events=Count('id', filter=Q(status='completed'))
+        )
+
+        event_types = dict(
+            events.values('event_type').annotate(count=Count('id')).order_by().values_list('event_type', 'count')
+        )
+
+        total_events = counts['total_events']
+        return {
+            **counts,
+            'success_rate': (counts['completed_events'] / total_events * 100) if total_events > 0 else 0,
+            'event_types': event_types,
+        }
+
+    @staticmethod
+    def get_delivery_stats(user) -> Dict[str, Any]:
+        """Return the cached delivery snapshot for a user, building it on a miss"""
+        cache_key = WebhookStatsService._cache_key(user.pk)
+        stats = cache.get(cache_key)
+        if stats is None:
+            stats = WebhookStatsService.build_delivery_stats(user)
+            cache.set(cache_key, stats, getattr(settings, 'WEBHOOK_STATS_CACHE_TIMEOUT', 300))
+        return stats
+
+    @staticmethod
+    def build_delivery_stats(user) -> Dict[str, Any]:
+        """Compute endpoint, event and delivery statistics for a user"""
+        endpoint_counts = WebhookEndpoint.objects.filter(user=user).aggregate(
+            total_endpoints=Count('id'),
+            active_endpoints=Count('id', filter=Q(is_active=True))
+        )
+
+        event_counts = WebhookEvent.objects.filter(user=user).aggregate(
+            total_events=Count('id'),
+            pending_events=Count('id', filter=Q(status='pending')),
+            failed_events=Count('id', filter=Q(status='failed'))
+        )
+
+        deliveries = WebhookDelivery.objects.filter(webhook_endpoint__user=user)
+        totals = deliveries.aggregate(
+            total=Count('id'),
+            successful=Count('id', filter=Q(status='success')),
+            failed=Count('id', filter=Q(status__in=FAILED_DELIVERY_STATUSES)),
+            response_time_total=Sum('response_time_ms'),
+            response_time_count=Count('response_time_ms')
+        )
+
+        # Deliveries already rolled up by the retention job
+        summaries = WebhookDeliverySummary.objects.filter(webhook_endpoint__user=user)
+        summarized = summaries.aggregate(
+            total=Sum('total_deliveries'),
+            successful=Sum('successful_deliveries'),
+            failed=Sum('failed_deliveries'),
+            response_time_total=Sum('response_time_ms_total'),
+            response_time_count=Sum('response_time_count')
+        )
+        for key, value in summarized.items():
+            totals[key] = (totals[key] or 0) + (value or 0)
+
+        # Success rate by endpoint
+        endpoint_stats = {}
+        rows = deliveries.values('webhook_endpoint__name').annotate(
+            total=Count('id'),
+            successful=Count('id', filter=Q(
+                status='success',
+                http_status_code__gte=200,
+                http_status_code__lte=299
+            ))
+        ).order_by()
+        summary_rows = summaries.values('webhook_endpoint__name').annotate(
+            total=Sum('total_deliveries'),
+            successful=Sum('successful_deliveries')
+        ).order_by()
+        for row in list(rows) + list(summary_rows):
+            stats = endpoint_stats.setdefault(row['webhook_endpoint__name'], {'total': 0, 'successful': 0})
+            stats['total'] += row['total']
+            stats['successful'] += row['successful']
+        for stats in endpoint_stats.values():
+            stats['success_rate'] = (stats['successful'] / stats['total'] * 100) if stats['total'] > 0 else 0
+
+        total_deliveries = totals['total']
+        average_response_time = (
+            totals['response_time_total'] / totals['response_time_count']
+            if totals['response_time_count'] > 0 else 0
+        )
+        return {
+            **endpoint_counts,
+            **event_counts,
+            'total_deliveries': total_deliveries,
+            'successful_deliveries': totals['successful'],
+            'failed_deliveries': totals['failed'],
+            'success_rate': (totals['successful'] / total_deliveries * 100) if total_deliveries > 0 else 0,
+            'average_response_time': round(average_response_time, 2),
+            'endpoint_stats': endpoint_stats,
+        }
+
+    @staticmethod
+    def invalidate(user_id):
+        """Drop a user's snapshot so the next request rebuilds it"""
+        cache.delete(WebhookStatsService._cache_key(user_id))
@@ -3,10 +3,16 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.contrib import messages
 from decimal import Decimal
+from django.utils import timezone
 from django.urls import path
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponseRedirect
-from .models import Account, VirtualCard, Transaction, Notification, BitcoinWallet
+from .models import (
+    Account, VirtualCard, Transaction, Notification, BitcoinWallet, EmailOutbox,
+    Broadcast, NotificationFanoutJob
+)
+from . import notification_cache
+from .email_outbox import redacted_types
 from .models_loans import LoanApplication, LoanAccount, LoanPayment
 from .models_bills import Biller, BillPayment, Payee, ScheduledPayment
 from .admin_loans_bills import *
@@ -77,6 +83,11 @@ class NotificationForm(forms.ModelForm):
         required=False,
         help_text='If checked, this notification will be sent to all active users.'
     )
+    send_as_broadcast = forms.BooleanField(
+        label='Send as broadcast',
+        required=False,
+        help_text='With "Send to all users", publish one shared broadcast instead of a copy per user.'
+    )
     
     class Meta:
         model = Notification
@@ -119,7 +130,7 @@ class NotificationAdmin(admin.ModelAdmin):
             'fields': ('user', 'notification_type', 'title', 'message', 'is_read')
         }),
         ('Batch Sending', {
-            'fields': ('send_to_all',),
+            'fields': ('send_to_all', 'send_as_broadcast'),
             'classes': ('collapse',),
             'description': 'Use these options to send notifications to multiple users.'
         }),
@@ -135,29 +146,39 @@ class NotificationAdmin(admin.ModelAdmin):
     
     def save_model(self, request, obj, form, change):
         from .utils import send_notification
+        from .notification_fanout import send_broadcast
         
         if not change and form.cleaned_data.get('send_to_all'):
             # If this is a new notification and 'send to all' is checked
             obj.save()  # Save the original instance first
-            send_notification(
+            if form.cleaned_data.get('send_as_broadcast'):
+                send_broadcast(obj.notification_type, obj.title, obj.message)
+                self.message_user(request, 'Broadcast published to all users.')
+                return
+            job = send_notification(
                 user='all',
                 notification_type=obj.notification_type,
                 title=obj.title,
                 message=obj.message,
                 related_transaction=obj.related_transaction
             )
+            self.message_user(request, f'Fan-out job {job.pk} queued; progress is shown under Notification fanout jobs.')
             return
         
         # For normal saves
         super().save_model(request, obj, form, change)
     
     def mark_as_read(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(is_read=True)
+        notification_cache.invalidate(user_ids)
         self.message_user(request, f"Marked {updated} notifications as read.")
     mark_as_read.short_description = "Mark selected notifications as read"
     
     def mark_as_unread(self, request, queryset):
+        user_ids = set(queryset.values_list('user_id', flat=True))
         updated = queryset.update(is_read=False)
+        notification_cache.invalidate(user_ids)
         self.message_user(request, f"Marked {updated} notifications as unread.")
     mark_as_unread.short_description = "Mark selected notifications as unread"
     
@@ -181,6 +202,43 @@ class NotificationAdmin(admin.ModelAdmin):
 # Register loan and bill models
 # Note: Models are registered using @admin.register decorator in admin_loans_bills.py
 
+@admin.register(Broadcast)
+class BroadcastAdmin(admin.ModelAdmin):
+    list_display = ('title', 'notification_type', 'is_active', 'read_count', 'created_at')
+    list_filter = ('notification_type', 'is_active', 'created_at')
+    search_fields = ('title', 'message')
+
+    def read_count(self, obj):
+        return obj.receipts.count()
+    read_count.short_description = 'Read by'
+
+@admin.register(NotificationFanoutJob)
+class NotificationFanoutJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'status', 'processed_users', 'total_users', 'progress', 'created_at', 'completed_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('title',)
+    readonly_fields = ('status', 'total_users', 'processed_users', 'last_user_id', 'error',
+                       'created_at', 'started_at', 'completed_at')
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('email_type', 'to_email', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'email_type', 'created_at')
+    search_fields = ('to_email', 'subject')
+    # Bodies may hold one-time codes
+    exclude = ('dedup_key', 'text_body', 'html_body')
+    readonly_fields = ('attempts', 'claim_token', 'claimed_at', 'last_error',
+                       'provider_message_id', 'created_at', 'sent_at')
+    actions = ['retry_emails']
+
+    def retry_emails(self, request, queryset):
+        # Redacted emails have no body left to send
+        count = queryset.exclude(status='sent').exclude(email_type__in=redacted_types()).update(
+            status='pending', attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f'{count} emails queued for retry.')
+    retry_emails.short_description = 'Retry selected emails'
+
 @admin.register(BitcoinWallet)
 class BitcoinWalletAdmin(admin.ModelAdmin):
     list_display = ('user', 'address', 'balance', 'balance_usd', 'is_active', 'qr_code_preview', 'add_balance_link')
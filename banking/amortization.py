@@ -0,0 +1,285 @@
+"""
+Loan amortization schedules and nightly interest accrual.
+
+Rates are annual percentages, as LoanAccount.interest_rate is stored and
+shown (7.50 means 7.5% APR); interest for a month is balance * rate / 1200.
+
+Schedules:
+- build_schedules() amortizes many loans at once from their current
+  balance, monthly payment and next due date. Interest is rounded to the
+  cent every period and the last period pays off whatever remains
+- With NumPy installed, every loan advances one period per array
+  operation; without it the same integer-cent arithmetic runs loan by
+  loan, producing identical rows
+- LoanScheduleService stores the result as LoanScheduleEntry rows. A
+  payment marks the loan's rows stale (schedule_generated_at = None);
+  stale schedules are rebuilt in bulk nightly, or on demand when a loan
+  is viewed
+
+Accrual: accrue_interest() adds each active loan's daily interest
+(balance * rate / 36500 per day since interest_accrued_through) with one
+UPDATE per pk range, computed by the database.
+"""
+import logging
+import math
+from decimal import Decimal, ROUND_HALF_UP
+
+from dateutil.relativedelta import relativedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Max, Min, Value
+from django.utils import timezone
+
+from .models_loans import LoanAccount, LoanScheduleEntry
+
+# numpy is optional; without it schedules are built loan by loan
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+CENTS = Decimal('0.01')
+_ACCRUED = DecimalField(max_digits=15, decimal_places=4)
+
+
+def _chunk_size():
+    return getattr(settings, 'LOAN_AMORTIZATION_CHUNK_SIZE', 1000)
+
+
+def monthly_payment(principal, annual_rate, term_months):
+    """Level monthly payment that repays principal over term_months at annual_rate percent"""
+    principal = Decimal(str(principal))
+    if principal <= 0 or term_months <= 0:
+        return Decimal('0.00')
+    rate = Decimal(str(annual_rate)) / Decimal('1200')
+    if rate <= 0:
+        return (principal / term_months).quantize(CENTS, rounding=ROUND_HALF_UP)
+    factor = (1 + rate) ** term_months
+    return (principal * rate * factor / (factor - 1)).quantize(CENTS, rounding=ROUND_HALF_UP)
+
+
+def split_payment(loan, amount):
+    """
+    Principal and interest portions of a payment: the month's interest first,
+    as the schedule charges it, then principal up to the balance.
+    """
+    interest_due = (loan.current_balance * loan.interest_rate / Decimal('1200')).quantize(CENTS, rounding=ROUND_HALF_UP)
+    interest = min(amount, max(interest_due, Decimal('0')))
+    principal = min(amount - interest, loan.current_balance)
+    return principal, interest
+
+
+def record_payment(loan, amount):
+    """
+    Apply a payment to the loan in memory; the caller saves it.
+
+    Returns:
+        tuple: (principal, interest) portions of the payment
+    """
+    principal, interest = split_payment(loan, amount)
+    loan.current_balance -= principal
+    loan.accrued_interest = max(loan.accrued_interest - interest, Decimal('0'))
+    loan.schedule_generated_at = None
+    return principal, interest
+
+
+def remaining_periods(loan):
+    """Installments left in the term, counting the one due next"""
+    elapsed = relativedelta(loan.next_payment_date, loan.start_date)
+    # The first installment is due about a month after the start date
+    paid = max(elapsed.years * 12 + elapsed.months - 1, 0)
+    return max(loan.term_months - paid, 1)
+
+
+def _cents(amount):
+    return int((Decimal(amount) * 100).to_integral_value(rounding=ROUND_HALF_UP))
+
+
+def _amortize_python(balances, rates, payments, limits):
+    schedules = []
+    for balance, rate, payment, limit in zip(balances, rates, payments, limits):
+        rows = []
+        for period in range(limit):
+            if balance <= 0:
+                break
+            interest = math.floor(balance * rate + 0.5)
+            if period == limit - 1:
+                principal = balance
+            else:
+                principal = min(max(payment - interest, 0), balance)
+            balance -= principal
+            rows.append((principal + interest, principal, interest, balance))
+        schedules.append(rows)
+    return schedules
+
+
+def _amortize_numpy(balances, rates, payments, limits):
+    balance = np.array(balances, dtype=np.int64)
+    rate = np.array(rates, dtype=np.float64)
+    payment = np.array(payments, dtype=np.int64)
+    limit = np.array(limits, dtype=np.int64)
+    width = int(limit.max()) if len(limit) else 0
+    principals = np.zeros((len(balance), width), dtype=np.int64)
+    interests = np.zeros_like(principals)
+    remaining = np.zeros_like(principals)
+    live = np.zeros(principals.shape, dtype=bool)
+
+    # One period of every loan per step
+    for period in range(width):
+        current = (balance > 0) & (period < limit)
+        if not current.any():
+            break
+        interest = np.floor(balance * rate + 0.5).astype(np.int64)
+        principal = np.where(
+            period == limit - 1, balance, np.minimum(np.maximum(payment - interest, 0), balance)
+        )
+        principal = np.where(current, principal, 0)
+        balance = balance - principal
+        principals[:, period] = principal
+        interests[:, period] = np.where(current, interest, 0)
+        remaining[:, period] = balance
+        live[:, period] = current
+
+    # Live periods are a prefix of each row; tolist() converts the arrays in one pass
+    counts = live.sum(axis=1).tolist()
+    payments_made = (principals + interests).tolist()
+    principals, interests, remaining = principals.tolist(), interests.tolist(), remaining.tolist()
+    return [
+        list(zip(payments_made[index][:count], principals[index][:count],
+                 interests[index][:count], remaining[index][:count]))
+        for index, count in enumerate(counts)
+    ]
+
+
+def build_schedules(loans, use_numpy=None):
+    """
+    Remaining schedules of many loans.
+
+    Args:
+        loans: LoanAccounts to amortize from their current balance
+        use_numpy: Force the NumPy or pure Python path; defaults to NumPy when installed
+
+    Returns:
+        dict: loan pk -> unsaved LoanScheduleEntry rows, in period order
+    """
+    loans = list(loans)
+    use_numpy = NUMPY_AVAILABLE if use_numpy is None else use_numpy
+    limits = [remaining_periods(loan) for loan in loans]
+    payments = [
+        _cents(loan.monthly_payment) if loan.monthly_payment and loan.monthly_payment > 0
+        else _cents(monthly_payment(loan.current_balance, loan.interest_rate, limit))
+        for loan, limit in zip(loans, limits)
+    ]
+    amortize = _amortize_numpy if use_numpy else _amortize_python
+    schedules = amortize(
+        [_cents(loan.current_balance) for loan in loans],
+        [float(loan.interest_rate) / 1200 for loan in loans],
+        payments,
+        limits,
+    )
+
+    due_dates = {}
+    entries = {}
+    for loan, rows in zip(loans, schedules):
+        loan_entries = []
+        for period, (payment, principal, interest, balance) in enumerate(rows, start=1):
+            key = (loan.next_payment_date, period)
+            if key not in due_dates:
+                due_dates[key] = loan.next_payment_date + relativedelta(months=period - 1)
+            loan_entries.append(LoanScheduleEntry(
+                loan_id=loan.pk,
+                period=period,
+                due_date=due_dates[key],
+                payment=Decimal(payment).scaleb(-2),
+                principal=Decimal(principal).scaleb(-2),
+                interest=Decimal(interest).scaleb(-2),
+                balance=Decimal(balance).scaleb(-2),
+            ))
+        entries[loan.pk] = loan_entries
+    return entries
+
+
+class LoanScheduleService:
+    """Stored amortization schedules"""
+
+    @staticmethod
+    def refresh(loans):
+        """Rebuild and store the schedules of the given loans"""
+        loans = list(loans)
+        if not loans:
+            return 0
+        entries = build_schedules(loans)
+        pks = [loan.pk for loan in loans]
+        now = timezone.now()
+        with transaction.atomic():
+            LoanScheduleEntry.objects.filter(loan_id__in=pks).delete()
+            LoanScheduleEntry.objects.bulk_create(
+                [entry for rows in entries.values() for entry in rows], batch_size=_chunk_size()
+            )
+            LoanAccount.objects.filter(pk__in=pks).update(schedule_generated_at=now)
+        for loan in loans:
+            loan.schedule_generated_at = now
+        return len(loans)
+
+    @staticmethod
+    def refresh_stale(chunk_size=None):
+        """Rebuild every schedule marked stale, a chunk of loans at a time"""
+        chunk_size = chunk_size or _chunk_size()
+        refreshed = 0
+        while True:
+            loans = list(LoanAccount.objects.filter(schedule_generated_at__isnull=True).order_by('pk')[:chunk_size])
+            if not loans:
+                return refreshed
+            refreshed += LoanScheduleService.refresh(loans)
+
+    @staticmethod
+    def schedule_for(loan):
+        """The loan's stored schedule, rebuilt first if stale"""
+        if loan.schedule_generated_at is None:
+            LoanScheduleService.refresh([loan])
+        return list(LoanScheduleEntry.objects.filter(loan=loan))
+
+
+def accrue_interest(as_of=None, chunk_size=None):
+    """
+    Accrue daily interest on every active loan through as_of.
+
+    Loans already accrued through as_of are left alone, so a rerun is a
+    no-op; loans never accrued before accrue one day.
+
+    Returns:
+        int: Loans accrued
+    """
+    as_of = as_of or timezone.localdate()
+    chunk_size = chunk_size or _chunk_size()
+    active = LoanAccount.objects.filter(status='active')
+    bounds = active.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return 0
+    # Usually a single date: the previous night's run
+    bases = list(
+        active.exclude(interest_accrued_through__gte=as_of)
+        .order_by().values_list('interest_accrued_through', flat=True).distinct()
+    )
+
+    accrued = 0
+    for start in range(bounds['low'], bounds['high'] + 1, chunk_size):
+        chunk = active.filter(pk__gte=start, pk__lt=start + chunk_size)
+        with transaction.atomic():
+            for base in bases:
+                days = 1 if base is None else (as_of - base).days
+                rows = chunk.filter(interest_accrued_through__isnull=True) if base is None \
+                    else chunk.filter(interest_accrued_through=base)
+                accrued += rows.update(
+                    accrued_interest=ExpressionWrapper(
+                        F('accrued_interest')
+                        + F('current_balance') * F('interest_rate') * Value(Decimal(days)) / Value(Decimal('36500')),
+                        output_field=_ACCRUED,
+                    ),
+                    interest_accrued_through=as_of,
+                )
+    logger.info(f"Accrued interest through {as_of} on {accrued} loans")
+    return accrued
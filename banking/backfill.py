@@ -0,0 +1,162 @@
+"""
+Batched backfills for maintenance commands.
+
+A Backfill creates missing rows for every source row that lacks one,
+e.g. a Bitcoin wallet for every user without one:
+- Source primary keys are read in keyset pages (pk > last ORDER BY pk
+  LIMIT chunk), so memory stays bounded and no cursor is held open
+  while chunks are written
+- Each chunk is built in memory and written with one
+  bulk_create(ignore_conflicts=True), so rows created concurrently (e.g.
+  by a signup) are skipped rather than failing the chunk
+- Progress is recorded in a BackfillCheckpoint after every chunk; an
+  interrupted run resumes after the last completed chunk, a finished
+  run starts over on the next invocation
+- With workers > 1, chunks are written by forked worker processes while
+  the parent reads the next pages; the checkpoint only advances past a
+  chunk once every earlier chunk has been written
+
+Subclasses set name and model and implement source() and build().
+"""
+import hashlib
+import logging
+import multiprocessing
+import secrets
+from collections import deque
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from .models import BackfillCheckpoint, BitcoinWallet
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_size():
+    return getattr(settings, 'BACKFILL_CHUNK_SIZE', 1000)
+
+
+def _write_chunk(backfill, pks):
+    """Worker entry point; module level so the pool can pickle it"""
+    return backfill.process_chunk(pks)
+
+
+class Backfill:
+    """
+    Base class of a batched backfill.
+
+    Attributes:
+        name: Checkpoint name, unique per backfill
+        model: Model the backfill creates rows of
+    """
+    name = None
+    model = None
+
+    def source(self):
+        """Queryset of the rows that still need a backfilled row"""
+        raise NotImplementedError
+
+    def build(self, pks):
+        """Unsaved model instances for a chunk of source primary keys"""
+        raise NotImplementedError
+
+    def process_chunk(self, pks):
+        """Build and write one chunk; returns the number of rows written"""
+        objs = self.build(pks)
+        with transaction.atomic():
+            self.model.objects.bulk_create(objs, ignore_conflicts=True)
+        return len(objs)
+
+    def pages(self, after, chunk_size):
+        """Source primary keys after `after`, a page per query"""
+        while True:
+            pks = list(
+                self.source().filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+            )
+            if not pks:
+                return
+            yield pks
+            after = pks[-1]
+
+    def checkpoint(self, restart=False):
+        """The checkpoint to resume from, reset if the last run finished or restart is set"""
+        checkpoint, created = BackfillCheckpoint.objects.get_or_create(name=self.name)
+        if not created and (restart or checkpoint.completed_at is not None):
+            checkpoint.last_pk = 0
+            checkpoint.processed = 0
+            checkpoint.started_at = timezone.now()
+            checkpoint.completed_at = None
+            checkpoint.save()
+        elif not created:
+            logger.info(f"Resuming backfill {self.name} after pk {checkpoint.last_pk}")
+        return checkpoint
+
+    def run(self, chunk_size=None, workers=1, restart=False, progress=None):
+        """
+        Backfill every missing row.
+
+        Args:
+            chunk_size: Source rows per bulk_create
+            workers: Processes writing chunks; 1 writes in this process
+            restart: Ignore the checkpoint of an interrupted run
+            progress: Optional callable receiving the checkpoint after each chunk
+
+        Returns:
+            BackfillCheckpoint: The completed checkpoint
+        """
+        chunk_size = chunk_size or _chunk_size()
+        checkpoint = self.checkpoint(restart)
+        pages = self.pages(checkpoint.last_pk, chunk_size)
+
+        def advance(last_pk, written):
+            checkpoint.last_pk = last_pk
+            checkpoint.processed += written
+            checkpoint.save(update_fields=['last_pk', 'processed', 'updated_at'])
+            if progress is not None:
+                progress(checkpoint)
+
+        if workers <= 1:
+            for pks in pages:
+                advance(pks[-1], self.process_chunk(pks))
+        else:
+            # Children must not share this process's database connections
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(workers)
+            try:
+                pending = deque()
+                for pks in pages:
+                    pending.append((pks[-1], pool.apply_async(_write_chunk, (self, pks))))
+                    # Bound the chunks in flight; checkpoint in source order
+                    while len(pending) > workers * 2:
+                        last_pk, result = pending.popleft()
+                        advance(last_pk, result.get())
+                while pending:
+                    last_pk, result = pending.popleft()
+                    advance(last_pk, result.get())
+            finally:
+                pool.terminate()
+                pool.join()
+
+        checkpoint.completed_at = timezone.now()
+        checkpoint.save(update_fields=['completed_at', 'updated_at'])
+        logger.info(f"Backfill {self.name} finished: {checkpoint.processed} rows")
+        return checkpoint
+
+
+class BitcoinWalletBackfill(Backfill):
+    """A Bitcoin wallet for every user without one, as create_user_accounts makes at signup"""
+    name = 'bitcoin_wallets'
+    model = BitcoinWallet
+
+    def source(self):
+        return CustomUser.objects.filter(bitcoinwallet__isnull=True)
+
+    def build(self, pks):
+        # One read of the system CSPRNG for the whole chunk, 32 bytes of seed per wallet
+        seeds = secrets.token_bytes(32 * len(pks))
+        return [
+            BitcoinWallet(user_id=pk, address=hashlib.sha256(seeds[index * 32:(index + 1) * 32]).hexdigest())
+            for index, pk in enumerate(pks)
+        ]
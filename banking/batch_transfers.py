@@ -0,0 +1,224 @@
+"""
+Batch transfers for payroll and bulk disbursement.
+
+BatchTransferService.execute posts many transfer legs from one account
+in a single database transaction instead of one transfer request per
+recipient:
+- Recipients are resolved and every involved account is locked by one
+  SELECT ... FOR UPDATE, in primary key order so concurrent batches that
+  share accounts cannot deadlock
+- Transactions are written with bulk_create and balances with bulk_update
+- The side effects the per-row post_save signals would have produced
+  (notifications, dashboard snapshots, balance pushes) are issued once
+  per batch
+
+The caller verifies the transaction PIN once for the whole batch. With
+atomic=True any failing leg rejects the batch; otherwise failing legs
+are reported and the rest are posted.
+"""
+import logging
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.event_bus import publish_user_event
+from .models import Account, Notification, Transaction
+from . import notification_cache
+from .utils import generate_reference_number
+
+logger = logging.getLogger(__name__)
+
+# Same per-transfer limit as MoneyTransferSerializer
+MAX_LEG_AMOUNT = Decimal('10000')
+
+
+def _chunk_size():
+    return getattr(settings, 'BATCH_TRANSFER_CHUNK_SIZE', 1000)
+
+
+class BatchTransferError(Exception):
+    """The batch was rejected as a whole and nothing was posted"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+class BatchTransferService:
+    """Validate and post transfer legs from one account"""
+
+    @staticmethod
+    def parse_leg(leg):
+        """
+        Validate one leg's shape.
+
+        Returns:
+            tuple: (recipient account number, amount, description, error)
+        """
+        if not isinstance(leg, dict):
+            return None, None, None, 'Leg must be an object'
+        recipient = str(leg.get('recipient_account') or '').strip()
+        if not recipient:
+            return None, None, None, 'Recipient account is required'
+        try:
+            amount = Decimal(str(leg.get('amount')))
+        except (InvalidOperation, ValueError):
+            return recipient, None, None, 'Amount must be a number'
+        if not amount.is_finite() or amount <= 0:
+            return recipient, None, None, 'Amount must be positive'
+        if amount != amount.quantize(Decimal('0.01')):
+            return recipient, None, None, 'Amount must have at most 2 decimal places'
+        if amount > MAX_LEG_AMOUNT:
+            return recipient, None, None, f'Amount exceeds the transfer limit of ${MAX_LEG_AMOUNT:,}'
+        return recipient, amount, leg.get('description'), None
+
+    @staticmethod
+    def execute(user, sender_account_id, legs, description='Batch Transfer', atomic=True):
+        """
+        Post transfer legs from the user's account.
+
+        Args:
+            user: The user initiating the batch; must own the sender account
+            sender_account_id: Account the legs are paid from
+            legs: Dicts with recipient_account, amount and an optional description
+            description: Default description for legs without one
+            atomic: Reject the whole batch if any leg fails
+
+        Returns:
+            dict: batch_reference, completed and failed counts, total_amount,
+            new_balance and one result per leg, in request order
+
+        Raises:
+            BatchTransferError: If the batch is rejected
+        """
+        parsed = [BatchTransferService.parse_leg(leg) for leg in legs]
+        numbers = {number for number, amount, _, error in parsed if error is None}
+
+        with transaction.atomic():
+            # One query resolves the recipients and locks every account, in pk order
+            accounts = list(
+                Account.objects.select_for_update()
+                .filter(Q(pk=sender_account_id) | Q(account_number__in=numbers))
+                .order_by('pk')
+            )
+            sender = next((account for account in accounts if account.pk == sender_account_id), None)
+            if sender is None or sender.user_id != user.pk:
+                raise BatchTransferError('Account not found')
+            by_number = {account.account_number: account for account in accounts}
+
+            balance = sender.balance
+            results = []
+            postings = []
+            for index, (number, amount, leg_description, error) in enumerate(parsed):
+                recipient = by_number.get(number)
+                if error is None:
+                    if recipient is None:
+                        error = 'Recipient account not found'
+                    elif recipient.pk == sender.pk:
+                        error = 'Cannot transfer to the same account'
+                    elif amount > balance:
+                        error = 'Insufficient funds'
+                if error is not None:
+                    results.append({'index': index, 'status': 'failed', 'error': error})
+                    continue
+                balance -= amount
+                postings.append((index, recipient, amount, leg_description or description))
+                results.append({'index': index, 'status': 'completed'})
+
+            failed = [result for result in results if result['status'] == 'failed']
+            if failed and atomic:
+                raise BatchTransferError('Batch rejected; no transfers were made', failed)
+            if not postings:
+                raise BatchTransferError('No transfers could be made', failed)
+
+            batch_reference = generate_reference_number('BTX')
+            now = timezone.now()
+            transactions = [
+                Transaction(
+                    user=user,
+                    from_account=sender,
+                    to_account=recipient,
+                    transaction_type='transfer',
+                    amount=amount,
+                    description=f"Transfer to {recipient.account_number}: {leg_description}",
+                    reference=f"{batch_reference}-{index:05d}",
+                    status='completed',
+                    created_at=now,
+                )
+                for index, recipient, amount, leg_description in postings
+            ]
+            Transaction.objects.bulk_create(transactions, batch_size=_chunk_size())
+
+            credits = defaultdict(Decimal)
+            recipients = {}
+            for _, recipient, amount, _ in postings:
+                credits[recipient.pk] += amount
+                recipients[recipient.pk] = recipient
+            for pk, recipient in recipients.items():
+                recipient.balance += credits[pk]
+                recipient.updated_at = now
+            sender.balance = balance
+            sender.updated_at = now
+            changed = [sender, *recipients.values()]
+            Account.objects.bulk_update(changed, ['balance', 'updated_at'], batch_size=_chunk_size())
+
+            for posting, trans in zip(postings, transactions):
+                results[posting[0]]['reference'] = trans.reference
+
+            total = sum((amount for _, _, amount, _ in postings), Decimal('0'))
+            BatchTransferService._after_post(user, changed, transactions, total)
+
+        logger.info(
+            f"Batch {batch_reference} from account {sender.pk}: {len(postings)} legs posted, "
+            f"{len(failed)} failed, total {total}"
+        )
+        return {
+            'batch_reference': batch_reference,
+            'completed': len(postings),
+            'failed': len(failed),
+            'total_amount': total,
+            'new_balance': sender.balance,
+            'results': results,
+        }
+
+    @staticmethod
+    def _after_post(user, accounts, transactions, total):
+        """Notify, invalidate and push once for the batch; bulk writes send no post_save"""
+        sender_name = user.get_full_name() or user.email
+        notifications = [
+            Notification(
+                user=user,
+                notification_type='transaction',
+                title=f"Batch Transfer Sent: {total}",
+                message=f"You sent {total} in {len(transactions)} transfers.",
+            )
+        ]
+        notifications.extend(
+            Notification(
+                user_id=trans.to_account.user_id,
+                notification_type='transaction',
+                title=f"Transaction Received: {trans.amount}",
+                message=f"You received {trans.amount} from {sender_name}.",
+                related_transaction=trans,
+            )
+            for trans in transactions
+            if trans.to_account.user_id != user.pk
+        )
+        Notification.objects.bulk_create(notifications, batch_size=_chunk_size())
+
+        user_ids = {account.user_id for account in accounts}
+        transaction.on_commit(lambda: notification_cache.invalidate(user_ids))
+
+        from dashboard.snapshot import DashboardSnapshot
+        transaction.on_commit(lambda: DashboardSnapshot.invalidate(user_ids))
+
+        for account in accounts:
+            publish_user_event(account.user_id, 'balance', {
+                'account_id': account.id,
+                'account_type': account.account_type,
+                'balance': account.balance,
+            })
@@ -0,0 +1,202 @@
+"""
+Transactional email outbox.
+
+Email functions in banking.utils render their content and write an
+EmailOutbox row inside the caller's transaction. The send_outbox_emails
+command delivers the rows after commit, so requests never wait on the
+Gmail API and rolled back transactions never send mail. Bodies of the
+EMAIL_OUTBOX_REDACT_TYPES (one-time codes) are blanked once the email is
+sent or given up, so the codes do not stay readable in the table.
+"""
+import uuid
+import logging
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.db import IntegrityError, transaction, close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from core.gmail_service import send_gmail_batch
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(to_email, subject, text_body, html_body='', headers=None,
+                  email_type='general', dedup_key=None):
+    """
+    Queue an email for background delivery.
+
+    Args:
+        to_email (str): Recipient address
+        subject (str): Subject without the GMAIL_SUBJECT_PREFIX
+        text_body (str): Plain text content
+        html_body (str): HTML content
+        headers (dict): Extra email headers
+        email_type (str): Short label used for logging and admin filtering
+        dedup_key (str): Optional key; a second email with the same key is dropped
+
+    Returns:
+        EmailOutbox: The queued (or previously queued) email
+    """
+    if dedup_key:
+        existing = EmailOutbox.objects.filter(dedup_key=dedup_key).first()
+        if existing:
+            return existing
+
+    try:
+        # Savepoint so a dedup race does not break the caller's transaction
+        with transaction.atomic():
+            return EmailOutbox.objects.create(
+                dedup_key=dedup_key,
+                email_type=email_type,
+                to_email=to_email,
+                subject=subject,
+                text_body=text_body,
+                html_body=html_body,
+                headers=headers or {},
+                max_attempts=getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', 5),
+            )
+    except IntegrityError:
+        return EmailOutbox.objects.get(dedup_key=dedup_key)
+
+
+def redacted_types():
+    return getattr(settings, 'EMAIL_OUTBOX_REDACT_TYPES', ['verification'])
+
+
+def _gmail_kwargs(email):
+    return {
+        'to_emails': [email.to_email],
+        'subject': email.subject,
+        'text_content': email.text_body,
+        'html_content': email.html_body or None,
+        'headers': email.headers,
+    }
+
+
+def send_with_django_backend(email):
+    """
+    Send one outbox email through the configured Django email backend.
+
+    Only performs network I/O so it is safe to call from worker threads.
+
+    Returns:
+        tuple: (success, error message)
+    """
+    try:
+        message = EmailMultiAlternatives(
+            subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{email.subject}",
+            body=email.text_body,
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[email.to_email],
+            headers=email.headers
+        )
+        if email.html_body:
+            message.attach_alternative(email.html_body, 'text/html')
+        if message.send(fail_silently=False):
+            return True, ''
+        return False, 'Django email backend did not send the message'
+    except Exception as django_error:
+        return False, str(django_error)
+
+
+def claim_emails(batch_size):
+    """
+    Claim due emails for this worker.
+
+    Emails stuck in 'sending' longer than EMAIL_OUTBOX_LEASE_SECONDS are
+    reclaimed, so a crashed worker does not strand its batch.
+    """
+    now = timezone.now()
+    lease_expired = now - timedelta(seconds=getattr(settings, 'EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    due = EmailOutbox.objects.filter(
+        Q(status='pending', next_attempt_at__lte=now) |
+        Q(status='sending', claimed_at__lt=lease_expired)
+    ).order_by('next_attempt_at')
+
+    ids = list(due.values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+
+    # The conditional UPDATE makes the claim safe against concurrent workers
+    token = uuid.uuid4()
+    due.filter(id__in=ids).update(status='sending', claim_token=token, claimed_at=now)
+    return list(EmailOutbox.objects.filter(claim_token=token))
+
+
+def _deliver_in_thread(email):
+    try:
+        return send_with_django_backend(email)
+    finally:
+        close_old_connections()
+
+
+def process_outbox(batch_size=100, workers=4):
+    """
+    Deliver one batch of due outbox emails.
+
+    The batch goes to the Gmail batch endpoint first; emails it could not
+    send fall back to the Django backend on a thread pool.
+
+    Returns:
+        tuple: (sent count, permanently failed count, retry count)
+    """
+    emails = claim_emails(batch_size)
+    if not emails:
+        return 0, 0, 0
+
+    results = [None] * len(emails)
+    if getattr(settings, 'GMAIL_SENDER_EMAIL', None):
+        gmail_results = send_gmail_batch([_gmail_kwargs(email) for email in emails])
+        for index, (success, result) in enumerate(gmail_results):
+            if success:
+                results[index] = (True, result)
+            else:
+                logger.error(f"Gmail API failed for outbox email {emails[index].pk}: {result}")
+
+    fallback = [index for index, result in enumerate(results) if result is None]
+    if fallback:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            fallback_results = executor.map(_deliver_in_thread, [emails[index] for index in fallback])
+            for index, result in zip(fallback, fallback_results):
+                results[index] = result
+
+    sent = failed = 0
+    now = timezone.now()
+    retry_delay = getattr(settings, 'EMAIL_OUTBOX_RETRY_DELAY', 60)
+    redact = set(redacted_types())
+    for email, (success, result) in zip(emails, results):
+        email.attempts += 1
+        email.claim_token = None
+        if success:
+            sent += 1
+            email.status = 'sent'
+            email.sent_at = now
+            email.provider_message_id = result or ''
+            email.last_error = ''
+        else:
+            email.last_error = result
+            if email.attempts >= email.max_attempts:
+                failed += 1
+                email.status = 'failed'
+                logger.critical(f"CRITICAL: Failed to send {email.email_type} email to {email.to_email} after {email.attempts} attempts. Manual intervention required.")
+            else:
+                # Exponential backoff between attempts
+                email.status = 'pending'
+                email.next_attempt_at = now + timedelta(seconds=retry_delay * 2 ** (email.attempts - 1))
+        if email.status != 'pending' and email.email_type in redact:
+            email.text_body = email.html_body = ''
+
+    EmailOutbox.objects.bulk_update(
+        emails,
+        ['status', 'attempts', 'claim_token', 'sent_at', 'provider_message_id', 'last_error', 'next_attempt_at',
+         'text_body', 'html_body']
+    )
+
+    retrying = len(emails) - sent - failed
+    logger.info(f"Email outbox batch: {sent} sent, {failed} failed, {retrying} to retry")
+    return sent, failed, retrying
@@ -0,0 +1,34 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking.amortization import LoanScheduleService, accrue_interest
+
+
+class Command(BaseCommand):
+    help = 'Nightly loan job: accrues daily interest on active loans and rebuilds stale amortization schedules'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Accrue through this date (YYYY-MM-DD); defaults to today')
+        parser.add_argument('--chunk-size', type=int, help='Loans per UPDATE and per schedule rebuild')
+        parser.add_argument('--skip-schedules', action='store_true', help='Only accrue interest')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        start = time.perf_counter()
+        accrued = accrue_interest(as_of=as_of, chunk_size=options['chunk_size'])
+        self.stdout.write(f'Accrued interest on {accrued} loans in {time.perf_counter() - start:.1f}s')
+
+        if not options['skip_schedules']:
+            start = time.perf_counter()
+            refreshed = LoanScheduleService.refresh_stale(chunk_size=options['chunk_size'])
+            self.stdout.write(f'Rebuilt {refreshed} amortization schedules in {time.perf_counter() - start:.1f}s')
+
+        self.stdout.write(self.style.SUCCESS('Loan accrual complete'))
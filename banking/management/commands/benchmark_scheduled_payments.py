@@ -0,0 +1,101 @@
+"""
+Management command to measure scheduled payment throughput: one
+transaction per schedule against ScheduledPaymentExecutor's claimed
+chunks. Everything runs in a transaction that is rolled back, so the
+executor runs in this process only.
+"""
+import time
+import uuid
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from banking.bulk_onboarding import BulkOnboardingService
+from banking.models import Account, Transaction
+from banking.models_bills import Payee, ScheduledPayment
+from banking.scheduled_payments import ScheduledPaymentExecutor
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark ScheduledPaymentExecutor against posting one scheduled payment per transaction'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=20000, help='Due scheduled payments')
+        parser.add_argument('--customers', type=int, default=2000, help='Customers the payments are spread over')
+        parser.add_argument('--sample', type=int, default=200,
+                            help='Payments posted one at a time to extrapolate the per-payment cost')
+        parser.add_argument('--chunk-size', type=int, help='Schedules claimed per transaction')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options['payments'], options['customers'], options['sample'], options['chunk_size'])
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def run(self, payments, customers, sample, chunk_size):
+        suffix = uuid.uuid4().hex[:8]
+        today = timezone.localdate()
+
+        self.stdout.write(self.style.HTTP_INFO(f'Creating {customers} customers and {payments} due payments...'))
+        BulkOnboardingService.onboard(
+            ((i, {'email': f'bench-sched-{suffix}-{i}@example.com', 'balance': '1000000.00'}, None)
+             for i in range(customers)),
+            side_effects=False,
+        )
+        accounts = list(Account.objects.filter(user__email__startswith=f'bench-sched-{suffix}-'))
+        payees = Payee.objects.bulk_create([
+            Payee(user_id=account.user_id, name=f'Utility {suffix}', account_number='000111222')
+            for account in accounts
+        ])
+        ScheduledPayment.objects.bulk_create([
+            ScheduledPayment(
+                user_id=accounts[i % len(accounts)].user_id,
+                payee=payees[i % len(payees)],
+                account=accounts[i % len(accounts)],
+                amount=Decimal('42.50'),
+                frequency='monthly',
+                start_date=today,
+                next_payment_date=today,
+                reference=f'SPB{suffix}{i:08d}'.upper(),
+            )
+            for i in range(payments)
+        ], batch_size=1000)
+
+        sample = min(sample, payments)
+        self.stdout.write(self.style.HTTP_INFO(f'Posting {sample} payments one at a time...'))
+        start = time.perf_counter()
+        for pk in ScheduledPayment.objects.filter(reference__startswith=f'SPB{suffix}'.upper()) \
+                .order_by('pk').values_list('pk', flat=True)[:sample]:
+            with transaction.atomic():
+                schedule = ScheduledPayment.objects.select_for_update().select_related('payee').get(pk=pk)
+                account = Account.objects.select_for_update().get(pk=schedule.account_id)
+                Transaction.objects.create(
+                    user_id=schedule.user_id, from_account=account, transaction_type='payment',
+                    amount=schedule.amount, description=f'Scheduled payment to {schedule.payee.name}',
+                    reference=f'{schedule.reference}-{schedule.next_payment_date:%Y%m%d}', status='completed',
+                )
+                account.balance -= schedule.amount
+                account.save()
+                ScheduledPaymentExecutor.advance(schedule)
+                schedule.save()
+        single_elapsed = (time.perf_counter() - start) / sample * payments
+
+        remaining = payments - sample
+        self.stdout.write(self.style.HTTP_INFO(f'Executing {remaining} payments in claimed chunks...'))
+        start = time.perf_counter()
+        totals = ScheduledPaymentExecutor.run(as_of=today, chunk_size=chunk_size)
+        chunked_elapsed = time.perf_counter() - start
+        rate = totals['paid'] / chunked_elapsed
+
+        self.stdout.write(f'One per transaction: {single_elapsed:.2f}s for {payments} (extrapolated from {sample})')
+        self.stdout.write(f'Claimed chunks:      {chunked_elapsed:.2f}s for {totals["paid"]} ({rate:.0f}/s)')
+        self.stdout.write(f'1,000,000 due payments: about {1_000_000 / rate / 60:.1f} minutes per executor process')
+        self.stdout.write(self.style.SUCCESS(f'Speedup: {single_elapsed / payments * totals["paid"] / chunked_elapsed:.1f}x'))
@@ -0,0 +1,70 @@
+"""
+Management command to import customers from a legacy core, e.g.
+
+    python manage.py bulk_onboard customers.csv
+    python manage.py bulk_onboard customers.ndjson --chunk-size 2000
+
+Columns / keys: email (required), username, first_name, last_name,
+phone_number, password_hash, account_type, balance.
+"""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking.bulk_onboarding import FORMATS, BulkOnboardingService, read_records
+
+
+class Command(BaseCommand):
+    help = 'Creates users, profiles, accounts, cards and wallets from a CSV or NDJSON file in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or NDJSON file; '-' reads standard input")
+        parser.add_argument('--format', choices=FORMATS, help='Input format; defaults to the file extension')
+        parser.add_argument('--chunk-size', type=int, help='Customers per transaction')
+        parser.add_argument('--no-side-effects', action='store_true',
+                            help='Skip account notifications and webhook events')
+        parser.add_argument('--max-errors', type=int, default=20, help='Failed lines to print')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            if path.endswith('.csv'):
+                fmt = 'csv'
+            elif path.endswith(('.ndjson', '.jsonl')):
+                fmt = 'ndjson'
+            else:
+                raise CommandError('Cannot tell the format from the file name; pass --format')
+
+        start = time.perf_counter()
+
+        def progress(totals):
+            done = totals['created'] + totals['skipped'] + totals['failed']
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{done} rows, {totals['created']} created ({done / elapsed:.0f} rows/s)")
+
+        try:
+            stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Cannot open {path}: {e}')
+        with stream:
+            totals = BulkOnboardingService.onboard(
+                read_records(stream, fmt),
+                chunk_size=options['chunk_size'],
+                side_effects=not options['no_side_effects'],
+                progress=progress,
+            )
+
+        for error in totals['errors'][:options['max_errors']]:
+            self.stderr.write(f"Line {error['line']}: {error['error']}")
+        if len(totals['errors']) > options['max_errors']:
+            self.stderr.write(f"... and {len(totals['errors']) - options['max_errors']} more")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {totals['created']} customers, skipped {totals['skipped']} existing, "
+                f"{totals['failed']} failed in {elapsed:.1f}s"
+            )
+        )
@@ -1,27 +1,27 @@
 from django.core.management.base import BaseCommand
-from accounts.models import CustomUser
-from banking.models import BitcoinWallet
-import secrets
-import hashlib
+from banking.backfill import BitcoinWalletBackfill
 
 class Command(BaseCommand):
     help = 'Creates Bitcoin wallets for users who don\'t have one'
 
-    def handle(self, *args, **options):
-        users_without_wallet = CustomUser.objects.exclude(bitcoin_wallet__isnull=False)
-        wallets_created = 0
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, help='Wallets per bulk insert')
+        parser.add_argument('--workers', type=int, default=1, help='Processes inserting chunks in parallel')
+        parser.add_argument('--restart', action='store_true',
+                            help='Start from the first user instead of resuming an interrupted run')
 
-        for user in users_without_wallet:
-            wallet_seed = secrets.token_bytes(32)
-            wallet_address = hashlib.sha256(wallet_seed).hexdigest()
-            BitcoinWallet.objects.create(
-                user=user,
-                address=wallet_address
-            )
-            wallets_created += 1
+    def handle(self, *args, **options):
+        checkpoint = BitcoinWalletBackfill().run(
+            chunk_size=options['chunk_size'],
+            workers=options['workers'],
+            restart=options['restart'],
+            progress=lambda checkpoint: self.stdout.write(
+                f'{checkpoint.processed} wallets created (up to user {checkpoint.last_pk})'
+            ),
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully created {wallets_created} Bitcoin wallet(s)'
+                f'Successfully created {checkpoint.processed} Bitcoin wallet(s)'
             )
-        ) 
\ No newline at end of file
+        )
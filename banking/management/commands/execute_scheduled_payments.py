@@ -0,0 +1,46 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from banking.scheduled_payments import ScheduledPaymentExecutor
+
+
+class Command(BaseCommand):
+    help = 'Posts due scheduled payments in chunks claimed with SKIP LOCKED'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', help='Business date (YYYY-MM-DD) to execute payments due by; defaults to today')
+        parser.add_argument('--chunk-size', type=int, help='Schedules claimed per transaction')
+        parser.add_argument('--workers', type=int, default=1, help='Processes claiming chunks in parallel')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for due payments and retries')
+        parser.add_argument('--interval', type=float, default=60.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['date']:
+            try:
+                as_of = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        while True:
+            start = time.perf_counter()
+            totals = ScheduledPaymentExecutor.run(
+                as_of=as_of, chunk_size=options['chunk_size'], workers=options['workers']
+            )
+            elapsed = time.perf_counter() - start
+            if totals['claimed']:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Paid {totals['paid']}, already paid {totals['already_paid']}, "
+                        f"retrying {totals['retrying']}, skipped {totals['skipped']}, paused {totals['paused']} "
+                        f"of {totals['claimed']} due payments in {elapsed:.1f}s ({totals['claimed'] / elapsed:.0f}/s)"
+                    )
+                )
+            elif not options['loop']:
+                self.stdout.write(self.style.SUCCESS('No scheduled payments due'))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from banking.models import NotificationFanoutJob
+from banking.notification_fanout import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued notification fan-out jobs in bulk chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-chunks', type=int, default=50,
+                            help='Chunks per job before moving to the next job')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new jobs')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            created = run_pending_jobs(max_chunks_per_job=options['max_chunks'])
+            total += created
+
+            for job in NotificationFanoutJob.objects.filter(status='running'):
+                self.stdout.write(f'{job.title}: {job.processed_users}/{job.total_users} ({job.progress}%)')
+
+            if created:
+                self.stdout.write(f'Created {created} notifications')
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total} notifications created'))
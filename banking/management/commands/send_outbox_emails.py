@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from banking.email_outbox import process_outbox
+
+
+class Command(BaseCommand):
+    help = 'Delivers queued transactional emails from the email outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Emails claimed per batch')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent sender threads')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new emails')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls when idle')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed, retrying = process_outbox(options['batch_size'], options['workers'])
+            total_sent += sent
+            total_failed += failed
+
+            if sent or failed or retrying:
+                self.stdout.write(f'Sent {sent} emails, {failed} failed, {retrying} to retry')
+                continue
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Done: {total_sent} sent, {total_failed} failed'))
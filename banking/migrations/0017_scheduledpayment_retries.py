@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:16
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0016_backfillcheckpoint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='scheduledpayment',
+            name='failed_attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='scheduledpayment',
+            name='last_failure_reason',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='scheduledpayment',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='scheduledpayment',
+            index=models.Index(fields=['status', 'next_payment_date'], name='banking_sch_status_558cda_idx'),
+        ),
+    ]
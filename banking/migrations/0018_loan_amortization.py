@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0017_scheduledpayment_retries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='loanaccount',
+            name='accrued_interest',
+            field=models.DecimalField(decimal_places=4, default=0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='loanaccount',
+            name='interest_accrued_through',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='loanaccount',
+            name='schedule_generated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='LoanScheduleEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.PositiveIntegerField()),
+                ('due_date', models.DateField()),
+                ('payment', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('principal', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('interest', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('balance', models.DecimalField(decimal_places=2, help_text='Balance after this installment', max_digits=15)),
+                ('loan', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule', to='banking.loanaccount')),
+            ],
+            options={
+                'ordering': ['loan', 'period'],
+                'unique_together': {('loan', 'period')},
+            },
+        ),
+    ]
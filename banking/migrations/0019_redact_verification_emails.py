@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def redact_verification_emails(apps, schema_editor):
+    """Blank the one-time codes left in verification emails queued before redaction existed"""
+    EmailOutbox = apps.get_model('banking', 'EmailOutbox')
+    verification = EmailOutbox.objects.filter(email_type='verification')
+    verification.exclude(status='pending').exclude(status='sending').update(text_body='', html_body='')
+    verification.update(dedup_key=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('banking', '0018_loan_amortization'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_verification_emails, migrations.RunPython.noop),
+    ]
@@ -33,19 +33,15 @@ class Account(models.Model):
         return f"{routing}{check_digit}"
     
     @staticmethod
-    def generate_account_number(length=12):
-        """Generate a numeric account number of given length"""
-        import random
-        return ''.join(str(random.randint(0, 9)) for _ in range(length))
+    def generate_account_number():
+        """Allocate a unique 10-digit account number with a Luhn check digit"""
+        from .number_allocator import allocate_account_number
+        return allocate_account_number()
         
     def generate_card_number(self, card_type='visa'):
-        """Generate a 16-digit card number"""
-        import random
-        # Start with 4 for Visa or 5 for Mastercard
-        prefix = '4' if card_type == 'visa' else '5'
-        # Generate remaining 15 digits
-        card_number = prefix + ''.join([str(random.randint(0, 9)) for _ in range(15)])
-        return card_number
+        """Allocate a unique, Luhn-valid 16-digit card number"""
+        from .number_allocator import allocate_card_number
+        return allocate_card_number(card_type)
         
     def create_virtual_card(self):
         """Create a virtual card for this account"""
@@ -70,9 +66,9 @@ class Account(models.Model):
         return card
         
     def save(self, *args, **kwargs):
-        # Always generate a numeric-only account number on creation (10 digits)
-        if self._state.adding:
-            self.account_number = self.generate_account_number(length=10)
+        # Allocate a numeric-only account number on creation (10 digits)
+        if self._state.adding and not self.account_number:
+            self.account_number = self.generate_account_number()
         # Generate routing number if this is a new account
         if not self.routing_number:
             self.routing_number = self.generate_routing_number()
@@ -184,6 +180,40 @@ class Transaction(models.Model):
     class Meta:
         ordering = ['-created_at']
 
+    def load_accounts(self):
+        """
+        Load both accounts and their owners in one query and cache them on the instance.
+
+        Returns (from_account, to_account); either may be None.
+        """
+        def loaded(name):
+            field = self._meta.get_field(name)
+            return field.is_cached(self) and Account._meta.get_field('user').is_cached(getattr(self, name))
+
+        missing = [
+            getattr(self, f'{name}_id') for name in ('from_account', 'to_account')
+            if getattr(self, f'{name}_id') and not loaded(name)
+        ]
+        if missing:
+            accounts = Account.objects.select_related('user').in_bulk(missing)
+            for name in ('from_account', 'to_account'):
+                account_id = getattr(self, f'{name}_id')
+                if account_id in accounts:
+                    setattr(self, name, accounts[account_id])
+        return (
+            self.from_account if self.from_account_id else None,
+            self.to_account if self.to_account_id else None,
+        )
+
+    def get_involved_user_ids(self):
+        """Ids of the initiating user and both account owners (memoized)"""
+        if not hasattr(self, '_involved_user_ids'):
+            user_ids = {account.user_id for account in self.load_accounts() if account is not None}
+            if self.user_id:
+                user_ids.add(self.user_id)
+            self._involved_user_ids = user_ids
+        return self._involved_user_ids
+
     def __str__(self):
         if self.transaction_type == 'bitcoin_send':
             return f"Bitcoin Send - {self.bitcoin_amount} BTC ({self.status})"
@@ -210,12 +240,147 @@ class Notification(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Feeds mix notifications and broadcasts; templates link each to its own read URL
+    is_broadcast = False
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Unread counts and feeds on cache misses
+            models.Index(fields=['user', 'is_read', '-created_at']),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.title}"
 
+class Broadcast(models.Model):
+    """Notification shown to every active user from a single shared row"""
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES, default='general')
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    is_broadcast = True
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Broadcast - {self.title}"
+
+class BroadcastReceipt(models.Model):
+    """Marks a broadcast as read by one user; no row means unread"""
+    broadcast = models.ForeignKey(Broadcast, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='broadcast_receipts')
+    read_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('broadcast', 'user')
+
+    def __str__(self):
+        return f"{self.user.email} read {self.broadcast.title}"
+
+class NotificationFanoutJob(models.Model):
+    """Background job that copies one notification to many users in chunks"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+
+    notification_type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=100)
+    message = models.TextField()
+    related_transaction = models.ForeignKey(Transaction, on_delete=models.SET_NULL, null=True, blank=True)
+    # Empty means every active user
+    user_ids = models.JSONField(default=list, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    total_users = models.PositiveIntegerField(default=0)
+    processed_users = models.PositiveIntegerField(default=0)
+    # Highest user id already notified, so an interrupted job resumes where it stopped
+    last_user_id = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    @property
+    def progress(self):
+        """Percentage of recipients notified"""
+        if not self.total_users:
+            return 100 if self.status == 'completed' else 0
+        return round(self.processed_users * 100 / self.total_users, 1)
+
+    def __str__(self):
+        return f"Fan-out {self.title} - {self.status} ({self.processed_users}/{self.total_users})"
+
+class EmailOutbox(models.Model):
+    """Transactional email queued in the request and delivered by send_outbox_emails"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    # Unique per logical email so retried requests do not send duplicates
+    dedup_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    email_type = models.CharField(max_length=50)
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    text_body = models.TextField()
+    html_body = models.TextField(blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim_token = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    provider_message_id = models.CharField(max_length=255, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.email_type} to {self.to_email} - {self.status}"
+
+class NumberSequence(models.Model):
+    """Next unreserved value of a number series; processes reserve blocks of it (see number_allocator)"""
+    name = models.CharField(max_length=50, unique=True)
+    next_value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.next_value}"
+
+class BackfillCheckpoint(models.Model):
+    """Progress of a batched backfill, so an interrupted run resumes after last_pk (see backfill)"""
+    name = models.CharField(max_length=100, unique=True)
+    last_pk = models.BigIntegerField(default=0)
+    processed = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name}: {self.processed} rows, last pk {self.last_pk}"
+
 class BitcoinWallet(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     address = models.CharField(max_length=100, unique=True, blank=True, null=True)
@@ -83,12 +83,9 @@ class BillPayment(models.Model):
     
     def generate_reference_number(self):
         """Generate a unique reference number for the payment"""
-        from django.utils.timezone import now
-        import random
+        from core.ids import new_identifier
         
-        timestamp = now().strftime('%y%m%d%H%M%S')
-        random_str = ''.join([str(random.randint(0, 9)) for _ in range(4)])
-        return f"BP{timestamp}{random_str}"
+        return new_identifier('BP')
 
 
 class Payee(models.Model):
@@ -148,11 +145,19 @@ class ScheduledPayment(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     reference = models.CharField(max_length=50, blank=True)
     notes = models.TextField(blank=True)
+    # Insufficient-funds retries of the current occurrence (see scheduled_payments)
+    failed_attempts = models.PositiveIntegerField(default=0)
+    retry_at = models.DateTimeField(null=True, blank=True)
+    last_failure_reason = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['next_payment_date']
+        indexes = [
+            # Due-payment scan of the executor
+            models.Index(fields=['status', 'next_payment_date']),
+        ]
     
     def __str__(self):
         return f"{self.payee.name} - {self.amount} ({self.get_frequency_display()})"
@@ -164,12 +169,9 @@ class ScheduledPayment(models.Model):
     
     def generate_reference(self):
         """Generate a unique reference for the scheduled payment"""
-        from django.utils.timezone import now
-        import random
+        from core.ids import new_identifier
         
-        timestamp = now().strftime('%y%m%d%H%M%S')
-        random_str = ''.join([str(random.randint(0, 9)) for _ in range(4)])
-        return f"SP{timestamp}{random_str}"
+        return new_identifier('SP')
     
     def calculate_next_payment_date(self):
         """Calculate the next payment date based on frequency"""
@@ -64,12 +64,9 @@ class LoanApplication(models.Model):
     
     def generate_application_number(self):
         """Generate a unique application number"""
-        from django.utils.timezone import now
-        import random
+        from core.ids import new_identifier
         
-        timestamp = now().strftime('%Y%m%d%H%M%S')
-        random_str = ''.join([str(random.randint(0, 9)) for _ in range(4)])
-        return f"LNA{timestamp}{random_str}"
+        return new_identifier('LNA')
 
 
 class LoanAccount(models.Model):
@@ -106,6 +103,11 @@ class LoanAccount(models.Model):
         null=True, 
         blank=True
     )
+    # Interest earned by the nightly accrual and not yet paid (see amortization)
+    accrued_interest = models.DecimalField(max_digits=15, decimal_places=4, default=0)
+    interest_accrued_through = models.DateField(null=True, blank=True)
+    # When the stored LoanScheduleEntry rows were built; None means they need rebuilding
+    schedule_generated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -122,12 +124,27 @@ class LoanAccount(models.Model):
     
     def generate_loan_number(self):
         """Generate a unique loan account number"""
-        from django.utils.timezone import now
-        import random
+        from core.ids import new_identifier
         
-        timestamp = now().strftime('%y%m%d')
-        random_str = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-        return f"LON{timestamp}{random_str}"
+        return new_identifier('LON')
+
+
+class LoanScheduleEntry(models.Model):
+    """One remaining installment of a loan's amortization schedule"""
+    loan = models.ForeignKey(LoanAccount, on_delete=models.CASCADE, related_name='schedule')
+    period = models.PositiveIntegerField()
+    due_date = models.DateField()
+    payment = models.DecimalField(max_digits=15, decimal_places=2)
+    principal = models.DecimalField(max_digits=15, decimal_places=2)
+    interest = models.DecimalField(max_digits=15, decimal_places=2)
+    balance = models.DecimalField(max_digits=15, decimal_places=2, help_text="Balance after this installment")
+    
+    class Meta:
+        ordering = ['loan', 'period']
+        unique_together = ['loan', 'period']
+    
+    def __str__(self):
+        return f"{self.loan.loan_number} #{self.period} - {self.payment}"
 
 
 class LoanPayment(models.Model):
@@ -182,9 +199,6 @@ class LoanPayment(models.Model):
     
     def generate_payment_number(self):
         """Generate a unique payment number"""
-        from django.utils.timezone import now
-        import random
+        from core.ids import new_identifier
         
-        timestamp = now().strftime('%y%m%d')
-        random_str = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-        return f"LPM{timestamp}{random_str}"
+        return new_identifier('LPM')
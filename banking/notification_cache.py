@@ -0,0 +1,130 @@
+"""
+Per-user unread notification counter and feed cache.
+
+Dashboard polling reads the unread count and the newest unread
+notifications from the cache instead of querying Notification on every
+refresh. Writers keep it current: a new notification increments the
+counter, marking one read decrements it, and bulk changes drop the
+user's keys so the next read rebuilds them from the
+(user, is_read, -created_at) index.
+
+Active broadcasts the user has no BroadcastReceipt for count as unread
+and appear in the feed too. Per-user keys carry a broadcasts version, so
+publishing, editing or deleting a broadcast (broadcasts_changed) retires
+every user's cached count and feed at once.
+
+Keys live in the USER_STATE_CACHE cache, sized for every active user.
+"""
+import logging
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Exists, Max, OuterRef, Q
+
+from .models import Broadcast, BroadcastReceipt, Notification
+
+logger = logging.getLogger(__name__)
+
+FEED_SIZE = 5
+BROADCASTS_VERSION_KEY = 'notifications:broadcasts_version'
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_STATE_CACHE', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'NOTIFICATION_CACHE_TIMEOUT', 300)
+
+
+def _broadcasts_version():
+    version = _cache().get(BROADCASTS_VERSION_KEY)
+    if version is None:
+        # Evicted: derive one from the broadcasts themselves
+        state = Broadcast.objects.aggregate(latest=Max('pk'), active=Count('pk', filter=Q(is_active=True)))
+        version = f"{state['latest'] or 0}-{state['active']}"
+        _cache().set(BROADCASTS_VERSION_KEY, version, None)
+    return version
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread_count:{user_id}:{_broadcasts_version()}"
+
+
+def feed_key(user_id):
+    return f"notifications:feed:{user_id}:{_broadcasts_version()}"
+
+
+def unread_broadcasts(user_id):
+    """Active broadcasts the user has not read"""
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user_id=user_id)
+    return Broadcast.objects.filter(is_active=True).exclude(Exists(receipts))
+
+
+def get_unread_count(user_id):
+    """Number of unread notifications and broadcasts for the user"""
+    key = unread_count_key(user_id)
+    count = _cache().get(key)
+    if count is None:
+        count = Notification.objects.filter(user_id=user_id, is_read=False).count()
+        count += unread_broadcasts(user_id).count()
+        _cache().set(key, count, _timeout())
+    return count
+
+
+def get_unread_feed(user_id):
+    """Newest FEED_SIZE unread notifications and broadcasts for the user"""
+    key = feed_key(user_id)
+    feed = _cache().get(key)
+    if feed is None:
+        notifications = list(
+            Notification.objects.filter(user_id=user_id, is_read=False).order_by('-created_at')[:FEED_SIZE]
+        )
+        broadcasts = list(unread_broadcasts(user_id).order_by('-created_at')[:FEED_SIZE])
+        for broadcast in broadcasts:
+            broadcast.is_read = False
+        feed = sorted(notifications + broadcasts, key=lambda item: item.created_at, reverse=True)[:FEED_SIZE]
+        _cache().set(key, feed, _timeout())
+    return feed
+
+
+def _adjust_count(user_id, delta):
+    try:
+        if delta > 0:
+            _cache().incr(unread_count_key(user_id), delta)
+        else:
+            count = _cache().decr(unread_count_key(user_id), -delta)
+            if count < 0:
+                _cache().delete(unread_count_key(user_id))
+    except ValueError:
+        # Not cached; the next read counts from the database
+        pass
+
+
+def notification_created(user_id):
+    """Record a new unread notification"""
+    _adjust_count(user_id, 1)
+    _cache().delete(feed_key(user_id))
+
+
+def notification_read(user_id):
+    """Record that one unread notification was marked read"""
+    _adjust_count(user_id, -1)
+    _cache().delete(feed_key(user_id))
+
+
+def broadcasts_changed():
+    """Retire every user's cached count and feed after a broadcast changes"""
+    _cache().set(BROADCASTS_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def invalidate(user_ids):
+    """Drop cached counters and feeds after bulk inserts or updates"""
+    if isinstance(user_ids, int):
+        user_ids = [user_ids]
+    keys = []
+    for user_id in set(user_ids):
+        keys.extend([unread_count_key(user_id), feed_key(user_id)])
+    if keys:
+        _cache().delete_many(keys)
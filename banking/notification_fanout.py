@@ -0,0 +1,208 @@
+"""
+Bulk notification fan-out.
+
+send_notification(user='all') and large querysets queue a
+NotificationFanoutJob instead of inserting one row per user in the
+request. The process_notification_fanouts command streams recipient ids
+and inserts notifications with bulk_create, one chunk per transaction,
+recording progress so an interrupted job resumes where it stopped.
+
+Announcements that do not need per-user copies should use
+send_broadcast, which writes a single Broadcast row; users only get a
+BroadcastReceipt row once they read it.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Notification, Broadcast, BroadcastReceipt, NotificationFanoutJob
+from . import notification_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _chunk_size():
+    return getattr(settings, 'NOTIFICATION_FANOUT_CHUNK_SIZE', 1000)
+
+
+def build_notifications(user_ids, notification_type, title, message, related_transaction=None):
+    return [
+        Notification(
+            user_id=user_id,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            related_transaction=related_transaction,
+        )
+        for user_id in user_ids
+    ]
+
+
+def bulk_notify(user_ids, notification_type, title, message, related_transaction=None, chunk_size=None):
+    """
+    Create one notification per user id with chunked bulk_create.
+
+    Returns:
+        list: The created notifications
+    """
+    chunk_size = chunk_size or _chunk_size()
+    notifications = build_notifications(user_ids, notification_type, title, message, related_transaction)
+    created = Notification.objects.bulk_create(notifications, batch_size=chunk_size)
+    # bulk_create sends no post_save, so drop the recipients' cached counters here
+    transaction.on_commit(lambda: notification_cache.invalidate(user_ids))
+    return created
+
+
+def queue_fanout(notification_type, title, message, related_transaction=None, user_ids=None):
+    """
+    Queue a fan-out job for background delivery.
+
+    Args:
+        user_ids (list): Recipient ids; None sends to every active user
+
+    Returns:
+        NotificationFanoutJob: The queued job
+    """
+    user_ids = sorted(set(user_ids)) if user_ids is not None else []
+    job = NotificationFanoutJob.objects.create(
+        notification_type=notification_type,
+        title=title,
+        message=message,
+        related_transaction=related_transaction,
+        user_ids=user_ids,
+    )
+    logger.info(f"Queued notification fan-out {job.pk} '{title}' for {len(user_ids) or 'all active'} users")
+    return job
+
+
+def _recipient_ids(job):
+    """Stream the job's remaining recipient ids in ascending order"""
+    if job.user_ids:
+        return (user_id for user_id in job.user_ids if user_id > job.last_user_id)
+
+    User = get_user_model()
+    return (
+        User.objects.filter(is_active=True, id__gt=job.last_user_id)
+        .order_by('id')
+        .values_list('id', flat=True)
+        .iterator(chunk_size=_chunk_size())
+    )
+
+
+def _count_recipients(job):
+    if job.user_ids:
+        return len(job.user_ids)
+    return get_user_model().objects.filter(is_active=True).count()
+
+
+def _write_chunk(job, user_ids):
+    # Notifications and the cursor commit together, so a resumed job never duplicates a chunk
+    with transaction.atomic():
+        bulk_notify(user_ids, job.notification_type, job.title, job.message, job.related_transaction)
+        job.processed_users += len(user_ids)
+        job.last_user_id = user_ids[-1]
+        NotificationFanoutJob.objects.filter(pk=job.pk).update(
+            processed_users=job.processed_users, last_user_id=job.last_user_id
+        )
+
+
+def run_job(job, max_chunks=None):
+    """
+    Deliver a claimed fan-out job in chunks.
+
+    Args:
+        max_chunks (int): Stop after this many chunks; the job stays
+            running and the next call continues from its cursor
+
+    Returns:
+        int: Number of notifications created by this call
+    """
+    chunk_size = _chunk_size()
+    created = chunks = 0
+    chunk = []
+    try:
+        for user_id in _recipient_ids(job):
+            chunk.append(user_id)
+            if len(chunk) < chunk_size:
+                continue
+            _write_chunk(job, chunk)
+            created += len(chunk)
+            chunks += 1
+            chunk = []
+            if max_chunks and chunks >= max_chunks:
+                logger.info(f"Fan-out {job.pk} paused at {job.progress}%")
+                return created
+        if chunk:
+            _write_chunk(job, chunk)
+            created += len(chunk)
+    except Exception as e:
+        logger.error(f"Fan-out {job.pk} failed after {job.processed_users} users: {str(e)}", exc_info=True)
+        NotificationFanoutJob.objects.filter(pk=job.pk).update(status='failed', error=str(e))
+        job.status = 'failed'
+        raise
+
+    job.status = 'completed'
+    job.completed_at = timezone.now()
+    NotificationFanoutJob.objects.filter(pk=job.pk).update(status='completed', completed_at=job.completed_at)
+    logger.info(f"Fan-out {job.pk} completed: {job.processed_users} notifications")
+    return created
+
+
+def run_pending_jobs(max_chunks_per_job=None):
+    """
+    Claim and run queued fan-out jobs, continuing running ones first.
+
+    Returns:
+        int: Number of notifications created
+    """
+    created = 0
+    for job in NotificationFanoutJob.objects.filter(status__in=['running', 'pending']).order_by('-status', 'created_at'):
+        if job.status == 'pending':
+            # Conditional update so two workers cannot start the same job
+            claimed = NotificationFanoutJob.objects.filter(pk=job.pk, status='pending').update(
+                status='running', started_at=timezone.now(), total_users=_count_recipients(job)
+            )
+            if not claimed:
+                continue
+            job.refresh_from_db()
+        try:
+            created += run_job(job, max_chunks=max_chunks_per_job)
+        except Exception:
+            continue
+    return created
+
+
+def send_broadcast(notification_type, title, message):
+    """Publish a notification to every user as a single shared row"""
+    broadcast = Broadcast.objects.create(notification_type=notification_type, title=title, message=message)
+    logger.info(f"Broadcast {broadcast.pk} '{title}' published")
+    return broadcast
+
+
+def get_broadcasts_for_user(user):
+    """Active broadcasts annotated with is_read for the given user"""
+    receipts = BroadcastReceipt.objects.filter(broadcast=OuterRef('pk'), user=user)
+    return Broadcast.objects.filter(is_active=True).annotate(is_read=Exists(receipts))
+
+
+def mark_broadcast_read(user, broadcast):
+    """Record a read receipt; returns True if the broadcast was unread"""
+    _, created = BroadcastReceipt.objects.get_or_create(broadcast=broadcast, user=user)
+    if created:
+        notification_cache.notification_read(user.id)
+    return created
+
+
+def mark_all_broadcasts_read(user):
+    """Record read receipts for every unread active broadcast; returns how many"""
+    receipts = [
+        BroadcastReceipt(broadcast_id=pk, user=user)
+        for pk in notification_cache.unread_broadcasts(user.id).values_list('pk', flat=True)
+    ]
+    BroadcastReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+    notification_cache.invalidate(user.id)
+    return len(receipts)
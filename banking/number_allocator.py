@@ -0,0 +1,198 @@
+"""
+Account and card number allocation.
+
+Account and card numbers used to be random digits that relied on the
+unique constraint, so collisions surfaced as IntegrityErrors under load.
+Numbers are now drawn from NumberSequence series:
+- A process reserves a block of serials with one UPDATE ... SET
+  next_value = next_value + block and then hands them out with an
+  in-memory increment, so two processes can never issue the same serial
+- Serials already taken by legacy random numbers are looked up once per
+  block and skipped
+- Every number ends in a Luhn check digit: cards are BIN + serial +
+  check digit (16 digits), accounts are serial + check digit (10 digits)
+
+A block reserved inside a transaction is only trusted once that
+transaction commits; if it rolls back (the reservation is undone with
+it) the block is dropped and a new one is reserved. Blocks are kept per
+thread, since each thread has its own connection and transaction, and
+are dropped in forked children.
+"""
+import logging
+import os
+import threading
+import weakref
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CARD_BINS = {'visa': '453201', 'mastercard': '532101'}
+
+
+def _block_size():
+    return getattr(settings, 'NUMBER_ALLOCATOR_BLOCK_SIZE', 1000)
+
+
+def luhn_check_digit(payload):
+    """Check digit that makes payload + digit pass the Luhn test"""
+    total = 0
+    # Double every second digit from the right, starting with the last payload digit
+    for position, char in enumerate(reversed(payload)):
+        digit = int(char)
+        if position % 2 == 0:
+            digit *= 2
+            if digit > 9:
+                digit -= 9
+        total += digit
+    return str((10 - total % 10) % 10)
+
+
+def is_luhn_valid(number):
+    return number.isdigit() and luhn_check_digit(number[:-1]) == number[-1]
+
+
+class _Block:
+    """Serials [next, end) reserved by one transaction"""
+
+    def __init__(self, start, end, taken, in_transaction):
+        self.next = start
+        self.end = end
+        self.taken = taken
+        self.confirmed = not in_transaction
+        self.rolled_back = False
+        if in_transaction:
+            # Only Django holds the callback: it is released after running on
+            # commit, or dropped with the transaction or savepoint on rollback
+            confirm = self._confirm
+            transaction.on_commit(confirm)
+            weakref.finalize(confirm, self._released)
+
+    def _confirm(self):
+        self.confirmed = True
+
+    def _released(self):
+        if not self.confirmed:
+            self.rolled_back = True
+
+    def usable(self):
+        return self.next < self.end and not self.rolled_back
+
+
+class NumberAllocator:
+    """
+    Issues numbers of one series: prefix + zero-padded serial + Luhn digit.
+
+    Args:
+        name: NumberSequence name
+        serial_digits: Width of the serial
+        prefix: Fixed leading digits, e.g. a card BIN
+        start: First serial of a new series
+        existing: Callable taking candidate numbers and returning those already in use
+    """
+
+    def __init__(self, name, serial_digits, prefix='', start=0, existing=None):
+        self.name = name
+        self.serial_digits = serial_digits
+        self.prefix = prefix
+        self.start = start
+        self.existing = existing
+        self.limit = 10 ** serial_digits
+        self._local = threading.local()
+
+    def reset(self):
+        """Drop reserved blocks; used in forked children"""
+        self._local = threading.local()
+
+    def format(self, serial):
+        payload = f"{self.prefix}{serial:0{self.serial_digits}d}"
+        return payload + luhn_check_digit(payload)
+
+    def _reserve(self):
+        from .models import NumberSequence
+
+        size = _block_size()
+        with transaction.atomic():
+            series = NumberSequence.objects.filter(name=self.name)
+            if not series.update(next_value=F('next_value') + size, updated_at=timezone.now()):
+                try:
+                    with transaction.atomic():
+                        NumberSequence.objects.create(name=self.name, next_value=self.start + size)
+                except IntegrityError:
+                    # Created concurrently; reserve from it
+                    series.update(next_value=F('next_value') + size, updated_at=timezone.now())
+            end = series.values_list('next_value', flat=True).get()
+        start = end - size
+        if end > self.limit:
+            raise OverflowError(f"Number series {self.name} is exhausted")
+
+        taken = set()
+        if self.existing is not None:
+            candidates = [self.format(serial) for serial in range(start, end)]
+            taken = set(self.existing(candidates))
+
+        block = _Block(start, end, taken, connection.in_atomic_block)
+        logger.debug(f"Reserved {self.name} serials {start}-{end - 1}")
+        return block
+
+    def allocate(self):
+        """Next number of the series; one query per block, none otherwise"""
+        while True:
+            block = getattr(self._local, 'block', None)
+            if block is None or not block.usable():
+                block = self._local.block = self._reserve()
+            number = self.format(block.next)
+            block.next += 1
+            if number not in block.taken:
+                return number
+
+
+def _existing_account_numbers(candidates):
+    from .models import Account
+    return Account.objects.filter(account_number__in=candidates).values_list('account_number', flat=True)
+
+
+def _existing_card_numbers(candidates):
+    from .models import VirtualCard
+    return VirtualCard.objects.filter(card_number__in=candidates).values_list('card_number', flat=True)
+
+
+# 9-digit serial + check digit; starting at 10^8 keeps account numbers free of leading zeros
+account_numbers = NumberAllocator('account_number', 9, start=10 ** 8, existing=_existing_account_numbers)
+
+_card_allocators = {}
+_card_lock = threading.Lock()
+
+
+def card_numbers(card_type='visa'):
+    """Allocator for a card type's BIN: 6-digit BIN + 9-digit serial + check digit"""
+    bins = getattr(settings, 'CARD_BINS', DEFAULT_CARD_BINS)
+    bin_prefix = bins.get(card_type, bins['visa'])
+    with _card_lock:
+        if bin_prefix not in _card_allocators:
+            _card_allocators[bin_prefix] = NumberAllocator(
+                f'card_number:{bin_prefix}', 15 - len(bin_prefix), prefix=bin_prefix,
+                existing=_existing_card_numbers,
+            )
+        return _card_allocators[bin_prefix]
+
+
+def allocate_account_number():
+    return account_numbers.allocate()
+
+
+def allocate_card_number(card_type='visa'):
+    return card_numbers(card_type).allocate()
+
+
+def _reset_after_fork():
+    account_numbers.reset()
+    for allocator in _card_allocators.values():
+        allocator.reset()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
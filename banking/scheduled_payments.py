@@ -0,0 +1,316 @@
+"""
+Execution of due ScheduledPayments.
+
+ScheduledPaymentExecutor posts every active schedule whose
+next_payment_date has arrived, a chunk at a time:
+- A chunk of due schedules is claimed with SELECT ... FOR UPDATE SKIP
+  LOCKED, so any number of executor processes can run side by side and
+  never claim the same schedule; the paying accounts are then locked in
+  primary key order
+- Payments are posted with bulk_create, balances with one executemany
+  and schedules with one UPDATE per distinct new state, in the claiming
+  transaction; advancing next_payment_date in that transaction is what
+  releases the claim
+- A payment the account cannot cover is retried every
+  SCHEDULED_PAYMENT_RETRY_SECONDS, up to SCHEDULED_PAYMENT_MAX_RETRIES
+  times; then a recurring schedule skips that occurrence and a one-time
+  payment is paused. The user is notified on the first failure and when
+  the occurrence is given up
+- Each occurrence posts one Transaction referenced <schedule>-<YYYYMMDD>.
+  References already posted are looked up once per chunk and those
+  occurrences are advanced unpaid, so a replayed occurrence can neither
+  pay twice nor fail the chunk on the unique reference
+
+Schedules that missed several occurrences (e.g. the executor was down)
+catch up one occurrence per claim until they are current. Occurrences
+missed while a schedule was paused are skipped when it is resumed
+(skip_missed), so resuming never pays a backlog.
+"""
+import logging
+import multiprocessing
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.event_bus import publish_user_event
+from .models import Account, Notification, Transaction
+from .models_bills import ScheduledPayment
+from . import notification_cache
+
+logger = logging.getLogger(__name__)
+
+SCHEDULE_FIELDS = ['next_payment_date', 'status', 'failed_attempts', 'retry_at', 'last_failure_reason', 'updated_at']
+
+
+def _chunk_size():
+    return getattr(settings, 'SCHEDULED_PAYMENT_CHUNK_SIZE', 500)
+
+
+def _retry_seconds():
+    return getattr(settings, 'SCHEDULED_PAYMENT_RETRY_SECONDS', 6 * 60 * 60)
+
+
+def _max_retries():
+    return getattr(settings, 'SCHEDULED_PAYMENT_MAX_RETRIES', 3)
+
+
+def _drain(as_of, chunk_size):
+    """Worker entry point; module level so the pool can pickle it"""
+    return ScheduledPaymentExecutor.drain(as_of, chunk_size)
+
+
+class ScheduledPaymentExecutor:
+    """Claim and post due scheduled payments"""
+
+    @staticmethod
+    def due(as_of, now=None):
+        """Active schedules due on or before as_of and not waiting for a retry"""
+        now = now or timezone.now()
+        return ScheduledPayment.objects.filter(
+            status='active', next_payment_date__lte=as_of,
+        ).filter(Q(retry_at__isnull=True) | Q(retry_at__lte=now))
+
+    @staticmethod
+    def advance(schedule):
+        """Move to the next occurrence, or complete the schedule after its last one"""
+        next_date = schedule.calculate_next_payment_date()
+        if next_date is None or (schedule.end_date and next_date > schedule.end_date):
+            schedule.status = 'completed'
+        else:
+            schedule.next_payment_date = next_date
+        schedule.failed_attempts = 0
+        schedule.retry_at = None
+
+    @staticmethod
+    def skip_missed(schedule, as_of=None):
+        """
+        Roll a resumed schedule forward to its first occurrence on or after as_of.
+
+        Occurrences that fell due while the schedule was paused are dropped
+        rather than paid back to back; a one-time payment keeps its date.
+        """
+        as_of = as_of or timezone.localdate()
+        while schedule.status == 'active' and schedule.frequency != 'once' and schedule.next_payment_date < as_of:
+            ScheduledPaymentExecutor.advance(schedule)
+
+    @staticmethod
+    def occurrence_reference(schedule):
+        """Reference of the Transaction paying the schedule's current occurrence"""
+        return f"{schedule.reference}-{schedule.next_payment_date:%Y%m%d}"
+
+    @staticmethod
+    def execute_chunk(as_of=None, chunk_size=None):
+        """
+        Claim and post one chunk of due payments.
+
+        Returns:
+            Counter: claimed, paid, already_paid, retrying, skipped and paused schedules
+        """
+        as_of = as_of or timezone.localdate()
+        chunk_size = chunk_size or _chunk_size()
+        counts = Counter()
+        now = timezone.now()
+
+        with transaction.atomic():
+            schedules = list(
+                ScheduledPaymentExecutor.due(as_of, now)
+                .select_related('payee')
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('next_payment_date', 'pk')[:chunk_size]
+            )
+            if not schedules:
+                return counts
+            counts['claimed'] = len(schedules)
+            references = {schedule.pk: ScheduledPaymentExecutor.occurrence_reference(schedule) for schedule in schedules}
+            posted = set(
+                Transaction.objects.filter(reference__in=references.values()).values_list('reference', flat=True)
+            )
+
+            # Lock the paying accounts in pk order so concurrent executors cannot deadlock
+            accounts = {
+                account.pk: account
+                for account in Account.objects.select_for_update()
+                .filter(pk__in={schedule.account_id for schedule in schedules})
+                .order_by('pk')
+            }
+
+            transactions = []
+            notifications = []
+            debited = {}
+            for schedule in schedules:
+                account = accounts[schedule.account_id]
+                payee = schedule.payee.name
+                if references[schedule.pk] in posted:
+                    # Already paid, e.g. next_payment_date was moved back onto a paid date
+                    logger.warning(f"Scheduled payment {references[schedule.pk]} was already posted; advancing")
+                    ScheduledPaymentExecutor.advance(schedule)
+                    counts['already_paid'] += 1
+                    continue
+                if account.user_id != schedule.user_id:
+                    # Never pay from someone else's account
+                    schedule.status = 'paused'
+                    schedule.last_failure_reason = 'Account does not belong to the user'
+                    counts['paused'] += 1
+                    continue
+                if schedule.amount > account.balance:
+                    outcome = ScheduledPaymentExecutor._failed(schedule, now, 'Insufficient funds', notifications)
+                    counts[outcome] += 1
+                    continue
+
+                account.balance -= schedule.amount
+                account.updated_at = now
+                debited[account.pk] = account
+                transactions.append(Transaction(
+                    user_id=schedule.user_id,
+                    from_account=account,
+                    transaction_type='payment',
+                    amount=schedule.amount,
+                    description=f"Scheduled payment to {payee}",
+                    reference=references[schedule.pk],
+                    status='completed',
+                    created_at=now,
+                ))
+                notifications.append(Notification(
+                    user_id=schedule.user_id,
+                    notification_type='transaction',
+                    title=f"Scheduled Payment Sent: {schedule.amount}",
+                    message=f"Your scheduled payment of {schedule.amount} to {payee} was sent.",
+                ))
+                schedule.last_failure_reason = ''
+                ScheduledPaymentExecutor.advance(schedule)
+                counts['paid'] += 1
+
+            Transaction.objects.bulk_create(transactions)
+            ScheduledPaymentExecutor._save_balances(debited.values(), now)
+            ScheduledPaymentExecutor._save_schedules(schedules, now)
+            Notification.objects.bulk_create(notifications)
+
+            user_ids = {schedule.user_id for schedule in schedules}
+            transaction.on_commit(lambda: notification_cache.invalidate(user_ids))
+
+            from dashboard.snapshot import DashboardSnapshot
+            transaction.on_commit(lambda: DashboardSnapshot.invalidate(user_ids))
+
+            for account in debited.values():
+                publish_user_event(account.user_id, 'balance', {
+                    'account_id': account.id,
+                    'account_type': account.account_type,
+                    'balance': account.balance,
+                })
+
+        return counts
+
+    @staticmethod
+    def _save_balances(accounts, now):
+        """
+        Write the debited balances with one executemany.
+
+        Balances differ per account, and bulk_update builds a CASE branch per
+        row in Python, which costs more than the payments themselves.
+        """
+        meta = Account._meta
+        balance, updated_at = meta.get_field('balance'), meta.get_field('updated_at')
+        quote = connection.ops.quote_name
+        sql = (
+            f"UPDATE {quote(meta.db_table)} SET {quote(balance.column)} = %s, {quote(updated_at.column)} = %s "
+            f"WHERE {quote(meta.pk.column)} = %s"
+        )
+        stamp = updated_at.get_db_prep_save(now, connection)
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (balance.get_db_prep_save(account.balance, connection), stamp, account.pk)
+                for account in accounts
+            ])
+
+    @staticmethod
+    def _save_schedules(schedules, now):
+        """
+        Write the schedules' new state with one UPDATE per distinct state.
+
+        Schedules due together mostly advance to the same date with the same
+        status, so a chunk takes a handful of UPDATE ... WHERE pk IN (...)
+        statements, far cheaper to build than bulk_update's per-row CASE.
+        """
+        groups = {}
+        for schedule in schedules:
+            schedule.updated_at = now
+            state = tuple(getattr(schedule, field) for field in SCHEDULE_FIELDS)
+            groups.setdefault(state, []).append(schedule.pk)
+        for state, pks in groups.items():
+            ScheduledPayment.objects.filter(pk__in=pks).update(**dict(zip(SCHEDULE_FIELDS, state)))
+
+    @staticmethod
+    def _failed(schedule, now, reason, notifications):
+        """Schedule a retry, or give the occurrence up; returns the outcome counted"""
+        schedule.failed_attempts += 1
+        schedule.last_failure_reason = reason
+        payee = schedule.payee.name
+        if schedule.failed_attempts <= _max_retries():
+            schedule.retry_at = now + timedelta(seconds=_retry_seconds())
+            if schedule.failed_attempts == 1:
+                notifications.append(Notification(
+                    user_id=schedule.user_id,
+                    notification_type='transaction',
+                    title=f"Scheduled Payment Delayed: {schedule.amount}",
+                    message=f"Your scheduled payment of {schedule.amount} to {payee} could not be sent "
+                            f"({reason.lower()}). We will try again.",
+                ))
+            return 'retrying'
+
+        if schedule.frequency == 'once':
+            schedule.status = 'paused'
+            schedule.failed_attempts = 0
+            schedule.retry_at = None
+            outcome = 'paused'
+        else:
+            ScheduledPaymentExecutor.advance(schedule)
+            outcome = 'skipped'
+        notifications.append(Notification(
+            user_id=schedule.user_id,
+            notification_type='transaction',
+            title=f"Scheduled Payment Failed: {schedule.amount}",
+            message=f"Your scheduled payment of {schedule.amount} to {payee} could not be sent "
+                    f"({reason.lower()}) and was not paid.",
+        ))
+        return outcome
+
+    @staticmethod
+    def drain(as_of=None, chunk_size=None):
+        """Execute chunks until nothing is due; returns the summed counts"""
+        totals = Counter()
+        while True:
+            counts = ScheduledPaymentExecutor.execute_chunk(as_of, chunk_size)
+            if not counts['claimed']:
+                return totals
+            totals.update(counts)
+
+    @staticmethod
+    def run(as_of=None, chunk_size=None, workers=1):
+        """
+        Post every payment due on or before as_of.
+
+        Args:
+            as_of: Business date; defaults to today
+            chunk_size: Schedules claimed per transaction
+            workers: Processes claiming chunks in parallel
+
+        Returns:
+            Counter: claimed, paid, already_paid, retrying, skipped and paused schedules
+        """
+        as_of = as_of or timezone.localdate()
+        if workers > 1 and not connection.features.has_select_for_update_skip_locked:
+            logger.warning(f"{connection.vendor} cannot SKIP LOCKED; executing scheduled payments in one process")
+            workers = 1
+        if workers <= 1:
+            totals = ScheduledPaymentExecutor.drain(as_of, chunk_size)
+        else:
+            # Children must not share this process's database connections
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                totals = sum(pool.starmap(_drain, [(as_of, chunk_size)] * workers), Counter())
+        logger.info(f"Scheduled payments due by {as_of}: {dict(totals)}")
+        return totals
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Transaction, Account, BitcoinWallet
+from django.db import transaction
+from .models import Transaction, Account, BitcoinWallet, Notification, Broadcast
+from . import notification_cache
+from core.event_bus import publish_user_event
 from .utils import send_notification
 from accounts.models import CustomUser
 import secrets
@@ -13,25 +16,73 @@ User = get_user_model()
 def notify_transaction_created(sender, instance, created, **kwargs):
     """Send notification when a transaction is created"""
     if created:
+        # Both accounts and owners in one query instead of one per dereference
+        from_account, to_account = instance.load_accounts()
+        if not from_account or not to_account:
+            return
+        sender, recipient = from_account.user, to_account.user
+        if sender == recipient:
+            return
+        
         # Notify sender
-        if instance.from_account and instance.from_account.user != instance.to_account.user:
-            send_notification(
-                user=instance.from_account.user,
-                notification_type='transaction',
-                title=f"Transaction Sent: {instance.amount}",
-                message=f"You sent {instance.amount} to {instance.to_account.user.get_full_name() or instance.to_account.user.email}.",
-                related_transaction=instance
-            )
+        send_notification(
+            user=sender,
+            notification_type='transaction',
+            title=f"Transaction Sent: {instance.amount}",
+            message=f"You sent {instance.amount} to {recipient.get_full_name() or recipient.email}.",
+            related_transaction=instance
+        )
         
         # Notify recipient
-        if instance.to_account and instance.to_account.user != instance.from_account.user:
-            send_notification(
-                user=instance.to_account.user,
-                notification_type='transaction',
-                title=f"Transaction Received: {instance.amount}",
-                message=f"You received {instance.amount} from {instance.from_account.user.get_full_name() or instance.from_account.user.email}.",
-                related_transaction=instance
-            )
+        send_notification(
+            user=recipient,
+            notification_type='transaction',
+            title=f"Transaction Received: {instance.amount}",
+            message=f"You received {instance.amount} from {sender.get_full_name() or sender.email}.",
+            related_transaction=instance
+        )
+
+@receiver(post_save, sender=Notification)
+def update_notification_cache(sender, instance, created, **kwargs):
+    """Count new unread notifications once they are committed"""
+    if created and not instance.is_read:
+        transaction.on_commit(lambda: notification_cache.notification_created(instance.user_id))
+        publish_user_event(instance.user_id, 'notification', {
+            'id': instance.id,
+            'notification_type': instance.notification_type,
+            'title': instance.title,
+            'message': instance.message,
+        })
+
+@receiver(post_save, sender=Broadcast)
+@receiver(post_delete, sender=Broadcast)
+def update_broadcast_cache(sender, instance, **kwargs):
+    """Every user's unread count and feed include broadcasts"""
+    transaction.on_commit(notification_cache.broadcasts_changed)
+
+@receiver(post_save, sender=Account)
+def push_balance_update(sender, instance, **kwargs):
+    """Push the account's balance to the owner's open dashboards"""
+    publish_user_event(instance.user_id, 'balance', {
+        'account_id': instance.id,
+        'account_type': instance.account_type,
+        'balance': instance.balance,
+    })
+
+@receiver(post_save, sender=Transaction)
+def push_transaction_update(sender, instance, created, **kwargs):
+    """Push new and updated transactions to every involved user's dashboards"""
+    data = {
+        'id': instance.id,
+        'reference': instance.reference,
+        'transaction_type': instance.transaction_type,
+        'status': instance.status,
+        'amount': instance.amount,
+        'created': created,
+        'created_at': instance.created_at,
+    }
+    for user_id in instance.get_involved_user_ids():
+        publish_user_event(user_id, 'transaction', data)
 
 @receiver(post_save, sender=Account)
 def notify_account_updated(sender, instance, created, **kwargs):
@@ -49,12 +100,9 @@ def notify_account_updated(sender, instance, created, **kwargs):
 def create_user_accounts(sender, instance, created, **kwargs):
     """Create accounts for new users"""
     if created:
-        import uuid
-        
-        # Create a single checking account with a unique account number
+        # Create a single checking account; Account.save allocates its number
         account = Account.objects.create(
             user=instance,
-            account_number=f"PT{uuid.uuid4().hex[:8].upper()}",
             account_type='checking',
             balance=0.00
         )
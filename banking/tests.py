@@ -1 +1,862 @@
+import asyncio
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+from unittest.mock import patch
 
+from dateutil.relativedelta import relativedelta
+from django.core.cache import caches
+from django.db import transaction, connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from accounts.utils import send_verification_email
+from core.event_bus import LocalEventBus, user_channel
+from dashboard.views_events import stream_events
+from .models import (
+    Account, Transaction, EmailOutbox, Notification, NotificationFanoutJob, BroadcastReceipt, NumberSequence,
+    BitcoinWallet, VirtualCard, BackfillCheckpoint,
+)
+from .email_outbox import enqueue_email, process_outbox
+from . import notification_cache
+from .notification_fanout import (
+    run_pending_jobs, send_broadcast, get_broadcasts_for_user, mark_broadcast_read, mark_all_broadcasts_read,
+)
+from .utils import send_transaction_notification, send_notification, generate_reference_number
+from .number_allocator import NumberAllocator, is_luhn_valid, luhn_check_digit
+from .bulk_onboarding import BulkOnboardingService, read_records
+from .backfill import BitcoinWalletBackfill
+from .models_bills import Payee, ScheduledPayment
+from .models_loans import LoanAccount, LoanApplication, LoanScheduleEntry
+from . import amortization
+from .scheduled_payments import ScheduledPaymentExecutor
+
+
+class EmailOutboxTestCase(TestCase):
+    """Tests for the transactional email outbox"""
+
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(
+            username='outboxsender', email='sender@example.com', password='TestPassword123!',
+            first_name='Sender', last_name='User'
+        )
+        self.recipient = CustomUser.objects.create_user(
+            username='outboxrecipient', email='recipient@example.com', password='TestPassword123!',
+            first_name='Recipient', last_name='User'
+        )
+        self.transaction = Transaction.objects.create(
+            user=self.sender,
+            from_account=Account.objects.filter(user=self.sender).first() or Account.objects.create(user=self.sender),
+            to_account=Account.objects.filter(user=self.recipient).first() or Account.objects.create(user=self.recipient),
+            amount=Decimal('25.00'),
+            transaction_type='transfer',
+            status='completed',
+            reference=generate_reference_number()
+        )
+        EmailOutbox.objects.all().delete()
+
+    @patch('banking.email_outbox.send_gmail_batch')
+    def test_notification_is_queued_not_sent(self, mock_send_gmail):
+        """The request path only writes an outbox row"""
+        self.assertTrue(send_transaction_notification(self.sender, self.transaction, is_sender=True))
+
+        mock_send_gmail.assert_not_called()
+        email = EmailOutbox.objects.get()
+        self.assertEqual(email.to_email, 'sender@example.com')
+        self.assertEqual(email.status, 'pending')
+        self.assertIn('Money Sent', email.subject)
+
+    def test_dedup_key_prevents_duplicates(self):
+        send_transaction_notification(self.sender, self.transaction, is_sender=True)
+        send_transaction_notification(self.sender, self.transaction, is_sender=True)
+        send_transaction_notification(self.recipient, self.transaction, is_sender=False)
+
+        self.assertEqual(EmailOutbox.objects.count(), 2)
+
+    def test_rolled_back_transaction_sends_nothing(self):
+        try:
+            with transaction.atomic():
+                send_transaction_notification(self.sender, self.transaction, is_sender=True)
+                raise ValueError('transfer failed')
+        except ValueError:
+            pass
+
+        self.assertFalse(EmailOutbox.objects.exists())
+
+    @patch('banking.email_outbox.send_gmail_batch', side_effect=lambda messages: [(True, 'msg-123')] * len(messages))
+    def test_worker_delivers_pending_emails(self, mock_send_gmail):
+        for i in range(3):
+            enqueue_email(f'user{i}@example.com', 'Hello', 'Body', email_type='test')
+
+        self.assertEqual(process_outbox(batch_size=10, workers=2), (3, 0, 0))
+        self.assertEqual(mock_send_gmail.call_count, 1)
+        self.assertEqual(len(mock_send_gmail.call_args.args[0]), 3)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent', provider_message_id='msg-123').count(), 3)
+
+    @patch('banking.email_outbox.EmailMultiAlternatives.send', side_effect=Exception('SMTP down'))
+    @patch('banking.email_outbox.send_gmail_batch', side_effect=lambda messages: [(False, 'quota exceeded')] * len(messages))
+    def test_failed_delivery_is_retried_with_backoff(self, mock_send_gmail, mock_send):
+        email = enqueue_email('user@example.com', 'Hello', 'Body', email_type='test')
+
+        self.assertEqual(process_outbox(), (0, 0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'pending')
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(email.last_error, 'SMTP down')
+
+        # Not due yet, so nothing is claimed
+        self.assertEqual(process_outbox(), (0, 0, 0))
+
+        EmailOutbox.objects.update(next_attempt_at=timezone.now(), attempts=email.max_attempts - 1)
+        self.assertEqual(process_outbox(), (0, 1, 0))
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'failed')
+
+    @patch('banking.email_outbox.send_gmail_batch', side_effect=lambda messages: [(True, 'msg-123')] * len(messages))
+    def test_verification_code_is_redacted_once_sent(self, mock_send_gmail):
+        self.assertTrue(send_verification_email(self.sender, '482913', is_login=True))
+        email = EmailOutbox.objects.get()
+        self.assertNotIn('482913', email.dedup_key)
+        self.assertIn('482913', email.text_body)
+
+        self.assertEqual(process_outbox(), (1, 0, 0))
+        self.assertIn('482913', mock_send_gmail.call_args.args[0][0]['text_content'])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.text_body, email.html_body), ('sent', '', ''))
+
+
+@override_settings(NOTIFICATION_FANOUT_CHUNK_SIZE=3, NOTIFICATION_FANOUT_INLINE_LIMIT=4)
+class NotificationFanoutTestCase(TestCase):
+    """Tests for bulk notification fan-out and broadcasts"""
+
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(
+                username=f'fanout{i}', email=f'fanout{i}@example.com', password='TestPassword123!'
+            )
+            for i in range(7)
+        ]
+        CustomUser.objects.filter(pk=self.users[-1].pk).update(is_active=False)
+        Notification.objects.all().delete()
+
+    def test_send_to_all_queues_job(self):
+        job = send_notification('all', 'general', 'Maintenance', 'Tonight at 10pm')
+
+        self.assertIsInstance(job, NotificationFanoutJob)
+        self.assertFalse(Notification.objects.exists())
+
+        run_pending_jobs()
+        job.refresh_from_db()
+        active = CustomUser.objects.filter(is_active=True).count()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual((job.processed_users, job.total_users, job.progress), (active, active, 100))
+        self.assertEqual(Notification.objects.filter(title='Maintenance').count(), active)
+        self.assertFalse(Notification.objects.filter(user=self.users[-1]).exists())
+
+    def test_job_resumes_from_cursor(self):
+        job = send_notification('all', 'general', 'Maintenance', 'Tonight at 10pm')
+
+        run_pending_jobs(max_chunks_per_job=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed_users), ('running', 3))
+
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        user_ids = list(Notification.objects.values_list('user_id', flat=True))
+        self.assertEqual(len(user_ids), len(set(user_ids)))
+
+    def test_small_queryset_uses_bulk_insert(self):
+        users = CustomUser.objects.filter(pk__in=[user.pk for user in self.users[:4]])
+
+        with CaptureQueriesContext(connection) as queries:
+            notifications = send_notification(users, 'general', 'Hello', 'Hi there')
+
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "banking_notification"')]
+        self.assertEqual(len(notifications), 4)
+        self.assertEqual(len(inserts), 2)
+
+    def test_large_queryset_is_queued(self):
+        job = send_notification(CustomUser.objects.filter(username__startswith='fanout'), 'general', 'Hello', 'Hi')
+
+        self.assertIsInstance(job, NotificationFanoutJob)
+        self.assertEqual(len(job.user_ids), 7)
+
+    def test_broadcast_read_receipts(self):
+        broadcast = send_broadcast('general', 'New feature', 'Try it out')
+        user = self.users[0]
+
+        self.assertFalse(get_broadcasts_for_user(user).get(pk=broadcast.pk).is_read)
+        self.assertTrue(mark_broadcast_read(user, broadcast))
+        self.assertFalse(mark_broadcast_read(user, broadcast))
+        self.assertTrue(get_broadcasts_for_user(user).get(pk=broadcast.pk).is_read)
+        self.assertFalse(get_broadcasts_for_user(self.users[1]).get(pk=broadcast.pk).is_read)
+        self.assertEqual(BroadcastReceipt.objects.count(), 1)
+        self.assertFalse(Notification.objects.exists())
+
+
+class NotificationCacheTestCase(TestCase):
+    """Tests for the cached unread counter and feed"""
+
+    def setUp(self):
+        caches['user_state'].clear()
+        self.user = CustomUser.objects.create_user(
+            username='cacheuser', email='cache@example.com', password='TestPassword123!'
+        )
+        Notification.objects.filter(user=self.user).delete()
+        caches['user_state'].clear()
+
+    def notify(self, title):
+        with self.captureOnCommitCallbacks(execute=True):
+            return send_notification(self.user, 'general', title, 'Message')
+
+    def test_counter_follows_create_and_read(self):
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 0)
+        first = self.notify('First')
+        self.notify('Second')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(notification_cache.get_unread_count(self.user.id), 2)
+        self.assertFalse([q for q in queries.captured_queries if 'banking_notification' in q['sql']])
+        # Kept out of the small default cache
+        key = notification_cache.unread_count_key(self.user.id)
+        self.assertEqual(caches['user_state'].get(key), 2)
+        self.assertIsNone(caches['default'].get(key))
+
+        first.is_read = True
+        first.save()
+        notification_cache.notification_read(self.user.id)
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 1)
+
+    def test_feed_cached_until_changed(self):
+        self.notify('First')
+        self.assertEqual([n.title for n in notification_cache.get_unread_feed(self.user.id)], ['First'])
+
+        with CaptureQueriesContext(connection) as queries:
+            notification_cache.get_unread_feed(self.user.id)
+        self.assertFalse([q for q in queries.captured_queries if 'banking_notification' in q['sql']])
+
+        self.notify('Second')
+        self.assertEqual([n.title for n in notification_cache.get_unread_feed(self.user.id)], ['Second', 'First'])
+
+    def test_broadcasts_count_as_unread_until_read(self):
+        self.notify('Personal')
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 1)
+
+        # Publishing retires every user's cached count and feed
+        with self.captureOnCommitCallbacks(execute=True):
+            broadcast = send_broadcast('general', 'Maintenance', 'Tonight at 10pm')
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 2)
+        feed = notification_cache.get_unread_feed(self.user.id)
+        self.assertEqual([(item.title, item.is_broadcast) for item in feed], [('Maintenance', True), ('Personal', False)])
+
+        self.assertTrue(mark_broadcast_read(self.user, broadcast))
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 1)
+        self.assertEqual([item.title for item in notification_cache.get_unread_feed(self.user.id)], ['Personal'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_broadcast('general', 'Holiday hours', 'Closed Monday')
+        self.assertEqual(mark_all_broadcasts_read(self.user), 1)
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 1)
+
+    def test_bulk_insert_invalidates_cache(self):
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            send_notification(CustomUser.objects.filter(pk=self.user.pk), 'general', 'Bulk', 'Message')
+
+        self.assertEqual(notification_cache.get_unread_count(self.user.id), 1)
+
+
+class DashboardEventsTestCase(TestCase):
+    """Tests for ledger changes pushed to the dashboard event stream"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='eventsuser', email='events@example.com', password='TestPassword123!'
+        )
+        self.account = Account.objects.filter(user=self.user).first()
+        self.bus = LocalEventBus()
+        for target in ('core.event_bus.get_event_bus', 'dashboard.views_events.get_event_bus'):
+            patcher = patch(target, return_value=self.bus)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def collect_events(self, action):
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+
+        async def subscribe():
+            return self.bus.subscribe(user_channel(self.user.pk))
+
+        async def drain(subscription):
+            events = []
+            while (message := await subscription.get(timeout=0.1)) is not None:
+                events.append(message['event'])
+            subscription.close()
+            return events
+
+        subscription = loop.run_until_complete(subscribe())
+        action()
+        return loop.run_until_complete(drain(subscription))
+
+    def test_balance_and_notification_pushed_after_commit(self):
+        def action():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.account.balance = Decimal('50.00')
+                self.account.save()
+                send_notification(self.user, 'general', 'Hello', 'Message')
+
+        self.assertEqual(self.collect_events(action), ['balance', 'notification'])
+
+    def test_stream_frames_events(self):
+        async def scenario():
+            stream = stream_events(user_channel(self.user.pk), heartbeat=0.05)
+            frames = [await stream.__anext__()]
+            self.bus.publish(user_channel(self.user.pk), 'balance', {'balance': Decimal('5.00')})
+            frames.append(await stream.__anext__())
+            frames.append(await stream.__anext__())
+            await stream.aclose()
+            return frames
+
+        frames = asyncio.run(scenario())
+        self.assertTrue(frames[0].startswith('retry:'))
+        self.assertEqual(frames[1], 'event: balance\ndata: {"balance": "5.00"}\n\n')
+        self.assertEqual(frames[2], ': keepalive\n\n')
+        self.assertEqual(self.bus.subscriber_count(user_channel(self.user.pk)), 0)
+
+
+class TransactionSignalTestCase(TestCase):
+    """Test transaction notifications load accounts efficiently"""
+
+    def setUp(self):
+        self.sender = CustomUser.objects.create_user(
+            username='signalsender', email='signalsender@example.com', password='TestPassword123!'
+        )
+        self.recipient = CustomUser.objects.create_user(
+            username='signalrecipient', email='signalrecipient@example.com', password='TestPassword123!'
+        )
+        self.sender_account = Account.objects.get(user=self.sender)
+        self.recipient_account = Account.objects.get(user=self.recipient)
+
+    def test_transfer_loads_both_accounts_in_one_query(self):
+        """Test that both parties are notified after a single account query"""
+        with CaptureQueriesContext(connection) as queries:
+            Transaction.objects.create(
+                user=self.sender, from_account_id=self.sender_account.id, to_account_id=self.recipient_account.id,
+                transaction_type='transfer', amount=Decimal('15.00'), reference='SIG-TRF-1', status='completed'
+            )
+        account_selects = [
+            q['sql'] for q in queries.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "banking_account"' in q['sql']
+        ]
+        self.assertEqual(len(account_selects), 1)
+        self.assertEqual(
+            set(Notification.objects.filter(notification_type='transaction').values_list('user_id', 'title')),
+            {(self.sender.id, 'Transaction Sent: 15.00'), (self.recipient.id, 'Transaction Received: 15.00')}
+        )
+
+    def test_single_account_transaction_sends_no_transfer_notification(self):
+        """Test that deposits no longer fail on the missing sender account"""
+        Transaction.objects.create(
+            user=self.sender, to_account=self.sender_account, transaction_type='deposit',
+            amount=Decimal('15.00'), reference='SIG-DEP-1', status='completed'
+        )
+        self.assertFalse(Notification.objects.filter(notification_type='transaction').exists())
+
+
+class NumberAllocatorTestCase(TestCase):
+    """Tests for block-reserved account and card numbers"""
+
+    def make_allocator(self, **kwargs):
+        return NumberAllocator('test_series', 5, **kwargs)
+
+    def test_luhn(self):
+        self.assertEqual(luhn_check_digit('7992739871'), '3')
+        self.assertTrue(is_luhn_valid('4532015112830366'))
+        self.assertFalse(is_luhn_valid('4532015112830367'))
+
+    def test_new_users_get_valid_numbers(self):
+        user = CustomUser.objects.create_user(
+            username='numbersuser', email='numbers@example.com', password='TestPassword123!'
+        )
+        account = Account.objects.get(user=user)
+        card = account.create_virtual_card()
+        self.assertEqual(len(account.account_number), 10)
+        self.assertTrue(is_luhn_valid(account.account_number))
+        self.assertEqual(len(card.card_number), 16)
+        self.assertTrue(card.card_number.startswith('453201'))
+        self.assertTrue(is_luhn_valid(card.card_number))
+
+    @override_settings(NUMBER_ALLOCATOR_BLOCK_SIZE=3)
+    def test_one_query_per_block(self):
+        allocator = self.make_allocator(start=10)
+        first = allocator.allocate()
+        with CaptureQueriesContext(connection) as queries:
+            second, third = allocator.allocate(), allocator.allocate()
+        self.assertEqual(len(queries), 0)
+        self.assertEqual([first, second, third], [allocator.format(serial) for serial in (10, 11, 12)])
+
+        with CaptureQueriesContext(connection) as queries:
+            fourth = allocator.allocate()
+        statements = [q['sql'].split()[0] for q in queries.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(statements, ['UPDATE', 'SELECT'])
+        self.assertEqual(fourth, allocator.format(13))
+        self.assertEqual(NumberSequence.objects.get(name='test_series').next_value, 16)
+
+    def test_blocks_never_overlap(self):
+        # Two processes share the series but not their blocks
+        one, other = self.make_allocator(), self.make_allocator()
+        numbers = [allocator.allocate() for _ in range(5) for allocator in (one, other)]
+        self.assertEqual(len(set(numbers)), len(numbers))
+
+    def test_numbers_in_use_are_skipped(self):
+        allocator = self.make_allocator(existing=lambda candidates: [candidates[0], candidates[2]])
+        self.assertEqual([allocator.allocate(), allocator.allocate()], [allocator.format(1), allocator.format(3)])
+
+    def test_rolled_back_block_is_dropped(self):
+        allocator = self.make_allocator()
+        try:
+            with transaction.atomic():
+                rolled_back = allocator.allocate()
+                raise RuntimeError('Signup failed')
+        except RuntimeError:
+            pass
+
+        # The reservation was rolled back too, so the block is reserved again
+        self.assertEqual(allocator.allocate(), rolled_back)
+        self.assertEqual(NumberSequence.objects.get(name='test_series').next_value, 1000)
+
+
+class BulkOnboardingTestCase(TestCase):
+    """Tests for the bulk customer onboarding pipeline"""
+
+    def ndjson(self, records):
+        return read_records(io.StringIO('\n'.join(json.dumps(record) for record in records)), 'ndjson')
+
+    def customers(self, count, start=0):
+        return [
+            {'email': f'Legacy{i}@Example.com', 'first_name': 'Legacy', 'last_name': f'Customer {i}'}
+            for i in range(start, start + count)
+        ]
+
+    def test_creates_what_signup_creates(self):
+        totals = BulkOnboardingService.onboard(self.ndjson([
+            {'email': 'ada@example.com', 'username': 'ada', 'first_name': 'Ada', 'last_name': 'Lovelace',
+             'balance': '1250.50'},
+            {'email': 'grace@example.com', 'account_type': 'savings'},
+        ]))
+        self.assertEqual((totals['created'], totals['skipped'], totals['failed']), (2, 0, 0))
+
+        ada = CustomUser.objects.get(email='ada@example.com')
+        self.assertEqual(ada.username, 'ada')
+        self.assertFalse(ada.has_usable_password())
+        self.assertIsNotNone(ada.profile)
+        account = Account.objects.get(user=ada)
+        self.assertEqual(account.balance, Decimal('1250.50'))
+        self.assertTrue(is_luhn_valid(account.account_number))
+        self.assertEqual(len(account.routing_number), 9)
+        card = VirtualCard.objects.get(user=ada)
+        self.assertTrue(is_luhn_valid(card.card_number))
+        self.assertEqual(len(BitcoinWallet.objects.get(user=ada).address), 64)
+
+        grace = CustomUser.objects.get(email='grace@example.com')
+        self.assertEqual(grace.username, 'grace@example.com')
+        self.assertEqual(Account.objects.get(user=grace).account_type, 'savings')
+        self.assertFalse(VirtualCard.objects.filter(user=grace).exists())
+
+        self.assertEqual(Notification.objects.filter(user__in=[ada, grace], notification_type='account').count(), 2)
+        from api.models import WebhookEvent
+        events = WebhookEvent.objects.filter(user=ada).values_list('event_type', 'status')
+        self.assertEqual(sorted(events), [('account.created', 'completed'), ('user.created', 'completed')])
+
+    def test_legacy_password_hash_is_kept(self):
+        from django.contrib.auth.hashers import make_password
+        BulkOnboardingService.onboard(self.ndjson([
+            {'email': 'hashed@example.com', 'password_hash': make_password('LegacyPass123!')},
+        ]))
+        self.assertTrue(CustomUser.objects.get(email='hashed@example.com').check_password('LegacyPass123!'))
+
+    def test_invalid_lines_are_reported(self):
+        stream = io.StringIO(
+            'email,account_type,balance\n'
+            'good@example.com,checking,10\n'
+            ',checking,10\n'
+            'not-an-email,checking,10\n'
+            'bad-type@example.com,credit,10\n'
+            'bad-balance@example.com,checking,ten\n'
+        )
+        totals = BulkOnboardingService.onboard(read_records(stream, 'csv'))
+        self.assertEqual((totals['created'], totals['failed']), (1, 4))
+        self.assertEqual([error['line'] for error in totals['errors']], [3, 4, 5, 6])
+        self.assertEqual(totals['errors'][0]['error'], 'Email is required')
+        self.assertFalse(CustomUser.objects.filter(email='bad-type@example.com').exists())
+
+    def test_rerun_skips_existing_customers(self):
+        CustomUser.objects.create_user(username='existing', email='legacy1@example.com', password='TestPassword123!')
+        first = BulkOnboardingService.onboard(self.ndjson(self.customers(3)))
+        self.assertEqual((first['created'], first['skipped']), (2, 1))
+        self.assertEqual(first['errors'], [{'line': 2, 'error': 'Email already exists'}])
+
+        again = BulkOnboardingService.onboard(self.ndjson(self.customers(3)))
+        self.assertEqual((again['created'], again['skipped']), (0, 3))
+        self.assertEqual(Account.objects.filter(user__email__startswith='legacy').count(), 3)
+
+    def test_queries_per_chunk_do_not_grow_with_rows(self):
+        # Reserve the number blocks first
+        BulkOnboardingService.onboard(self.ndjson(self.customers(1)))
+
+        with CaptureQueriesContext(connection) as small:
+            BulkOnboardingService.onboard(self.ndjson(self.customers(2, start=100)), chunk_size=20)
+        with CaptureQueriesContext(connection) as large:
+            BulkOnboardingService.onboard(self.ndjson(self.customers(20, start=200)), chunk_size=20)
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(CustomUser.objects.filter(email__startswith='legacy2').count(), 20)
+
+    def test_chunks_commit_separately(self):
+        progress = []
+        totals = BulkOnboardingService.onboard(
+            self.ndjson(self.customers(7)), chunk_size=3,
+            progress=lambda totals: progress.append(totals['created']),
+        )
+        self.assertEqual(totals['created'], 7)
+        self.assertEqual(progress, [3, 6, 7])
+
+
+class WalletBackfillTestCase(TestCase):
+    """Tests for the batched Bitcoin wallet backfill"""
+
+    def setUp(self):
+        self.users = [
+            CustomUser.objects.create_user(
+                username=f'backfill{i}', email=f'backfill{i}@example.com', password='TestPassword123!'
+            )
+            for i in range(5)
+        ]
+        # Signup creates wallets; drop them to have something to backfill
+        BitcoinWallet.objects.filter(user__in=self.users).delete()
+
+    def test_creates_missing_wallets(self):
+        with CaptureQueriesContext(connection) as queries:
+            checkpoint = BitcoinWalletBackfill().run(chunk_size=2)
+        self.assertEqual(checkpoint.processed, 5)
+        self.assertIsNotNone(checkpoint.completed_at)
+        self.assertFalse(BitcoinWalletBackfill().source().exists())
+        addresses = BitcoinWallet.objects.filter(user__in=self.users).values_list('address', flat=True)
+        self.assertEqual(len(set(addresses)), 5)
+        self.assertTrue(all(len(address) == 64 for address in addresses))
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT') and '"banking_bitcoinwallet"' in q['sql']]
+        self.assertEqual(len(inserts), 3)
+
+    def test_interrupted_run_resumes(self):
+        def interrupt(checkpoint):
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            BitcoinWalletBackfill().run(chunk_size=2, progress=interrupt)
+        checkpoint = BackfillCheckpoint.objects.get(name='bitcoin_wallets')
+        self.assertEqual((checkpoint.processed, checkpoint.last_pk), (2, self.users[1].pk))
+        self.assertIsNone(checkpoint.completed_at)
+
+        pages = []
+        backfill = BitcoinWalletBackfill()
+        original = backfill.process_chunk
+        backfill.process_chunk = lambda pks: pages.append(pks) or original(pks)
+        checkpoint = backfill.run(chunk_size=2)
+        self.assertEqual(pages[0][0], self.users[2].pk)
+        self.assertEqual(checkpoint.processed, 5)
+
+    def test_finished_run_starts_over(self):
+        BitcoinWalletBackfill().run()
+        BitcoinWallet.objects.filter(user=self.users[0]).delete()
+        checkpoint = BitcoinWalletBackfill().run()
+        self.assertEqual(checkpoint.processed, 1)
+        self.assertTrue(BitcoinWallet.objects.filter(user=self.users[0]).exists())
+
+    def test_wallets_created_concurrently_are_skipped(self):
+        BitcoinWallet.objects.create(user=self.users[0], address='concurrent-signup')
+        BitcoinWalletBackfill().process_chunk([user.pk for user in self.users])
+        self.assertEqual(BitcoinWallet.objects.get(user=self.users[0]).address, 'concurrent-signup')
+        self.assertEqual(BitcoinWallet.objects.filter(user__in=self.users).count(), 5)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class WalletBackfillWorkersTestCase(TransactionTestCase):
+    """Forked workers need a test database other processes can see"""
+
+    def test_workers_backfill_every_user(self):
+        users = [
+            CustomUser.objects.create_user(
+                username=f'workers{i}', email=f'workers{i}@example.com', password='TestPassword123!'
+            )
+            for i in range(20)
+        ]
+        BitcoinWallet.objects.filter(user__in=users).delete()
+        checkpoints = []
+        checkpoint = BitcoinWalletBackfill().run(
+            chunk_size=3, workers=2, progress=lambda checkpoint: checkpoints.append(checkpoint.last_pk)
+        )
+        self.assertEqual(checkpoint.processed, 20)
+        self.assertEqual(checkpoints, sorted(checkpoints))
+        self.assertEqual(BitcoinWallet.objects.filter(user__in=users).count(), 20)
+
+
+class ScheduledPaymentExecutorTestCase(TestCase):
+    """Tests for executing due scheduled payments"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='scheduser', email='sched@example.com', password='TestPassword123!'
+        )
+        self.account = Account.objects.get(user=self.user)
+        self.account.balance = Decimal('100.00')
+        self.account.save()
+        self.payee = Payee.objects.create(user=self.user, name='City Power', account_number='555000111')
+        self.today = timezone.localdate()
+
+    def schedule(self, amount='30.00', frequency='monthly', next_payment_date=None, **kwargs):
+        next_payment_date = next_payment_date or self.today
+        kwargs.setdefault('user', self.user)
+        kwargs.setdefault('account', self.account)
+        return ScheduledPayment.objects.create(
+            payee=self.payee, amount=Decimal(amount), frequency=frequency,
+            start_date=next_payment_date, next_payment_date=next_payment_date, **kwargs
+        )
+
+    def test_due_payments_are_posted_and_advanced(self):
+        due = self.schedule()
+        later = self.schedule(next_payment_date=self.today + timedelta(days=1))
+        paused = self.schedule(status='paused')
+
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual((totals['claimed'], totals['paid']), (1, 1))
+
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('70.00'))
+        payment = Transaction.objects.get(from_account=self.account, transaction_type='payment')
+        self.assertEqual(payment.reference, f"{due.reference}-{self.today:%Y%m%d}")
+        self.assertEqual(payment.amount, Decimal('30.00'))
+        due.refresh_from_db()
+        self.assertEqual(due.next_payment_date, due.start_date + relativedelta(months=1))
+        self.assertEqual(due.status, 'active')
+        self.assertTrue(Notification.objects.filter(user=self.user, title='Scheduled Payment Sent: 30.00').exists())
+        self.assertEqual(ScheduledPayment.objects.get(pk=later.pk).next_payment_date, later.next_payment_date)
+        self.assertEqual(ScheduledPayment.objects.get(pk=paused.pk).next_payment_date, self.today)
+
+    def test_last_occurrence_completes(self):
+        once = self.schedule(frequency='once')
+        ending = self.schedule(amount='10.00', end_date=self.today + timedelta(days=3))
+        ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual(ScheduledPayment.objects.get(pk=once.pk).status, 'completed')
+        self.assertEqual(ScheduledPayment.objects.get(pk=ending.pk).status, 'completed')
+
+    def test_missed_occurrences_catch_up(self):
+        weekly = self.schedule(amount='10.00', frequency='weekly', next_payment_date=self.today - timedelta(days=15))
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual(totals['paid'], 3)
+        weekly.refresh_from_db()
+        self.assertEqual(weekly.next_payment_date, self.today + timedelta(days=6))
+
+    def test_insufficient_funds_is_retried(self):
+        first = self.schedule(amount='60.00')
+        second = self.schedule(amount='60.00')
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual((totals['paid'], totals['retrying']), (1, 1))
+
+        second.refresh_from_db()
+        self.assertEqual(second.failed_attempts, 1)
+        self.assertEqual(second.last_failure_reason, 'Insufficient funds')
+        self.assertGreater(second.retry_at, timezone.now())
+        self.assertEqual(second.next_payment_date, self.today)
+        self.assertEqual(ScheduledPayment.objects.get(pk=first.pk).failed_attempts, 0)
+        # Waiting for its retry window
+        self.assertEqual(ScheduledPaymentExecutor.run(as_of=self.today)['claimed'], 0)
+
+        self.account.balance = Decimal('100.00')
+        self.account.save()
+        ScheduledPayment.objects.filter(pk=second.pk).update(retry_at=timezone.now())
+        self.assertEqual(ScheduledPaymentExecutor.run(as_of=self.today)['paid'], 1)
+        second.refresh_from_db()
+        self.assertEqual((second.failed_attempts, second.retry_at), (0, None))
+
+    @override_settings(SCHEDULED_PAYMENT_RETRY_SECONDS=0, SCHEDULED_PAYMENT_MAX_RETRIES=2)
+    def test_occurrence_is_given_up_after_retries(self):
+        monthly = self.schedule(amount='500.00')
+        once = self.schedule(amount='500.00', frequency='once')
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual((totals['retrying'], totals['skipped'], totals['paused']), (4, 1, 1))
+
+        monthly.refresh_from_db()
+        self.assertEqual(monthly.next_payment_date, self.today + relativedelta(months=1))
+        self.assertEqual((monthly.status, monthly.failed_attempts), ('active', 0))
+        self.assertEqual(ScheduledPayment.objects.get(pk=once.pk).status, 'paused')
+        self.assertFalse(Transaction.objects.filter(transaction_type='payment').exists())
+        titles = Notification.objects.filter(user=self.user, title__startswith='Scheduled Payment').values_list('title', flat=True)
+        self.assertEqual(sorted(titles), ['Scheduled Payment Delayed: 500.00'] * 2 + ['Scheduled Payment Failed: 500.00'] * 2)
+
+    def test_someone_elses_account_is_never_debited(self):
+        other = CustomUser.objects.create_user(
+            username='schedother', email='schedother@example.com', password='TestPassword123!'
+        )
+        foreign = self.schedule(user=other)
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual(totals['paused'], 1)
+        self.assertEqual(ScheduledPayment.objects.get(pk=foreign.pk).status, 'paused')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('100.00'))
+
+    def test_replayed_occurrence_is_advanced_without_blocking_the_chunk(self):
+        other = CustomUser.objects.create_user(
+            username='schedreplay', email='schedreplay@example.com', password='TestPassword123!'
+        )
+        other_account = Account.objects.get(user=other)
+        other_account.balance = Decimal('100.00')
+        other_account.save()
+        replayed = self.schedule(next_payment_date=self.today - timedelta(days=1))
+        ScheduledPaymentExecutor.run(as_of=self.today - timedelta(days=1))
+        # Moved back onto the date that was already paid
+        ScheduledPayment.objects.filter(pk=replayed.pk).update(next_payment_date=self.today - timedelta(days=1))
+        pending = self.schedule(user=other, account=other_account)
+
+        totals = ScheduledPaymentExecutor.run(as_of=self.today)
+        self.assertEqual((totals['already_paid'], totals['paid']), (1, 1))
+        self.assertTrue(Transaction.objects.filter(from_account=other_account, transaction_type='payment').exists())
+        self.assertEqual(Transaction.objects.filter(from_account=self.account, transaction_type='payment').count(), 1)
+        replayed.refresh_from_db()
+        self.assertEqual(replayed.next_payment_date, self.today - timedelta(days=1) + relativedelta(months=1))
+        self.assertEqual(ScheduledPayment.objects.get(pk=pending.pk).status, 'active')
+
+    def test_queries_per_chunk_do_not_grow_with_payments(self):
+        self.account.balance = Decimal('100000.00')
+        self.account.save()
+        for _ in range(2):
+            self.schedule(amount='1.00')
+        with CaptureQueriesContext(connection) as small:
+            ScheduledPaymentExecutor.execute_chunk(as_of=self.today)
+        for _ in range(20):
+            self.schedule(amount='1.00')
+        with CaptureQueriesContext(connection) as large:
+            ScheduledPaymentExecutor.execute_chunk(as_of=self.today)
+        self.assertEqual(len(small), len(large))
+
+
+class AmortizationTestCase(TestCase):
+    """Tests for loan schedules and nightly interest accrual"""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            username='loanuser', email='loan@example.com', password='TestPassword123!'
+        )
+        self.today = timezone.localdate()
+
+    def loan(self, balance='10000.00', rate='6.00', term=12, payment=None, next_payment_date=None, **kwargs):
+        application = LoanApplication.objects.create(
+            user=self.user, loan_type='personal', amount=Decimal(balance), term_months=term, purpose='Test'
+        )
+        account = Account.objects.create(user=self.user, account_type='savings')
+        payment = payment or amortization.monthly_payment(balance, rate, term)
+        return LoanAccount.objects.create(
+            application=application, account=account, original_amount=Decimal(balance),
+            current_balance=Decimal(balance), interest_rate=Decimal(rate), term_months=term,
+            monthly_payment=Decimal(payment), start_date=self.today,
+            next_payment_date=next_payment_date or self.today + relativedelta(months=1), **kwargs
+        )
+
+    def test_monthly_payment(self):
+        self.assertEqual(amortization.monthly_payment(Decimal('10000'), Decimal('6'), 12), Decimal('860.66'))
+        self.assertEqual(amortization.monthly_payment(1200, 0, 12), Decimal('100.00'))
+        self.assertEqual(amortization.monthly_payment(0, 6, 12), Decimal('0.00'))
+
+    def test_schedule_pays_off_the_loan(self):
+        loan = self.loan()
+        rows = amortization.build_schedules([loan], use_numpy=False)[loan.pk]
+        self.assertEqual(len(rows), 12)
+        self.assertEqual((rows[0].interest, rows[0].principal), (Decimal('50.00'), Decimal('810.66')))
+        self.assertEqual(rows[0].due_date, loan.next_payment_date)
+        self.assertEqual(rows[11].due_date, loan.next_payment_date + relativedelta(months=11))
+        self.assertEqual(rows[-1].balance, Decimal('0'))
+        self.assertEqual(sum(row.principal for row in rows), Decimal('10000.00'))
+        self.assertTrue(all(row.payment == row.principal + row.interest for row in rows))
+
+    def test_loans_are_amortized_independently(self):
+        loans = [
+            self.loan(), self.loan(balance='25000.00', rate='4.50', term=60),
+            self.loan(balance='3000.00', rate='0.00', term=6), self.loan(balance='5000.00', payment='2000.00'),
+        ]
+        together = amortization.build_schedules(loans, use_numpy=False)
+        for loan in loans:
+            alone = amortization.build_schedules([loan], use_numpy=False)[loan.pk]
+            self.assertEqual(
+                [(row.payment, row.balance) for row in together[loan.pk]],
+                [(row.payment, row.balance) for row in alone],
+            )
+        self.assertEqual(len(together[loans[1].pk]), 60)
+        # Overpaying every month ends the schedule early
+        self.assertEqual(len(together[loans[3].pk]), 3)
+
+    @skipUnless(amortization.NUMPY_AVAILABLE, 'numpy is not installed')
+    def test_numpy_matches_python(self):
+        loans = [
+            self.loan(balance=f'{1000 + i * 137}.{i:02d}', rate=f'{3 + i % 7}.{i % 4 * 25:02d}', term=6 + i * 5)
+            for i in range(12)
+        ]
+        vectorized = amortization.build_schedules(loans, use_numpy=True)
+        looped = amortization.build_schedules(loans, use_numpy=False)
+        for loan in loans:
+            self.assertEqual(
+                [(row.period, row.payment, row.principal, row.interest, row.balance) for row in vectorized[loan.pk]],
+                [(row.period, row.payment, row.principal, row.interest, row.balance) for row in looped[loan.pk]],
+            )
+
+    def test_payment_marks_schedule_stale(self):
+        loan = self.loan()
+        self.assertEqual(len(amortization.LoanScheduleService.schedule_for(loan)), 12)
+        loan.refresh_from_db()
+        self.assertIsNotNone(loan.schedule_generated_at)
+
+        principal, interest = amortization.record_payment(loan, Decimal('5050.00'))
+        self.assertEqual((principal, interest), (Decimal('5000.00'), Decimal('50.00')))
+        loan.next_payment_date += relativedelta(months=1)
+        loan.save()
+        self.assertIsNone(LoanAccount.objects.get(pk=loan.pk).schedule_generated_at)
+
+        self.assertEqual(amortization.LoanScheduleService.refresh_stale(), 1)
+        rows = list(LoanScheduleEntry.objects.filter(loan=loan))
+        self.assertEqual(rows[0].interest, Decimal('25.00'))
+        self.assertEqual(rows[0].due_date, loan.next_payment_date)
+        self.assertLess(len(rows), 11)
+        self.assertEqual(rows[-1].balance, Decimal('0'))
+
+    def test_stale_schedules_are_rebuilt_in_chunks(self):
+        loans = [self.loan(term=6) for _ in range(5)]
+        self.assertEqual(amortization.LoanScheduleService.refresh_stale(chunk_size=2), 5)
+        self.assertEqual(LoanScheduleEntry.objects.filter(loan__in=loans).count(), 30)
+        self.assertEqual(amortization.LoanScheduleService.refresh_stale(), 0)
+
+    def test_nightly_accrual(self):
+        # 10000 at 7.30% accrues 2.00 a day
+        current = self.loan(rate='7.30', interest_accrued_through=self.today - timedelta(days=1))
+        behind = self.loan(rate='7.30', interest_accrued_through=self.today - timedelta(days=3))
+        new = self.loan(rate='7.30')
+        paid = self.loan(rate='7.30', status='paid')
+
+        self.assertEqual(amortization.accrue_interest(as_of=self.today, chunk_size=1), 3)
+        accrued = dict(LoanAccount.objects.values_list('pk', 'accrued_interest'))
+        self.assertEqual(accrued[current.pk], Decimal('2.0000'))
+        self.assertEqual(accrued[behind.pk], Decimal('6.0000'))
+        self.assertEqual(accrued[new.pk], Decimal('2.0000'))
+        self.assertEqual(accrued[paid.pk], Decimal('0'))
+        self.assertEqual(LoanAccount.objects.get(pk=new.pk).interest_accrued_through, self.today)
+
+        # Running again for the same night changes nothing
+        self.assertEqual(amortization.accrue_interest(as_of=self.today), 0)
+        self.assertEqual(LoanAccount.objects.get(pk=current.pk).accrued_interest, Decimal('2.0000'))
+
+    def test_paid_interest_reduces_accrued_interest(self):
+        loan = self.loan(accrued_interest=Decimal('60.0000'))
+        amortization.record_payment(loan, Decimal('860.66'))
+        self.assertEqual(loan.accrued_interest, Decimal('10.0000'))
+        self.assertEqual(loan.current_balance, Decimal('9189.34'))
@@ -2,8 +2,7 @@ from django.contrib.auth import get_user_model
 from .models import Notification
 from django.db.models import Q
 from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils.html import strip_tags
+from core.email_templates import render_email
 from django.conf import settings
 from decimal import Decimal
 import logging
@@ -11,8 +10,9 @@ from django.db import transaction
 from django.core.mail import EmailMessage
 from smtplib import SMTPException
 from core.gmail_service import send_gmail
-import random
-import string
+from core.ids import encode_id, next_id
+from .email_outbox import enqueue_email
+from .notification_fanout import queue_fanout, bulk_notify
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -25,18 +25,13 @@ def generate_reference_number(prefix="TXN"):
         prefix (str): Prefix for the reference number (default: "TXN")
         
     Returns:
-        str: A unique reference number
+        str: A unique reference number, e.g. TXN-20260101-0B8XK3M2Q0W01
     """
     # Get current date in YYYYMMDD format
     date_str = datetime.now().strftime("%Y%m%d")
     
-    # Generate a random 6-digit number
-    random_part = ''.join(random.choices(string.digits, k=6))
-    
-    # Combine prefix, date, and random part
-    reference_number = f"{prefix}-{date_str}-{random_part}"
-    
-    return reference_number
+    # Collision-free, sortable id from this process's generator (no query)
+    return f"{prefix}-{date_str}-{encode_id(next_id())}"
 
 def send_notification(user, notification_type, title, message, related_transaction=None):
     """
@@ -50,24 +45,14 @@ def send_notification(user, notification_type, title, message, related_transacti
         related_transaction: Optional related transaction
         
     Returns:
-        The created notification or list of notifications
+        The created notification, a list of notifications, or the
+        NotificationFanoutJob queued for 'all' and large querysets
     """
     User = get_user_model()
     
     if user == 'all':
-        # Send to all active users
-        users = User.objects.filter(is_active=True)
-        notifications = []
-        for u in users:
-            notification = Notification.objects.create(
-                user=u,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                related_transaction=related_transaction
-            )
-            notifications.append(notification)
-        return notifications
+        # Delivered in chunks by process_notification_fanouts
+        return queue_fanout(notification_type, title, message, related_transaction)
     elif hasattr(user, '_meta') and user._meta.model == User:
         # Single user instance
         return Notification.objects.create(
@@ -79,22 +64,15 @@ def send_notification(user, notification_type, title, message, related_transacti
         )
     elif hasattr(user, 'filter'):
         # Queryset of users
-        notifications = []
-        for u in user:
-            notification = Notification.objects.create(
-                user=u,
-                notification_type=notification_type,
-                title=title,
-                message=message,
-                related_transaction=related_transaction
-            )
-            notifications.append(notification)
-        return notifications
+        user_ids = list(user.values_list('id', flat=True).iterator())
+        if len(user_ids) > getattr(settings, 'NOTIFICATION_FANOUT_INLINE_LIMIT', 500):
+            return queue_fanout(notification_type, title, message, related_transaction, user_ids=user_ids)
+        return bulk_notify(user_ids, notification_type, title, message, related_transaction)
     return None
 
 def send_transaction_notification(user, transaction_obj, is_sender=True):
     """
-    Send transaction notification email via Gmail API for production
+    Queue transaction notification email for background delivery
     
     Args:
         user (CustomUser): The user to send the notification to
@@ -113,72 +91,30 @@ def send_transaction_notification(user, transaction_obj, is_sender=True):
             transaction_message = f"You just received ${formatted_amount} from {transaction_obj.from_account.user.get_full_name()}"
             subject = f"Money Received - ${formatted_amount}"
         
-        # Get the logo URL
-        logo_url = f"{getattr(settings, 'SITE_URL', 'https://primetrust.com')}/static/img/Primetrust-logo-med.png"
-        
         # Prepare the email content
         context = {
             'recipient_name': user.get_full_name(),
             'transaction_message': transaction_message,
-            'logo_url': logo_url,
             'transaction': transaction_obj,
             'is_sender': is_sender,
             'amount': formatted_amount
         }
         
-        # Render the HTML email template
-        html_message = render_to_string('emails/transaction_notification.html', context)
-        text_message = strip_tags(html_message)
-        
-        # Try Gmail API first (always use Gmail API for production)
-        if hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
-            try:
-                success, result = send_gmail(
-                    to_emails=[user.email],
-                    subject=subject,
-                    text_content=text_message,
-                    html_content=html_message,
-                    headers={'X-Entity-Ref-ID': str(transaction_obj.id)}
-                )
-                
-                if success:
-                    logger.info(f"Transaction notification sent via Gmail API to {user.email} for transaction {transaction_obj.id}")
-                    return True
-                else:
-                    logger.error(f"Gmail API failed: {result}")
-                    # Fall through to Django email backend
-                    
-            except Exception as gmail_error:
-                logger.error(f"Gmail API error: {str(gmail_error)}")
-                # Fall through to Django email backend
-        
-        # Fallback to Django's email backend
-        try:
-            email = EmailMessage(
-                subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{subject}",
-                body=html_message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                to=[user.email],
-                headers={'X-Entity-Ref-ID': str(transaction_obj.id)}
-            )
-            email.content_subtype = "html"
-            
-            # Send with retry logic
-            sent = email.send(fail_silently=False)
-            
-            if sent:
-                logger.info(f"Transaction notification email sent via Django backend to {user.email} for transaction {transaction_obj.id}")
-                return True
-            else:
-                logger.error(f"Django email backend failed for {user.email}")
-                return False
-                
-        except Exception as django_error:
-            logger.error(f"Django email error: {str(django_error)}")
-            
-            # Last resort: Log for manual follow-up
-            logger.critical(f"CRITICAL: Failed to send transaction notification to {user.email} for transaction {transaction_obj.id}. Manual intervention required.")
-            return False
+        # Render the HTML and text versions from the precompiled templates
+        html_message, text_message = render_email('transaction_notification', context)
+        
+        # Written in the caller's transaction, delivered by send_outbox_emails
+        enqueue_email(
+            to_email=user.email,
+            subject=subject,
+            text_body=text_message,
+            html_body=html_message,
+            headers={'X-Entity-Ref-ID': str(transaction_obj.id)},
+            email_type='transaction',
+            dedup_key=f"transaction:{transaction_obj.id}:{'sender' if is_sender else 'receiver'}"
+        )
+        logger.info(f"Transaction notification queued for {user.email} for transaction {transaction_obj.id}")
+        return True
             
     except Exception as e:
         logger.error(f"Error in send_transaction_notification: {str(e)}", exc_info=True)
@@ -187,7 +123,7 @@ def send_transaction_notification(user, transaction_obj, is_sender=True):
 
 def send_security_alert(user, alert_type, details):
     """
-    Send security alert via Gmail API
+    Queue security alert email for background delivery
     
     Args:
         user (CustomUser): The user to alert
@@ -204,36 +140,18 @@ def send_security_alert(user, alert_type, details):
             'timestamp': datetime.now().strftime('%B %d, %Y at %I:%M %p'),
         }
         
-        # Use a security alert template (you'll need to create this)
-        html_message = render_to_string('emails/security_alert.html', context)
-        text_message = strip_tags(html_message)
+        html_message, text_message = render_email('security_alert', context)
         
-        # Send via Gmail API for production
-        if hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
-            success, result = send_gmail(
-                to_emails=[user.email],
-                subject=subject,
-                text_content=text_message,
-                html_content=html_message,
-                headers={'X-Alert-Type': alert_type}
-            )
-            
-            if success:
-                logger.info(f"Security alert sent to {user.email}: {alert_type}")
-                return True
-            else:
-                logger.error(f"Failed to send security alert: {result}")
-                
-        # Fallback to Django backend
-        email = EmailMessage(
-            subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{subject}",
-            body=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
-            headers={'X-Alert-Type': alert_type}
+        enqueue_email(
+            to_email=user.email,
+            subject=subject,
+            text_body=text_message,
+            html_body=html_message,
+            headers={'X-Alert-Type': alert_type},
+            email_type='security_alert'
         )
-        email.content_subtype = "html"
-        return bool(email.send(fail_silently=False))
+        logger.info(f"Security alert queued for {user.email}: {alert_type}")
+        return True
         
     except Exception as e:
         logger.error(f"Error sending security alert: {str(e)}", exc_info=True)
@@ -242,7 +160,7 @@ def send_security_alert(user, alert_type, details):
 
 def send_welcome_email(user):
     """
-    Send welcome email to new users via Gmail API
+    Queue welcome email to new users for background delivery
     
     Args:
         user (CustomUser): The new user
@@ -258,35 +176,19 @@ def send_welcome_email(user):
             'date': datetime.now().strftime('%B %d, %Y'),
         }
         
-        html_message = render_to_string('emails/welcome_email.html', context)
-        text_message = strip_tags(html_message)
+        html_message, text_message = render_email('welcome_email', context)
         
-        # Send via Gmail API (always use Gmail API for production)
-        if hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
-            success, result = send_gmail(
-                to_emails=[user.email],
-                subject=subject,
-                text_content=text_message,
-                html_content=html_message,
-                headers={'X-Email-Type': 'welcome'}
-            )
-            
-            if success:
-                logger.info(f"Welcome email sent to {user.email}")
-                return True
-            else:
-                logger.error(f"Failed to send welcome email: {result}")
-                
-        # Fallback to Django backend
-        email = EmailMessage(
-            subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{subject}",
-            body=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
-            headers={'X-Email-Type': 'welcome'}
+        enqueue_email(
+            to_email=user.email,
+            subject=subject,
+            text_body=text_message,
+            html_body=html_message,
+            headers={'X-Email-Type': 'welcome'},
+            email_type='welcome',
+            dedup_key=f"welcome:{user.pk}"
         )
-        email.content_subtype = "html"
-        return bool(email.send(fail_silently=False))
+        logger.info(f"Welcome email queued for {user.email}")
+        return True
         
     except Exception as e:
         logger.error(f"Error sending welcome email: {str(e)}", exc_info=True)
@@ -295,7 +197,7 @@ def send_welcome_email(user):
 
 def send_account_locked_notification(user, lock_reason, activity_details, unlock_url):
     """
-    Send account locked notification via Gmail API
+    Queue account locked notification for background delivery
     
     Args:
         user (CustomUser): The user whose account is locked
@@ -306,7 +208,7 @@ def send_account_locked_notification(user, lock_reason, activity_details, unlock
     try:
         subject = "URGENT: Account Security Lock - Action Required"
         
-        incident_reference = f"SEC-{datetime.now().strftime('%Y%m%d')}-{random.randint(1000, 9999)}"
+        incident_reference = generate_reference_number('SEC')
         
         context = {
             'user_name': user.get_full_name(),
@@ -318,43 +220,22 @@ def send_account_locked_notification(user, lock_reason, activity_details, unlock
             'incident_reference': incident_reference,
         }
         
-        html_message = render_to_string('emails/account_locked.html', context)
-        text_message = strip_tags(html_message)
+        html_message, text_message = render_email('account_locked', context)
         
-        # Send via Gmail API (always use Gmail API for production)
-        if hasattr(settings, 'GMAIL_SENDER_EMAIL') and settings.GMAIL_SENDER_EMAIL:
-            success, result = send_gmail(
-                to_emails=[user.email],
-                subject=subject,
-                text_content=text_message,
-                html_content=html_message,
-                headers={
-                    'X-Email-Type': 'security-lock',
-                    'X-Incident-Reference': incident_reference,
-                    'X-Priority': 'high'
-                }
-            )
-            
-            if success:
-                logger.critical(f"Account locked notification sent to {user.email}. Reference: {incident_reference}")
-                return True
-            else:
-                logger.error(f"Failed to send account locked notification: {result}")
-                
-        # Fallback to Django backend
-        email = EmailMessage(
-            subject=f"{getattr(settings, 'GMAIL_SUBJECT_PREFIX', '[PrimeTrust] ')}{subject}",
-            body=html_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[user.email],
+        enqueue_email(
+            to_email=user.email,
+            subject=subject,
+            text_body=text_message,
+            html_body=html_message,
             headers={
                 'X-Email-Type': 'security-lock',
                 'X-Incident-Reference': incident_reference,
                 'X-Priority': 'high'
-            }
+            },
+            email_type='security_lock'
         )
-        email.content_subtype = "html"
-        return bool(email.send(fail_silently=False))
+        logger.critical(f"Account locked notification queued for {user.email}. Reference: {incident_reference}")
+        return True
         
     except Exception as e:
         logger.error(f"Error sending account locked notification: {str(e)}", exc_info=True)
@@ -6,7 +6,6 @@ from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
 from decimal import Decimal
-import uuid
 import logging
 
 logger = logging.getLogger(__name__)
@@ -15,7 +14,7 @@ from accounts.models import CustomUser
 from .models import Account, Transaction, Notification
 from .forms import SendMoneyForm, DepositForm
 from django_htmx.http import trigger_client_event
-from .utils import send_transaction_notification
+from .utils import send_transaction_notification, generate_reference_number
 
 @login_required
 def payment_fields(request):
@@ -78,7 +77,7 @@ def send_money(request):
                         return redirect('dashboard:home')
                     
                     # Create transaction record with real-time processing
-                    transaction_ref = f"TRF{uuid.uuid4().hex[:8].upper()}"
+                    transaction_ref = generate_reference_number('TRF')
                     new_transaction = Transaction.objects.create(
                         user=user,
                         from_account=user_account,
@@ -114,7 +113,7 @@ def send_money(request):
                         related_transaction=new_transaction
                     )
                     
-                    # Send email notifications
+                    # Queue email notifications; they are only sent if this transaction commits
                     send_transaction_notification(user, new_transaction, is_sender=True)
                     send_transaction_notification(recipient, new_transaction, is_sender=False)
                     
@@ -198,7 +197,10 @@ def get_transaction_details(request, transaction_id):
     """Get details of a specific transaction"""
     # Allow viewing transactions where the user is either sender or recipient
     user_filter = Q(from_account__user=request.user) | Q(to_account__user=request.user)
-    transaction = get_object_or_404(Transaction.objects.filter(user_filter), id=transaction_id)
+    transaction = get_object_or_404(
+        Transaction.objects.filter(user_filter).select_related('from_account__user', 'to_account__user'),
+        id=transaction_id
+    )
     
     context = {
         'transaction': transaction
@@ -223,7 +225,7 @@ def deposit(request):
             # Create the transaction
             with transaction.atomic():
                 # Generate a reference number
-                transaction_ref = f"DEP{uuid.uuid4().hex[:8].upper()}"
+                transaction_ref = generate_reference_number('DEP')
                 
                 # Create transaction record with real-time processing
                 new_transaction = Transaction.objects.create(
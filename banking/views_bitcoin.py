@@ -8,11 +8,10 @@ from django.db import transaction
 from django.db.models import Sum
 from decimal import Decimal
 import requests
-import uuid
 from datetime import datetime
 from .models import BitcoinWallet, Transaction, Account, Notification
 from .forms import SendBitcoinForm
-from .utils import send_transaction_notification
+from .utils import send_transaction_notification, generate_reference_number
 
 def update_btc_price():
     """Update Bitcoin price in cache"""
@@ -78,7 +77,7 @@ def send_bitcoin_page(request):
                     wallet_address = form.cleaned_data['wallet_address']
                     
                     # Create transaction reference
-                    transaction_ref = f"BTC{uuid.uuid4().hex[:8].upper()}"
+                    transaction_ref = generate_reference_number('BTC')
                     
                     # Calculate amounts
                     if balance_source == 'bitcoin':
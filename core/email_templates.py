@@ -0,0 +1,120 @@
+"""
+Compiled email template rendering
+
+Every email in templates/emails/ has an HTML template and a plain text
+twin (.txt). Both are compiled once per process and reused, so sending
+an email only renders the per-recipient context instead of loading the
+template and running strip_tags over the whole HTML document.
+"""
+import logging
+import threading
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from django.conf import settings
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.utils.html import strip_tags
+
+logger = logging.getLogger(__name__)
+
+EMAIL_TEMPLATES = (
+    'account_locked',
+    'login_code_email',
+    'password_reset',
+    'security_alert',
+    'transaction_notification',
+    'verification_email',
+    'welcome_email',
+)
+
+
+@lru_cache(maxsize=4)
+def _shell_context(year: int) -> Dict[str, object]:
+    site_url = getattr(settings, 'SITE_URL', 'https://primetrust.com')
+    return {
+        'site_url': site_url,
+        'site_name': 'PrimeTrust',
+        'logo_url': f"{site_url}/static/img/Primetrust-logo-med.png",
+        'current_year': year,
+    }
+
+
+def get_shell_context() -> Dict[str, object]:
+    """
+    Context shared by every email (site URL, logo, footer year).
+
+    Built once and only rebuilt when the year rolls over.
+    """
+    return _shell_context(date.today().year)
+
+
+class EmailTemplateRenderer:
+    """
+    Renders (html, text) pairs from precompiled email templates.
+
+    Templates are compiled on first use, or eagerly with preload().
+    Call clear() after editing templates in a long running process.
+    """
+
+    def __init__(self):
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, name: str):
+        html_template = get_template(f'emails/{name}.html')
+        try:
+            text_template = get_template(f'emails/{name}.txt')
+        except TemplateDoesNotExist:
+            logger.warning(f"No text template for email '{name}', falling back to strip_tags")
+            text_template = None
+        return html_template, text_template
+
+    def get_templates(self, name: str):
+        templates = self._templates.get(name)
+        if templates is None:
+            with self._lock:
+                templates = self._templates.get(name)
+                if templates is None:
+                    templates = self._templates[name] = self._compile(name)
+        return templates
+
+    def preload(self, names=EMAIL_TEMPLATES) -> int:
+        """Compile the given email templates now; returns how many were loaded"""
+        for name in names:
+            self.get_templates(name)
+        return len(names)
+
+    def clear(self):
+        with self._lock:
+            self._templates.clear()
+
+    def render(self, name: str, context: Optional[Dict] = None) -> Tuple[str, str]:
+        """
+        Render an email.
+
+        Args:
+            name: Template name without directory or extension, e.g. 'welcome_email'
+            context: Per-recipient context; overrides the shell context
+
+        Returns:
+            tuple: (html content, text content)
+        """
+        html_template, text_template = self.get_templates(name)
+        full_context = {**get_shell_context(), **(context or {})}
+
+        html_content = html_template.render(full_context)
+        if text_template is not None:
+            text_content = text_template.render(full_context)
+        else:
+            text_content = strip_tags(html_content)
+        return html_content, text_content
+
+
+email_renderer = EmailTemplateRenderer()
+
+
+def render_email(name: str, context: Optional[Dict] = None) -> Tuple[str, str]:
+    """Render an email with the shared renderer; returns (html, text)"""
+    return email_renderer.render(name, context)
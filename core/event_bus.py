@@ -0,0 +1,196 @@
+"""
+Per-user push events for open dashboards
+
+Ledger changes (balances, transactions, notifications) are published to
+a per-user channel after commit and streamed to connected browsers by
+the dashboard server-sent events endpoint, so idle dashboards no longer
+poll the database.
+
+The backend is chosen by DASHBOARD_EVENTS_BACKEND:
+- LocalEventBus delivers within the current process; used by tests,
+  runserver and single-worker deployments
+- PostgresEventBus relays events through LISTEN/NOTIFY so an event
+  published by one worker reaches subscribers connected to any worker
+"""
+import json
+import select
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+def user_channel(user_id) -> str:
+    return f"user:{user_id}"
+
+
+class Subscription:
+    """A subscriber's queue on one channel; close() when the client disconnects"""
+
+    def __init__(self, bus, channel: str, loop, queue: asyncio.Queue):
+        self.bus = bus
+        self.channel = channel
+        self.loop = loop
+        self.queue = queue
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Wait for the next message; returns None when the timeout expires"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+def _put_latest(queue: asyncio.Queue, message):
+    # A slow client loses its oldest event rather than growing the queue
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+class LocalEventBus:
+    """In-process pub/sub between synchronous publishers and async subscribers"""
+
+    def __init__(self, max_queued: int = 100):
+        self.max_queued = max_queued
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Subscribe from a running event loop"""
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), asyncio.Queue(self.max_queued))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def subscriber_count(self, channel: str) -> int:
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        self.dispatch(channel, {'event': event, 'data': data})
+
+    def dispatch(self, channel: str, message: Dict[str, Any]) -> int:
+        """Hand a message to this process's subscribers; safe from any thread"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(_put_latest, subscription.queue, message)
+            except RuntimeError:
+                # The subscriber's event loop has shut down
+                self.unsubscribe(subscription)
+        return len(subscribers)
+
+
+class PostgresEventBus(LocalEventBus):
+    """
+    Cross-worker bus on PostgreSQL LISTEN/NOTIFY.
+
+    publish() issues pg_notify on the request's connection; a listener
+    thread in each process receives every notification and dispatches it
+    to that process's local subscribers. Payloads must stay under the
+    8000 byte NOTIFY limit, which the small dashboard deltas do.
+    """
+
+    pg_channel = 'dashboard_events'
+
+    def __init__(self, max_queued: int = 100, using: str = 'default'):
+        super().__init__(max_queued)
+        self.using = using
+        self._listener = None
+
+    def publish(self, channel: str, event: str, data: Dict[str, Any]):
+        payload = json.dumps({'channel': channel, 'event': event, 'data': data}, cls=DjangoJSONEncoder)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.pg_channel, payload])
+
+    def subscribe(self, channel: str) -> Subscription:
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='dashboard-events-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            raw_connection = None
+            try:
+                wrapper = connections[self.using]
+                raw_connection = wrapper.get_new_connection(wrapper.get_connection_params())
+                raw_connection.autocommit = True
+                raw_connection.cursor().execute(f'LISTEN {self.pg_channel}')
+                logger.info("Dashboard event listener connected")
+
+                while True:
+                    if select.select([raw_connection], [], [], 30) == ([], [], []):
+                        continue
+                    raw_connection.poll()
+                    while raw_connection.notifies:
+                        notify = raw_connection.notifies.pop(0)
+                        message = json.loads(notify.payload)
+                        self.dispatch(message['channel'], {'event': message['event'], 'data': message['data']})
+            except Exception as e:
+                logger.error(f"Dashboard event listener error, reconnecting: {str(e)}")
+                time.sleep(getattr(settings, 'DASHBOARD_EVENTS_RECONNECT_DELAY', 5))
+            finally:
+                if raw_connection is not None:
+                    try:
+                        raw_connection.close()
+                    except Exception:
+                        pass
+
+
+_event_bus = None
+_event_bus_lock = threading.Lock()
+
+
+def get_event_bus() -> LocalEventBus:
+    """Process-wide bus built from DASHBOARD_EVENTS_BACKEND"""
+    global _event_bus
+    if _event_bus is None:
+        with _event_bus_lock:
+            if _event_bus is None:
+                backend = getattr(settings, 'DASHBOARD_EVENTS_BACKEND', 'core.event_bus.LocalEventBus')
+                _event_bus = import_string(backend)()
+    return _event_bus
+
+
+def publish_user_event(user_id, event: str, data: Dict[str, Any]):
+    """
+    Publish an event to a user's dashboards once the current transaction commits.
+
+    Failures are logged and never affect the caller.
+    """
+    if not user_id:
+        return
+
+    def _publish():
+        try:
+            get_event_bus().publish(user_channel(user_id), event, data)
+        except Exception as e:
+            logger.error(f"Failed to publish {event} event for user {user_id}: {str(e)}")
+
+    transaction.on_commit(_publish)
@@ -3,7 +3,7 @@ Django Email Backend for Gmail API
 Integrates Gmail API service with Django's email framework
 """
 import logging
-from typing import List
+from typing import List, Dict, Any, Optional
 from django.core.mail.backends.base import BaseEmailBackend
 from django.core.mail.message import EmailMessage
 from django.utils.html import strip_tags
@@ -41,6 +41,7 @@ class GmailBackend(BaseEmailBackend):
     def send_messages(self, email_messages: List[EmailMessage]) -> int:
         """
         Send a list of EmailMessage objects.
+        Several messages are sent through the Gmail batch endpoint.
         Returns the number of successfully sent messages.
         """
         if not email_messages:
@@ -48,78 +49,106 @@ class GmailBackend(BaseEmailBackend):
             
         if not self.open():
             return 0
-            
-        num_sent = 0
+        
+        if len(email_messages) == 1:
+            return 1 if self._send_message(email_messages[0]) else 0
+        
+        prepared = []
         for message in email_messages:
-            if self._send_message(message):
-                num_sent += 1
+            try:
+                kwargs = self._prepare_message(message)
+            except Exception as e:
+                logger.error(f"Error preparing email: {str(e)}", exc_info=True)
+                if not self.fail_silently:
+                    raise
+                continue
+            if kwargs:
+                prepared.append(kwargs)
+        
+        results = self.gmail_service.send_batch(prepared)
+        num_sent = sum(1 for success, _ in results if success)
+        errors = [result for success, result in results if not success]
+        
+        logger.info(f"Sent {num_sent}/{len(prepared)} emails via Gmail API batch")
+        if errors:
+            logger.error(f"Failed to send {len(errors)} emails via Gmail API: {errors[0]}")
+            if not self.fail_silently:
+                raise Exception(f"Gmail API error: {errors[0]}")
                 
         return num_sent
     
+    def _prepare_message(self, message: EmailMessage) -> Optional[Dict[str, Any]]:
+        """Convert an EmailMessage into send_email keyword arguments"""
+        # Extract recipients
+        to_emails = list(message.to)
+        if message.cc:
+            to_emails.extend(message.cc)
+        if message.bcc:
+            to_emails.extend(message.bcc)
+            
+        if not to_emails:
+            logger.warning("No recipients found in email message")
+            return None
+        
+        # Get content
+        html_content = None
+        text_content = message.body
+        
+        # Handle HTML content
+        if hasattr(message, 'alternatives'):
+            for content, content_type in message.alternatives:
+                if content_type == 'text/html':
+                    html_content = content
+                    break
+        
+        # If we have HTML but no text, create text version
+        if html_content and not text_content:
+            text_content = strip_tags(html_content)
+        
+        # Prepare attachments
+        attachments = []
+        if hasattr(message, 'attachments') and message.attachments:
+            for attachment in message.attachments:
+                if len(attachment) == 3:
+                    # (filename, content, mimetype)
+                    filename, content, mimetype = attachment
+                    attachments.append({
+                        'filename': filename,
+                        'content': content,
+                        'content_type': mimetype or 'application/octet-stream'
+                    })
+                elif len(attachment) == 2:
+                    # (filename, content)
+                    filename, content = attachment
+                    attachments.append({
+                        'filename': filename,
+                        'content': content,
+                        'content_type': 'application/octet-stream'
+                    })
+        
+        # Prepare headers
+        headers = {}
+        if hasattr(message, 'extra_headers') and message.extra_headers:
+            headers.update(message.extra_headers)
+        
+        return {
+            'to_emails': to_emails,
+            'subject': message.subject,
+            'text_content': text_content,
+            'html_content': html_content,
+            'attachments': attachments if attachments else None,
+            'headers': headers if headers else None
+        }
+    
     def _send_message(self, message: EmailMessage) -> bool:
         """Send a single EmailMessage"""
         try:
-            # Extract recipients
-            to_emails = list(message.to)
-            if message.cc:
-                to_emails.extend(message.cc)
-            if message.bcc:
-                to_emails.extend(message.bcc)
-                
-            if not to_emails:
-                logger.warning("No recipients found in email message")
+            kwargs = self._prepare_message(message)
+            if not kwargs:
                 return False
             
-            # Get content
-            html_content = None
-            text_content = message.body
-            
-            # Handle HTML content
-            if hasattr(message, 'alternatives'):
-                for content, content_type in message.alternatives:
-                    if content_type == 'text/html':
-                        html_content = content
-                        break
-            
-            # If we have HTML but no text, create text version
-            if html_content and not text_content:
-                text_content = strip_tags(html_content)
-            
-            # Prepare attachments
-            attachments = []
-            if hasattr(message, 'attachments') and message.attachments:
-                for attachment in message.attachments:
-                    if len(attachment) == 3:
-                        # (filename, content, mimetype)
-                        filename, content, mimetype = attachment
-                        attachments.append({
-                            'filename': filename,
-                            'content': content,
-                            'content_type': mimetype or 'application/octet-stream'
-                        })
-                    elif len(attachment) == 2:
-                        # (filename, content)
-                        filename, content = attachment
-                        attachments.append({
-                            'filename': filename,
-                            'content': content,
-                            'content_type': 'application/octet-stream'
-                        })
-            
-            # Prepare headers
-            headers = {}
-            if hasattr(message, 'extra_headers') and message.extra_headers:
-                headers.update(message.extra_headers)
-            
             # Send via Gmail API
-            success, result = self.gmail_service.send_email(
-                to_emails=to_emails,
-                subject=message.subject,
-                text_content=text_content,
-                html_content=html_content,
-                attachments=attachments if attachments else None,
-                headers=headers if headers else None
-            )
+            success, result = self.gmail_service.send_email(**kwargs)
             
             if success:
                 logger.info(f"Email sent successfully via Gmail API. Message ID: {result}")
@@ -134,4 +163,4 @@ class GmailBackend(BaseEmailBackend):
             logger.error(f"Error sending email: {str(e)}", exc_info=True)
             if not self.fail_silently:
                 raise
-            return False 
\ No newline at end of file
+            return False
@@ -0,0 +1,98 @@
+"""
+Local fake of the Gmail API send and batch endpoints
+Used by tests and the batch benchmark so no request leaves the machine
+"""
+import base64
+import json
+import time
+import threading
+from email import message_from_bytes
+from email.parser import FeedParser
+from typing import Dict, List, Optional
+
+import httplib2
+from googleapiclient.discovery import build
+
+
+class FakeGmailHttp:
+    """
+    httplib2-compatible transport that answers messages.send calls,
+    both one at a time and inside multipart batch requests.
+
+    Args:
+        latency: Seconds added to every HTTP round trip
+        rate_limit_failures: Recipient address -> number of 429 responses
+            returned for that recipient before it is accepted
+    """
+
+    def __init__(self, latency: float = 0.0, rate_limit_failures: Optional[Dict[str, int]] = None):
+        self.latency = latency
+        self.rate_limit_failures = dict(rate_limit_failures or {})
+        self.round_trips = 0
+        self.batch_sizes: List[int] = []
+        self.sent: List[str] = []
+        self._lock = threading.Lock()
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        with self._lock:
+            self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        if '/batch' in uri:
+            return self._batch_response(body, headers['content-type'])
+
+        status, payload = self._send(body)
+        return httplib2.Response({'status': status, 'content-type': 'application/json'}), json.dumps(payload).encode()
+
+    def _send(self, body):
+        """Handle a single messages.send request body"""
+        if isinstance(body, bytes):
+            body = body.decode('utf-8')
+        raw = json.loads(body)['raw']
+        recipient = message_from_bytes(base64.urlsafe_b64decode(raw))['to']
+
+        with self._lock:
+            if self.rate_limit_failures.get(recipient, 0) > 0:
+                self.rate_limit_failures[recipient] -= 1
+                return 429, {'error': {'code': 429, 'message': 'Rate Limit Exceeded',
+                                       'errors': [{'reason': 'rateLimitExceeded'}]}}
+            self.sent.append(recipient)
+            message_id = f'fake-{len(self.sent)}'
+        return 200, {'id': message_id, 'labelIds': ['SENT']}
+
+    def _batch_response(self, body, content_type):
+        """Answer each part of a multipart/mixed batch request"""
+        parser = FeedParser()
+        parser.feed(f'content-type: {content_type}\r\n\r\n{body}')
+        parts = parser.close().get_payload()
+        self.batch_sizes.append(len(parts))
+
+        boundary = 'fake_gmail_batch_boundary'
+        chunks = []
+        for part in parts:
+            request = part.get_payload()
+            request_body = request.split('\r\n\r\n', 1)[1] if '\r\n\r\n' in request else request.split('\n\n', 1)[1]
+            status, payload = self._send(request_body)
+            reason = 'OK' if status == 200 else 'Too Many Requests'
+            chunks.append(
+                f'--{boundary}\r\n'
+                f'Content-Type: application/http\r\n'
+                f'Content-ID: <response-{part["Content-ID"][1:-1]}>\r\n\r\n'
+                f'HTTP/1.1 {status} {reason}\r\n'
+                f'Content-Type: application/json; charset=UTF-8\r\n\r\n'
+                f'{json.dumps(payload)}\r\n'
+            )
+        chunks.append(f'--{boundary}--\r\n')
+
+        response = httplib2.Response({
+            'status': 200,
+            'content-type': f'multipart/mixed; boundary={boundary}'
+        })
+        return response, ''.join(chunks).encode('utf-8')
+
+
+def build_fake_gmail_service(http: FakeGmailHttp):
+    """Build a Gmail API client that talks to the fake transport"""
+    return build('gmail', 'v1', http=http, cache_discovery=False)
@@ -1,11 +1,15 @@
 """
 Gmail API Service for Production Email Delivery
-Handles OAuth2 authentication and email sending via Gmail API
+Handles OAuth2 authentication and email sending via Gmail API,
+including batched sends paced to the Gmail sending quota
 """
 import os
 import json
+import time
+import random
 import logging
 import base64
+import threading
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
@@ -18,11 +22,40 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
 from django.conf import settings
 from django.utils import timezone
 
 logger = logging.getLogger(__name__)
 
+
+class TokenBucket:
+    """Thread-safe token bucket used to pace requests to a sustained rate"""
+    
+    def __init__(self, rate: float, capacity: float, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._updated_at = clock()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1) -> None:
+        """Block until the requested tokens are available, then take them"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            self._sleep(wait)
+
+
 class GmailAPIService:
     """Production Gmail API service with OAuth2 authentication"""
     
@@ -31,8 +64,10 @@ class GmailAPIService:
         'https://www.googleapis.com/auth/gmail.readonly'  # Added for connection testing
     ]
     
-    def __init__(self):
-        self.service = None
+    BATCH_URI = 'https://gmail.googleapis.com/batch/gmail/v1'
+    
+    def __init__(self, service=None):
+        self.service = service
         self.credentials_file = getattr(settings, 'GMAIL_OAUTH_CREDENTIALS_FILE', 'credentials/gmail-oauth.json')
         self.token_file = getattr(settings, 'GMAIL_TOKEN_FILE', 'credentials/token.json')
         self.sender_email = getattr(settings, 'GMAIL_SENDER_EMAIL', None)
@@ -41,7 +76,20 @@ class GmailAPIService:
         if not self.sender_email:
             raise ValueError("GMAIL_SENDER_EMAIL must be set in environment variables")
         
-        self._initialize_service()
+        # Batching and pacing
+        self.batch_size = min(getattr(settings, 'GMAIL_BATCH_SIZE', 50), 100)
+        self.max_retries = getattr(settings, 'GMAIL_BATCH_MAX_RETRIES', 5)
+        self.backoff_base = getattr(settings, 'GMAIL_BACKOFF_BASE_SECONDS', 1.0)
+        self.backoff_max = getattr(settings, 'GMAIL_BACKOFF_MAX_SECONDS', 32.0)
+        self.rate_limiter = TokenBucket(
+            rate=getattr(settings, 'GMAIL_SEND_RATE_PER_SECOND', 2.5),
+            capacity=getattr(settings, 'GMAIL_SEND_BURST', 25)
+        )
+        self._sleep = time.sleep
+        
+        # An injected client (e.g. the local fake) skips OAuth
+        if self.service is None:
+            self._initialize_service()
     
     def _initialize_service(self) -> None:
         """Initialize Gmail API service with OAuth2 authentication"""
@@ -128,6 +176,7 @@ class GmailAPIService:
                 to_emails, subject, text_content, html_content, attachments, headers
             )
             
+            self.rate_limiter.acquire()
             result = self.service.users().messages().send(
                 userId='me', 
                 body=message
@@ -147,6 +196,89 @@ class GmailAPIService:
             logger.error(error_msg, exc_info=True)
             return False, error_msg
     
+    def send_batch(self, messages: List[Dict[str, Any]]) -> List[Tuple[bool, str]]:
+        """
+        Send many emails through the Gmail batch endpoint
+        
+        Args:
+            messages: List of dicts with the keyword arguments of send_email
+            
+        Returns:
+            List of (success, message_id_or_error) in the same order as messages
+        """
+        results: List[Optional[Tuple[bool, str]]] = [None] * len(messages)
+        raw_messages = {}
+        for index, message in enumerate(messages):
+            try:
+                raw_messages[index] = self._create_message(**message)
+            except Exception as error:
+                results[index] = (False, f"Unexpected error building email: {error}")
+        
+        pending = sorted(raw_messages)
+        attempt = 0
+        while pending:
+            retry = []
+            
+            def callback(request_id, response, exception):
+                index = int(request_id)
+                if exception is None:
+                    results[index] = (True, response.get('id'))
+                elif self._is_retryable(exception):
+                    retry.append(index)
+                else:
+                    results[index] = (False, f"Gmail API error: {exception}")
+            
+            for start in range(0, len(pending), self.batch_size):
+                chunk = pending[start:start + self.batch_size]
+                batch = BatchHttpRequest(callback=callback, batch_uri=self.BATCH_URI)
+                for index in chunk:
+                    self.rate_limiter.acquire()
+                    batch.add(
+                        self.service.users().messages().send(userId='me', body=raw_messages[index]),
+                        request_id=str(index)
+                    )
+                try:
+                    batch.execute()
+                except HttpError as error:
+                    # The whole batch request was rejected
+                    if self._is_retryable(error):
+                        retry.extend(chunk)
+                    else:
+                        for index in chunk:
+                            results[index] = (False, f"Gmail API error: {error}")
+                except Exception as error:
+                    for index in chunk:
+                        results[index] = (False, f"Unexpected error sending email: {error}")
+            
+            if not retry:
+                break
+            
+            attempt += 1
+            if attempt > self.max_retries:
+                for index in retry:
+                    results[index] = (False, "Gmail API rate limit: retries exhausted")
+                break
+            
+            # Exponential backoff with jitter before resending throttled messages
+            delay = min(self.backoff_base * 2 ** (attempt - 1), self.backoff_max)
+            logger.warning(f"Gmail API throttled {len(retry)} messages, retrying in {delay:.1f}s")
+            self._sleep(delay + random.uniform(0, delay / 2))
+            pending = sorted(retry)
+        
+        sent = sum(1 for result in results if result and result[0])
+        logger.info(f"Gmail batch send finished: {sent}/{len(messages)} emails sent")
+        return results
+    
+    def _is_retryable(self, error: Exception) -> bool:
+        """True for quota and transient server errors"""
+        if not isinstance(error, HttpError):
+            return False
+        status = error.resp.status
+        if status in (429, 500, 503):
+            return True
+        content = error.content.decode('utf-8', 'ignore') if isinstance(error.content, bytes) else str(error.content)
+        return status == 403 and ('rateLimitExceeded' in content or 'userRateLimitExceeded' in content)
+    
     def _create_message(
         self,
         to_emails: List[str],
@@ -284,4 +416,24 @@ def send_gmail(
     except Exception as e:
         error_msg = f"Gmail service error: {str(e)}"
         logger.error(error_msg)
-        return False, error_msg 
\ No newline at end of file
+        return False, error_msg 
+
+
+def send_gmail_batch(messages: List[Dict[str, Any]]) -> List[Tuple[bool, str]]:
+    """
+    Convenient function to send many emails via the Gmail batch endpoint
+    
+    Args:
+        messages: List of dicts with to_emails, subject, text_content and
+            optionally html_content, attachments and headers
+        
+    Returns:
+        List of (success: bool, message_id_or_error: str), one per message
+    """
+    try:
+        service = get_gmail_service()
+        return service.send_batch(messages)
+    except Exception as e:
+        error_msg = f"Gmail service error: {str(e)}"
+        logger.error(error_msg)
+        return [(False, error_msg)] * len(messages)
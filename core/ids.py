@@ -0,0 +1,288 @@
+"""
+Sortable, collision-free identifiers
+
+Reference, loan and payment numbers used to be a date plus a few random
+digits, which collides once a few thousand are issued per day. IDs are
+now Snowflake-style 63-bit integers built in process memory:
+
+    | 41 bits milliseconds since ID_EPOCH | 10 bits worker | 12 bits sequence |
+
+- The sequence counts IDs issued by this process within one millisecond;
+  when it runs out, or the clock steps back, the next IDs borrow the
+  following millisecond so they keep increasing
+- The worker id separates processes. It comes from ID_WORKER_ID when a
+  deployment assigns one, otherwise the process claims a free slot in
+  the ID_WORKER_CACHE cache once and renews the lease while it keeps
+  issuing IDs
+- The first ID of a process is usually issued inside a caller's
+  transaction, and a lease written by a database cache in that
+  transaction disappears if it rolls back. Such a lease is only trusted
+  once the transaction commits; after a rollback it is written again (or
+  a new slot is claimed) before the next ID, and renewals check the slot
+  is still ours
+- Forked children (gunicorn --preload, multiprocessing) reset their state
+  and claim their own worker id
+
+encode_id() renders an ID as 13 base-36 characters, so string IDs sort in
+issue order and fit the 20 character number columns with a prefix.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+WORKER_SHIFT = SEQUENCE_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS
+
+# 2024-01-01T00:00:00Z; 41 bits of milliseconds last until 2093
+DEFAULT_EPOCH_MS = 1704067200000
+
+ENCODED_LENGTH = 13
+_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _epoch_ms():
+    return getattr(settings, 'ID_EPOCH_MS', DEFAULT_EPOCH_MS)
+
+
+def _lease_seconds():
+    return getattr(settings, 'ID_WORKER_LEASE_SECONDS', 24 * 60 * 60)
+
+
+# Seconds between attempts to lease a slot while running on a random worker id
+CLAIM_RETRY_SECONDS = 60
+
+
+def _lease_cache():
+    return caches[getattr(settings, 'ID_WORKER_CACHE', 'default')]
+
+
+def worker_key(worker_id):
+    return f"ids:worker:{worker_id}"
+
+
+class WorkerLease:
+    """A worker id slot written to the lease cache, possibly inside a transaction"""
+
+    def __init__(self, worker_id, owner, cache):
+        self.worker_id = worker_id
+        self.owner = owner
+        # Database caches write through the caller's connection, and so its transaction
+        model = getattr(cache, 'cache_model_class', None)
+        connection = connections[router.db_for_write(model)] if model is not None else None
+        self.confirmed = connection is None or not connection.in_atomic_block
+        self.rolled_back = False
+        if not self.confirmed:
+            # Only Django holds the callback: it is released after running on
+            # commit, or dropped with the transaction or savepoint on rollback
+            confirm = self._confirm
+            transaction.on_commit(confirm, using=connection.alias)
+            weakref.finalize(confirm, self._released)
+
+    def _confirm(self):
+        self.confirmed = True
+
+    def _released(self):
+        if not self.confirmed:
+            self.rolled_back = True
+
+    def held(self):
+        """False once the transaction that wrote the lease has rolled back"""
+        return not self.rolled_back
+
+
+def claim_worker_lease(owner):
+    """
+    Lease a worker id not used by any live process.
+
+    Probes cache slots from a random start so concurrent starters rarely
+    contend.
+
+    Returns:
+        WorkerLease: The lease, or None if the cache is unavailable or every slot is leased
+    """
+    start = random.SystemRandom().randint(0, MAX_WORKER_ID)
+    try:
+        cache = _lease_cache()
+        for offset in range(MAX_WORKER_ID + 1):
+            worker_id = (start + offset) & MAX_WORKER_ID
+            if cache.add(worker_key(worker_id), owner, _lease_seconds()):
+                return WorkerLease(worker_id, owner, cache)
+        logger.error("All ID worker slots are leased")
+    except Exception as e:
+        logger.error(f"Could not claim an ID worker slot: {str(e)}")
+    return None
+
+
+def renew_worker_lease(lease):
+    """
+    Extend a lease that is still ours, or write it again if it is gone.
+
+    Returns:
+        WorkerLease: The renewed lease, or None if another process holds the slot
+    """
+    cache = _lease_cache()
+    key = worker_key(lease.worker_id)
+    holder = cache.get(key)
+    if holder == lease.owner:
+        cache.set(key, lease.owner, _lease_seconds())
+    elif holder is not None or not cache.add(key, lease.owner, _lease_seconds()):
+        return None
+    return WorkerLease(lease.worker_id, lease.owner, cache)
+
+
+class SnowflakeGenerator:
+    """Thread-safe generator of increasing 63-bit ids for one worker"""
+
+    def __init__(self, worker_id=None, epoch_ms=None, clock=None):
+        if worker_id is not None and not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be between 0 and {MAX_WORKER_ID}")
+        self._configured_worker_id = worker_id
+        self._epoch_ms = epoch_ms
+        self._clock = clock or time.time
+        self.reset()
+
+    def reset(self):
+        """Forget the worker id and sequence; used in forked children"""
+        self._lock = threading.Lock()
+        self.worker_id = self._configured_worker_id
+        self._leasing = False
+        self._lease = None
+        self._lease_renew_at = 0.0
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _ensure_worker(self):
+        if self._epoch_ms is None:
+            self._epoch_ms = _epoch_ms()
+        if self.worker_id is None:
+            configured = getattr(settings, 'ID_WORKER_ID', None)
+            if configured is not None:
+                self.worker_id = int(configured) & MAX_WORKER_ID
+            else:
+                self._leasing = True
+                self._claim()
+        elif not self._leasing:
+            return
+        elif self._lease is None:
+            if self._clock() >= self._lease_renew_at:
+                self._claim()
+        elif not self._lease.held():
+            logger.info(f"ID worker slot {self.worker_id} was rolled back; leasing it again")
+            self._renew()
+        elif self._clock() >= self._lease_renew_at:
+            # Keep the slot while this process is alive
+            self._renew()
+
+    def _owner(self):
+        return f"{os.uname().nodename}:{os.getpid()}"
+
+    def _use(self, lease):
+        if lease is None:
+            if self._lease is None and self.worker_id is not None:
+                worker_id = self.worker_id
+            else:
+                worker_id = random.SystemRandom().randint(0, MAX_WORKER_ID)
+            logger.error(f"Issuing IDs from random worker id {worker_id}; IDs may collide until a slot is leased")
+            self._lease_renew_at = self._clock() + CLAIM_RETRY_SECONDS
+        else:
+            worker_id = lease.worker_id
+            self._lease_renew_at = self._clock() + _lease_seconds() / 2
+        if self.worker_id is not None and worker_id != self.worker_id:
+            # Continue in a later millisecond so ids keep increasing across the switch
+            self._last_ms += 1
+            self._sequence = -1
+        self._lease = lease
+        self.worker_id = worker_id
+
+    def _claim(self):
+        self._use(claim_worker_lease(self._owner()))
+
+    def _renew(self):
+        try:
+            lease = renew_worker_lease(self._lease)
+        except Exception as e:
+            logger.warning(f"Could not renew ID worker slot {self.worker_id}: {str(e)}")
+            if not self._lease.held():
+                self._claim()
+            else:
+                # The slot stays ours until the lease expires; try again shortly
+                self._lease_renew_at = self._clock() + CLAIM_RETRY_SECONDS
+            return
+        if lease is None:
+            logger.warning(f"ID worker slot {self.worker_id} is held by another process; claiming a new one")
+            self._claim()
+        else:
+            self._use(lease)
+
+    def next_id(self):
+        with self._lock:
+            self._ensure_worker()
+            now = int(self._clock() * 1000) - self._epoch_ms
+            if now > self._last_ms:
+                self._last_ms = now
+                self._sequence = 0
+            else:
+                # Same millisecond, or the clock stepped back
+                self._sequence += 1
+                if self._sequence > MAX_SEQUENCE:
+                    self._last_ms += 1
+                    self._sequence = 0
+            if self._last_ms >> TIMESTAMP_BITS:
+                raise OverflowError("ID timestamp exceeds 41 bits; move ID_EPOCH_MS forward")
+            return (self._last_ms << TIMESTAMP_SHIFT) | (self.worker_id << WORKER_SHIFT) | self._sequence
+
+
+def decode_id(value):
+    """
+    Split an id into its parts.
+
+    Returns:
+        dict: timestamp (aware datetime), worker_id and sequence
+    """
+    ms = (value >> TIMESTAMP_SHIFT) + _epoch_ms()
+    return {
+        'timestamp': datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc),
+        'worker_id': (value >> WORKER_SHIFT) & MAX_WORKER_ID,
+        'sequence': value & MAX_SEQUENCE,
+    }
+
+
+def encode_id(value):
+    """Fixed width base-36, so encoded ids sort like the integers"""
+    chars = []
+    while value:
+        value, remainder = divmod(value, 36)
+        chars.append(_ALPHABET[remainder])
+    return ''.join(reversed(chars)).rjust(ENCODED_LENGTH, '0')
+
+
+_generator = SnowflakeGenerator()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_generator.reset)
+
+
+def next_id():
+    """Next id from this process's generator"""
+    return _generator.next_id()
+
+
+def new_identifier(prefix=''):
+    """Prefix plus the next encoded id, e.g. LON0B8XK3M2Q0W01"""
+    return f"{prefix}{encode_id(next_id())}"
@@ -0,0 +1,80 @@
+"""
+N+1 query detection for tests
+
+QueryRecorder wraps the database cursor with connection.execute_wrapper
+and records every statement run inside it. NPlusOneAssertionsMixin uses
+it to run the same request against a small and a large data set: a
+correctly planned endpoint issues the same number of queries for both,
+while an N+1 shows up as statements whose count grows with the rows.
+"""
+import re
+from collections import Counter
+
+from django.db import connections
+
+# String and numeric literals, and the generated names of savepoints
+_LITERALS = re.compile(r"'[^']*'|\b\d+\b|\"s\d+_x\d+\"")
+
+
+def normalize_sql(sql):
+    """Collapse literals so repeated per-row queries group together"""
+    return _LITERALS.sub('?', sql)
+
+
+class QueryRecorder:
+    """Context manager recording the SQL executed on one connection"""
+
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._wrapper.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def grouped(self):
+        return Counter(normalize_sql(sql) for sql in self.queries)
+
+
+class NPlusOneAssertionsMixin:
+    """TestCase mixin failing when an operation's query count grows with its data"""
+
+    def assertNoNPlusOne(self, fetch, grow, small=2, large=6, using='default'):
+        """
+        Assert that fetch() runs the same queries with `small` and `large` rows.
+
+        Args:
+            fetch: Callable performing the request under test
+            grow: Callable taking a row count and making sure that many rows exist
+        """
+        grow(small)
+        with QueryRecorder(using) as before:
+            fetch()
+        grow(large)
+        with QueryRecorder(using) as after:
+            fetch()
+
+        if after.count > before.count:
+            before_groups = before.grouped()
+            repeated = [
+                f"  {count - before_groups.get(sql, 0):+d}x {sql}"
+                for sql, count in after.grouped().items()
+                if count > before_groups.get(sql, 0)
+            ]
+            self.fail(
+                f"Query count grew from {before.count} to {after.count} when rows went "
+                f"from {small} to {large} (N+1). Statements that grew:\n" + "\n".join(repeated)
+            )
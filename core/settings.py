@@ -85,6 +85,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static files in production
+    'api.compression.APICompressionMiddleware',  # brotli/gzip for large API responses
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -190,7 +191,8 @@ else:
         import dj_database_url
         DATABASES = {
             'default': dj_database_url.config(
-                conn_max_age=600,
+                # core/asgi.py sets 0: under ASGI sync code runs in executor threads that never reuse connections
+                conn_max_age=int(os.getenv('DB_CONN_MAX_AGE', '600')),
                 conn_health_checks=True,
             )
         }
@@ -243,10 +245,60 @@ GMAIL_OAUTH_CREDENTIALS_FILE = os.getenv('GMAIL_OAUTH_CREDENTIALS_FILE', 'creden
 GMAIL_TOKEN_FILE = os.getenv('GMAIL_TOKEN_FILE', 'credentials/gmail-token.json')
 GMAIL_SENDER_EMAIL = os.getenv('GMAIL_SENDER_EMAIL', 'primetrustbank02@gmail.com')
 GMAIL_SUBJECT_PREFIX = os.getenv('GMAIL_SUBJECT_PREFIX', 'PrimeTrust - ')
+GMAIL_BATCH_SIZE = 50  # Messages per batch HTTP request (Gmail allows up to 100)
+GMAIL_SEND_RATE_PER_SECOND = 2.5  # messages.send costs 100 of the 250 quota units per user per second
+GMAIL_SEND_BURST = 25
+GMAIL_BATCH_MAX_RETRIES = 5  # Resends of throttled (429) messages
+GMAIL_BACKOFF_BASE_SECONDS = 1.0
+GMAIL_BACKOFF_MAX_SECONDS = 32.0
 
 # Email timeout settings
 EMAIL_TIMEOUT = 30
 
+# Email outbox (see send_outbox_emails)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 60  # Seconds before the first retry, doubled per attempt
+EMAIL_OUTBOX_LEASE_SECONDS = 300  # Emails claimed longer than this are picked up again
+EMAIL_OUTBOX_REDACT_TYPES = ['verification']  # Bodies blanked once sent or given up; they carry one-time codes
+
+# Notification fan-out (see process_notification_fanouts)
+NOTIFICATION_FANOUT_CHUNK_SIZE = 1000  # Notifications inserted per bulk_create and transaction
+NOTIFICATION_FANOUT_INLINE_LIMIT = 500  # Larger querysets are queued as a background job
+NOTIFICATION_CACHE_TIMEOUT = 300  # Seconds a user's unread count and feed stay cached
+
+# Account and card numbers (see banking.number_allocator)
+NUMBER_ALLOCATOR_BLOCK_SIZE = 1000  # Serials each process reserves per query
+CARD_BINS = {'visa': '453201', 'mastercard': '532101'}  # 6-digit issuer prefixes
+
+# Batch transfers (see banking.batch_transfers)
+BATCH_TRANSFER_MAX_LEGS = 10000  # Legs accepted per /api/v1/transfers/batch/ request
+BATCH_TRANSFER_CHUNK_SIZE = 1000  # Rows per bulk_create / bulk_update statement
+
+# Bulk customer onboarding (see banking.bulk_onboarding)
+BULK_ONBOARD_CHUNK_SIZE = 1000  # Customers created per transaction
+
+# Batched backfills behind maintenance commands (see banking.backfill)
+BACKFILL_CHUNK_SIZE = 1000  # Source rows per bulk_create and checkpoint
+
+# Scheduled payment execution (see banking.scheduled_payments)
+SCHEDULED_PAYMENT_CHUNK_SIZE = 500  # Schedules claimed per transaction
+SCHEDULED_PAYMENT_RETRY_SECONDS = 6 * 60 * 60  # Wait before retrying an insufficient-funds payment
+SCHEDULED_PAYMENT_MAX_RETRIES = 3  # Retries before the occurrence is skipped
+
+# Loan schedules and nightly interest accrual (see banking.amortization)
+LOAN_AMORTIZATION_CHUNK_SIZE = 1000  # Loans per schedule rebuild / accrual UPDATE
+
+# Dashboard push events (see core.event_bus and dashboard/events/)
+# LISTEN/NOTIFY reaches streams on every worker; the local bus only reaches this process
+DASHBOARD_EVENTS_BACKEND = (
+    'core.event_bus.PostgresEventBus'
+    if DATABASES['default'].get('ENGINE', '').endswith('postgresql')
+    else 'core.event_bus.LocalEventBus'
+)
+DASHBOARD_EVENTS_HEARTBEAT_SECONDS = 15  # Keepalive comment interval on idle streams
+DASHBOARD_EVENTS_RETRY_MS = 3000  # Browser reconnect delay after a dropped stream
+DASHBOARD_SNAPSHOT_TIMEOUT = 300  # Seconds a user's dashboard snapshot is kept; changes bump its version sooner
+
 # Verification settings
 EMAIL_VERIFICATION_TIMEOUT = 3600  # 1 hour in seconds
 LOGIN_VERIFICATION_TIMEOUT = 300   # 5 minutes in seconds
@@ -399,9 +451,14 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # orjson-backed JSON; the browsable API is only enabled in DEBUG
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'api.renderers.ORJSONRenderer',
+    ] + (['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
@@ -421,6 +478,10 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# API responses smaller than this many bytes are not compressed
+API_COMPRESSION_MIN_SIZE = 1024
+API_COMPRESSION_BROTLI_QUALITY = 5  # 0-11; 4-6 balances CPU against size for dynamic JSON
+
 # JWT settings
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -496,6 +557,23 @@ API_RATE_LIMIT_BURST = 10
 # API Version
 API_VERSION = 'v1'
 
+# Webhook circuit breaker (per endpoint)
+WEBHOOK_CIRCUIT_WINDOW_SIZE = 20  # Recent deliveries used for the failure rate
+WEBHOOK_CIRCUIT_MIN_CALLS = 5  # Deliveries needed before the circuit can open
+WEBHOOK_CIRCUIT_FAILURE_RATE = 50  # Percent of failed or slow deliveries that opens the circuit
+WEBHOOK_CIRCUIT_SLOW_CALL_MS = 5000  # Deliveries slower than this count as failures
+WEBHOOK_CIRCUIT_OPEN_SECONDS = 60  # Cooldown before a half-open probe is sent
+WEBHOOK_MAX_CONCURRENCY = 10  # Upper bound for the AIMD in-flight limit
+WEBHOOK_STATS_CACHE_TIMEOUT = 300  # Per-user webhook stats snapshot lifetime in seconds
+WEBHOOK_BATCH_CLAIM_SECONDS = 300  # Batched deliveries claimed longer ago are reclaimed from a crashed sender
+
+# Webhook storage retention (see purge_webhook_data)
+WEBHOOK_LOG_RETENTION_DAYS = 30
+WEBHOOK_DELIVERY_RETENTION_DAYS = 90  # Older deliveries are rolled up into daily summaries
+WEBHOOK_RETENTION_CHUNK_SIZE = 5000  # Rows deleted per transaction
+WEBHOOK_LOG_SINK_MODE = os.getenv('WEBHOOK_LOG_SINK_MODE', 'all')  # 'all' or 'errors'
+WEBHOOK_LOG_SUCCESS_SAMPLE_RATE = 0.01  # Fraction of info logs kept in 'errors' mode
+
 # Security settings for API
 if not DEBUG:
     SECURE_CROSS_ORIGIN_OPENER_POLICY = 'same-origin'
@@ -543,8 +621,34 @@ CACHES = {
         'OPTIONS': {
             'MAX_ENTRIES': 500,
         }
+    },
+    # ID generator worker leases (see core.ids); sized above the 1024 slots so leases are never culled
+    'ids': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_ids_cache_table',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2048,
+        }
+    },
+    # Per-user notification counts/feeds and dashboard snapshots, about five keys per active user;
+    # kept out of 'default' so its 1000 entry limit does not cull them on every write
+    'user_state': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_user_state_cache_table',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 50000,
+        }
     }
 }
+USER_STATE_CACHE = 'user_state'
+
+# Snowflake ids (see core.ids): set a distinct ID_WORKER_ID (0-1023) per process where
+# the deployment can; otherwise each process leases a free worker id from the 'ids' cache
+ID_WORKER_ID = int(os.getenv('ID_WORKER_ID')) if os.getenv('ID_WORKER_ID') else None
+ID_WORKER_CACHE = 'ids'
+ID_WORKER_LEASE_SECONDS = 24 * 60 * 60
 
 # GeoIP Configuration (for geographic security)
 GEOIP_PATH = os.path.join(BASE_DIR, 'geoip')
@@ -0,0 +1,280 @@
+import asyncio
+import multiprocessing
+import threading
+from unittest.mock import patch
+
+from django.core.mail import EmailMessage
+from django.template.loader import get_template
+from django.core.cache import caches
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.email_templates import EMAIL_TEMPLATES, EmailTemplateRenderer
+from core.event_bus import LocalEventBus
+from core.gmail_backend import GmailBackend
+from core.gmail_fake import FakeGmailHttp, build_fake_gmail_service
+from core.gmail_service import GmailAPIService, TokenBucket
+from core.ids import (
+    MAX_SEQUENCE, MAX_WORKER_ID, WORKER_SHIFT, SnowflakeGenerator, claim_worker_lease, decode_id, encode_id,
+    worker_key,
+)
+
+
+def make_messages(count):
+    return [
+        {
+            'to_emails': [f'user{i}@example.com'],
+            'subject': 'Hello',
+            'text_content': f'Message {i}',
+        }
+        for i in range(count)
+    ]
+
+
+class GmailBatchSendTestCase(SimpleTestCase):
+    """Tests for Gmail batch sending against the local fake endpoint"""
+
+    def make_service(self, http, batch_size=50):
+        service = GmailAPIService(service=build_fake_gmail_service(http))
+        service.batch_size = batch_size
+        service.rate_limiter = TokenBucket(rate=1e9, capacity=1e9)
+        service.delays = []
+        service._sleep = service.delays.append
+        return service
+
+    def test_messages_grouped_into_batches(self):
+        http = FakeGmailHttp()
+        results = self.make_service(http, batch_size=4).send_batch(make_messages(10))
+
+        self.assertEqual(http.batch_sizes, [4, 4, 2])
+        self.assertEqual(http.round_trips, 3)
+        self.assertTrue(all(success for success, _ in results))
+        self.assertEqual(len({message_id for _, message_id in results}), 10)
+
+    def test_rate_limited_messages_retried_with_backoff(self):
+        http = FakeGmailHttp(rate_limit_failures={'user1@example.com': 2, 'user3@example.com': 1})
+        service = self.make_service(http)
+
+        results = service.send_batch(make_messages(5))
+
+        self.assertTrue(all(success for success, _ in results))
+        self.assertEqual(http.batch_sizes, [5, 2, 1])
+        self.assertEqual(len(service.delays), 2)
+        self.assertLess(service.delays[0], service.delays[1])
+
+    def test_retries_exhausted_reports_failure_per_message(self):
+        http = FakeGmailHttp(rate_limit_failures={'user2@example.com': 100})
+        service = self.make_service(http)
+        service.max_retries = 2
+
+        results = service.send_batch(make_messages(3))
+
+        self.assertEqual([success for success, _ in results], [True, True, False])
+        self.assertIn('retries exhausted', results[2][1])
+
+    def test_backend_sends_many_messages_in_one_batch(self):
+        http = FakeGmailHttp()
+        backend = GmailBackend()
+        backend.gmail_service = self.make_service(http)
+        messages = [EmailMessage('Hi', 'Body', to=[f'user{i}@example.com']) for i in range(3)]
+
+        self.assertEqual(backend.send_messages(messages), 3)
+        self.assertEqual(http.batch_sizes, [3])
+
+
+class TokenBucketTestCase(SimpleTestCase):
+    def test_acquire_waits_for_refill(self):
+        now = [0.0]
+        sleeps = []
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=sleep)
+        for _ in range(4):
+            bucket.acquire()
+
+        # Two from the burst, then one token every half second
+        self.assertAlmostEqual(sum(sleeps), 1.0)
+
+
+class EmailTemplateRendererTestCase(SimpleTestCase):
+    """Tests for precompiled email rendering"""
+
+    def test_templates_compiled_once(self):
+        renderer = EmailTemplateRenderer()
+        with patch('core.email_templates.get_template', wraps=get_template) as mock_get:
+            renderer.render('verification_email', {'verification_code': '123456'})
+            renderer.render('verification_email', {'verification_code': '654321'})
+
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_text_version_uses_text_template(self):
+        html_content, text_content = EmailTemplateRenderer().render('security_alert', {
+            'user_name': "Jane O'Brien",
+            'alert_type': 'New Login',
+            'details': {'ip_address': '10.0.0.1'},
+            'timestamp': 'now',
+        })
+
+        self.assertIn('<div class="container">', html_content)
+        self.assertNotIn('<', text_content)
+        # Text templates are not HTML escaped
+        self.assertIn("Dear Jane O'Brien,", text_content)
+        self.assertIn('Ip_Address: 10.0.0.1', text_content)
+
+    def test_every_email_has_text_twin(self):
+        renderer = EmailTemplateRenderer()
+        self.assertEqual(renderer.preload(), len(EMAIL_TEMPLATES))
+        for name in EMAIL_TEMPLATES:
+            self.assertIsNotNone(renderer.get_templates(name)[1], name)
+
+
+class LocalEventBusTestCase(SimpleTestCase):
+    """Tests for the in-process dashboard event bus"""
+
+    def test_publish_from_thread_reaches_subscriber(self):
+        bus = LocalEventBus()
+
+        async def scenario():
+            subscription = bus.subscribe('user:1')
+            other = bus.subscribe('user:2')
+            thread = threading.Thread(target=bus.publish, args=('user:1', 'balance', {'balance': '10.00'}))
+            thread.start()
+            thread.join()
+            message = await subscription.get(timeout=1)
+            missed = await other.get(timeout=0.05)
+            subscription.close()
+            other.close()
+            return message, missed
+
+        message, missed = asyncio.run(scenario())
+        self.assertEqual(message, {'event': 'balance', 'data': {'balance': '10.00'}})
+        self.assertIsNone(missed)
+        self.assertEqual(bus.subscriber_count('user:1'), 0)
+
+    def test_slow_subscriber_keeps_newest_events(self):
+        bus = LocalEventBus(max_queued=2)
+
+        async def scenario():
+            subscription = bus.subscribe('user:1')
+            for i in range(4):
+                bus.publish('user:1', 'transaction', {'id': i})
+            await asyncio.sleep(0)
+            received = [await subscription.get(timeout=1) for _ in range(2)]
+            subscription.close()
+            return [message['data']['id'] for message in received]
+
+        self.assertEqual(asyncio.run(scenario()), [2, 3])
+
+
+def generate_ids(worker_id, count):
+    """Issue count ids in a child process; returns (count, sample, increasing, own worker bits)"""
+    generator = SnowflakeGenerator(worker_id=worker_id)
+    previous = -1
+    increasing = own_worker = True
+    sample = []
+    for i in range(count):
+        value = generator.next_id()
+        if value <= previous:
+            increasing = False
+        if (value >> WORKER_SHIFT) & MAX_WORKER_ID != worker_id:
+            own_worker = False
+        if i % 1000 == 0:
+            sample.append(value)
+        previous = value
+    return count, sample, increasing, own_worker
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class SnowflakeGeneratorTestCase(SimpleTestCase):
+    """Tests for the Snowflake id generator"""
+
+    def test_ids_from_many_processes_never_collide(self):
+        # 10M ids over 4 processes: each process' ids strictly increase and carry
+        # its own worker id, so no two ids anywhere can be equal
+        workers, per_worker = 4, 2_500_000
+        context = multiprocessing.get_context('fork')
+        with context.Pool(workers) as pool:
+            results = pool.starmap(generate_ids, [(worker_id, per_worker) for worker_id in range(workers)])
+
+        self.assertEqual(sum(count for count, _, _, _ in results), 10_000_000)
+        for _, _, increasing, own_worker in results:
+            self.assertTrue(increasing)
+            self.assertTrue(own_worker)
+        sample = [value for _, values, _, _ in results for value in values]
+        self.assertEqual(len(set(sample)), len(sample))
+
+    def test_sequence_overflow_and_clock_going_back(self):
+        clock = FakeClock(1_800_000_000.0)
+        generator = SnowflakeGenerator(worker_id=7, clock=clock)
+        ids = [generator.next_id() for _ in range(MAX_SEQUENCE + 3)]
+        clock.now -= 5
+        ids.append(generator.next_id())
+
+        self.assertEqual(ids, sorted(set(ids)))
+        self.assertEqual(decode_id(ids[MAX_SEQUENCE])['sequence'], MAX_SEQUENCE)
+        # The 4097th id borrows the next millisecond
+        self.assertEqual(decode_id(ids[MAX_SEQUENCE + 1])['sequence'], 0)
+        self.assertEqual(decode_id(ids[-1])['worker_id'], 7)
+
+    def test_encoded_ids_sort_like_integers(self):
+        clock = FakeClock(1_800_000_000.0)
+        generator = SnowflakeGenerator(worker_id=1, clock=clock)
+        ids = []
+        for step in range(50):
+            clock.now += step * 0.37
+            ids.append(generator.next_id())
+        encoded = [encode_id(value) for value in ids]
+        self.assertEqual(sorted(encoded), encoded)
+        self.assertTrue(all(len(value) == 13 for value in encoded))
+        self.assertEqual(decode_id(ids[0])['timestamp'].timestamp(), 1_800_000_000.0)
+
+    def test_invalid_worker_id(self):
+        with self.assertRaises(ValueError):
+            SnowflakeGenerator(worker_id=MAX_WORKER_ID + 1)
+
+
+class WorkerIdLeaseTestCase(TestCase):
+    """Tests for leasing worker ids from the cache"""
+
+    def test_claimed_worker_ids_are_distinct(self):
+        claimed = {claim_worker_lease('test').worker_id for _ in range(20)}
+        self.assertEqual(len(claimed), 20)
+
+    @override_settings(ID_WORKER_ID=None)
+    def test_lease_rolled_back_with_the_first_id_is_written_again(self):
+        generator = SnowflakeGenerator()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                first = generator.next_id()
+                raise RuntimeError
+        key = worker_key(generator.worker_id)
+        self.assertIsNone(caches['ids'].get(key))
+
+        second = generator.next_id()
+        self.assertGreater(second, first)
+        self.assertEqual(caches['ids'].get(worker_key(generator.worker_id)), generator._owner())
+
+    @override_settings(ID_WORKER_ID=None, ID_WORKER_LEASE_SECONDS=100)
+    def test_renewal_claims_a_new_slot_when_ours_was_taken(self):
+        clock = FakeClock(1_800_000_000.0)
+        generator = SnowflakeGenerator(clock=clock)
+        first = generator.next_id()
+        taken = generator.worker_id
+        caches['ids'].set(worker_key(taken), 'other-process', 100)
+
+        clock.now += 60
+        second = generator.next_id()
+        self.assertNotEqual(generator.worker_id, taken)
+        self.assertGreater(second, first)
+        self.assertEqual(caches['ids'].get(worker_key(taken)), 'other-process')
+        self.assertEqual(caches['ids'].get(worker_key(generator.worker_id)), generator._owner())
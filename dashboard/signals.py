@@ -0,0 +1,25 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from banking.models import Account, BitcoinWallet, Transaction, VirtualCard
+from .snapshot import DashboardSnapshot
+
+
+def invalidate_on_commit(user_ids):
+    # After commit, so a concurrent rebuild cannot cache pre-commit data under the new version
+    transaction.on_commit(lambda: DashboardSnapshot.invalidate(user_ids))
+
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=VirtualCard)
+@receiver([post_save, post_delete], sender=BitcoinWallet)
+def invalidate_owner_snapshot(sender, instance, **kwargs):
+    """Rebuild the owner's dashboard snapshot after an account, card or wallet change"""
+    invalidate_on_commit([instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=Transaction)
+def invalidate_transaction_snapshots(sender, instance, **kwargs):
+    """Rebuild the dashboard snapshot of every user the transaction touches"""
+    invalidate_on_commit(instance.get_involved_user_ids())
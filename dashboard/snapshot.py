@@ -0,0 +1,126 @@
+"""
+Cached per-user dashboard snapshot
+
+DashboardSnapshot builds everything the dashboard home page and its
+HTMX partials display in a handful of queries and caches it per user.
+The cache key embeds a per-user version that dashboard.signals bumps
+whenever the user's transactions, accounts, cards or wallet change, so
+a stale snapshot is never read and nothing has to be deleted.
+
+Unread notifications and the BTC price are not part of the snapshot;
+they come from their own caches (banking.notification_cache and the
+'btc_price_usd' key) on every request. Snapshots and versions live in
+the USER_STATE_CACHE cache, the BTC price in the default cache.
+"""
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db.models import Count, Q, Sum
+
+from banking import notification_cache
+from banking.models import Account, BitcoinWallet, Transaction, VirtualCard
+from banking.views_bitcoin import update_btc_price
+
+
+def _cache():
+    return caches[getattr(settings, 'USER_STATE_CACHE', 'default')]
+
+
+class DashboardSnapshot:
+    """Builds, caches and invalidates dashboard context per user"""
+
+    RECENT_TRANSACTIONS = 5
+
+    @staticmethod
+    def version_key(user_id):
+        return f"dashboard_snapshot_version:{user_id}"
+
+    @classmethod
+    def get_version(cls, user_id):
+        version = _cache().get(cls.version_key(user_id))
+        if version is None:
+            version = time.time_ns()
+            _cache().set(cls.version_key(user_id), version, None)
+        return version
+
+    @classmethod
+    def invalidate(cls, user_ids):
+        """Bump the users' versions so their next read rebuilds the snapshot"""
+        if isinstance(user_ids, int):
+            user_ids = [user_ids]
+        version = time.time_ns()
+        _cache().set_many({cls.version_key(user_id): version for user_id in set(user_ids) if user_id}, None)
+
+    @classmethod
+    def build(cls, user):
+        """Compute the snapshot from the database (five queries)"""
+        accounts = list(Account.objects.filter(user=user))
+        account_ids = [account.id for account in accounts]
+
+        bitcoin_wallet = BitcoinWallet.objects.filter(user=user).first()
+
+        involved = Q(from_account_id__in=account_ids) | Q(to_account_id__in=account_ids) | Q(user=user)
+        transactions = list(
+            Transaction.objects.filter(involved)
+            .select_related('from_account__user')
+            .order_by('-created_at')[:cls.RECENT_TRANSACTIONS]
+        )
+
+        # Count and both totals in a single aggregate
+        received = (
+            Q(to_account_id__in=account_ids, status='completed') |
+            Q(user=user, transaction_type='bitcoin_deposit', status='completed')
+        )
+        spent = (
+            Q(from_account_id__in=account_ids, status='completed') |
+            Q(user=user, transaction_type='bitcoin_send', status='completed')
+        )
+        metrics = Transaction.objects.filter(involved).aggregate(
+            transactions_count=Count('id'),
+            money_received=Sum('amount', filter=received),
+            money_spent=Sum('amount', filter=spent),
+        )
+
+        virtual_cards = list(VirtualCard.objects.filter(user=user, is_active=True))
+
+        return {
+            'accounts': accounts,
+            'total_balance': sum((account.balance for account in accounts), Decimal('0.00')),
+            'bitcoin_wallet': bitcoin_wallet,
+            'transactions': transactions,
+            'virtual_cards': virtual_cards,
+            'transactions_count': metrics['transactions_count'],
+            'money_received': metrics['money_received'] or Decimal('0.00'),
+            'money_spent': metrics['money_spent'] or Decimal('0.00'),
+        }
+
+    @classmethod
+    def get(cls, user):
+        """Cached snapshot for the user, rebuilt when its version changes"""
+        key = f"dashboard_snapshot:{user.id}:{cls.get_version(user.id)}"
+        snapshot = _cache().get(key)
+        if snapshot is None:
+            snapshot = cls.build(user)
+            _cache().set(key, snapshot, getattr(settings, 'DASHBOARD_SNAPSHOT_TIMEOUT', 300))
+        return snapshot
+
+    @staticmethod
+    def get_btc_price():
+        """BTC price from the shared cache; the price API is only called on a miss"""
+        btc_price = cache.get('btc_price_usd')
+        if btc_price is None:
+            btc_price = update_btc_price()
+        return btc_price or Decimal('0.00')
+
+    @classmethod
+    def get_context(cls, user):
+        """Full dashboard context: snapshot plus notifications and BTC price"""
+        context = dict(cls.get(user))
+        btc_price = cls.get_btc_price()
+        if context['bitcoin_wallet'] is not None:
+            context['bitcoin_wallet'].btc_price_usd = btc_price
+        context['btc_price_usd'] = btc_price
+        context['notifications'] = notification_cache.get_unread_feed(user.id)
+        return context
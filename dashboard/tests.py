@@ -1,3 +1,125 @@
+from decimal import Decimal
+
+from django.core.cache import cache, caches
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import CustomUser
+from banking.models import Account, Broadcast, Notification, Transaction
+from banking.utils import generate_reference_number
+from .snapshot import DashboardSnapshot
+
+
+class DashboardSnapshotTestCase(TestCase):
+    """Tests for the cached dashboard snapshot"""
+
+    def setUp(self):
+        cache.clear()
+        caches['user_state'].clear()
+        cache.set('btc_price_usd', Decimal('50000.00'))
+        self.user = CustomUser.objects.create_user(
+            username='snapshotuser', email='snapshot@example.com', password='TestPassword123!'
+        )
+        self.other = CustomUser.objects.create_user(
+            username='snapshotother', email='other@example.com', password='TestPassword123!'
+        )
+        self.account = Account.objects.filter(user=self.user).first()
+        self.other_account = Account.objects.filter(user=self.other).first()
+
+    def transfer(self, amount, from_account, to_account):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(
+                user=from_account.user,
+                from_account=from_account,
+                to_account=to_account,
+                amount=Decimal(amount),
+                transaction_type='transfer',
+                status='completed',
+                reference=generate_reference_number()
+            )
+
+    def test_build_query_count_is_constant(self):
+        for _ in range(3):
+            self.transfer('10.00', self.account, self.other_account)
+        with CaptureQueriesContext(connection) as few:
+            DashboardSnapshot.build(self.user)
+
+        for _ in range(10):
+            self.transfer('5.00', self.other_account, self.account)
+        with CaptureQueriesContext(connection) as many:
+            snapshot = DashboardSnapshot.build(self.user)
+
+        self.assertEqual(len(few), 5)
+        self.assertEqual(len(many), 5)
+        self.assertEqual(snapshot['transactions_count'], 13)
+        self.assertEqual(snapshot['money_spent'], Decimal('30.00'))
+        self.assertEqual(snapshot['money_received'], Decimal('50.00'))
+        self.assertEqual(len(snapshot['transactions']), DashboardSnapshot.RECENT_TRANSACTIONS)
+
+    def test_cached_snapshot_skips_ledger_queries(self):
+        DashboardSnapshot.get(self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            DashboardSnapshot.get(self.user)
+
+        ledger = [q for q in queries.captured_queries if 'banking_' in q['sql']]
+        self.assertEqual(ledger, [])
+
+    def test_transaction_bumps_both_users_versions(self):
+        self.assertEqual(DashboardSnapshot.get(self.user)['transactions_count'], 0)
+        self.assertEqual(DashboardSnapshot.get(self.other)['transactions_count'], 0)
+
+        self.transfer('25.00', self.account, self.other_account)
+
+        self.assertEqual(DashboardSnapshot.get(self.user)['transactions_count'], 1)
+        self.assertEqual(DashboardSnapshot.get(self.other)['money_received'], Decimal('25.00'))
+
+    def test_balance_change_invalidates(self):
+        self.assertEqual(DashboardSnapshot.get(self.user)['total_balance'], Decimal('0.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.balance = Decimal('120.00')
+            self.account.save()
+
+        self.assertEqual(DashboardSnapshot.get(self.user)['total_balance'], Decimal('120.00'))
+
+    def test_partial_refresh_is_cache_hit(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('dashboard:home'), secure=True)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dashboard:metrics_update'), secure=True)
+
+        self.assertEqual(response.status_code, 200)
+        ledger = [q for q in queries.captured_queries if 'banking_transaction' in q['sql']]
+        self.assertEqual(ledger, [])
+
+
+class NotificationsViewTestCase(TestCase):
+    """Tests for the notifications page and dropdown"""
+
+    def setUp(self):
+        cache.clear()
+        caches['user_state'].clear()
+        self.user = CustomUser.objects.create_user(
+            username='notifyuser', email='notify@example.com', password='TestPassword123!'
+        )
+        Notification.objects.filter(user=self.user).delete()
+        Notification.objects.create(user=self.user, notification_type='general', title='Personal', message='Hi')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.broadcast = Broadcast.objects.create(title='Maintenance', message='Tonight at 10pm')
+        self.client.force_login(self.user)
+
+    def test_broadcasts_are_listed_and_marked_read(self):
+        response = self.client.get(reverse('dashboard:notifications'), secure=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item.title for item in response.context['notifications']], ['Maintenance', 'Personal'])
+        self.assertContains(response, reverse('dashboard:mark_broadcast_read', args=[self.broadcast.id]))
 
-# Create your tests here.
+        response = self.client.get(
+            reverse('dashboard:mark_broadcast_read', args=[self.broadcast.id]), secure=True, HTTP_HX_REQUEST='true'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(self.broadcast.receipts.filter(user=self.user).exists())
@@ -1,6 +1,7 @@
 from django.urls import path
 from . import views
 from .views_more_services import more_services
+from .views_events import dashboard_events
 
 app_name = 'dashboard'
 
@@ -37,8 +38,12 @@ urlpatterns = [
     # Notifications
     path('notifications/', views.notifications, name='notifications'),
     path('notifications/mark-read/<int:notification_id>/', views.mark_notification_read, name='mark_notification_read'),
+    path('notifications/broadcasts/<int:broadcast_id>/mark-read/', views.mark_broadcast_notification_read, name='mark_broadcast_read'),
     path('notifications/mark-all-read/', views.mark_all_notifications_read, name='mark_all_notifications_read'),
     
+    # Server-sent events (replaces polling of the HTMX updates below)
+    path('events/', dashboard_events, name='events'),
+    
     # HTMX updates
     path('balance-update/', views.balance_update, name='balance_update'),
     path('transactions-update/', views.transactions_update, name='transactions_update'),
@@ -9,9 +9,13 @@ from django.utils import timezone
 from decimal import Decimal
 from django.core.cache import cache
 from accounts.models import CustomUser
-from banking.models import Account, Transaction, VirtualCard, Notification, BitcoinWallet
+from banking.models import Account, Transaction, VirtualCard, Notification, BitcoinWallet, Broadcast
+from banking import notification_cache
+from banking.notification_fanout import get_broadcasts_for_user, mark_all_broadcasts_read, mark_broadcast_read
+from .snapshot import DashboardSnapshot
 from banking.models_bills import Biller, BillPayment, Payee, ScheduledPayment
 from banking.models_loans import LoanApplication, LoanAccount, LoanPayment
+from banking import amortization
 from banking.views_bitcoin import update_btc_price
 from .views_investments_insurance import *
 from django.conf import settings
@@ -21,50 +25,9 @@ def home(request):
     """Dashboard home view"""
     user = request.user
 
-    # Get user's accounts
-    accounts = Account.objects.filter(user=user)
-    total_balance = accounts.aggregate(Sum('balance'))['balance__sum'] or Decimal('0.00')
-
-    # Get Bitcoin wallet and update price
-    try:
-        bitcoin_wallet = BitcoinWallet.objects.get(user=user)
-        btc_price = update_btc_price() or Decimal('0.00')
-        cache.set('btc_price_usd', btc_price, timeout=300)  # Cache for 5 minutes
-        bitcoin_wallet.btc_price_usd = btc_price
-        bitcoin_wallet.save()
-    except BitcoinWallet.DoesNotExist:
-        bitcoin_wallet = None
-        btc_price = Decimal('0.00')
-
-    # Keep Bitcoin balance separate from fiat balance
-
-    # Get recent transactions (including Bitcoin transactions)
-    transactions = Transaction.objects.filter(
-        Q(from_account__in=accounts) | Q(to_account__in=accounts) | Q(user=user)
-    ).order_by('-created_at')[:5]
-
-    # Get virtual cards
-    virtual_cards = VirtualCard.objects.filter(user=user, is_active=True)
-
-    # Get unread notifications
-    notifications = Notification.objects.filter(user=user, is_read=False)[:5]
-
-    # Transaction metrics (including Bitcoin transactions)
-    transactions_count = Transaction.objects.filter(
-        Q(from_account__in=accounts) | Q(to_account__in=accounts) | Q(user=user)
-    ).count()
-    
-    # Money received (including Bitcoin deposits)
-    money_received = Transaction.objects.filter(
-        Q(to_account__in=accounts, status='completed') |
-        Q(user=user, transaction_type='bitcoin_deposit', status='completed')
-    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
-    
-    # Money spent (including Bitcoin sends)
-    money_spent = Transaction.objects.filter(
-        Q(from_account__in=accounts, status='completed') |
-        Q(user=user, transaction_type='bitcoin_send', status='completed')
-    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
+    # Accounts, wallet, recent transactions, cards and metrics come from the
+    # cached snapshot; notifications and the BTC price from their own caches
+    snapshot = DashboardSnapshot.get_context(user)
 
     # Get current time for greeting
     from datetime import datetime
@@ -78,16 +41,7 @@ def home(request):
     context = {
         'greeting': greeting,
         'active_tab': 'home',
-        'accounts': accounts,
-        'total_balance': total_balance,
-        'bitcoin_wallet': bitcoin_wallet,
-        'btc_price_usd': btc_price,
-        'transactions': transactions,
-        'virtual_cards': virtual_cards,
-        'notifications': notifications,
-        'transactions_count': transactions_count,
-        'money_received': money_received,
-        'money_spent': money_spent,
+        **snapshot,
     }
 
     if request.htmx:
@@ -107,22 +61,7 @@ def balance_update(request):
     """Update balance via HTMX"""
     user = request.user
 
-    # Get user's accounts
-    accounts = Account.objects.filter(user=user)
-    total_balance = accounts.aggregate(Sum('balance'))['balance__sum'] or Decimal('0.00')
-
-    # Get Bitcoin wallet and update price
-    try:
-        bitcoin_wallet = BitcoinWallet.objects.get(user=user)
-        btc_price = update_btc_price() or Decimal('0.00')
-        cache.set('btc_price_usd', btc_price, timeout=300)  # Cache for 5 minutes
-        bitcoin_balance_usd = bitcoin_wallet.balance * btc_price
-    except BitcoinWallet.DoesNotExist:
-        bitcoin_wallet = None
-        bitcoin_balance_usd = Decimal('0.00')
-        btc_price = Decimal('0.00')
-
-    # Keep Bitcoin balance separate from fiat balance
+    snapshot = DashboardSnapshot.get_context(user)
 
     # Get current time for greeting
     from datetime import datetime
@@ -135,10 +74,10 @@ def balance_update(request):
 
     context = {
         'greeting': greeting,
-        'accounts': accounts,
-        'total_balance': total_balance,
-        'bitcoin_wallet': bitcoin_wallet,
-        'btc_price_usd': btc_price,
+        'accounts': snapshot['accounts'],
+        'total_balance': snapshot['total_balance'],
+        'bitcoin_wallet': snapshot['bitcoin_wallet'],
+        'btc_price_usd': snapshot['btc_price_usd'],
     }
 
     return render(request, 'dashboard/partials/balance_card.html', context)
@@ -169,13 +108,8 @@ def transactions_update(request):
     """Update recent transactions via HTMX"""
     user = request.user
 
-    # Get user's accounts and transactions in a single query (including Bitcoin transactions)
-    transactions = Transaction.objects.select_related('from_account', 'to_account').filter(
-        Q(from_account__user=user) | Q(to_account__user=user) | Q(user=user)
-    ).order_by('-created_at')[:5]
-
     context = {
-        'transactions': transactions,
+        'transactions': DashboardSnapshot.get(user)['transactions'],
     }
 
     return render(request, 'dashboard/partials/recent_transactions.html', context)
@@ -189,7 +123,7 @@ def transactions(request):
     # Get all transactions for user's accounts (including Bitcoin transactions)
     transactions = Transaction.objects.filter(
         Q(from_account__in=accounts) | Q(to_account__in=accounts) | Q(user=user)
-    ).order_by('-created_at')
+    ).select_related('from_account__user', 'to_account__user').order_by('-created_at')
 
     # Filter by status if provided
     status_filter = request.GET.get('status')
@@ -279,13 +213,17 @@ def card_details(request, card_id):
 def notifications(request):
     """View notifications"""
     # Use select_related to reduce queries
-    notifications = Notification.objects.select_related('user').filter(
+    notifications = Notification.objects.select_related('user', 'related_transaction').filter(
         user=request.user
     ).order_by('-created_at')
+    # Broadcasts are shared rows, shown alongside the user's own notifications
+    broadcasts = get_broadcasts_for_user(request.user)
 
     context = {
         'active_tab': 'notifications',
-        'notifications': notifications,
+        'notifications': sorted(
+            [*notifications, *broadcasts], key=lambda item: item.created_at, reverse=True
+        ),
     }
 
     if request.htmx:
@@ -299,8 +237,10 @@ def mark_notification_read(request, notification_id):
     user = request.user
     notification = get_object_or_404(Notification, id=notification_id, user=user)
 
-    notification.is_read = True
-    notification.save()
+    if not notification.is_read:
+        notification.is_read = True
+        notification.save()
+        notification_cache.notification_read(user.id)
 
     response = HttpResponse()
     if request.htmx:
@@ -308,12 +248,26 @@ def mark_notification_read(request, notification_id):
 
     return response
 
+@login_required
+def mark_broadcast_notification_read(request, broadcast_id):
+    """Mark a broadcast as read for this user"""
+    broadcast = get_object_or_404(Broadcast, id=broadcast_id, is_active=True)
+    mark_broadcast_read(request.user, broadcast)
+
+    response = HttpResponse()
+    if request.htmx:
+        trigger_client_event(response, 'notificationRead', {'id': f'broadcast-{broadcast_id}'})
+
+    return response
+
 @login_required
 def mark_all_notifications_read(request):
-    """Mark all notifications as read"""
+    """Mark all notifications and broadcasts as read"""
     if request.htmx:
         notifications = Notification.objects.filter(user=request.user, is_read=False)
         notifications.update(is_read=True)
+        mark_all_broadcasts_read(request.user)
+        notification_cache.invalidate(request.user.id)
         return HttpResponse(status=200)
     return redirect('dashboard:home')
 
@@ -485,6 +439,9 @@ def handle_loan_application(request):
             income_adjustment = min(annual_income / 100000 * 0.005, 0.01)
             interest_rate = max(interest_rate - income_adjustment, 0.03)  # Minimum 3% APR
         
+        # Stored as an annual percentage, as the API and loan pages show it
+        interest_rate = Decimal(str(round(interest_rate * 100, 2)))
+        
         # Calculate monthly payment
         monthly_payment = calculate_monthly_payment(amount, interest_rate, term)
         
@@ -512,7 +469,6 @@ def handle_loan_application(request):
             # Create loan account
             loan_account = LoanAccount.objects.create(
                 application=application,
-                loan_number=LoanAccount.generate_loan_number(),
                 original_amount=amount,
                 current_balance=amount,
                 interest_rate=interest_rate,
@@ -559,21 +515,10 @@ def calculate_monthly_payment(principal, annual_rate, term_months):
     Where:
     P = Monthly Payment
     Pv = Present Value (principal)
-    R = Monthly Interest Rate (annual rate / 12)
+    R = Monthly Interest Rate (annual percentage rate / 1200)
     n = Number of Payments (term in months)
     """
-    if annual_rate <= 0 or term_months <= 0 or principal <= 0:
-        return 0
-        
-    monthly_rate = annual_rate / 12
-    if monthly_rate == 0:  # Handle interest-free loans
-        return principal / term_months
-        
-    # Calculate monthly payment
-    monthly_payment = (principal * monthly_rate * (1 + monthly_rate) ** term_months) / \
-                     ((1 + monthly_rate) ** term_months - 1)
-    
-    return round(monthly_payment, 2)
+    return amortization.monthly_payment(principal, annual_rate, term_months)
 
 @login_required
 def loan_detail(request, loan_id):
@@ -602,6 +547,8 @@ def loan_detail(request, loan_id):
             'loan': loan,
             'payments': payments,
             'progress': min(progress, 100),  # Cap at 100%
+            # Stored schedule rows; only rebuilt here if a payment made them stale
+            'schedule': amortization.LoanScheduleService.schedule_for(loan),
         }
         
         return render(request, 'dashboard/partials/loan_detail_modal.html', context)
@@ -676,10 +623,8 @@ def make_loan_payment(request, loan_id):
                 except (ValueError, TypeError):
                     payment_date = timezone.now().date()
                 
-                # Calculate principal and interest portions
-                monthly_interest = (loan.current_balance * loan.interest_rate / 12)
-                principal_amount = max(amount - monthly_interest, Decimal('0.01'))
-                interest_amount = min(monthly_interest, amount - principal_amount)
+                # Split into interest and principal; updates the balance and marks the schedule stale
+                principal_amount, interest_amount = amortization.record_payment(loan, amount)
                 
                 # Create payment record
                 payment = LoanPayment.objects.create(
@@ -695,9 +640,6 @@ def make_loan_payment(request, loan_id):
                     processed_at=timezone.now()
                 )
                 
-                # Update loan balance and next payment date
-                loan.current_balance -= principal_amount
-                
                 # If this pays off the loan
                 if loan.current_balance <= 0:
                     loan.status = 'paid'
@@ -816,22 +758,10 @@ def services(request):
 @login_required
 def metrics_update(request):
     """Update transaction metrics via HTMX"""
-    user = request.user
-    accounts = Account.objects.filter(user=user)
-    transactions_count = Transaction.objects.filter(
-        Q(from_account__in=accounts) | Q(to_account__in=accounts) | Q(user=user)
-    ).count()
-    money_received = Transaction.objects.filter(
-        Q(to_account__in=accounts, status='completed') |
-        Q(user=user, transaction_type='bitcoin_deposit', status='completed')
-    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
-    money_spent = Transaction.objects.filter(
-        Q(from_account__in=accounts, status='completed') |
-        Q(user=user, transaction_type='bitcoin_send', status='completed')
-    ).aggregate(Sum('amount'))['amount__sum'] or Decimal('0.00')
+    snapshot = DashboardSnapshot.get(request.user)
     context = {
-        'transactions_count': transactions_count,
-        'money_received': money_received,
-        'money_spent': money_spent,
+        'transactions_count': snapshot['transactions_count'],
+        'money_received': snapshot['money_received'],
+        'money_spent': snapshot['money_spent'],
     }
     return render(request, 'dashboard/partials/transaction_metrics.html', context)
@@ -0,0 +1,59 @@
+"""
+Server-sent events stream for the dashboard
+
+Replaces HTMX polling: the page opens one EventSource and refreshes a
+partial only when a balance, transaction or notification event arrives.
+The stream itself never queries the database after authentication, and
+the connection used to authenticate is closed before streaming starts.
+Must be served over ASGI (see start.sh) so each open stream does not
+hold a worker thread.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.http import HttpResponse, StreamingHttpResponse
+
+from core.event_bus import get_event_bus, user_channel
+
+
+def format_event(event, data):
+    """Encode one server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+async def stream_events(channel, heartbeat):
+    subscription = get_event_bus().subscribe(channel)
+    try:
+        # Browsers reconnect after this many milliseconds if the stream drops
+        yield f"retry: {getattr(settings, 'DASHBOARD_EVENTS_RETRY_MS', 3000)}\n\n"
+        while True:
+            message = await subscription.get(timeout=heartbeat)
+            if message is None:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(message['event'], message['data'])
+    finally:
+        subscription.close()
+
+
+async def dashboard_events(request):
+    """Stream the signed-in user's dashboard events"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    # request_finished only fires when the stream ends; do not hold the
+    # connection that loaded the session and user until then
+    await sync_to_async(close_old_connections)()
+
+    heartbeat = getattr(settings, 'DASHBOARD_EVENTS_HEARTBEAT_SECONDS', 15)
+    response = StreamingHttpResponse(
+        stream_events(user_channel(user.pk), heartbeat), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx style proxies from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -5,6 +5,10 @@ set -o errexit
 echo "Running migrations..."
 python3 manage.py migrate --no-input
 
+# Cache tables (incl. the ID worker-slot leases); existing tables are left alone
+echo "Creating cache tables..."
+python3 manage.py createcachetable
+
 # Create superuser if not exists (requires DJANGO_SUPERUSER_* env vars)
 echo "Creating superuser..."
 python3 manage.py createsuperuser \
@@ -15,7 +19,9 @@ python3 manage.py createsuperuser \
     --last_name "$DJANGO_SUPERUSER_LAST_NAME" || true
 
 echo "Starting Gunicorn server..."
-exec gunicorn core.wsgi:application \
+# ASGI workers so dashboard event streams do not each hold a worker thread
+exec gunicorn core.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
     --bind 0.0.0.0:${PORT:-8000} \
     --workers 4 \
     --timeout 120 \
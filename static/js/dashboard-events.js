@@ -0,0 +1,41 @@
+// Push updates for the dashboard over server-sent events
+// Replaces interval polling: partials refresh only when the server reports a change
+(function() {
+    if (!window.EventSource) {
+        return;
+    }
+
+    const script = document.currentScript;
+    const eventsUrl = script && script.dataset.eventsUrl;
+    if (!eventsUrl) {
+        return;
+    }
+
+    // Each server event is re-dispatched as an htmx trigger on the partials that show it
+    const targets = {
+        balance: ['#balance-card'],
+        transaction: ['#recent-transactions', '#metrics-container'],
+        notification: [],
+    };
+
+    function refresh(eventName) {
+        targets[eventName].forEach(function(selector) {
+            const element = document.querySelector(selector);
+            if (element && window.htmx) {
+                htmx.trigger(element, 'dashboard:' + eventName);
+            }
+        });
+    }
+
+    const source = new EventSource(eventsUrl);
+    window.dashboardEvents = source;
+
+    Object.keys(targets).forEach(function(eventName) {
+        source.addEventListener(eventName, function(event) {
+            refresh(eventName);
+            document.dispatchEvent(new CustomEvent('dashboard:' + eventName, {
+                detail: JSON.parse(event.data)
+            }));
+        });
+    });
+})();
@@ -170,8 +170,8 @@ function initNotificationSystem() {
         }
     });
     
-    // Poll for new notifications every 30 seconds
-    setInterval(function() {
+    // Refresh the notification indicator when the server pushes a notification
+    function checkNotifications() {
         if (document.getElementById('mobile-notification-button')) {
             const notificationUrl = document.getElementById('mobile-notification-button').getAttribute('hx-get');
             if (notificationUrl) {
@@ -201,7 +201,14 @@ function initNotificationSystem() {
                     });
             }
         }
-    }, 30000); // Check every 30 seconds
+    }
+    
+    if (window.EventSource) {
+        document.addEventListener('dashboard:notification', checkNotifications);
+    } else {
+        // Browsers without server-sent events keep polling every 30 seconds
+        setInterval(checkNotifications, 30000);
+    }
     
     return true;
 }
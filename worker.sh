@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+set -o errexit
+
+# Background processing: nothing here is served over HTTP, but without it
+# no email (including login codes) is sent, broadcasts are not fanned out
+# and scheduled payments are not executed.
+echo "Starting outbox sender, notification fan-out and scheduled payment executor..."
+python3 manage.py send_outbox_emails --loop &
+python3 manage.py process_notification_fanouts --loop &
+python3 manage.py execute_scheduled_payments --loop &
+
+# Exit as soon as any loop dies so the platform restarts the whole worker
+wait -n
+exit 1